@@ -8,8 +8,10 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
 from app.core.config import get_settings
+from app.db.replica import read_router
 from app.db.session import get_session
 from app.models.user import Role, User
+from app.services.principal_cache import Principal, principal_cache
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/token")
 
@@ -19,9 +21,17 @@ async def get_db() -> AsyncGenerator[AsyncSession, None]:
         yield session
 
 
+async def get_read_db() -> AsyncGenerator[AsyncSession, None]:
+    """Sessão somente leitura: réplica saudável ou, na falta dela, o primário."""
+
+    session_factory = await read_router.session_factory()
+    async with session_factory() as session:
+        yield session
+
+
 async def get_current_user(
     token: str = Depends(oauth2_scheme), session: AsyncSession = Depends(get_db)
-) -> User:
+) -> Principal:
     settings = get_settings()
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -36,6 +46,10 @@ async def get_current_user(
     except JWTError:
         raise credentials_exception
 
+    principal = principal_cache.get(email)
+    if principal is not None:
+        return principal
+
     result = await session.execute(
         select(User)
         .options(
@@ -47,10 +61,12 @@ async def get_current_user(
     user = result.scalar_one_or_none()
     if not user:
         raise credentials_exception
-    return user
+    principal = Principal.from_user(user)
+    principal_cache.put(principal)
+    return principal
 
 
-async def get_active_user(current_user: User = Depends(get_current_user)) -> User:
+async def get_active_user(current_user: Principal = Depends(get_current_user)) -> Principal:
     if not current_user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
     return current_user
@@ -59,21 +75,17 @@ async def get_active_user(current_user: User = Depends(get_current_user)) -> Use
 def authorize(
     roles: Sequence[str] | None = None, permissions: Sequence[str] | None = None
 ):
-    async def dependency(current_user: User = Depends(get_active_user)) -> User:
+    required_roles = frozenset(roles or ())
+    required_permissions = frozenset(permissions or ())
+
+    async def dependency(current_user: Principal = Depends(get_active_user)) -> Principal:
         if current_user.is_superuser:
             return current_user
 
-        role_names: set[str] = {role.name for role in current_user.roles}
-        permission_codes: set[str] = {
-            permission.code
-            for role in current_user.roles
-            for permission in role.permissions
-        }
-
-        if roles and not role_names.intersection(roles):
+        if required_roles and current_user.role_names.isdisjoint(required_roles):
             raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Perfil insuficiente")
 
-        if permissions and not set(permissions).issubset(permission_codes):
+        if required_permissions and not required_permissions <= current_user.permission_codes:
             raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Permissão insuficiente")
 
         return current_user
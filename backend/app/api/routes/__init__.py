@@ -7,7 +7,9 @@ from . import (
     impressoras,
     pagamentos,
     produtos,
+    promocoes,
     relatorios,
+    tarefas,
     vendas,
 )
 
@@ -20,6 +22,8 @@ __all__ = [
     "impressoras",
     "pagamentos",
     "produtos",
+    "promocoes",
     "relatorios",
+    "tarefas",
     "vendas",
 ]
@@ -11,9 +11,8 @@ from app.core.config import get_settings
 from app.core.security import (
     create_access_token,
     generate_refresh_token,
-    get_password_hash,
     hash_token,
-    verify_password,
+    password_hasher,
 )
 from app.models.refresh_token import RefreshToken
 from app.models.user import User
@@ -44,10 +43,15 @@ async def login(
 ):
     result = await session.execute(select(User).where(User.email == form_data.username))
     user = result.scalars().first()
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    if not user:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Incorrect credentials")
+    valido, novo_hash = await password_hasher.verify_and_update(form_data.password, user.hashed_password)
+    if not valido:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Incorrect credentials")
     if not user.is_active:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Usuário inativo")
+    if novo_hash:
+        user.hashed_password = novo_hash
 
     settings = get_settings()
     access_token_expires = timedelta(minutes=settings.access_token_expire_minutes)
@@ -134,7 +138,7 @@ async def criar_usuario(
     user = User(
         email=payload.email,
         full_name=payload.full_name,
-        hashed_password=get_password_hash(payload.password),
+        hashed_password=await password_hasher.hash(payload.password),
         is_active=True,
     )
     session.add(user)
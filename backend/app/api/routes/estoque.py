@@ -1,7 +1,7 @@
 from fastapi import APIRouter, Depends
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.api.deps import authorize, get_db
+from app.api.deps import authorize, get_read_db
 from app.models.product import StockItem, StockLocation
 
 router = APIRouter(prefix="/estoque", tags=["estoque"])
@@ -9,7 +9,7 @@ router = APIRouter(prefix="/estoque", tags=["estoque"])
 
 @router.get("/itens", response_model=list[dict])
 async def listar_itens(
-    session: AsyncSession = Depends(get_db),
+    session: AsyncSession = Depends(get_read_db),
     _: None = Depends(authorize(roles=["GERENTE", "ALMOXARIFE"])),
 ):
     result = await session.execute(StockItem.__table__.select())
@@ -21,7 +21,7 @@ async def listar_itens(
 
 @router.get("/locais", response_model=list[dict])
 async def listar_locais(
-    session: AsyncSession = Depends(get_db),
+    session: AsyncSession = Depends(get_read_db),
     _: None = Depends(authorize(roles=["GERENTE", "ALMOXARIFE"])),
 ):
     result = await session.execute(StockLocation.__table__.select())
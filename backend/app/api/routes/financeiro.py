@@ -1,9 +1,11 @@
 from datetime import date
 
 from fastapi import APIRouter, Depends
+from sqlalchemy import func, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.api.deps import authorize, get_db
+from app.api.deps import authorize, get_read_db
+from app.core import money
 from app.models.sale import Payment
 
 router = APIRouter(prefix="/financeiro", tags=["financeiro"])
@@ -11,15 +13,15 @@ router = APIRouter(prefix="/financeiro", tags=["financeiro"])
 
 @router.get("/fluxo-caixa", response_model=list[dict])
 async def consultar_fluxo_caixa(
-    session: AsyncSession = Depends(get_db),
+    session: AsyncSession = Depends(get_read_db),
     _: None = Depends(authorize(roles=["GERENTE", "FINANCEIRO"])),
 ):
-    result = await session.execute(Payment.__table__.select())
+    result = await session.execute(select(Payment).order_by(Payment.id))
     return [
         {
             "id": payment.id,
             "metodo": payment.method,
-            "valor": float(payment.amount),
+            "valor": money.to_float(money.cents(payment.amount)),
             "pago": payment.paid,
         }
         for payment in result.scalars().all()
@@ -28,10 +30,11 @@ async def consultar_fluxo_caixa(
 
 @router.get("/resumo")
 async def resumo_financeiro(
-    session: AsyncSession = Depends(get_db),
+    session: AsyncSession = Depends(get_read_db),
     _: None = Depends(authorize(roles=["GERENTE", "FINANCEIRO"])),
 ):
-    result = await session.execute(Payment.__table__.select())
-    movimentos = result.scalars().all()
-    total = sum([float(m.amount) if m.paid else 0 for m in movimentos])
-    return {"saldo": total, "atualizado_em": date.today().isoformat()}
+    result = await session.execute(
+        select(func.coalesce(func.sum(Payment.amount), 0)).where(Payment.paid.is_(True))
+    )
+    total = money.cents(result.scalar_one())
+    return {"saldo": money.to_float(total), "atualizado_em": date.today().isoformat()}
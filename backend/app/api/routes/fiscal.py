@@ -2,10 +2,9 @@ from fastapi import APIRouter, Depends
 
 from app.api.deps import authorize
 from app.schemas import fiscal as fiscal_schema
-from app.services.fiscal import FiscalService
+from app.services.fiscal import fiscal_service
 
 router = APIRouter(prefix="/fiscal", tags=["fiscal"])
-fiscal_service = FiscalService()
 
 
 @router.post("/nota", response_model=fiscal_schema.InvoiceResponse)
@@ -40,6 +39,10 @@ async def listar_contingencia(
             reference=item["reference"],
             queued_at=item["queued_at"],
             reason=item["reason"],
+            deadline=item["deadline"],
+            status=item["status"],
+            attempts=item["attempts"],
+            message=item["message"],
         )
-        for item in fiscal_service.contingency_queue()
+        for item in await fiscal_service.contingency_queue()
     ]
@@ -1,4 +1,19 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.deps import get_db
+from app.core.security import password_hasher
+from app.db.replica import read_router
+from app.db.session import pool_status
+from app.services import audit
+from app.services.catalog_snapshot import catalog_snapshot
+from app.services.error_sink import error_sink
+from app.services.fiscal import fiscal_service
+from app.services.fiscal_contingency import contingency_retransmitter
+from app.services.outbox import outbox_dispatcher
+from app.services.pricing import pricing_engine
+from app.services.principal_cache import principal_cache
+from app.services.product_lookup import product_lookup
 
 router = APIRouter(tags=["health"])
 
@@ -6,3 +21,61 @@ router = APIRouter(tags=["health"])
 @router.get("/health", summary="Healthcheck")
 def healthcheck():
     return {"status": "ok"}
+
+
+@router.get("/health/audit", summary="Métricas da fila de auditoria")
+def auditoria():
+    return audit.audit_writer.metrics()
+
+
+@router.get("/health/auth-cache", summary="Métricas do cache de autenticação")
+def cache_autenticacao():
+    return principal_cache.metrics()
+
+
+@router.get("/health/password-hashing", summary="Métricas do hash de senhas")
+def hash_senhas():
+    return password_hasher.metrics()
+
+
+@router.get("/health/errors", summary="Métricas do agregador de erros")
+def erros():
+    return error_sink.metrics()
+
+
+@router.get("/health/catalog-snapshot", summary="Estado do snapshot do catálogo")
+def snapshot_catalogo():
+    return catalog_snapshot.metrics()
+
+
+@router.get("/health/product-lookup", summary="Métricas do índice de leitura de produtos")
+def indice_produtos():
+    return product_lookup.metrics()
+
+
+@router.get("/health/pricing", summary="Estado do motor de promoções")
+def promocoes():
+    return pricing_engine.metrics()
+
+
+@router.get("/health/outbox", summary="Despachante e pendências do outbox")
+async def outbox(session: AsyncSession = Depends(get_db)):
+    return {**outbox_dispatcher.metrics(), "backlog": await outbox_dispatcher.backlog(session)}
+
+
+@router.get("/health/sefaz", summary="Conexões e latência da SEFAZ por UF")
+def sefaz():
+    return fiscal_service.metrics()
+
+
+@router.get("/health/fiscal-contingency", summary="Retransmissão e pendências da contingência fiscal")
+async def contingencia_fiscal():
+    return {
+        **contingency_retransmitter.metrics(),
+        "backlog": await contingency_retransmitter.manager.backlog(),
+    }
+
+
+@router.get("/health/db", summary="Estado do pool de conexões")
+def banco():
+    return {**pool_status(), "read_replicas": read_router.status()}
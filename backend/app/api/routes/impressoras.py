@@ -6,6 +6,7 @@ from sqlalchemy.orm import selectinload
 from app.api.deps import authorize, get_db
 from app.models.sale import Sale, SaleItem
 from app.schemas.printer import PrintJobResult, PrintSaleRequest
+from app.services.jobs import enqueue_job
 from app.services.printer import ThermalPrinterService
 
 router = APIRouter(prefix="/impressoras", tags=["impressoras"])
@@ -43,30 +44,16 @@ async def imprimir_cupom_venda(
             detail="A venda precisa estar finalizada para impressão",
         )
 
-    printer_service = ThermalPrinterService(
-        host=payload.printer.host,
-        port=payload.printer.port,
-        timeout=payload.printer.timeout,
-        encoding=payload.printer.encoding,
-    )
-
-    try:
-        receipt = printer_service.print_sale(sale)
-    except OSError as exc:
-        raise HTTPException(
-            status_code=status.HTTP_502_BAD_GATEWAY,
-            detail=f"Falha ao comunicar com a impressora: {exc}",
-        ) from exc
-    except Exception as exc:  # pylint: disable=broad-except
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Erro ao enviar impressão: {exc}",
-        ) from exc
+    # A impressão roda na fila `print`: a resposta não espera pela impressora.
+    job = enqueue_job(session, "print.sale", {"sale_id": sale.id, "printer": payload.printer.model_dump()})
+    await session.commit()
 
+    printer_service = ThermalPrinterService(**payload.printer.model_dump())
     return PrintJobResult(
-        status="sent",
-        message="Cupom enviado para a impressora",
+        status="queued",
+        message="Cupom enviado para a fila de impressão",
         sale_id=sale.id,
         printer=payload.printer,
-        receipt_preview=receipt,
+        receipt_preview=printer_service.format_sale_receipt(sale),
+        job_id=job.id,
     )
@@ -7,12 +7,14 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
 from app.api.deps import authorize, get_db
+from app.core import money
 from app.models.sale import Payment, Sale
 from app.schemas.payment import (
     PaymentConfirmation,
     PaymentIntegrationRequest,
     PaymentIntegrationResponse,
 )
+from app.services.sales_rollup import record_sale
 
 router = APIRouter(prefix="/pagamentos", tags=["pagamentos"])
 
@@ -34,8 +36,9 @@ def _criar_codigo_transacao(prefixo: str) -> str:
 
 
 def _gerar_qrcode_pix(codigo: str, valor: float, sale_id: int) -> tuple[str, str]:
-    payload = f"00020126580014BR.GOV.BCB.PIX520400005303986540{valor:.2f}5802BR5913PDV Demo Ltda6014Sao Paulo BR6216SALE{sale_id:06d}6304"
-    qr_ascii = f"PIX:{codigo}|SALE:{sale_id}|AMOUNT:{valor:.2f}"
+    valor = money.format_reais(valor)
+    payload = f"00020126580014BR.GOV.BCB.PIX520400005303986540{valor}5802BR5913PDV Demo Ltda6014Sao Paulo BR6216SALE{sale_id:06d}6304"
+    qr_ascii = f"PIX:{codigo}|SALE:{sale_id}|AMOUNT:{valor}"
     return qr_ascii, payload
 
 
@@ -113,23 +116,32 @@ async def confirmar_pagamento(
 ):
     result = await session.execute(
         select(Payment)
-        .options(selectinload(Payment.sale))
+        .options(
+            selectinload(Payment.sale).selectinload(Sale.items),
+            selectinload(Payment.sale).selectinload(Sale.payments),
+        )
         .where(Payment.transaction_code == payload.transaction_code)
     )
     payment = result.scalar_one_or_none()
     if not payment:
         raise HTTPException(status_code=404, detail="Pagamento não encontrado")
 
+    status_anterior = payment.sale.status
     payment.paid = payload.approved
     if payload.approved:
         payment.transaction_code = payload.nsu or payment.transaction_code
         payment.sale.status = payment.sale.status or "pending"
-        total_pago = sum(float(p.amount) for p in payment.sale.payments if p.paid)
-        if payment.sale.items and total_pago >= float(payment.sale.total or 0):
+        total_pago = money.total(p.amount for p in payment.sale.payments if p.paid)
+        if payment.sale.items and total_pago >= money.cents(payment.sale.total):
             payment.sale.status = "completed"
     else:
         payment.sale.status = "pending"
 
+    if status_anterior != "completed" and payment.sale.status == "completed":
+        await record_sale(session, payment.sale)
+    elif status_anterior == "completed" and payment.sale.status != "completed":
+        await record_sale(session, payment.sale, sign=-1)
+
     await session.commit()
     status = "paid" if payload.approved else "declined"
     mensagem = "Pagamento confirmado" if payload.approved else "Pagamento não aprovado"
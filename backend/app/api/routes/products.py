@@ -2,7 +2,7 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 
-from app.api.deps import authorize, get_active_user, get_db
+from app.api.deps import authorize, get_active_user, get_db, get_read_db
 from app.models.product import Product
 from app.schemas import product as product_schema
 from app.services.audit import log_action
@@ -12,7 +12,7 @@ router = APIRouter(prefix="/products", tags=["products"])
 
 @router.get("/", response_model=list[product_schema.Product])
 async def list_products(
-    session: AsyncSession = Depends(get_db),
+    session: AsyncSession = Depends(get_read_db),
     _: None = Depends(authorize(roles=["GERENTE", "VENDEDOR"])),
 ):
     result = await session.execute(select(Product))
@@ -1,19 +1,28 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+import asyncio
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response, status
+from fastapi.responses import FileResponse
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.api.deps import authorize, get_db
-from app.models.product import Product
+from app.api.deps import authorize, get_db, get_read_db
+from app.models.product import Product, ProductBarcode
 from app.schemas import product as product_schema
 from app.services.audit import log_action
+from app.services.catalog_snapshot import SnapshotManifest, catalog_snapshot
+from app.services.catalog_sync import catalog_changes, catalog_etag, current_seq
 from app.services.crud_base import CRUDBase
+from app.services.product_lookup import on_hand, product_lookup
+from app.services.scale_labels import InvalidScaleLabel
 
 router = APIRouter(prefix="/produtos", tags=["produtos"])
-product_crud = CRUDBase[Product, product_schema.ProductCreate, product_schema.ProductCreate](Product)
+product_crud = CRUDBase[Product, product_schema.ProductCreate, product_schema.ProductUpdate](Product)
 
 
 @router.get("/", response_model=list[product_schema.Product])
 async def listar_produtos(
-    session: AsyncSession = Depends(get_db),
+    session: AsyncSession = Depends(get_read_db),
     _: None = Depends(authorize(roles=["GERENTE", "VENDEDOR"])),
 ):
     return await product_crud.get_multi(session)
@@ -30,6 +39,164 @@ async def criar_produto(
     return product
 
 
+@router.get("/sync", response_model=product_schema.ProductSyncPage)
+async def sincronizar_produtos(
+    response: Response,
+    since: int = Query(0, ge=0),
+    limit: int = Query(5000, ge=1, le=50000),
+    if_none_match: str | None = Header(None),
+    session: AsyncSession = Depends(get_read_db),
+    _: None = Depends(authorize(roles=["GERENTE", "VENDEDOR"])),
+):
+    """Alterações do catálogo desde o cursor informado; repetir com o cursor retornado."""
+
+    seq = await current_seq(session)
+    etag = catalog_etag(since, limit, seq)
+    if if_none_match == etag:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    return await catalog_changes(session, since, limit, seq)
+
+
+@router.get("/scan/{code}", response_model=product_schema.ProductScan)
+async def escanear_produto(
+    code: str,
+    session: AsyncSession = Depends(get_db),
+    _: None = Depends(authorize(roles=["GERENTE", "VENDEDOR"])),
+):
+    """Resolve um código lido (GTIN, SKU ou etiqueta de balança) com preço e saldo em estoque."""
+
+    await product_lookup.ensure_fresh(session)
+    try:
+        encontrado = product_lookup.resolve(code) or await product_lookup.resolve_plu(session, code)
+    except InvalidScaleLabel as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    if encontrado is None:
+        raise HTTPException(status_code=404, detail="Produto não encontrado")
+    entry = encontrado.entry
+    return product_schema.ProductScan(
+        product_id=entry.product_id,
+        sku=entry.sku,
+        name=entry.name,
+        price=float(entry.price),
+        is_active=entry.is_active,
+        code=code,
+        quantity=float(encontrado.quantity),
+        unit_price=float(encontrado.unit_price),
+        total=float(encontrado.total),
+        on_hand=float(await on_hand(session, entry.product_id)),
+    )
+
+
+@router.get("/busca", response_model=list[product_schema.ProductLookup])
+async def buscar_produtos(
+    q: str = Query(..., min_length=1),
+    limit: int = Query(20, ge=1, le=100),
+    session: AsyncSession = Depends(get_db),
+    _: None = Depends(authorize(roles=["GERENTE", "VENDEDOR"])),
+):
+    """Busca por prefixo de SKU ou nome, sem diferenciar maiúsculas e acentos."""
+
+    await product_lookup.ensure_fresh(session)
+    return [
+        product_schema.ProductLookup(
+            product_id=entry.product_id,
+            sku=entry.sku,
+            name=entry.name,
+            price=float(entry.price),
+            is_active=entry.is_active,
+        )
+        for entry in product_lookup.search(q, limit)
+    ]
+
+
+async def _snapshot_atual(session: AsyncSession) -> SnapshotManifest:
+    # Com a tarefa de fundo ativa o arquivo já existe; sem ela, é gerado na primeira chamada.
+    return catalog_snapshot.manifest or await catalog_snapshot.refresh(session)
+
+
+def _intervalo(header: str, size: int) -> tuple[int, int] | None:
+    """Interpreta um único intervalo `bytes=inicio-fim`; múltiplos intervalos recebem o arquivo todo."""
+
+    unidade, _, faixa = header.partition("=")
+    if unidade.strip() != "bytes" or "," in faixa:
+        return None
+    inicio, _, fim = faixa.strip().partition("-")
+    try:
+        if not inicio:
+            comprimento = int(fim)
+            if comprimento <= 0:
+                raise ValueError
+            return max(size - comprimento, 0), size - 1
+        primeiro = int(inicio)
+        ultimo = min(int(fim), size - 1) if fim else size - 1
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+            detail="Intervalo inválido",
+            headers={"Content-Range": f"bytes */{size}"},
+        ) from None
+    if primeiro > ultimo or primeiro >= size:
+        raise HTTPException(
+            status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+            detail="Intervalo fora do arquivo",
+            headers={"Content-Range": f"bytes */{size}"},
+        )
+    return primeiro, ultimo
+
+
+def _ler_trecho(path: str, inicio: int, fim: int) -> bytes:
+    with open(path, "rb") as handle:
+        handle.seek(inicio)
+        return handle.read(fim - inicio + 1)
+
+
+@router.get("/snapshot/manifest")
+async def manifesto_snapshot(
+    session: AsyncSession = Depends(get_read_db),
+    _: None = Depends(authorize(roles=["GERENTE", "VENDEDOR"])),
+):
+    """Versão, sequência e hash do snapshot; depois do download, sincronizar com since=seq."""
+
+    manifest = await _snapshot_atual(session)
+    return {**manifest.as_dict(), "url": router.url_path_for("baixar_snapshot")}
+
+
+@router.get("/snapshot")
+async def baixar_snapshot(
+    range_header: str | None = Header(None, alias="Range"),
+    if_range: str | None = Header(None),
+    if_none_match: str | None = Header(None),
+    session: AsyncSession = Depends(get_read_db),
+    _: None = Depends(authorize(roles=["GERENTE", "VENDEDOR"])),
+):
+    manifest = await _snapshot_atual(session)
+    etag = f'"{manifest.sha256}"'
+    headers = {
+        "ETag": etag,
+        "Accept-Ranges": "bytes",
+        "X-Catalog-Seq": str(manifest.seq),
+        "X-Content-SHA256": manifest.sha256,
+    }
+    if if_none_match == etag:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    intervalo = None
+    if range_header and (if_range is None or if_range == etag):
+        intervalo = _intervalo(range_header, manifest.size)
+    if intervalo is None:
+        return FileResponse(
+            manifest.path, media_type="application/gzip", headers=headers, filename="catalogo.sqlite.gz"
+        )
+    inicio, fim = intervalo
+    conteudo = await asyncio.to_thread(_ler_trecho, manifest.path, inicio, fim)
+    return Response(
+        conteudo,
+        status_code=status.HTTP_206_PARTIAL_CONTENT,
+        media_type="application/gzip",
+        headers={**headers, "Content-Range": f"bytes {inicio}-{fim}/{manifest.size}"},
+    )
+
+
 @router.get("/{product_id}", response_model=product_schema.Product)
 async def obter_produto(
     product_id: int,
@@ -40,3 +207,93 @@ async def obter_produto(
     if not product:
         raise HTTPException(status_code=404, detail="Produto não encontrado")
     return product
+
+
+@router.put("/{product_id}", response_model=product_schema.Product)
+async def atualizar_produto(
+    product_id: int,
+    payload: product_schema.ProductUpdate,
+    session: AsyncSession = Depends(get_db),
+    current_user=Depends(authorize(roles=["GERENTE"])),
+):
+    product = await product_crud.get(session, id=product_id)
+    if not product:
+        raise HTTPException(status_code=404, detail="Produto não encontrado")
+    product = await product_crud.update(session, product, payload)
+    await log_action(
+        session, current_user, "update_product", "Product", product.id, payload.dict(exclude_unset=True)
+    )
+    return product
+
+
+@router.delete("/{product_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def excluir_produto(
+    product_id: int,
+    session: AsyncSession = Depends(get_db),
+    current_user=Depends(authorize(roles=["GERENTE"])),
+):
+    try:
+        product = await product_crud.remove(session, id=product_id)
+    except IntegrityError as exc:
+        await session.rollback()
+        raise HTTPException(
+            status_code=409, detail="Produto possui vendas ou estoque; desative-o em vez de excluir"
+        ) from exc
+    if not product:
+        raise HTTPException(status_code=404, detail="Produto não encontrado")
+    await log_action(session, current_user, "delete_product", "Product", product_id, {"sku": product.sku})
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+
+@router.get("/{product_id}/codigos", response_model=list[product_schema.Barcode])
+async def listar_codigos(
+    product_id: int,
+    session: AsyncSession = Depends(get_db),
+    _: None = Depends(authorize(roles=["GERENTE", "VENDEDOR"])),
+):
+    result = await session.execute(
+        select(ProductBarcode).where(ProductBarcode.product_id == product_id).order_by(ProductBarcode.id)
+    )
+    return result.scalars().all()
+
+
+@router.post(
+    "/{product_id}/codigos", response_model=product_schema.Barcode, status_code=status.HTTP_201_CREATED
+)
+async def adicionar_codigo(
+    product_id: int,
+    payload: product_schema.BarcodeCreate,
+    session: AsyncSession = Depends(get_db),
+    current_user=Depends(authorize(roles=["GERENTE"])),
+):
+    if not await product_crud.get(session, id=product_id):
+        raise HTTPException(status_code=404, detail="Produto não encontrado")
+    barcode = ProductBarcode(product_id=product_id, **payload.dict())
+    session.add(barcode)
+    try:
+        await session.commit()
+    except IntegrityError as exc:
+        await session.rollback()
+        raise HTTPException(status_code=409, detail="Código de barras já cadastrado") from exc
+    await session.refresh(barcode)
+    await log_action(session, current_user, "create_barcode", "Product", product_id, payload.dict())
+    return barcode
+
+
+@router.delete("/{product_id}/codigos/{code}", status_code=status.HTTP_204_NO_CONTENT)
+async def remover_codigo(
+    product_id: int,
+    code: str,
+    session: AsyncSession = Depends(get_db),
+    current_user=Depends(authorize(roles=["GERENTE"])),
+):
+    result = await session.execute(
+        select(ProductBarcode).where(ProductBarcode.product_id == product_id, ProductBarcode.code == code)
+    )
+    barcode = result.scalar_one_or_none()
+    if not barcode:
+        raise HTTPException(status_code=404, detail="Código de barras não encontrado")
+    await session.delete(barcode)
+    await session.commit()
+    await log_action(session, current_user, "delete_barcode", "Product", product_id, {"code": code})
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
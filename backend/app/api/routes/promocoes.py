@@ -0,0 +1,107 @@
+from datetime import datetime
+
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from app.api.deps import authorize, get_db, get_read_db
+from app.models.product import Product
+from app.models.promotion import Promotion, PromotionProduct
+from app.schemas import promotion as promotion_schema
+from app.services.audit import log_action
+
+router = APIRouter(prefix="/promocoes", tags=["promocoes"])
+
+
+async def _buscar_promocao(session: AsyncSession, promotion_id: int) -> Promotion:
+    result = await session.execute(
+        select(Promotion).options(selectinload(Promotion.products)).where(Promotion.id == promotion_id)
+    )
+    promotion = result.scalar_one_or_none()
+    if not promotion:
+        raise HTTPException(status_code=404, detail="Promoção não encontrada")
+    return promotion
+
+
+async def _validar_produtos(session: AsyncSession, payload: promotion_schema.PromotionCreate) -> None:
+    ids = {item.product_id for item in payload.products}
+    result = await session.execute(select(Product.id).where(Product.id.in_(ids)))
+    faltantes = sorted(ids - set(result.scalars().all()))
+    if faltantes:
+        raise HTTPException(
+            status_code=404, detail=f"Produtos não encontrados: {', '.join(map(str, faltantes))}"
+        )
+
+
+def _preencher(promotion: Promotion, payload: promotion_schema.PromotionCreate) -> None:
+    for campo, valor in payload.model_dump(exclude={"products"}).items():
+        setattr(promotion, campo, valor)
+    # Marca a alteração mesmo quando só os produtos mudaram: os outros workers comparam `updated_at`.
+    promotion.updated_at = datetime.utcnow()
+    promotion.products = [
+        PromotionProduct(product_id=item.product_id, price=item.price)
+        for item in {item.product_id: item for item in payload.products}.values()
+    ]
+
+
+@router.get("/", response_model=list[promotion_schema.Promotion])
+async def listar_promocoes(
+    session: AsyncSession = Depends(get_read_db),
+    _: None = Depends(authorize(roles=["GERENTE"])),
+):
+    result = await session.execute(
+        select(Promotion).options(selectinload(Promotion.products)).order_by(Promotion.id)
+    )
+    return result.scalars().all()
+
+
+@router.post("/", response_model=promotion_schema.Promotion, status_code=status.HTTP_201_CREATED)
+async def criar_promocao(
+    payload: promotion_schema.PromotionCreate,
+    session: AsyncSession = Depends(get_db),
+    current_user=Depends(authorize(roles=["GERENTE"])),
+):
+    """Cadastra uma promoção; os caixas passam a aplicá-la na próxima alteração do carrinho."""
+
+    await _validar_produtos(session, payload)
+    promotion = Promotion()
+    _preencher(promotion, payload)
+    session.add(promotion)
+    await session.commit()
+    promotion = await _buscar_promocao(session, promotion.id)
+    await log_action(
+        session, current_user, "create_promotion", "Promotion", promotion.id, payload.model_dump(mode="json")
+    )
+    return promotion
+
+
+@router.put("/{promotion_id}", response_model=promotion_schema.Promotion)
+async def atualizar_promocao(
+    promotion_id: int,
+    payload: promotion_schema.PromotionCreate,
+    session: AsyncSession = Depends(get_db),
+    current_user=Depends(authorize(roles=["GERENTE"])),
+):
+    promotion = await _buscar_promocao(session, promotion_id)
+    await _validar_produtos(session, payload)
+    _preencher(promotion, payload)
+    await session.commit()
+    promotion = await _buscar_promocao(session, promotion_id)
+    await log_action(
+        session, current_user, "update_promotion", "Promotion", promotion_id, payload.model_dump(mode="json")
+    )
+    return promotion
+
+
+@router.delete("/{promotion_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def excluir_promocao(
+    promotion_id: int,
+    session: AsyncSession = Depends(get_db),
+    current_user=Depends(authorize(roles=["GERENTE"])),
+):
+    promotion = await _buscar_promocao(session, promotion_id)
+    await session.delete(promotion)
+    await session.commit()
+    await log_action(session, current_user, "delete_promotion", "Promotion", promotion_id, {"name": promotion.name})
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
@@ -1,39 +1,59 @@
+import asyncio
 from collections import defaultdict
-from datetime import date
+from datetime import date, timedelta
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy import func, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.api.deps import authorize, get_db
-from app.models.product import Product, StockItem, StockMovement
-from app.models.sale import Customer, Payment, Sale, SaleItem
+from app.api.deps import authorize, get_read_db
+from app.models.product import Product, StockItem
+from app.models.rollup import SalesDailyFact, SalesDailyTotal, StockMovementDaily
+from app.models.sale import Customer, Payment, Sale
+from app.services.archive import list_archives, read_archive
+from app.services.stock_rollup import stock_as_of
 
 router = APIRouter(prefix="/relatorios", tags=["relatorios"])
 
 
+def _intervalo(data_inicio: date | None, data_fim: date | None) -> tuple[date, date]:
+    fim = data_fim or date.today()
+    inicio = data_inicio or fim - timedelta(days=30)
+    if inicio > fim:
+        raise HTTPException(status_code=400, detail="Data inicial maior que a final")
+    return inicio, fim
+
+
 @router.get("/vendas/diario", response_model=list[dict])
 async def vendas_diarias(
-    session: AsyncSession = Depends(get_db),
+    data_inicio: date | None = None,
+    data_fim: date | None = None,
+    cash_register_id: int | None = None,
+    session: AsyncSession = Depends(get_read_db),
     _: None = Depends(authorize(roles=["GERENTE", "FINANCEIRO", "VENDEDOR"])),
 ):
-    result = await session.execute(select(Sale))
-    sales = result.scalars().all()
-
-    resumo: dict[str, dict] = {}
-    for sale in sales:
-        data_venda = sale.created_at.date().isoformat() if sale.created_at else date.today().isoformat()
-        if data_venda not in resumo:
-            resumo[data_venda] = {"data": data_venda, "total": 0.0, "quantidade": 0}
-        resumo[data_venda]["total"] += float(sale.total or 0)
-        resumo[data_venda]["quantidade"] += 1
+    inicio, fim = _intervalo(data_inicio, data_fim)
+    quantidade = func.sum(SalesDailyTotal.sale_count)
+    stmt = (
+        select(SalesDailyTotal.day, func.sum(SalesDailyTotal.total).label("total"), quantidade.label("quantidade"))
+        .where(SalesDailyTotal.day.between(inicio, fim))
+        .group_by(SalesDailyTotal.day)
+        .having(quantidade > 0)
+        .order_by(SalesDailyTotal.day.desc())
+    )
+    if cash_register_id is not None:
+        stmt = stmt.where(SalesDailyTotal.cash_register_id == cash_register_id)
+    result = await session.execute(stmt)
 
-    return sorted(resumo.values(), key=lambda item: item["data"], reverse=True)
+    return [
+        {"data": row.day.isoformat(), "total": float(row.total or 0), "quantidade": int(row.quantidade)}
+        for row in result.all()
+    ]
 
 
 @router.get("/fluxo-caixa", response_model=list[dict])
 async def fluxo_caixa(
-    session: AsyncSession = Depends(get_db),
+    session: AsyncSession = Depends(get_read_db),
     _: None = Depends(authorize(roles=["GERENTE", "FINANCEIRO"])),
 ):
     stmt = (
@@ -51,19 +71,27 @@ async def fluxo_caixa(
 
 @router.get("/produtos-mais-vendidos", response_model=list[dict])
 async def produtos_mais_vendidos(
-    session: AsyncSession = Depends(get_db),
+    data_inicio: date | None = None,
+    data_fim: date | None = None,
+    limite: int = Query(20, ge=1, le=500),
+    session: AsyncSession = Depends(get_read_db),
     _: None = Depends(authorize(roles=["GERENTE", "FINANCEIRO", "VENDEDOR"])),
 ):
+    inicio, fim = _intervalo(data_inicio, data_fim)
+    quantidade = func.sum(SalesDailyFact.quantity)
     stmt = (
         select(
             Product.id,
             Product.name,
-            func.sum(SaleItem.quantity).label("quantidade"),
-            func.sum(SaleItem.total_price).label("faturamento"),
+            quantidade.label("quantidade"),
+            func.sum(SalesDailyFact.revenue).label("faturamento"),
         )
-        .join(SaleItem, SaleItem.product_id == Product.id)
+        .join(Product, SalesDailyFact.product_id == Product.id)
+        .where(SalesDailyFact.day.between(inicio, fim))
         .group_by(Product.id, Product.name)
-        .order_by(func.sum(SaleItem.quantity).desc())
+        .having(quantidade > 0)
+        .order_by(quantidade.desc())
+        .limit(limite)
     )
     result = await session.execute(stmt)
 
@@ -78,47 +106,95 @@ async def produtos_mais_vendidos(
     ]
 
 
+async def _saldo_por_produto(
+    session: AsyncSession, dia: date, mapa_itens: dict[int, int]
+) -> dict[int, float]:
+    saldos: dict[int, float] = defaultdict(float)
+    for stock_item_id, quantidade in (await stock_as_of(session, dia)).items():
+        if stock_item_id in mapa_itens:
+            saldos[mapa_itens[stock_item_id]] += float(quantidade)
+    return saldos
+
+
 @router.get("/giro-estoque", response_model=list[dict])
 async def giro_estoque(
-    session: AsyncSession = Depends(get_db),
+    data_inicio: date | None = None,
+    data_fim: date | None = None,
+    session: AsyncSession = Depends(get_read_db),
     _: None = Depends(authorize(roles=["GERENTE", "ALMOXARIFE", "FINANCEIRO"])),
 ):
+    inicio, fim = _intervalo(data_inicio, data_fim)
     stmt = (
-        select(StockMovement.change, Product.id, Product.name)
-        .join(StockItem, StockMovement.stock_item_id == StockItem.id)
+        select(
+            Product.id,
+            Product.name,
+            func.sum(StockMovementDaily.entries).label("entradas"),
+            func.sum(StockMovementDaily.exits).label("saidas"),
+        )
+        .join(StockItem, StockMovementDaily.stock_item_id == StockItem.id)
         .join(Product, StockItem.product_id == Product.id)
+        .where(StockMovementDaily.day.between(inicio, fim))
+        .group_by(Product.id, Product.name)
     )
-    result = await session.execute(stmt)
-
-    movimentos: dict[int, dict] = defaultdict(
-        lambda: {"produto": "", "entradas": 0.0, "saidas": 0.0, "saldo": 0.0}
-    )
+    movimentos = (await session.execute(stmt)).all()
+    if not movimentos:
+        return []
+
+    itens = await session.execute(select(StockItem.id, StockItem.product_id))
+    mapa_itens = dict(itens.all())
+    estoque_inicial = await _saldo_por_produto(session, inicio - timedelta(days=1), mapa_itens)
+    estoque_final = await _saldo_por_produto(session, fim, mapa_itens)
+
+    resultado = []
+    for row in movimentos:
+        entradas = float(row.entradas or 0)
+        saidas = float(row.saidas or 0)
+        media = (estoque_inicial[row.id] + estoque_final[row.id]) / 2
+        resultado.append(
+            {
+                "product_id": row.id,
+                "produto": row.name,
+                "entradas": entradas,
+                "saidas": saidas,
+                "saldo": entradas - saidas,
+                "estoque_inicial": estoque_inicial[row.id],
+                "estoque_final": estoque_final[row.id],
+                "giro": saidas / media if media > 0 else None,
+            }
+        )
+    return resultado
 
-    for change, product_id, product_name in result.all():
-        movimento = movimentos[product_id]
-        movimento["produto"] = product_name
-        quantidade = float(change or 0)
-        if quantidade >= 0:
-            movimento["entradas"] += quantidade
-        else:
-            movimento["saidas"] += abs(quantidade)
-        movimento["saldo"] += quantidade
 
+@router.get("/estoque-em", response_model=list[dict])
+async def estoque_em(
+    data: date,
+    product_id: int | None = None,
+    session: AsyncSession = Depends(get_read_db),
+    _: None = Depends(authorize(roles=["GERENTE", "ALMOXARIFE", "FINANCEIRO"])),
+):
+    saldos = await stock_as_of(session, data, product_id)
+    if not saldos:
+        return []
+    result = await session.execute(
+        select(StockItem.id, StockItem.product_id, StockItem.location_id, Product.name)
+        .join(Product, StockItem.product_id == Product.id)
+        .where(StockItem.id.in_(list(saldos)))
+        .order_by(StockItem.product_id, StockItem.location_id)
+    )
     return [
         {
-            "product_id": product_id,
-            "produto": data["produto"],
-            "entradas": data["entradas"],
-            "saidas": data["saidas"],
-            "saldo": data["saldo"],
+            "product_id": row.product_id,
+            "produto": row.name,
+            "location_id": row.location_id,
+            "quantidade": float(saldos[row.id]),
         }
-        for product_id, data in movimentos.items()
+        for row in result.all()
     ]
 
 
 @router.get("/clientes-fiado", response_model=list[dict])
 async def clientes_fiado(
-    session: AsyncSession = Depends(get_db),
+    session: AsyncSession = Depends(get_read_db),
     _: None = Depends(authorize(roles=["GERENTE", "FINANCEIRO"])),
 ):
     stmt = (
@@ -135,3 +211,30 @@ async def clientes_fiado(
         {"customer_id": row.id, "cliente": row.name, "valor_pendente": float(row.pendente or 0)}
         for row in result.all()
     ]
+
+
+@router.get("/arquivo", response_model=dict)
+async def arquivos_disponiveis(_: None = Depends(authorize(roles=["GERENTE", "FINANCEIRO"]))):
+    return await asyncio.to_thread(list_archives)
+
+
+@router.get("/arquivo/{tabela}/{mes}", response_model=list[dict])
+async def consultar_arquivo(
+    tabela: str,
+    mes: str,
+    filtro: list[str] = Query([], description="Igualdade campo=valor, ex.: customer_id=7"),
+    limite: int = Query(500, ge=1, le=5000),
+    _: None = Depends(authorize(roles=["GERENTE", "FINANCEIRO"])),
+):
+    """Consulta sob demanda os meses já arquivados em NDJSON compactado."""
+
+    filtros = {}
+    for item in filtro:
+        campo, separador, valor = item.partition("=")
+        if not separador or not campo:
+            raise HTTPException(status_code=400, detail=f"Filtro inválido: {item}")
+        filtros[campo] = valor
+    try:
+        return await asyncio.to_thread(lambda: list(read_archive(tabela, mes, filtros, limite)))
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
@@ -1,24 +1,33 @@
 import uuid
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
 
-from app.api.deps import get_active_user, get_db
+from app.api.deps import get_active_user, get_db, get_read_db
+from app.core import money
 from app.models.product import Product
 from app.models.sale import Payment, Sale, SaleItem
 from app.schemas import sale as sale_schema
+from app.services.sale_listing import SaleExpand, SaleFilters, list_sales_page
 
 router = APIRouter(prefix="/sales", tags=["sales"])
 
 
-def _calculate_total(items: list[SaleItem]) -> float:
-    return float(sum([float(item.total_price) for item in items]))
+def _calculate_total(items: list[SaleItem]) -> int:
+    return money.total(item.total_price for item in items)
 
 
-@router.get("/", response_model=list[sale_schema.Sale])
-async def list_sales(session: AsyncSession = Depends(get_db)):
-    result = await session.execute(select(Sale))
-    return result.scalars().unique().all()
+@router.get("/", response_model=sale_schema.SalePage)
+async def list_sales(
+    filters: SaleFilters = Depends(),
+    limit: int = Query(50, ge=1, le=200),
+    cursor: str | None = None,
+    expand: list[SaleExpand] = Query([]),
+    session: AsyncSession = Depends(get_read_db),
+):
+    try:
+        return await list_sales_page(session, filters, limit=limit, cursor=cursor, expand=expand)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
 
 
 @router.post("/", response_model=sale_schema.Sale, status_code=status.HTTP_201_CREATED)
@@ -33,7 +42,7 @@ async def create_sale(
         product = await session.get(Product, item.product_id)
         if not product:
             raise HTTPException(status_code=404, detail=f"Product {item.product_id} not found")
-        total_price = float(item.quantity) * float(item.unit_price)
+        total_price = money.to_decimal(money.line_total(money.milli(item.quantity), money.cents(item.unit_price)))
         items.append(
             SaleItem(
                 product_id=item.product_id,
@@ -44,7 +53,7 @@ async def create_sale(
         )
 
     payments = [Payment(method=p.method, amount=p.amount, paid=False) for p in payload.payments]
-    sale_total = sum([float(p.amount) for p in payload.payments])
+    sale_total = money.to_decimal(money.total(p.amount for p in payload.payments))
     sale = Sale(
         code=sale_code,
         status="pending",
@@ -0,0 +1,86 @@
+from typing import Literal
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.deps import authorize, get_db
+from app.models.job import Job
+from app.schemas import job as job_schema
+from app.services.audit import log_action
+from app.services.jobs import enqueue_job, job_runner, registered_tasks, requeue_job
+
+router = APIRouter(prefix="/tarefas", tags=["tarefas"])
+
+
+@router.get("/")
+async def resumo_filas(
+    session: AsyncSession = Depends(get_db),
+    _: None = Depends(authorize(roles=["GERENTE"])),
+):
+    """Profundidade das filas, tempos por tarefa e estado dos workers deste processo."""
+
+    return {
+        **await job_runner.queue_stats(session),
+        "registered": sorted(registered_tasks()),
+        "runner": job_runner.metrics(),
+    }
+
+
+@router.get("/lista", response_model=list[job_schema.Job])
+async def listar_tarefas(
+    status_: Literal["queued", "running", "done", "dead"] | None = Query(None, alias="status"),
+    queue: str | None = None,
+    task: str | None = None,
+    limit: int = Query(50, ge=1, le=500),
+    session: AsyncSession = Depends(get_db),
+    _: None = Depends(authorize(roles=["GERENTE"])),
+):
+    consulta = select(Job).order_by(Job.id.desc()).limit(limit)
+    if status_:
+        consulta = consulta.where(Job.status == status_)
+    if queue:
+        consulta = consulta.where(Job.queue == queue)
+    if task:
+        consulta = consulta.where(Job.task == task)
+    result = await session.execute(consulta)
+    return result.scalars().all()
+
+
+@router.post("/", response_model=job_schema.Job, status_code=status.HTTP_201_CREATED)
+async def enfileirar_tarefa(
+    payload: job_schema.JobCreate,
+    session: AsyncSession = Depends(get_db),
+    user=Depends(authorize(roles=["GERENTE"])),
+):
+    try:
+        job = enqueue_job(
+            session,
+            payload.task,
+            payload.payload,
+            queue=payload.queue,
+            priority=payload.priority,
+            run_at=payload.run_at,
+        )
+    except LookupError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    await session.commit()
+    await log_action(session, user, "enqueue_job", "Job", job.id, payload.model_dump(mode="json"))
+    return job
+
+
+@router.post("/{job_id}/reenfileirar", response_model=job_schema.Job)
+async def reenfileirar_tarefa(
+    job_id: int,
+    session: AsyncSession = Depends(get_db),
+    user=Depends(authorize(roles=["GERENTE"])),
+):
+    job = await session.get(Job, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Tarefa não encontrada")
+    if job.status != "dead":
+        raise HTTPException(status_code=400, detail="Somente tarefas mortas podem voltar à fila")
+    requeue_job(session, job)
+    await session.commit()
+    await log_action(session, user, "requeue_job", "Job", job.id)
+    return job
@@ -1,22 +1,52 @@
+import contextlib
 import uuid
+from decimal import Decimal
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy import select
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
-from app.api.deps import authorize, get_db
+from app.api.deps import authorize, get_db, get_read_db
+from app.core import money
 from app.models.cash import CashRegister
-from app.models.product import Product, StockItem, StockLocation, StockMovement
+from app.models.product import Product, ProductBarcode
 from app.models.sale import Payment, Sale, SaleItem
 from app.schemas import sale as sale_schema
-from app.services.audit import log_action
+from app.services.audit import enqueue_action, log_action
+from app.services.cart_store import Cart, audit_entry, cart_store
+from app.services.pricing import CartPricing, pricing_engine
+from app.services.product_lookup import product_lookup
+from app.services.sale_effects import enqueue_sale_effects
+from app.services.scale_labels import InvalidScaleLabel
+from app.services.sale_listing import SaleExpand, SaleFilters, list_sales_page
+from app.services.sales_rollup import record_sale
+from app.services.stock_ledger import StockDelta, apply_stock_deltas
 
 router = APIRouter(prefix="/vendas", tags=["vendas"])
 
 
-def _calcular_total(itens: list[SaleItem]) -> float:
-    return float(sum([float(item.total_price) for item in itens]))
+def _calcular_total(itens: list[SaleItem]) -> int:
+    """Soma dos totais das linhas, em centavos."""
+
+    return money.total(item.total_price for item in itens)
+
+
+def _novo_item(product_id: int, quantidade: int, preco: int, **valores) -> SaleItem:
+    """Item com quantidade em milésimos e preço em centavos; o total é arredondado uma vez."""
+
+    return SaleItem(
+        product_id=product_id,
+        quantity=money.quantity_to_decimal(quantidade),
+        unit_price=money.to_decimal(preco),
+        total_price=money.to_decimal(money.line_total(quantidade, preco)),
+        **valores,
+    )
+
+
+def _total_venda(sale: Sale) -> Decimal:
+    return money.to_decimal(_calcular_total(sale.items) - money.cents(sale.discount))
 
 
 async def _buscar_venda(session: AsyncSession, sale_id: int) -> Sale:
@@ -34,6 +64,155 @@ async def _buscar_venda(session: AsyncSession, sale_id: int) -> Sale:
     return sale
 
 
+async def _carregar_carrinho(session: AsyncSession, sale_id: int) -> Cart:
+    cart = cart_store.peek(sale_id)
+    if cart is None:
+        sale = await _buscar_venda(session, sale_id)
+        if sale.status in {"completed", "canceled"}:
+            raise HTTPException(status_code=400, detail="Venda não está aberta para edição")
+        cart = await cart_store.load(session, sale)
+    return cart
+
+
+@contextlib.asynccontextmanager
+async def _carrinho_na_transacao(session: AsyncSession, sale_id: int):
+    """Leva as linhas pendentes do carrinho para a transação do bloco, confirmada pelo commit dele."""
+
+    cart = cart_store.peek(sale_id) if cart_store.enabled else None
+    if cart is None:
+        yield
+        return
+    async with cart_store.staged(session, cart):
+        yield
+
+
+async def _resolver_produtos(
+    session: AsyncSession, linhas: list[sale_schema.SaleScanLine]
+) -> list[tuple[Product, int, int | None]]:
+    """Resolve as linhas escaneadas pelo índice de leitura.
+
+    Devolve o produto, a quantidade de cada leitura (embalagem ou peso) em milésimos e,
+    para etiquetas de balança, o preço unitário em centavos que reproduz o total impresso.
+    """
+
+    await product_lookup.ensure_fresh(session)
+    alvos: list[tuple[int, Decimal, Decimal | None] | None] = []
+    desconhecidos: set[str] = set()
+    for linha in linhas:
+        if linha.product_id is not None:
+            alvos.append((linha.product_id, Decimal("1"), None))
+            continue
+        try:
+            encontrado = product_lookup.resolve(linha.barcode)
+        except InvalidScaleLabel as exc:
+            raise HTTPException(status_code=400, detail=f"{exc}: {linha.barcode}") from exc
+        if encontrado is None:
+            desconhecidos.add(linha.barcode)
+            alvos.append(None)
+        else:
+            preco = encontrado.unit_price if encontrado.from_scale else None
+            alvos.append((encontrado.entry.product_id, encontrado.quantity, preco))
+
+    por_codigo: dict[str, tuple[int, Decimal, Decimal | None]] = {}
+    if desconhecidos:
+        # Código cadastrado por outro worker depois da última atualização do índice.
+        result = await session.execute(
+            select(ProductBarcode.code, ProductBarcode.product_id, ProductBarcode.pack_quantity).where(
+                ProductBarcode.code.in_(desconhecidos)
+            )
+        )
+        por_codigo = {code: (product_id, Decimal(str(pack)), None) for code, product_id, pack in result.all()}
+        result = await session.execute(
+            select(Product.sku, Product.id).where(Product.sku.in_(desconhecidos - por_codigo.keys()))
+        )
+        por_codigo.update({sku: (product_id, Decimal("1"), None) for sku, product_id in result.all()})
+        for code in desconhecidos - por_codigo.keys():
+            # O decodificador já validou a etiqueta na primeira passada; aqui só falta o PLU.
+            pesado = await product_lookup.resolve_plu(session, code)
+            if pesado is not None:
+                por_codigo[code] = (pesado.entry.product_id, pesado.quantity, pesado.unit_price)
+    alvos = [
+        alvo if alvo is not None else por_codigo.get(linha.barcode) for linha, alvo in zip(linhas, alvos)
+    ]
+
+    ids = {alvo[0] for alvo in alvos if alvo is not None}
+    result = await session.execute(select(Product).where(Product.id.in_(ids)))
+    por_id = {produto.id: produto for produto in result.scalars().all()}
+
+    resolvidos: list[tuple[Product, int, int | None]] = []
+    faltantes: list[str] = []
+    for linha, alvo in zip(linhas, alvos):
+        produto = por_id.get(alvo[0]) if alvo is not None else None
+        if produto is None:
+            faltantes.append(str(linha.product_id if linha.product_id is not None else linha.barcode))
+        else:
+            preco = money.cents(alvo[2]) if alvo[2] is not None else None
+            resolvidos.append((produto, money.milli(alvo[1]), preco))
+    if faltantes:
+        raise HTTPException(status_code=404, detail=f"Produtos não encontrados: {', '.join(faltantes)}")
+    return resolvidos
+
+
+def _preco_unitario(linha: sale_schema.SaleScanLine, produto: Product, preco_etiqueta: int | None) -> int:
+    if linha.unit_price is not None:
+        return money.cents(linha.unit_price)
+    return preco_etiqueta if preco_etiqueta is not None else money.cents(produto.price)
+
+
+def _quantidade(linha: sale_schema.SaleScanLine, leitura: int) -> int:
+    """Quantidade lançada em milésimos: leituras informadas × unidades (ou peso) de cada leitura."""
+
+    return money.divide(money.milli(linha.quantity) * leitura, money.MILLI)
+
+
+async def _repreciar_carrinho(session: AsyncSession, cart: Cart) -> set[int]:
+    """Aplica as promoções às linhas alteradas do carrinho; devolve as linhas com desconto novo."""
+
+    await pricing_engine.ensure_fresh(session)
+    mudancas = pricing_engine.reprice(cart.pricing, cart.customer_id)
+    cart_store.apply_discounts(cart, mudancas)
+    return set(mudancas)
+
+
+def _descontar(item: SaleItem, desconto: int, promotion_id: int | None) -> None:
+    bruto = money.line_total(money.milli(item.quantity), money.cents(item.unit_price))
+    item.discount = money.to_decimal(desconto)
+    item.promotion_id = promotion_id
+    item.total_price = money.to_decimal(bruto - desconto)
+
+
+def _descontos(customer_id: int | None, linhas: list[tuple[int, int, int]]) -> dict[int, tuple[int, int | None]]:
+    """Descontos das promoções para linhas ainda não gravadas (produto, milésimos, centavos), por posição.
+
+    Chame depois de `pricing_engine.ensure_fresh`.
+    """
+
+    if not pricing_engine.touches({product_id for product_id, _, _ in linhas}):
+        return {}
+    estado = CartPricing()
+    for indice, (product_id, quantidade, preco) in enumerate(linhas):
+        estado.add(indice, product_id, quantidade, preco)
+    return pricing_engine.reprice(estado, customer_id)
+
+
+async def _aplicar_promocoes(session: AsyncSession, sale: Sale, itens: list[SaleItem]) -> list[SaleItem]:
+    """Recalcula os descontos de todos os itens gravados da venda; devolve os alterados."""
+
+    await pricing_engine.ensure_fresh(session)
+    estado = CartPricing()
+    for item in itens:
+        estado.add(item.id, item.product_id, money.milli(item.quantity), money.cents(item.unit_price))
+        if item.promotion_id is not None:
+            estado.discounts[item.id] = (money.cents(item.discount), item.promotion_id)
+    por_id = {item.id: item for item in itens}
+    alterados = []
+    for line_id, (desconto, promotion_id) in pricing_engine.reprice(estado, sale.customer_id).items():
+        item = por_id[line_id]
+        _descontar(item, desconto, promotion_id)
+        alterados.append(item)
+    return alterados
+
+
 async def _buscar_caixa(session: AsyncSession, cash_register_id: int | None) -> CashRegister | None:
     if not cash_register_id:
         return None
@@ -45,85 +224,76 @@ async def _buscar_caixa(session: AsyncSession, cash_register_id: int | None) ->
     return cash_register
 
 
-async def _local_padrao_estoque(session: AsyncSession) -> StockLocation:
-    result = await session.execute(select(StockLocation).where(StockLocation.is_default.is_(True)))
-    location = result.scalars().first()
-    if not location:
-        location = StockLocation(name="Padrão", is_default=True)
-        session.add(location)
-        await session.flush()
-    return location
-
-
-async def _obter_item_estoque(session: AsyncSession, product_id: int) -> StockItem:
-    result = await session.execute(select(StockItem).where(StockItem.product_id == product_id))
-    stock_item = result.scalars().first()
-    if not stock_item:
-        location = await _local_padrao_estoque(session)
-        stock_item = StockItem(product_id=product_id, location_id=location.id, quantity=0)
-        session.add(stock_item)
-        await session.flush()
-    return stock_item
-
-
 async def _registrar_baixa_estoque(session: AsyncSession, sale: Sale, user_id: int | None = None) -> None:
-    for item in sale.items:
-        stock_item = await _obter_item_estoque(session, item.product_id)
-        stock_item.quantity = float(stock_item.quantity) - float(item.quantity)
-        movement = StockMovement(
-            stock_item_id=stock_item.id,
-            change=-float(item.quantity),
-            movement_type="sale",
-            reason=f"Venda {sale.code}",
-            sale_item_id=item.id,
-            created_by_id=user_id,
-        )
-        session.add(movement)
+    await apply_stock_deltas(
+        session,
+        [
+            StockDelta(
+                product_id=item.product_id,
+                change=-float(item.quantity),
+                movement_type="sale",
+                reason=f"Venda {sale.code}",
+                sale_item_id=item.id,
+            )
+            for item in sale.items
+        ],
+        user_id,
+    )
 
 
 async def _estornar_estoque(session: AsyncSession, sale: Sale, user_id: int | None = None) -> None:
-    for item in sale.items:
-        stock_item = await _obter_item_estoque(session, item.product_id)
-        stock_item.quantity = float(stock_item.quantity) + float(item.quantity)
-        movement = StockMovement(
-            stock_item_id=stock_item.id,
-            change=float(item.quantity),
-            movement_type="sale_cancel",
-            reason=f"Cancelamento da venda {sale.code}",
-            sale_item_id=item.id,
-            created_by_id=user_id,
-        )
-        session.add(movement)
+    await apply_stock_deltas(
+        session,
+        [
+            StockDelta(
+                product_id=item.product_id,
+                change=float(item.quantity),
+                movement_type="sale_cancel",
+                reason=f"Cancelamento da venda {sale.code}",
+                sale_item_id=item.id,
+            )
+            for item in sale.items
+        ],
+        user_id,
+    )
 
 
 def _gerar_cupom(sale: Sale) -> str:
     linhas = [f"CUPOM NÃO FISCAL - VENDA {sale.code}", "------------------------------"]
     for item in sale.items:
         linhas.append(
-            f"{item.product.name if item.product else 'Produto'} x{float(item.quantity):.3f} "
-            f"@ {float(item.unit_price):.2f} = {float(item.total_price):.2f}"
+            f"{item.product.name if item.product else 'Produto'} x{money.format_quantity(money.milli(item.quantity))} "
+            f"@ {money.format_reais(item.unit_price)} = {money.format_reais(item.total_price)}"
         )
-    linhas.append(f"Subtotal: {_calcular_total(sale.items):.2f}")
-    if float(sale.discount or 0) > 0:
-        linhas.append(f"Desconto: -{float(sale.discount):.2f}")
-    linhas.append(f"Total: {float(sale.total):.2f}")
+        if money.cents(item.discount) > 0:
+            linhas.append(f"  Promoção: -{money.format_reais(item.discount)}")
+    linhas.append(f"Subtotal: {money.format_cents(_calcular_total(sale.items))}")
+    if money.cents(sale.discount) > 0:
+        linhas.append(f"Desconto: -{money.format_reais(sale.discount)}")
+    linhas.append(f"Total: {money.format_reais(sale.total)}")
     if sale.payments:
         linhas.append("Pagamentos:")
         for pagamento in sale.payments:
             status = "pago" if pagamento.paid else "pendente"
-            linhas.append(f"- {pagamento.method}: {float(pagamento.amount):.2f} ({status})")
+            linhas.append(f"- {pagamento.method}: {money.format_reais(pagamento.amount)} ({status})")
     linhas.append("------------------------------")
     linhas.append("Obrigado pela preferência!")
     return "\n".join(linhas)
 
 
-@router.get("/", response_model=list[sale_schema.Sale])
+@router.get("/", response_model=sale_schema.SalePage)
 async def listar_vendas(
-    session: AsyncSession = Depends(get_db),
+    filters: SaleFilters = Depends(),
+    limit: int = Query(50, ge=1, le=200),
+    cursor: str | None = None,
+    expand: list[SaleExpand] = Query([]),
+    session: AsyncSession = Depends(get_read_db),
     _: None = Depends(authorize(roles=["GERENTE", "FINANCEIRO"])),
 ):
-    result = await session.execute(select(Sale))
-    return result.scalars().unique().all()
+    try:
+        return await list_sales_page(session, filters, limit=limit, cursor=cursor, expand=expand)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
 
 
 @router.post("/", response_model=sale_schema.Sale, status_code=status.HTTP_201_CREATED)
@@ -133,23 +303,19 @@ async def criar_venda(
     user=Depends(authorize(roles=["GERENTE", "VENDEDOR"])),
 ):
     sale_code = uuid.uuid4().hex[:8]
-    itens: list[SaleItem] = []
+    linhas: list[tuple[int, int, int]] = []
     for item in payload.items:
         product = await session.get(Product, item.product_id)
         if not product:
             raise HTTPException(status_code=404, detail=f"Produto {item.product_id} não encontrado")
-        total_price = float(item.quantity) * float(item.unit_price)
-        itens.append(
-            SaleItem(
-                product_id=item.product_id,
-                quantity=item.quantity,
-                unit_price=item.unit_price,
-                total_price=total_price,
-            )
-        )
+        linhas.append((item.product_id, money.milli(item.quantity), money.cents(item.unit_price)))
+    itens = [_novo_item(*linha) for linha in linhas]
+    await pricing_engine.ensure_fresh(session)
+    for indice, (desconto, promotion_id) in _descontos(payload.customer_id, linhas).items():
+        _descontar(itens[indice], desconto, promotion_id)
 
     pagamentos = [Payment(method=p.method, amount=p.amount, paid=False) for p in payload.payments]
-    sale_total = _calcular_total(itens) - float(payload.discount or 0)
+    sale_total = money.to_decimal(_calcular_total(itens) - money.cents(payload.discount))
     sale = Sale(
         code=sale_code,
         status="pending",
@@ -183,6 +349,136 @@ async def criar_venda(
     return sale
 
 
+@router.post("/lote", response_model=sale_schema.SaleBatchResult)
+async def criar_vendas_em_lote(
+    payload: sale_schema.SaleBatchCreate,
+    session: AsyncSession = Depends(get_db),
+    user=Depends(authorize(roles=["GERENTE", "VENDEDOR"])),
+):
+    """Recebe vendas acumuladas offline pelos terminais em uma única transação."""
+
+    product_ids = {item.product_id for venda in payload.sales for item in venda.items}
+    produtos_existentes: set[int] = set()
+    if product_ids:
+        result = await session.execute(select(Product.id).where(Product.id.in_(product_ids)))
+        produtos_existentes = set(result.scalars().all())
+
+    codigos_informados = {venda.code for venda in payload.sales if venda.code}
+    codigos_existentes: set[str] = set()
+    if codigos_informados:
+        result = await session.execute(select(Sale.code).where(Sale.code.in_(codigos_informados)))
+        codigos_existentes = set(result.scalars().all())
+
+    resultados: list[sale_schema.SaleBatchItemResult] = []
+    aceitas: list[tuple[sale_schema.SaleBatchItemResult, sale_schema.SaleBatchEntry]] = []
+    codigos_lote: set[str] = set()
+    for index, venda in enumerate(payload.sales):
+        code = venda.code or uuid.uuid4().hex[:8]
+        resultado = sale_schema.SaleBatchItemResult(index=index, code=code, status="created")
+        resultados.append(resultado)
+
+        if code in codigos_existentes or code in codigos_lote:
+            resultado.status = "duplicate"
+            resultado.detail = "Venda já registrada"
+            continue
+        if not venda.items:
+            resultado.status = "rejected"
+            resultado.detail = "Venda sem itens"
+            continue
+        faltantes = sorted({item.product_id for item in venda.items} - produtos_existentes)
+        if faltantes:
+            resultado.status = "rejected"
+            resultado.detail = f"Produtos não encontrados: {', '.join(map(str, faltantes))}"
+            continue
+
+        codigos_lote.add(code)
+        aceitas.append((resultado, venda))
+
+    if aceitas:
+        await pricing_engine.ensure_fresh(session)
+        linhas_vendas = []
+        linhas_itens = []
+        for resultado, venda in aceitas:
+            precos = [
+                (item.product_id, money.milli(item.quantity), money.cents(item.unit_price)) for item in venda.items
+            ]
+            descontos = _descontos(venda.customer_id, precos)
+            itens_venda = []
+            for indice, (product_id, quantidade, preco) in enumerate(precos):
+                desconto, promotion_id = descontos.get(indice, (0, None))
+                itens_venda.append(
+                    {
+                        "product_id": product_id,
+                        "quantity": money.quantity_to_decimal(quantidade),
+                        "unit_price": money.to_decimal(preco),
+                        "discount": money.to_decimal(desconto),
+                        "promotion_id": promotion_id,
+                        "total_price": money.to_decimal(money.line_total(quantidade, preco) - desconto),
+                    }
+                )
+            linhas_itens.append(itens_venda)
+            subtotal = money.total(item["total_price"] for item in itens_venda)
+            linha = {
+                "code": resultado.code,
+                "status": "pending",
+                "discount": venda.discount,
+                "total": money.to_decimal(subtotal - money.cents(venda.discount)),
+                "customer_id": venda.customer_id,
+                "cashier_id": user.id if user else None,
+                "cash_register_id": venda.cash_register_id,
+            }
+            if venda.created_at:
+                linha["created_at"] = venda.created_at
+            linhas_vendas.append(linha)
+
+        try:
+            result = await session.execute(
+                insert(Sale).returning(Sale.id, sort_by_parameter_order=True), linhas_vendas
+            )
+        except IntegrityError as exc:
+            # Código gerado que colide com venda gravada, ou outro envio gravou o código depois da consulta.
+            await session.rollback()
+            raise HTTPException(status_code=409, detail="Código de venda já registrado; reenvie o lote") from exc
+        sale_ids = result.scalars().all()
+
+        linhas_pagamentos = []
+        for sale_id, (resultado, venda), itens_venda in zip(sale_ids, aceitas, linhas_itens):
+            resultado.sale_id = sale_id
+            for item in itens_venda:
+                item["sale_id"] = sale_id
+            linhas_pagamentos.extend(
+                {
+                    "sale_id": sale_id,
+                    "method": pagamento.method,
+                    "amount": pagamento.amount,
+                    "paid": False,
+                    "cash_register_id": venda.cash_register_id,
+                }
+                for pagamento in venda.payments
+            )
+        await session.execute(insert(SaleItem), [item for itens_venda in linhas_itens for item in itens_venda])
+        if linhas_pagamentos:
+            await session.execute(insert(Payment), linhas_pagamentos)
+        await session.commit()
+
+    criadas = [resultado for resultado, _ in aceitas]
+    if criadas:
+        await log_action(
+            session,
+            user,
+            "create_sale_batch",
+            "Sale",
+            None,
+            {"sales": [{"id": r.sale_id, "code": r.code} for r in criadas]},
+        )
+    return sale_schema.SaleBatchResult(
+        created=len(criadas),
+        duplicates=sum(1 for r in resultados if r.status == "duplicate"),
+        rejected=sum(1 for r in resultados if r.status == "rejected"),
+        results=resultados,
+    )
+
+
 @router.post("/iniciar", response_model=sale_schema.Sale, status_code=status.HTTP_201_CREATED)
 async def iniciar_venda(
     payload: sale_schema.SaleStart,
@@ -196,7 +492,7 @@ async def iniciar_venda(
         code=sale_code,
         status="in_progress",
         discount=payload.discount,
-        total=0,
+        total=money.to_decimal(-money.cents(payload.discount)),
         items=[],
         payments=[],
         customer_id=payload.customer_id,
@@ -205,8 +501,9 @@ async def iniciar_venda(
     )
     session.add(sale)
     await session.commit()
-    await session.refresh(sale)
     await log_action(session, user, "start_sale", "Sale", sale.id, payload.dict())
+    if cart_store.enabled:
+        await cart_store.load(session, sale)
     return sale
 
 
@@ -216,27 +513,147 @@ async def adicionar_item(
     session: AsyncSession = Depends(get_db),
     user=Depends(authorize(roles=["GERENTE", "VENDEDOR"])),
 ):
+    if cart_store.enabled:
+        cart = await _carregar_carrinho(session, payload.sale_id)
+        [(product, leitura, preco)] = await _resolver_produtos(session, [payload])
+        cart_store.add_item(
+            cart,
+            product.id,
+            _quantidade(payload, leitura),
+            _preco_unitario(payload, product, preco),
+            audit_entry(user, "add_sale_item", cart.sale_id, payload.dict()),
+        )
+        await _repreciar_carrinho(session, cart)
+        return cart.as_sale()
+
     sale = await _buscar_venda(session, payload.sale_id)
     if sale.status in {"completed", "canceled"}:
         raise HTTPException(status_code=400, detail="Venda não está aberta para edição")
 
-    product = await session.get(Product, payload.product_id)
-    if not product:
-        raise HTTPException(status_code=404, detail="Produto não encontrado")
-
-    unit_price = payload.unit_price if payload.unit_price is not None else float(product.price)
-    sale.items.append(
-        SaleItem(
-            product_id=payload.product_id,
-            quantity=payload.quantity,
-            unit_price=unit_price,
-            total_price=float(payload.quantity) * float(unit_price),
+    [(product, leitura, preco)] = await _resolver_produtos(session, [payload])
+    sale.items.append(_novo_item(product.id, _quantidade(payload, leitura), _preco_unitario(payload, product, preco)))
+    await session.flush()
+    await _aplicar_promocoes(session, sale, sale.items)
+    sale.total = _total_venda(sale)
+    await session.commit()
+    await session.refresh(sale)
+    await log_action(session, user, "add_sale_item", "Sale", sale.id, payload.dict())
+    return sale
+
+
+@router.post("/adicionar-itens", response_model=sale_schema.SaleItemsDelta)
+async def adicionar_itens(
+    payload: sale_schema.SaleAddItems,
+    session: AsyncSession = Depends(get_db),
+    user=Depends(authorize(roles=["GERENTE", "VENDEDOR"])),
+):
+    """Registra uma rajada de leituras e devolve as linhas novas, as que mudaram de desconto e os totais."""
+
+    if cart_store.enabled:
+        cart = await _carregar_carrinho(session, payload.sale_id)
+        produtos = await _resolver_produtos(session, payload.lines)
+        audit = audit_entry(user, "add_sale_items", cart.sale_id, payload.dict())
+        novas = [
+            cart_store.add_item(
+                cart,
+                produto.id,
+                _quantidade(linha, leitura),
+                _preco_unitario(linha, produto, preco),
+                audit if index == 0 else None,
+            ).line_id
+            for index, (linha, (produto, leitura, preco)) in enumerate(zip(payload.lines, produtos))
+        ]
+        repreciadas = await _repreciar_carrinho(session, cart) - set(novas)
+        return sale_schema.SaleItemsDelta(
+            sale_id=cart.sale_id,
+            items=[cart.lines[line_id].as_dict() for line_id in [*novas, *sorted(repreciadas)]],
+            subtotal=money.to_float(cart.subtotal),
+            discount=money.to_float(cart.discount),
+            total=money.to_float(cart.total),
+        )
+
+    sale = await session.get(Sale, payload.sale_id)
+    if not sale:
+        raise HTTPException(status_code=404, detail="Venda não encontrada")
+    if sale.status in {"completed", "canceled"}:
+        raise HTTPException(status_code=400, detail="Venda não está aberta para edição")
+
+    produtos = await _resolver_produtos(session, payload.lines)
+    itens = [
+        _novo_item(produto.id, _quantidade(linha, leitura), _preco_unitario(linha, produto, preco), sale_id=sale.id)
+        for linha, (produto, leitura, preco) in zip(payload.lines, produtos)
+    ]
+    session.add_all(itens)
+    await session.flush()
+
+    repreciados: list[SaleItem] = []
+    # Promoção gravada neste processo só marca o motor como desatualizado: recompila antes de consultar.
+    await pricing_engine.ensure_fresh(session)
+    if pricing_engine.touches({item.product_id for item in itens}):
+        # Há promoção para algum produto lido: as linhas já gravadas podem mudar de desconto.
+        result = await session.execute(select(SaleItem).where(SaleItem.sale_id == sale.id))
+        todos = result.scalars().all()
+        novos = {item.id for item in itens}
+        repreciados = [item for item in await _aplicar_promocoes(session, sale, todos) if item.id not in novos]
+        await session.flush()
+        total = (
+            select(func.coalesce(func.sum(SaleItem.total_price), 0))
+            .where(SaleItem.sale_id == sale.id)
+            .scalar_subquery()
         )
+        valores = {"total": total - func.coalesce(Sale.discount, 0)}
+    else:
+        valores = {"total": Sale.total + money.to_decimal(_calcular_total(itens))}
+    result = await session.execute(
+        update(Sale)
+        .where(Sale.id == sale.id)
+        .values(**valores)
+        .returning(Sale.total, Sale.discount),
+        execution_options={"synchronize_session": False},
+    )
+    total, discount = result.one()
+    await session.commit()
+    await log_action(session, user, "add_sale_items", "Sale", sale.id, payload.dict())
+    return sale_schema.SaleItemsDelta(
+        sale_id=sale.id,
+        items=[sale_schema.SaleItem.model_validate(item) for item in [*itens, *repreciados]],
+        subtotal=money.to_float(money.cents(total) + money.cents(discount)),
+        discount=money.to_float(money.cents(discount)),
+        total=money.to_float(money.cents(total)),
     )
-    sale.total = _calcular_total(sale.items) - float(sale.discount or 0)
+
+
+@router.post("/remover-item", response_model=sale_schema.Sale)
+async def remover_item(
+    payload: sale_schema.SaleRemoveItem,
+    session: AsyncSession = Depends(get_db),
+    user=Depends(authorize(roles=["GERENTE", "VENDEDOR"])),
+):
+    if cart_store.enabled:
+        cart = await _carregar_carrinho(session, payload.sale_id)
+        try:
+            cart_store.remove_item(
+                cart, payload.item_id, audit_entry(user, "remove_sale_item", cart.sale_id, payload.dict())
+            )
+        except KeyError:
+            raise HTTPException(status_code=404, detail="Item não encontrado na venda")
+        await _repreciar_carrinho(session, cart)
+        return cart.as_sale()
+
+    sale = await _buscar_venda(session, payload.sale_id)
+    if sale.status in {"completed", "canceled"}:
+        raise HTTPException(status_code=400, detail="Venda não está aberta para edição")
+
+    item = next((item for item in sale.items if item.id == payload.item_id), None)
+    if not item:
+        raise HTTPException(status_code=404, detail="Item não encontrado na venda")
+
+    sale.items.remove(item)
+    await _aplicar_promocoes(session, sale, sale.items)
+    sale.total = _total_venda(sale)
     await session.commit()
     await session.refresh(sale)
-    await log_action(session, user, "add_sale_item", "Sale", sale.id, payload.dict())
+    await log_action(session, user, "remove_sale_item", "Sale", sale.id, payload.dict())
     return sale
 
 
@@ -246,54 +663,59 @@ async def finalizar_venda(
     session: AsyncSession = Depends(get_db),
     user=Depends(authorize(roles=["GERENTE", "VENDEDOR", "FINANCEIRO"])),
 ):
-    sale = await _buscar_venda(session, payload.sale_id)
-    if sale.status == "canceled":
-        raise HTTPException(status_code=400, detail="Venda cancelada não pode ser finalizada")
-    if not sale.items:
-        raise HTTPException(status_code=400, detail="Adicione itens antes de finalizar a venda")
-
-    await _buscar_caixa(session, payload.cash_register_id or sale.cash_register_id)
-
-    sale.discount = payload.discount
-    sale.cash_register_id = payload.cash_register_id or sale.cash_register_id
-    sale.total = _calcular_total(sale.items) - float(sale.discount or 0)
-    sale.payments.clear()
-
-    payment_total = 0.0
-    for payment in payload.payments:
-        payment_total += float(payment.amount)
-        sale.payments.append(
-            Payment(
-                method=payment.method,
-                amount=payment.amount,
-                paid=True,
-                transaction_code=uuid.uuid4().hex[:10],
-                cash_register_id=sale.cash_register_id,
+    async with _carrinho_na_transacao(session, payload.sale_id):
+        sale = await _buscar_venda(session, payload.sale_id)
+        if sale.status == "canceled":
+            raise HTTPException(status_code=400, detail="Venda cancelada não pode ser finalizada")
+        if sale.status == "completed":
+            raise HTTPException(status_code=400, detail="Venda já finalizada")
+        if not sale.items:
+            raise HTTPException(status_code=400, detail="Adicione itens antes de finalizar a venda")
+
+        await _buscar_caixa(session, payload.cash_register_id or sale.cash_register_id)
+
+        sale.discount = payload.discount
+        sale.cash_register_id = payload.cash_register_id or sale.cash_register_id
+        sale.total = _total_venda(sale)
+        sale.payments.clear()
+
+        payment_total = 0
+        for payment in payload.payments:
+            payment_total += money.cents(payment.amount)
+            sale.payments.append(
+                Payment(
+                    method=payment.method,
+                    amount=payment.amount,
+                    paid=True,
+                    transaction_code=uuid.uuid4().hex[:10],
+                    cash_register_id=sale.cash_register_id,
+                )
             )
-        )
 
-    if payment_total < float(sale.total):
-        raise HTTPException(status_code=400, detail="Pagamentos não cobrem o total da venda")
+        if payment_total < money.cents(sale.total):
+            raise HTTPException(status_code=400, detail="Pagamentos não cobrem o total da venda")
 
-    sale.status = "completed"
-    await session.flush()
-    await _registrar_baixa_estoque(session, sale, getattr(user, "id", None))
-    await session.commit()
-    await session.refresh(sale)
-    await log_action(
-        session,
-        user,
-        "finalize_sale",
-        "Sale",
-        sale.id,
-        {"payments": [p.dict() for p in payload.payments], "discount": payload.discount},
-    )
+        sale.status = "completed"
+        await session.flush()
+        await _registrar_baixa_estoque(session, sale, getattr(user, "id", None))
+        # Auditoria, totais diários, NFC-e e impressão saem do outbox depois deste commit.
+        enqueue_sale_effects(session, sale, payload.invoice, payload.printer)
+        enqueue_action(
+            session,
+            user,
+            "finalize_sale",
+            "Sale",
+            sale.id,
+            {"payments": [p.dict() for p in payload.payments], "discount": payload.discount},
+        )
 
-    receipt = _gerar_cupom(sale)
-    cash_info = None
-    if sale.cash_register_id:
-        cash_info = {"cash_register_id": sale.cash_register_id, "movimento": payment_total}
-    return sale_schema.SaleWorkflowResult(sale=sale, receipt=receipt, cash_control=cash_info)
+        cash_info = None
+        if sale.cash_register_id:
+            cash_info = {"cash_register_id": sale.cash_register_id, "movimento": money.to_float(payment_total)}
+        resultado = sale_schema.SaleWorkflowResult(sale=sale, receipt=_gerar_cupom(sale), cash_control=cash_info)
+        await session.commit()
+    cart_store.discard(sale.id)
+    return resultado
 
 
 @router.post("/cancelar", response_model=sale_schema.Sale)
@@ -302,18 +724,23 @@ async def cancelar_venda(
     session: AsyncSession = Depends(get_db),
     user=Depends(authorize(roles=["GERENTE", "FINANCEIRO"])),
 ):
-    sale = await _buscar_venda(session, payload.sale_id)
-    if sale.status == "canceled":
-        return sale
-
-    if sale.status == "completed" and payload.restock:
-        await _estornar_estoque(session, sale, getattr(user, "id", None))
-
-    sale.status = "canceled"
-    for payment in sale.payments:
-        payment.paid = False
-
-    await session.commit()
+    async with _carrinho_na_transacao(session, payload.sale_id):
+        sale = await _buscar_venda(session, payload.sale_id)
+        if sale.status == "canceled":
+            await session.commit()
+            return sale
+
+        if sale.status == "completed":
+            await record_sale(session, sale, sign=-1)
+            if payload.restock:
+                await _estornar_estoque(session, sale, getattr(user, "id", None))
+
+        sale.status = "canceled"
+        for payment in sale.payments:
+            payment.paid = False
+
+        await session.commit()
+    cart_store.discard(sale.id)
     await session.refresh(sale)
     await log_action(session, user, "cancel_sale", "Sale", sale.id, payload.dict())
     return sale
@@ -325,4 +752,7 @@ async def obter_venda(
     session: AsyncSession = Depends(get_db),
     _: None = Depends(authorize(roles=["GERENTE", "VENDEDOR", "FINANCEIRO"])),
 ):
+    cart = cart_store.peek(sale_id) if cart_store.enabled else None
+    if cart is not None:
+        return cart.as_sale()
     return await _buscar_venda(session, sale_id)
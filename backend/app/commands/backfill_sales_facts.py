@@ -0,0 +1,35 @@
+"""Recalcula as tabelas diárias de vendas para um intervalo de datas.
+
+Uso: python -m app.commands.backfill_sales_facts --inicio 2025-01-01 --fim 2025-12-31
+"""
+
+import argparse
+import asyncio
+from datetime import date, timedelta
+
+from app.db.session import AsyncSessionLocal
+from app.services.sales_rollup import rebuild_daily_facts
+
+
+async def backfill(start: date, end: date, step_days: int = 31) -> None:
+    # Processa o histórico em blocos para manter as transações curtas.
+    current = start
+    while current <= end:
+        block_end = min(current + timedelta(days=step_days - 1), end)
+        async with AsyncSessionLocal() as session:
+            await rebuild_daily_facts(session, current, block_end)
+            await session.commit()
+        print(f"Fatos recalculados de {current} a {block_end}")
+        current = block_end + timedelta(days=1)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--inicio", type=date.fromisoformat, required=True)
+    parser.add_argument("--fim", type=date.fromisoformat, default=date.today())
+    args = parser.parse_args()
+    asyncio.run(backfill(args.inicio, args.fim))
+
+
+if __name__ == "__main__":
+    main()
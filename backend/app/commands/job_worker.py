@@ -0,0 +1,47 @@
+"""Processo dedicado às tarefas em segundo plano; rode quantos forem necessários.
+
+Uso: python -m app.commands.job_worker [--filas fiscal=2,print=1] [--sem-agendador]
+"""
+
+import argparse
+import asyncio
+import signal
+
+from app.core.config import get_settings
+from app.core.logging import setup_logging
+from app.db.session import AsyncSessionLocal
+from app.services import job_tasks  # registra as tarefas do job_runner
+from app.services.jobs import job_runner
+
+
+def _filas(texto: str) -> dict[str, int]:
+    filas = {}
+    for parte in texto.split(","):
+        nome, _, workers = parte.partition("=")
+        filas[nome.strip()] = int(workers or 1)
+    return filas
+
+
+async def executar(filas: dict[str, int] | None, agendar: bool) -> None:
+    parar = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sinal in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sinal, parar.set)
+    job_runner.start(AsyncSessionLocal, queues=filas, schedule=agendar)
+    print(f"Worker {job_runner.worker_id} atendendo {job_runner.queues}")
+    await parar.wait()
+    await job_runner.stop()
+    print(f"Worker {job_runner.worker_id} encerrado")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--filas", type=_filas, default=None, help="fila=workers separados por vírgula")
+    parser.add_argument("--sem-agendador", action="store_true", help="não enfileira as tarefas agendadas")
+    args = parser.parse_args()
+    setup_logging(get_settings())
+    asyncio.run(executar(args.filas, not args.sem_agendador))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""Cria partições futuras e arquiva os meses além do período de retenção.
+
+Uso: python -m app.commands.partition_maintenance [--converter] [--retencao 24]
+
+--converter transforma audit_logs e stock_movements em tabelas particionadas por mês
+(somente PostgreSQL; bloqueia as tabelas durante a cópia, rode em janela de manutenção).
+"""
+
+import argparse
+import asyncio
+
+from app.core.config import get_settings
+from app.db.session import AsyncSessionLocal
+from app.services.archive import maintain_partitions
+from app.services.partitions import PARTITIONED_TABLES, convert_to_partitioned
+
+
+async def maintain(convert: bool, retention_months: int) -> None:
+    settings = get_settings()
+    async with AsyncSessionLocal() as session:
+        if convert:
+            for table in PARTITIONED_TABLES:
+                copiadas = await convert_to_partitioned(session, table, settings.partition_months_ahead)
+                await session.commit()
+                print(f"{table}: {copiadas} linhas copiadas para a tabela particionada")
+
+        resultado = await maintain_partitions(session, settings.partition_months_ahead, retention_months)
+        if resultado["created"]:
+            print(f"partições criadas: {', '.join(resultado['created'])}")
+        for chave, linhas in resultado["archived"].items():
+            print(f"{chave}: {linhas} linhas arquivadas")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--converter", action="store_true")
+    parser.add_argument("--retencao", type=int, default=get_settings().archive_retention_months)
+    args = parser.parse_args()
+    asyncio.run(maintain(args.converter, args.retencao))
+
+
+if __name__ == "__main__":
+    main()
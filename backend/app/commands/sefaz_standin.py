@@ -0,0 +1,35 @@
+"""Sobe a SEFAZ local para testar emissão e carga sem a SEFAZ real.
+
+Uso: python -m app.commands.sefaz_standin [--porta 8790] [--latencia-ms 80] [--rejeicao 0.02]
+
+Aponte a UF do emitente para ela com
+SEFAZ_ENDPOINTS='{"SP": {"url": "http://127.0.0.1:8790/ws/"}}'.
+"""
+
+import argparse
+
+import uvicorn
+
+from app.fiscal.standin import StandinConfig, create_standin_app
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--porta", type=int, default=8790)
+    parser.add_argument("--latencia-ms", type=float, default=50)
+    parser.add_argument("--variacao-ms", type=float, default=0, help="variação aleatória da latência")
+    parser.add_argument("--rejeicao", type=float, default=0.0, help="fração dos documentos rejeitados")
+    parser.add_argument("--fora-do-ar", action="store_true", help="responde 503 até PUT /controle")
+    args = parser.parse_args()
+    config = StandinConfig(
+        latency_ms=args.latencia_ms,
+        jitter_ms=args.variacao_ms,
+        reject_rate=args.rejeicao,
+        outage=args.fora_do_ar,
+    )
+    uvicorn.run(create_standin_app(config), host=args.host, port=args.porta, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
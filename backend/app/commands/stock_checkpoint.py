@@ -0,0 +1,34 @@
+"""Grava o checkpoint de saldo de estoque ao final de um dia.
+
+Uso: python -m app.commands.stock_checkpoint --data 2025-01-31 [--reconstruir-desde 2025-01-01]
+"""
+
+import argparse
+import asyncio
+from datetime import date, timedelta
+
+from app.db.session import AsyncSessionLocal
+from app.services.stock_rollup import create_checkpoint, rebuild_movement_rollup
+
+
+async def checkpoint(day: date, rebuild_from: date | None = None) -> None:
+    async with AsyncSessionLocal() as session:
+        if rebuild_from:
+            await rebuild_movement_rollup(session, rebuild_from, date.today())
+            await session.commit()
+            print(f"Agregado diário de movimentações recalculado desde {rebuild_from}")
+        total = await create_checkpoint(session, day)
+        await session.commit()
+    print(f"Checkpoint de {day} gravado para {total} itens de estoque")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--data", type=date.fromisoformat, default=date.today() - timedelta(days=1))
+    parser.add_argument("--reconstruir-desde", type=date.fromisoformat, default=None)
+    args = parser.parse_args()
+    asyncio.run(checkpoint(args.data, args.reconstruir_desde))
+
+
+if __name__ == "__main__":
+    main()
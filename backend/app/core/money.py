@@ -0,0 +1,124 @@
+"""Valores monetários em centavos e quantidades em milésimos, sempre inteiros.
+
+Colunas `Numeric(12, 2)` e `Numeric(12, 3)` entram por `cents()` e `milli()` e voltam por
+`to_decimal()`; as contas no meio do caminho não passam por `float`. O total de uma linha
+é arredondado uma única vez (meio para cima) e os totais da venda são somas
+exatas dos totais das linhas.
+"""
+
+from decimal import ROUND_HALF_UP, Decimal
+from typing import Iterable, Sequence
+
+CENTS = 100
+MILLI = 1000
+
+
+def _inteiro(valor, escala: int) -> int:
+    if valor is None:
+        return 0
+    if isinstance(valor, int):
+        return valor * escala
+    if not isinstance(valor, Decimal):
+        # str() evita herdar o erro binário do float (0.1 + 0.2 vira 0.30000000000000004).
+        valor = Decimal(str(valor))
+    return int((valor * escala).to_integral_value(ROUND_HALF_UP))
+
+
+def cents(valor) -> int:
+    """Reais (Decimal, float, str ou int) para centavos."""
+
+    return _inteiro(valor, CENTS)
+
+
+def milli(valor) -> int:
+    """Quantidade (unidades ou quilos) para milésimos."""
+
+    return _inteiro(valor, MILLI)
+
+
+def divide(numerador: int, denominador: int) -> int:
+    """Divisão inteira com arredondamento meio para cima (afastando do zero)."""
+
+    quociente, resto = divmod(abs(numerador), denominador)
+    if resto * 2 >= denominador:
+        quociente += 1
+    return quociente if numerador >= 0 else -quociente
+
+
+def line_total(quantity_milli: int, unit_cents: int) -> int:
+    """Total da linha em centavos: quantidade × preço unitário, arredondado uma vez."""
+
+    return divide(quantity_milli * unit_cents, MILLI)
+
+
+def percent(valor_cents: int, basis_points: int) -> int:
+    """Parcela de `valor_cents` em pontos-base (1000 = 10%)."""
+
+    return divide(valor_cents * basis_points, 10000)
+
+
+def total(valores: Iterable) -> int:
+    """Soma valores em reais vindos do banco ou da API, em centavos."""
+
+    return sum(cents(valor) for valor in valores)
+
+
+def allocate(valor_cents: int, pesos: Sequence[int]) -> list[int]:
+    """Divide `valor_cents` proporcionalmente aos pesos sem perder centavos.
+
+    Usa o método dos maiores restos: a soma das partes é sempre igual ao valor e nenhuma
+    parte difere da proporção exata em mais de um centavo.
+    """
+
+    if not pesos:
+        return []
+    soma = sum(pesos)
+    if soma <= 0:
+        pesos, soma = [1] * len(pesos), len(pesos)
+    sinal = -1 if valor_cents < 0 else 1
+    absoluto = abs(valor_cents)
+    partes = []
+    restos = []
+    for indice, peso in enumerate(pesos):
+        parte, resto = divmod(absoluto * peso, soma)
+        partes.append(parte)
+        restos.append((-resto, indice))
+    for _, indice in sorted(restos)[: absoluto - sum(partes)]:
+        partes[indice] += 1
+    return [sinal * parte for parte in partes]
+
+
+def to_decimal(valor_cents: int) -> Decimal:
+    return Decimal(valor_cents).scaleb(-2)
+
+
+def quantity_to_decimal(quantity_milli: int) -> Decimal:
+    return Decimal(quantity_milli).scaleb(-3)
+
+
+def to_float(valor_cents: int) -> float:
+    """Para respostas JSON: o float mais próximo de reais com duas casas."""
+
+    return valor_cents / CENTS
+
+
+def format_quantity(quantity_milli: int) -> str:
+    """Quantidade com três casas (`1500` → `1.500`)."""
+
+    sinal = "-" if quantity_milli < 0 else ""
+    inteiro, fracao = divmod(abs(quantity_milli), MILLI)
+    return f"{sinal}{inteiro}.{fracao:03d}"
+
+
+def format_cents(valor_cents: int) -> str:
+    """Texto com duas casas (`1234` → `12.34`), sem passar por float."""
+
+    sinal = "-" if valor_cents < 0 else ""
+    reais, centavos = divmod(abs(valor_cents), CENTS)
+    return f"{sinal}{reais}.{centavos:02d}"
+
+
+def format_reais(valor) -> str:
+    """Valor em reais vindo do banco como texto de duas casas."""
+
+    return format_cents(cents(valor))
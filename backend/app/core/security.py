@@ -1,5 +1,8 @@
+import asyncio
 import hashlib
 import secrets
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Optional
 
@@ -34,3 +37,76 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
+
+
+class PasswordHasher:
+    """Executa bcrypt em threads dedicadas, limitando quantos hashes rodam ao mesmo tempo."""
+
+    def __init__(self, concurrency: int) -> None:
+        self.concurrency = max(1, concurrency)
+        self._executor: ThreadPoolExecutor | None = None
+        self._semaphore: asyncio.Semaphore | None = None
+        self.calls = 0
+        self.waiting = 0
+        self.rehashed = 0
+        self.queue_ms_total = 0.0
+        self.queue_ms_max = 0.0
+        self.run_ms_total = 0.0
+        self.run_ms_max = 0.0
+
+    async def _executar(self, func, *args):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="pwd-hash")
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        enfileirado = time.perf_counter()
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        inicio = time.perf_counter()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+        finally:
+            self._semaphore.release()
+            fila_ms = (inicio - enfileirado) * 1000
+            execucao_ms = (time.perf_counter() - inicio) * 1000
+            self.calls += 1
+            self.queue_ms_total += fila_ms
+            self.queue_ms_max = max(self.queue_ms_max, fila_ms)
+            self.run_ms_total += execucao_ms
+            self.run_ms_max = max(self.run_ms_max, execucao_ms)
+
+    async def verify_and_update(self, plain_password: str, hashed_password: str) -> tuple[bool, str | None]:
+        """Confere a senha e devolve um novo hash quando o atual usa parâmetros obsoletos."""
+
+        valido, novo_hash = await self._executar(
+            lambda: pwd_context.verify_and_update(plain_password, hashed_password)
+        )
+        if novo_hash:
+            self.rehashed += 1
+        return valido, novo_hash
+
+    async def hash(self, password: str) -> str:
+        return await self._executar(lambda: pwd_context.hash(password))
+
+    def metrics(self) -> dict:
+        return {
+            "concurrency": self.concurrency,
+            "waiting": self.waiting,
+            "calls": self.calls,
+            "rehashed": self.rehashed,
+            "avg_queue_ms": round(self.queue_ms_total / self.calls, 3) if self.calls else 0.0,
+            "max_queue_ms": round(self.queue_ms_max, 3),
+            "avg_run_ms": round(self.run_ms_total / self.calls, 3) if self.calls else 0.0,
+            "max_run_ms": round(self.run_ms_max, 3),
+        }
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+            self._semaphore = None
+
+
+password_hasher = PasswordHasher(get_settings().password_hash_concurrency)
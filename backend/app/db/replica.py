@@ -0,0 +1,135 @@
+import asyncio
+import itertools
+import logging
+import time
+from dataclasses import dataclass, field
+
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.core.config import Settings, get_settings
+from app.db.session import AsyncSessionLocal, engine_options
+
+logger = logging.getLogger("pdv")
+
+# Em uma réplica sem WAL pendente o atraso é zero, mesmo sem escrita recente no primário.
+_LAG_POSTGRES = text(
+    "SELECT CASE WHEN NOT pg_is_in_recovery() "
+    "OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+)
+
+
+@dataclass
+class _Replica:
+    name: str
+    engine: AsyncEngine
+    session_factory: sessionmaker
+    healthy: bool = False
+    lag_seconds: float | None = None
+    last_error: str | None = None
+    checked_at: float = float("-inf")
+    reads: int = 0
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+
+
+class ReadRouter:
+    """Escolhe a réplica para consultas somente leitura, voltando ao primário se necessário."""
+
+    def __init__(
+        self,
+        primary: sessionmaker,
+        engines: list[AsyncEngine],
+        max_lag_seconds: float,
+        check_seconds: float,
+        check_timeout_seconds: float,
+    ) -> None:
+        self.primary = primary
+        self.max_lag_seconds = max_lag_seconds
+        self.check_seconds = check_seconds
+        self.check_timeout_seconds = check_timeout_seconds
+        self.replicas = [
+            _Replica(
+                name=engine.url.render_as_string(hide_password=True),
+                engine=engine,
+                session_factory=sessionmaker(engine, class_=AsyncSession, expire_on_commit=False),
+            )
+            for engine in engines
+        ]
+        self._ordem = itertools.cycle(range(len(self.replicas)))
+        self.primary_reads = 0
+
+    @classmethod
+    def from_settings(cls, settings: Settings, primary: sessionmaker) -> "ReadRouter":
+        engines = [
+            create_async_engine(url, future=True, **engine_options(settings, url))
+            for url in settings.database_replica_urls
+        ]
+        return cls(
+            primary,
+            engines,
+            max_lag_seconds=settings.replica_max_lag_seconds,
+            check_seconds=settings.replica_check_seconds,
+            check_timeout_seconds=settings.replica_check_timeout_seconds,
+        )
+
+    async def _medir_atraso(self, replica: _Replica) -> float:
+        async with replica.engine.connect() as connection:
+            if make_url(replica.engine.url).get_backend_name() == "postgresql":
+                return float((await connection.execute(_LAG_POSTGRES)).scalar_one())
+            await connection.execute(text("SELECT 1"))
+            return 0.0
+
+    async def _verificar(self, replica: _Replica) -> None:
+        async with replica.lock:
+            if time.monotonic() - replica.checked_at < self.check_seconds:
+                return
+            try:
+                replica.lag_seconds = await asyncio.wait_for(
+                    self._medir_atraso(replica), self.check_timeout_seconds
+                )
+                replica.last_error = None
+                replica.healthy = replica.lag_seconds <= self.max_lag_seconds
+            except Exception as exc:  # pylint: disable=broad-except
+                if replica.healthy:
+                    logger.warning("Réplica %s indisponível: %s", replica.name, exc)
+                replica.healthy = False
+                replica.lag_seconds = None
+                replica.last_error = str(exc) or type(exc).__name__
+            replica.checked_at = time.monotonic()
+
+    async def session_factory(self) -> sessionmaker:
+        for _ in range(len(self.replicas)):
+            replica = self.replicas[next(self._ordem)]
+            if time.monotonic() - replica.checked_at >= self.check_seconds:
+                await self._verificar(replica)
+            if replica.healthy:
+                replica.reads += 1
+                return replica.session_factory
+        self.primary_reads += 1
+        return self.primary
+
+    def status(self) -> dict:
+        return {
+            "primary_reads": self.primary_reads,
+            "max_lag_seconds": self.max_lag_seconds,
+            "replicas": [
+                {
+                    "name": replica.name,
+                    "healthy": replica.healthy,
+                    "lag_seconds": replica.lag_seconds,
+                    "last_error": replica.last_error,
+                    "reads": replica.reads,
+                }
+                for replica in self.replicas
+            ],
+        }
+
+    async def dispose(self) -> None:
+        for replica in self.replicas:
+            await replica.engine.dispose()
+
+
+read_router = ReadRouter.from_settings(get_settings(), AsyncSessionLocal)
@@ -1,16 +1,93 @@
+import time
+from typing import AsyncGenerator
+
+from sqlalchemy import exc
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from app.core.config import Settings, get_settings
+
+
+class PoolStats:
+    """Contadores de espera por conexão do pool."""
+
+    def __init__(self) -> None:
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_ms_total = 0.0
+        self.wait_ms_max = 0.0
+
+    def record(self, wait_ms: float, timed_out: bool) -> None:
+        if timed_out:
+            self.timeouts += 1
+            return
+        self.checkouts += 1
+        self.wait_ms_total += wait_ms
+        self.wait_ms_max = max(self.wait_ms_max, wait_ms)
+
+
+pool_stats = PoolStats()
+
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    """Pool padrão do asyncio que mede o tempo de espera de cada checkout."""
+
+    def _do_get(self):
+        inicio = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            pool_stats.record((time.perf_counter() - inicio) * 1000, timed_out=True)
+            raise
+        pool_stats.record((time.perf_counter() - inicio) * 1000, timed_out=False)
+        return connection
+
+
+def engine_options(settings: Settings, database_url: str | None = None) -> dict:
+    url = make_url(database_url or settings.database_url)
+    if url.get_backend_name() == "sqlite":
+        return {}
+    options = {
+        "poolclass": InstrumentedPool,
+        "pool_size": settings.db_pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_timeout": settings.db_pool_timeout,
+        "pool_recycle": settings.db_pool_recycle,
+        "pool_pre_ping": settings.db_pool_pre_ping,
+    }
+    if url.get_driver_name() == "asyncpg":
+        options["connect_args"] = {"statement_cache_size": settings.db_statement_cache_size}
+    return options
+
+
+def pool_status() -> dict:
+    pool = engine.pool
+    status = {"pool": type(pool).__name__}
+    if isinstance(pool, AsyncAdaptedQueuePool):
+        status.update(
+            size=pool.size(),
+            checked_out=pool.checkedout(),
+            idle=pool.checkedin(),
+            overflow=max(pool.overflow(), 0),
+            max_overflow=pool._max_overflow,  # pylint: disable=protected-access
+            timeout_seconds=pool.timeout(),
+        )
+    status.update(
+        checkouts=pool_stats.checkouts,
+        timeouts=pool_stats.timeouts,
+        avg_wait_ms=round(pool_stats.wait_ms_total / pool_stats.checkouts, 3) if pool_stats.checkouts else 0.0,
+        max_wait_ms=round(pool_stats.wait_ms_max, 3),
+    )
+    return status
 
-from app.core.config import get_settings
 
 settings = get_settings()
-engine = create_async_engine(settings.database_url, future=True, echo=settings.debug)
+engine = create_async_engine(settings.database_url, future=True, echo=settings.debug, **engine_options(settings))
 AsyncSessionLocal = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
 
-def get_session():
-    session = AsyncSessionLocal()
-    try:
+async def get_session() -> AsyncGenerator[AsyncSession, None]:
+    async with AsyncSessionLocal() as session:
         yield session
-    finally:
-        session.close()
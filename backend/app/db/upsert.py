@@ -0,0 +1,24 @@
+from typing import Sequence
+
+from sqlalchemy import Table
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+async def upsert_increment(
+    session: AsyncSession, table: Table, rows: Sequence[dict], key_columns: Sequence[str]
+) -> None:
+    """Insere as linhas ou soma os valores nas colunas não-chave das linhas existentes."""
+
+    if not rows:
+        return
+    dialect = session.get_bind().dialect.name
+    insert = pg_insert if dialect == "postgresql" else sqlite_insert
+    stmt = insert(table).values(list(rows))
+    measures = [name for name in rows[0] if name not in key_columns]
+    stmt = stmt.on_conflict_do_update(
+        index_elements=list(key_columns),
+        set_={name: table.c[name] + stmt.excluded[name] for name in measures},
+    )
+    await session.execute(stmt)
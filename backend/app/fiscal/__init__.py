@@ -1,13 +1,13 @@
 """Pacote dedicado aos fluxos fiscais.
 
-Esta camada simula as integrações reais com a SEFAZ, mantendo a mesma
-interface pública que será utilizada quando o conector oficial estiver
-pronto.
+A comunicação com a SEFAZ usa os web services da UF configurada em
+`SEFAZ_ENDPOINTS`; sem endpoint, um cliente simulado responde no lugar.
+Geração do XML, assinatura e tabelas tributárias ainda são simuladas.
 """
 
 from .contingency import ContingencyManager
 from .nfce import NfceProcessor
-from .sefaz import SefazClient
+from .sefaz import SefazClient, SefazMockClient, SefazRequestError, SefazUnavailable, build_sefaz_client
 from .signature import DigitalSigner, SignedXml
 from .tax_tables import TaxTableRepository
 from .xml_builder import NfceXmlBuilder
@@ -17,7 +17,11 @@ __all__ = [
     "DigitalSigner",
     "NfceProcessor",
     "SefazClient",
+    "SefazMockClient",
+    "SefazRequestError",
+    "SefazUnavailable",
     "SignedXml",
     "TaxTableRepository",
     "NfceXmlBuilder",
+    "build_sefaz_client",
 ]
@@ -1,8 +1,20 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from datetime import datetime
-from typing import List
+from datetime import datetime, timedelta
+from uuid import uuid4
+
+from sqlalchemy import and_, case, func, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from app.db.session import AsyncSessionLocal
+from app.models.fiscal import FiscalContingency, FiscalDocument, FiscalEvent
+from app.services.work_queue import claim_rows
+
+_RESPOSTAS = {"authorized", "rejected"}
+# `linking` já foi transmitido: só espera a NFC-e da venda receber a resposta.
+_TRANSMITIDOS = _RESPOSTAS | {"failed", "linking"}
 
 
 @dataclass
@@ -11,28 +23,268 @@ class ContingencyRecord:
     payload: str
     created_at: datetime
     reason: str | None = None
+    deadline: datetime | None = None
+    status: str = "pending"
+    attempts: int = 0
+    code: str | None = None
+    message: str | None = None
+
+
+def _registro(linha: FiscalContingency) -> ContingencyRecord:
+    return ContingencyRecord(
+        reference=linha.reference,
+        payload=linha.xml,
+        created_at=linha.created_at,
+        reason=linha.reason,
+        deadline=linha.deadline,
+        status=linha.status,
+        attempts=linha.attempts,
+        code=linha.code,
+        message=linha.message,
+    )
 
 
 class ContingencyManager:
-    """Armazena documentos emitidos offline para posterior sincronização."""
+    """Guarda na tabela `fiscal_contingency` os documentos emitidos offline até a transmissão.
+
+    O documento é gravado e confirmado antes de a emissão retornar, então sobrevive a um
+    reinício e fica visível a todos os workers. A transmissão é do `ContingencyRetransmitter`.
+    """
 
-    def __init__(self) -> None:
-        self._queue: List[ContingencyRecord] = []
+    def __init__(self, session_factory: sessionmaker | None = None, deadline_hours: float = 24) -> None:
+        self.session_factory = session_factory or AsyncSessionLocal
+        self.deadline_hours = deadline_hours
 
-    def enqueue(self, reference: str, payload: str, reason: str | None = None) -> ContingencyRecord:
-        record = ContingencyRecord(
+    async def enqueue(
+        self,
+        reference: str,
+        payload: str,
+        reason: str | None = None,
+        sale_id: int | None = None,
+        uf: str | None = None,
+    ) -> ContingencyRecord:
+        agora = datetime.utcnow()
+        linha = FiscalContingency(
             reference=reference,
-            payload=payload,
+            sale_id=sale_id,
+            uf=uf,
+            xml=payload,
             reason=reason,
-            created_at=datetime.utcnow(),
+            status="pending",
+            attempts=0,
+            deadline=agora + timedelta(hours=self.deadline_hours),
+            next_attempt_at=agora,
+            created_at=agora,
+        )
+        async with self.session_factory() as session:
+            session.add(linha)
+            session.info["contingency"] = True
+            await session.commit()
+        return _registro(linha)
+
+    async def pending(self, limit: int = 500) -> list[ContingencyRecord]:
+        """Documentos ainda não transmitidos, do prazo mais curto para o mais longo."""
+
+        async with self.session_factory() as session:
+            result = await session.execute(
+                select(FiscalContingency)
+                .where(FiscalContingency.status.notin_(_TRANSMITIDOS))
+                .order_by(FiscalContingency.deadline, FiscalContingency.id)
+                .limit(limit)
+            )
+            return [_registro(linha) for linha in result.scalars()]
+
+    async def claim(self, limit: int, lease_seconds: float) -> list:
+        """Reivindica até `limit` documentos vencidos, do prazo legal mais próximo para o mais distante.
+
+        Todos recebem o mesmo `claim_token`, devolvido em cada linha: `record`, `release` e
+        `renew` só valem para quem ainda detém a reivindicação. Um documento `sending` com a
+        posse vencida é retomado com outro token.
+        """
+
+        agora = datetime.utcnow()
+        async with self.session_factory() as session:
+            documentos = await claim_rows(
+                session,
+                FiscalContingency,
+                or_(
+                    and_(FiscalContingency.status == "pending", FiscalContingency.next_attempt_at <= agora),
+                    and_(FiscalContingency.status == "sending", FiscalContingency.locked_until <= agora),
+                ),
+                order_by=(FiscalContingency.deadline, FiscalContingency.id),
+                limit=limit,
+                values={
+                    "status": "sending",
+                    "claim_token": uuid4().hex,
+                    "locked_until": agora + timedelta(seconds=lease_seconds),
+                },
+                returning=(
+                    FiscalContingency.id,
+                    FiscalContingency.reference,
+                    FiscalContingency.uf,
+                    FiscalContingency.xml,
+                    FiscalContingency.attempts,
+                    FiscalContingency.deadline,
+                    FiscalContingency.claim_token,
+                ),
+            )
+            await session.commit()
+        return sorted(documentos, key=lambda documento: (documento.deadline, documento.id))
+
+    async def record(self, resultados: list[dict], token: str) -> set[int]:
+        """Grava o resultado de cada documento ainda reivindicado com `token`; devolve os ids gravados.
+
+        Cada item tem `id`, `reference` e os campos da linha a alterar (`status`, `code`,
+        `message`, `protocol`, `access_key`, `attempts`, `next_attempt_at`, ...). Resultados
+        de uma posse já retomada por outro worker são descartados. Com venda, a resposta
+        definitiva fica em `outcome` e a linha em `linking` até a NFC-e da venda ser atualizada.
+        """
+
+        if not resultados:
+            return set()
+        linhas = []
+        for resultado in resultados:
+            linha = {campo: valor for campo, valor in resultado.items() if campo != "reference"}
+            if linha.get("status") in _RESPOSTAS:
+                linha["outcome"], linha["status"] = linha["status"], "linking"
+            linhas.append({**linha, "locked_until": None})
+        async with self.session_factory() as session:
+            await session.execute(
+                update(FiscalContingency).where(
+                    FiscalContingency.claim_token == token, FiscalContingency.status == "sending"
+                ),
+                linhas,
+                execution_options={"synchronize_session": None},
+            )
+            gravados = await session.execute(
+                select(FiscalContingency.id).where(
+                    FiscalContingency.id.in_([linha["id"] for linha in linhas]),
+                    FiscalContingency.claim_token == token,
+                    FiscalContingency.status != "sending",
+                )
+            )
+            ids = set(gravados.scalars())
+            await self._vincular(session, FiscalContingency.id.in_(ids))
+            await session.commit()
+        return ids
+
+    async def link_pending(self, limit: int = 100) -> int:
+        """Vincula à NFC-e da venda as respostas gravadas antes de o documento existir; devolve quantas."""
+
+        async with self.session_factory() as session:
+            vinculados = await self._vincular(session, None, limit)
+            await session.commit()
+        return vinculados
+
+    async def _vincular(self, session: AsyncSession, criterio, limit: int | None = None) -> int:
+        # Documentos sem venda terminam direto; com venda, só depois de a NFC-e receber a resposta.
+        await session.execute(
+            update(FiscalContingency)
+            .where(FiscalContingency.status == "linking", FiscalContingency.sale_id.is_(None))
+            .values(status=FiscalContingency.outcome),
+            execution_options={"synchronize_session": False},
+        )
+        consulta = (
+            select(FiscalContingency).where(FiscalContingency.status == "linking").order_by(FiscalContingency.id)
         )
-        self._queue.append(record)
-        return record
+        if criterio is not None:
+            consulta = consulta.where(criterio)
+        if limit is not None:
+            consulta = consulta.limit(limit)
+        linhas = (await session.execute(consulta)).scalars().all()
+        agora = datetime.utcnow()
+        vinculados = 0
+        for linha in linhas:
+            documento = (
+                await session.execute(
+                    select(FiscalDocument)
+                    .where(FiscalDocument.sale_id == linha.sale_id, FiscalDocument.model == "NFC-e")
+                    .order_by(case((FiscalDocument.protocol == linha.reference, 0), else_=1), FiscalDocument.id.desc())
+                    .limit(1)
+                )
+            ).scalar_one_or_none()
+            if documento is None:
+                continue
+            # A linha primeiro: se outro worker já vinculou, a NFC-e não recebe um segundo evento.
+            resultado = await session.execute(
+                update(FiscalContingency)
+                .where(FiscalContingency.id == linha.id, FiscalContingency.status == "linking")
+                .values(status=linha.outcome, document_id=documento.id),
+                execution_options={"synchronize_session": False},
+            )
+            if not resultado.rowcount:
+                continue
+            documento.status = linha.outcome
+            if linha.outcome == "authorized":
+                documento.protocol = linha.protocol
+                documento.access_key = linha.access_key
+            session.add(
+                FiscalEvent(
+                    document_id=documento.id,
+                    type="transmission",
+                    status=linha.outcome,
+                    message=linha.message,
+                    created_at=agora,
+                )
+            )
+            vinculados += 1
+        return vinculados
+
+    async def renew(self, ids: list[int], token: str, lease_seconds: float) -> None:
+        """Estende a posse dos documentos ainda reivindicados com `token`."""
+
+        async with self.session_factory() as session:
+            await session.execute(
+                update(FiscalContingency)
+                .where(
+                    FiscalContingency.id.in_(ids),
+                    FiscalContingency.claim_token == token,
+                    FiscalContingency.status == "sending",
+                )
+                .values(locked_until=datetime.utcnow() + timedelta(seconds=lease_seconds))
+            )
+            await session.commit()
+
+    async def release(self, ids: list[int], token: str, delay_seconds: float, error: str | None = None) -> None:
+        """Devolve documentos reivindicados com `token` à fila, para nova tentativa depois de `delay_seconds`."""
 
-    def pending(self) -> list[ContingencyRecord]:
-        return list(self._queue)
+        if not ids:
+            return
+        valores = {
+            "status": "pending",
+            "locked_until": None,
+            "next_attempt_at": datetime.utcnow() + timedelta(seconds=delay_seconds),
+        }
+        if error is not None:
+            valores["message"] = error[:1000]
+        async with self.session_factory() as session:
+            await session.execute(
+                update(FiscalContingency)
+                .where(
+                    FiscalContingency.id.in_(ids),
+                    FiscalContingency.claim_token == token,
+                    FiscalContingency.status == "sending",
+                )
+                .values(**valores)
+            )
+            await session.commit()
 
-    def flush(self) -> list[ContingencyRecord]:
-        flushed = list(self._queue)
-        self._queue.clear()
-        return flushed
+    async def backlog(self) -> dict:
+        agora = datetime.utcnow()
+        async with self.session_factory() as session:
+            result = await session.execute(
+                select(
+                    FiscalContingency.status,
+                    func.count(),
+                    func.min(FiscalContingency.deadline),
+                    func.sum(case((FiscalContingency.deadline < agora, 1), else_=0)),
+                ).group_by(FiscalContingency.status)
+            )
+            return {
+                status: {
+                    "count": quantidade,
+                    "next_deadline": prazo.isoformat() if prazo and status not in _TRANSMITIDOS else None,
+                    "overdue": int(vencidos or 0) if status not in _TRANSMITIDOS else 0,
+                }
+                for status, quantidade, prazo, vencidos in result.all()
+            }
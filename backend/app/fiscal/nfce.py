@@ -4,7 +4,7 @@ from dataclasses import dataclass
 from uuid import uuid4
 
 from app.fiscal.contingency import ContingencyManager
-from app.fiscal.sefaz import SefazClient, SefazResponse
+from app.fiscal.sefaz import SefazClient, SefazMockClient, SefazResponse, SefazUnavailable
 from app.fiscal.signature import DigitalSigner
 from app.fiscal.tax_tables import TaxTableRepository
 from app.fiscal.xml_builder import NfceXmlBuilder
@@ -27,7 +27,7 @@ class NfceProcessor:
         *,
         tax_tables: TaxTableRepository,
         signer: DigitalSigner,
-        sefaz_client: SefazClient,
+        sefaz_client: SefazClient | SefazMockClient,
         contingency_manager: ContingencyManager,
     ) -> None:
         self.tax_tables = tax_tables
@@ -36,31 +36,37 @@ class NfceProcessor:
         self.contingency_manager = contingency_manager
         self.xml_builder = NfceXmlBuilder(tax_tables)
 
-    def emit(self, sale_id: int, items: list[InvoiceItem], offline: bool, contingency_reason: str | None) -> NfceEmissionResult:
+    async def emit(
+        self, sale_id: int, items: list[InvoiceItem], offline: bool, contingency_reason: str | None
+    ) -> NfceEmissionResult:
         xml = self.xml_builder.build(sale_id, items)
         signed = self.signer.sign(xml)
 
-        if offline:
-            reference = f"CONT-{uuid4().hex[:8]}"
-            self.contingency_manager.enqueue(reference, signed.xml, contingency_reason)
-            return NfceEmissionResult(
-                success=True,
-                message="Documento emitido em contingência offline.",
-                protocol=reference,
-                access_key=None,
-                contingency=True,
-                xml=signed.xml,
-            )
+        if not offline:
+            try:
+                sefaz_response = await self.sefaz_client.send_signed_xml(signed.xml)
+                return self._map_response(sefaz_response, signed.xml)
+            except SefazUnavailable as exc:
+                # Sem resposta da SEFAZ a venda não para: o documento segue em contingência offline.
+                contingency_reason = str(exc)
 
-        sefaz_response = self.sefaz_client.send_signed_xml(signed.xml)
-        return self._map_response(sefaz_response, signed.xml)
+        reference = f"CONT-{uuid4().hex[:8]}"
+        await self.contingency_manager.enqueue(reference, signed.xml, contingency_reason, sale_id=sale_id)
+        return NfceEmissionResult(
+            success=True,
+            message="Documento emitido em contingência offline.",
+            protocol=reference,
+            access_key=None,
+            contingency=True,
+            xml=signed.xml,
+        )
 
-    def cancel(self, access_key: str, justification: str) -> NfceEmissionResult:
-        sefaz_response = self.sefaz_client.cancel(access_key, justification)
+    async def cancel(self, access_key: str, justification: str) -> NfceEmissionResult:
+        sefaz_response = await self.sefaz_client.cancel(access_key, justification)
         return self._map_response(sefaz_response, xml="")
 
-    def status(self, access_key: str) -> NfceEmissionResult:
-        sefaz_response = self.sefaz_client.status(access_key)
+    async def status(self, access_key: str) -> NfceEmissionResult:
+        sefaz_response = await self.sefaz_client.status(access_key)
         return self._map_response(sefaz_response, xml="")
 
     def _map_response(self, response: SefazResponse, xml: str) -> NfceEmissionResult:
@@ -1,8 +1,33 @@
 from __future__ import annotations
 
+import asyncio
+import logging
+import time
 from dataclasses import dataclass
 from datetime import datetime
+from itertools import count
 from uuid import uuid4
+from xml.etree import ElementTree
+from xml.sax.saxutils import escape
+
+import httpx
+
+from app.core.config import SefazEndpoint, Settings
+
+logger = logging.getLogger("pdv")
+
+SOAP_NS = "http://www.w3.org/2003/05/soap-envelope"
+WSDL_NS = "http://www.portalfiscal.inf.br/nfe/wsdl"
+
+# Autorizado, cancelamento homologado e evento registrado, dentro ou fora do prazo.
+_AUTORIZADO = {"100", "101", "135", "136", "150", "151", "155"}
+# Serviço paralisado: tratado como indisponibilidade, não como rejeição do documento.
+_PARALISADO = {"108", "109"}
+_CODIGOS_UF = {
+    "AC": "12", "AL": "27", "AM": "13", "AP": "16", "BA": "29", "CE": "23", "DF": "53", "ES": "32", "GO": "52",
+    "MA": "21", "MG": "31", "MS": "50", "MT": "51", "PA": "15", "PB": "25", "PE": "26", "PI": "22", "PR": "41",
+    "RJ": "33", "RN": "24", "RO": "11", "RR": "14", "RS": "43", "SC": "42", "SE": "28", "SP": "35", "TO": "17",
+}
 
 
 @dataclass
@@ -12,12 +37,25 @@ class SefazResponse:
     protocol: str | None
     access_key: str | None
     processed_at: datetime
+    code: str | None = None
 
 
-class SefazClient:
-    """Cliente fake para envio e cancelamento na SEFAZ."""
+class SefazUnavailable(Exception):
+    """SEFAZ fora do ar, paralisada ou sem resposta no prazo; a NFC-e pode sair em contingência."""
+
+
+class SefazRequestError(Exception):
+    """SEFAZ recusou a requisição (HTTP 4xx): endpoint, certificado ou credenciais errados.
+
+    Não é indisponibilidade: a emissão falha em vez de cair na contingência, que só
+    esconderia o problema até o prazo de transmissão vencer.
+    """
+
+
+class SefazMockClient:
+    """Cliente fake para envio e cancelamento na SEFAZ, usado quando a UF não tem endpoint."""
 
-    def send_signed_xml(self, signed_xml: str) -> SefazResponse:
+    async def send_signed_xml(self, signed_xml: str, uf: str | None = None) -> SefazResponse:
         protocol = str(uuid4())[:8]
         access_key = f"{datetime.utcnow():%y%m}{protocol}"
         message = "XML recebido e processado (mock)."
@@ -29,7 +67,7 @@ class SefazClient:
             processed_at=datetime.utcnow(),
         )
 
-    def cancel(self, access_key: str, justification: str) -> SefazResponse:
+    async def cancel(self, access_key: str, justification: str, uf: str | None = None) -> SefazResponse:
         message = f"Cancelamento registrado (mock) para {access_key}: {justification}"
         return SefazResponse(
             success=True,
@@ -39,7 +77,7 @@ class SefazClient:
             processed_at=datetime.utcnow(),
         )
 
-    def status(self, access_key: str) -> SefazResponse:
+    async def status(self, access_key: str, uf: str | None = None) -> SefazResponse:
         message = "Documento autorizado (mock)."
         return SefazResponse(
             success=True,
@@ -48,3 +86,220 @@ class SefazClient:
             access_key=access_key,
             processed_at=datetime.utcnow(),
         )
+
+    def metrics(self) -> dict:
+        return {"mode": "mock"}
+
+    async def aclose(self) -> None:
+        pass
+
+
+@dataclass
+class _UfStats:
+    requests: int = 0
+    authorized: int = 0
+    rejected: int = 0
+    unavailable: int = 0
+    errors: int = 0
+    in_flight: int = 0
+    waiting: int = 0
+    latency_ms_total: float = 0.0
+    latency_ms_max: float = 0.0
+
+
+class SefazClient:
+    """Web services SOAP da SEFAZ sobre um `httpx.AsyncClient` por UF.
+
+    Cada UF tem seu pool de conexões com keep-alive e um semáforo que limita as requisições
+    simultâneas: acima do limite, as emissões esperam a vez em vez de abrir mais conexões.
+    Erros de rede, prazo esgotado, HTTP 5xx ou 429 e serviço paralisado viram `SefazUnavailable`;
+    os demais HTTP 4xx viram `SefazRequestError`.
+    """
+
+    def __init__(
+        self,
+        endpoints: dict[str, SefazEndpoint],
+        uf: str,
+        timeout_seconds: float = 10,
+        connect_timeout_seconds: float = 3,
+        max_concurrency: int = 8,
+        max_connections: int = 16,
+        keepalive_seconds: float = 60,
+        transport: httpx.AsyncBaseTransport | None = None,
+    ) -> None:
+        self.endpoints = {sigla.upper(): endpoint for sigla, endpoint in endpoints.items()}
+        self.uf = uf.upper()
+        self.timeout_seconds = timeout_seconds
+        self.connect_timeout_seconds = connect_timeout_seconds
+        self.max_concurrency = max_concurrency
+        self.max_connections = max_connections
+        self.keepalive_seconds = keepalive_seconds
+        self._transport = transport
+        self._clientes: dict[str, httpx.AsyncClient] = {}
+        self._semaforos: dict[str, asyncio.Semaphore] = {}
+        self._lotes = count(1)
+        self.stats: dict[str, _UfStats] = {}
+
+    @classmethod
+    def from_settings(cls, settings: Settings) -> "SefazClient":
+        return cls(
+            endpoints=settings.sefaz_endpoints,
+            uf=settings.sefaz_uf,
+            timeout_seconds=settings.sefaz_timeout_seconds,
+            connect_timeout_seconds=settings.sefaz_connect_timeout_seconds,
+            max_concurrency=settings.sefaz_max_concurrency,
+            max_connections=settings.sefaz_max_connections,
+            keepalive_seconds=settings.sefaz_keepalive_seconds,
+        )
+
+    def _endpoint(self, uf: str) -> SefazEndpoint:
+        endpoint = self.endpoints.get(uf)
+        if endpoint is None:
+            raise LookupError(f"UF sem endpoint da SEFAZ configurado: {uf}")
+        return endpoint
+
+    def _cliente(self, uf: str) -> tuple[httpx.AsyncClient, asyncio.Semaphore]:
+        cliente = self._clientes.get(uf)
+        if cliente is None:
+            endpoint = self._endpoint(uf)
+            prazo = endpoint.timeout_seconds or self.timeout_seconds
+            limite = endpoint.max_concurrency or self.max_concurrency
+            cliente = httpx.AsyncClient(
+                base_url=endpoint.url,
+                timeout=httpx.Timeout(prazo, connect=self.connect_timeout_seconds),
+                limits=httpx.Limits(
+                    max_connections=max(self.max_connections, limite),
+                    max_keepalive_connections=self.max_connections,
+                    keepalive_expiry=self.keepalive_seconds,
+                ),
+                headers={"Content-Type": "application/soap+xml; charset=utf-8"},
+                transport=self._transport,
+            )
+            self._clientes[uf] = cliente
+            self._semaforos[uf] = asyncio.Semaphore(limite)
+        return cliente, self._semaforos[uf]
+
+    @staticmethod
+    def _envelope(servico: str, mensagem: str) -> str:
+        return (
+            f'<?xml version="1.0" encoding="UTF-8"?><soap12:Envelope xmlns:soap12="{SOAP_NS}"><soap12:Body>'
+            f'<nfeDadosMsg xmlns="{WSDL_NS}/{servico}">{mensagem}</nfeDadosMsg></soap12:Body></soap12:Envelope>'
+        )
+
+    async def _enviar(self, uf: str | None, servico: str, operacao: str, mensagem: str) -> SefazResponse:
+        uf = (uf or self.uf).upper()
+        cliente, semaforo = self._cliente(uf)
+        caminho = getattr(self._endpoint(uf), servico)
+        stats = self.stats.setdefault(uf, _UfStats())
+        stats.waiting += 1
+        try:
+            await semaforo.acquire()
+        finally:
+            stats.waiting -= 1
+        stats.in_flight += 1
+        stats.requests += 1
+        inicio = time.perf_counter()
+        try:
+            resposta = await cliente.post(caminho, content=self._envelope(operacao, mensagem).encode())
+            resposta.raise_for_status()
+            resultado = self._ler_resposta(resposta.content)
+        except SefazUnavailable:
+            stats.unavailable += 1
+            raise
+        except httpx.HTTPStatusError as exc:
+            codigo = exc.response.status_code
+            if codigo >= 500 or codigo == 429:
+                stats.unavailable += 1
+                raise SefazUnavailable(f"SEFAZ {uf} indisponível: HTTP {codigo}") from exc
+            stats.errors += 1
+            logger.error("SEFAZ %s recusou %s com HTTP %s: verifique endpoint e certificado", uf, servico, codigo)
+            raise SefazRequestError(f"SEFAZ {uf} recusou a requisição: HTTP {codigo} em {exc.request.url}") from exc
+        except (httpx.TransportError, ElementTree.ParseError) as exc:
+            stats.unavailable += 1
+            raise SefazUnavailable(f"SEFAZ {uf} indisponível: {type(exc).__name__}: {exc}") from exc
+        finally:
+            semaforo.release()
+            duracao = (time.perf_counter() - inicio) * 1000
+            stats.in_flight -= 1
+            stats.latency_ms_total += duracao
+            stats.latency_ms_max = max(stats.latency_ms_max, duracao)
+        if resultado.success:
+            stats.authorized += 1
+        else:
+            stats.rejected += 1
+        return resultado
+
+    @staticmethod
+    def _ler_resposta(conteudo: bytes) -> SefazResponse:
+        campos: dict[str, str] = {}
+        protocolo: dict[str, str] = {}
+        # O resultado do documento (infProt/infEvento) prevalece sobre o do lote.
+        for elemento in ElementTree.fromstring(conteudo).iter():
+            nome = elemento.tag.rsplit("}", 1)[-1]
+            if nome in ("infProt", "infEvento", "retConsSitNFe"):
+                for filho in elemento:
+                    protocolo.setdefault(filho.tag.rsplit("}", 1)[-1], (filho.text or "").strip())
+            elif elemento.text and elemento.text.strip():
+                campos.setdefault(nome, elemento.text.strip())
+        campos.update(protocolo)
+        codigo = campos.get("cStat")
+        if codigo is None:
+            raise SefazUnavailable("Resposta da SEFAZ sem cStat")
+        if codigo in _PARALISADO:
+            raise SefazUnavailable(f"{codigo} - {campos.get('xMotivo', 'Serviço paralisado')}")
+        return SefazResponse(
+            success=codigo in _AUTORIZADO,
+            message=f"{codigo} - {campos.get('xMotivo', '')}".strip(" -"),
+            protocol=campos.get("nProt"),
+            access_key=campos.get("chNFe"),
+            processed_at=datetime.utcnow(),
+            code=codigo,
+        )
+
+    async def send_signed_xml(self, signed_xml: str, uf: str | None = None) -> SefazResponse:
+        lote = next(self._lotes)
+        mensagem = f'<enviNFe versao="4.00"><idLote>{lote}</idLote><indSinc>1</indSinc>{signed_xml}</enviNFe>'
+        return await self._enviar(uf, "autorizacao", "NFeAutorizacao4", mensagem)
+
+    async def cancel(self, access_key: str, justification: str, uf: str | None = None) -> SefazResponse:
+        orgao = _CODIGOS_UF.get((uf or self.uf).upper(), "")
+        mensagem = (
+            f'<envEvento versao="1.00"><idLote>{next(self._lotes)}</idLote><evento versao="1.00"><infEvento>'
+            f"<cOrgao>{orgao}</cOrgao><chNFe>{escape(access_key)}</chNFe><tpEvento>110111</tpEvento>"
+            f"<detEvento><descEvento>Cancelamento</descEvento><xJust>{escape(justification)}</xJust></detEvento>"
+            "</infEvento></evento></envEvento>"
+        )
+        return await self._enviar(uf, "evento", "NFeRecepcaoEvento4", mensagem)
+
+    async def status(self, access_key: str, uf: str | None = None) -> SefazResponse:
+        mensagem = f'<consSitNFe versao="4.00"><xServ>CONSULTAR</xServ><chNFe>{escape(access_key)}</chNFe></consSitNFe>'
+        return await self._enviar(uf, "consulta", "NFeConsultaProtocolo4", mensagem)
+
+    def metrics(self) -> dict:
+        return {
+            "mode": "http",
+            "uf": self.uf,
+            "max_concurrency": self.max_concurrency,
+            "max_connections": self.max_connections,
+            "ufs": {
+                uf: {
+                    **{campo: valor for campo, valor in vars(stats).items() if not campo.startswith("latency")},
+                    "avg_ms": round(stats.latency_ms_total / stats.requests, 3) if stats.requests else 0.0,
+                    "max_ms": round(stats.latency_ms_max, 3),
+                }
+                for uf, stats in sorted(self.stats.items())
+            },
+        }
+
+    async def aclose(self) -> None:
+        clientes, self._clientes, self._semaforos = self._clientes, {}, {}
+        for cliente in clientes.values():
+            await cliente.aclose()
+
+
+def build_sefaz_client(settings: Settings) -> SefazClient | SefazMockClient:
+    """Cliente HTTP quando a UF do emitente tem endpoint configurado; senão, o simulado."""
+
+    if settings.sefaz_uf.upper() in {uf.upper() for uf in settings.sefaz_endpoints}:
+        return SefazClient.from_settings(settings)
+    return SefazMockClient()
@@ -0,0 +1,158 @@
+"""SEFAZ local para testes de carga da emissão, sem rede externa.
+
+Responde aos três web services usados pelo `SefazClient` (autorização, evento de
+cancelamento e consulta) com latência, rejeições e indisponibilidade configuráveis.
+`PUT /controle` altera a configuração com o servidor no ar, para simular uma queda no
+meio do teste; `GET /controle` devolve a configuração e os contadores.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import random
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from itertools import count
+from xml.etree import ElementTree
+
+from fastapi import FastAPI, Request, Response
+
+from app.fiscal.sefaz import SOAP_NS
+
+_MOTIVOS = {
+    "100": "Autorizado o uso da NF-e",
+    "101": "Cancelamento de NF-e homologado",
+    "108": "Serviço Paralisado Momentaneamente (curto prazo)",
+    "135": "Evento registrado e vinculado a NF-e",
+    "217": "Rejeição: NF-e não consta na base de dados da SEFAZ",
+    "225": "Rejeição: Falha no Schema XML da NFe",
+    "539": "Rejeição: Duplicidade de NF-e com diferença na Chave de Acesso",
+    "778": "Rejeição: Informado NCM inexistente",
+}
+
+
+@dataclass
+class StandinConfig:
+    latency_ms: float = 50
+    jitter_ms: float = 0
+    reject_rate: float = 0.0
+    reject_codes: list[str] = field(default_factory=lambda: ["225", "539", "778"])
+    outage: bool = False
+    suspended: bool = False
+    # Status HTTP devolvido no lugar da resposta SOAP (ex.: 403 de certificado recusado).
+    http_status: int | None = None
+    seed: int | None = None
+
+
+@dataclass
+class _StandinStats:
+    requests: int = 0
+    authorized: int = 0
+    rejected: int = 0
+    unavailable: int = 0
+    in_flight: int = 0
+    max_in_flight: int = 0
+
+
+def _chave(uf: str, numero: int) -> str:
+    base = f"{uf}{datetime.utcnow():%y%m}{'0' * 14}65001{numero:09d}1{numero % 10**8:08d}"
+    soma = sum(int(digito) * (2 + indice % 8) for indice, digito in enumerate(reversed(base)))
+    resto = soma % 11
+    return f"{base}{0 if resto < 2 else 11 - resto}"
+
+
+def _envelope(corpo: str) -> str:
+    return (
+        f'<?xml version="1.0" encoding="UTF-8"?><soap12:Envelope xmlns:soap12="{SOAP_NS}">'
+        f"<soap12:Body><nfeResultMsg>{corpo}</nfeResultMsg></soap12:Body></soap12:Envelope>"
+    )
+
+
+def _resultado(codigo: str, **campos: str) -> str:
+    extras = "".join(f"<{nome}>{valor}</{nome}>" for nome, valor in campos.items())
+    return f"{extras}<cStat>{codigo}</cStat><xMotivo>{_MOTIVOS.get(codigo, 'Rejeição')}</xMotivo>"
+
+
+def create_standin_app(config: StandinConfig | None = None, uf: str = "35") -> FastAPI:
+    config = config or StandinConfig()
+    stats = _StandinStats()
+    rng = random.Random(config.seed)
+    numeros = count(1)
+    documentos: dict[str, str] = {}
+    app = FastAPI(title="SEFAZ local", docs_url=None, redoc_url=None)
+
+    def _autorizar(mensagem: ElementTree.Element) -> str:
+        numero = next(numeros)
+        if rng.random() < config.reject_rate:
+            stats.rejected += 1
+            protocolo = _resultado(rng.choice(config.reject_codes))
+        else:
+            stats.authorized += 1
+            chave = _chave(uf, numero)
+            documentos[chave] = "100"
+            protocolo = _resultado("100", chNFe=chave, nProt=f"1{uf}{numero:013d}")
+        return (
+            f"<retEnviNFe>{_resultado('104')}<protNFe><infProt>{protocolo}</infProt></protNFe></retEnviNFe>"
+        )
+
+    def _cancelar(mensagem: ElementTree.Element) -> str:
+        chave = mensagem.findtext(".//{*}chNFe") or ""
+        if documentos.get(chave) != "100":
+            stats.rejected += 1
+            evento = _resultado("217", chNFe=chave)
+        else:
+            stats.authorized += 1
+            documentos[chave] = "101"
+            evento = _resultado("135", chNFe=chave, nProt=f"2{uf}{next(numeros):013d}")
+        return (
+            f"<retEnvEvento>{_resultado('128')}<retEvento><infEvento>{evento}</infEvento></retEvento></retEnvEvento>"
+        )
+
+    def _consultar(mensagem: ElementTree.Element) -> str:
+        chave = mensagem.findtext(".//{*}chNFe") or ""
+        situacao = documentos.get(chave, "217")
+        return f"<retConsSitNFe>{_resultado(situacao, chNFe=chave)}</retConsSitNFe>"
+
+    servicos = {"enviNFe": _autorizar, "envEvento": _cancelar, "consSitNFe": _consultar}
+
+    @app.post("/{caminho:path}")
+    async def web_service(caminho: str, request: Request) -> Response:
+        stats.requests += 1
+        stats.in_flight += 1
+        stats.max_in_flight = max(stats.max_in_flight, stats.in_flight)
+        try:
+            espera = config.latency_ms + (rng.uniform(-1, 1) * config.jitter_ms if config.jitter_ms else 0)
+            await asyncio.sleep(max(espera, 0) / 1000)
+            if config.outage:
+                stats.unavailable += 1
+                return Response("Service Unavailable", status_code=503)
+            if config.http_status is not None:
+                return Response("Erro HTTP simulado", status_code=config.http_status)
+            if config.suspended:
+                stats.unavailable += 1
+                corpo = f"<retEnviNFe>{_resultado('108')}</retEnviNFe>"
+            else:
+                dados = ElementTree.fromstring(await request.body()).find(".//{*}nfeDadosMsg")
+                mensagem = dados[0] if dados is not None and len(dados) else None
+                servico = servicos.get(mensagem.tag.rsplit("}", 1)[-1]) if mensagem is not None else None
+                if servico is None:
+                    return Response("Mensagem desconhecida", status_code=400)
+                corpo = servico(mensagem)
+            return Response(_envelope(corpo), media_type="application/soap+xml; charset=utf-8")
+        finally:
+            stats.in_flight -= 1
+
+    @app.get("/controle")
+    async def estado() -> dict:
+        return {"config": asdict(config), "stats": asdict(stats), "documents": len(documentos)}
+
+    @app.put("/controle")
+    async def alterar(alteracoes: dict) -> dict:
+        for nome, valor in alteracoes.items():
+            if hasattr(config, nome):
+                setattr(config, nome, valor)
+        return {"config": asdict(config), "stats": asdict(stats), "documents": len(documentos)}
+
+    app.state.config = config
+    app.state.stats = stats
+    return app
@@ -1,11 +1,10 @@
-import traceback
+from contextlib import asynccontextmanager
 
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.responses import JSONResponse
 from jose import JWTError, jwt
-from sqlalchemy import select
-from sqlalchemy.ext.asyncio import AsyncSession
 from starlette.requests import Request
 
 from app.api.routes import (
@@ -17,18 +16,68 @@ from app.api.routes import (
     impressoras,
     pagamentos,
     produtos,
+    promocoes,
     relatorios,
+    tarefas,
     vendas,
 )
 from app.core.config import get_settings
 from app.core.logging import setup_logging
+from app.core.security import password_hasher
+from app.db.replica import read_router
 from app.db.session import AsyncSessionLocal
-from app.models.error_log import ErrorLog
-from app.models.user import User
+from app.services.audit import audit_writer
+from app.services.cart_store import cart_store
+from app.services.catalog_snapshot import catalog_snapshot
+from app.services.error_sink import error_sink
+from app.services.fiscal import fiscal_service
+from app.services.fiscal_contingency import contingency_retransmitter
+from app.services import job_tasks  # registra as tarefas do job_runner
+from app.services.jobs import job_runner
+from app.services.outbox import outbox_dispatcher
+from app.services.pricing import pricing_engine
+from app.services.product_lookup import product_lookup
 
 settings = get_settings()
 logger = setup_logging(settings)
-app = FastAPI(title=settings.app_name, debug=settings.debug, version="0.1.0")
+
+
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    if audit_writer.enabled:
+        audit_writer.start(AsyncSessionLocal)
+    error_sink.start(AsyncSessionLocal)
+    if cart_store.enabled:
+        recuperados = await cart_store.recover(AsyncSessionLocal)
+        if recuperados:
+            logger.warning("%s carrinhos recuperados do journal", recuperados)
+        cart_store.start(AsyncSessionLocal)
+    catalog_snapshot.start(AsyncSessionLocal)
+    product_lookup.start(AsyncSessionLocal)
+    pricing_engine.start(AsyncSessionLocal)
+    if outbox_dispatcher.enabled:
+        outbox_dispatcher.start(AsyncSessionLocal)
+    if job_runner.enabled:
+        job_runner.start(AsyncSessionLocal)
+    if contingency_retransmitter.enabled:
+        contingency_retransmitter.start(AsyncSessionLocal)
+    yield
+    await contingency_retransmitter.stop()
+    await job_runner.stop()
+    await outbox_dispatcher.stop()
+    await fiscal_service.aclose()
+    await pricing_engine.stop()
+    await product_lookup.stop()
+    await catalog_snapshot.stop()
+    if cart_store.enabled:
+        await cart_store.stop(AsyncSessionLocal)
+    await audit_writer.stop()
+    await error_sink.stop(AsyncSessionLocal)
+    password_hasher.shutdown()
+    await read_router.dispose()
+
+
+app = FastAPI(title=settings.app_name, debug=settings.debug, version="0.1.0", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -38,9 +87,26 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+SEM_COMPRESSAO = {"/api/produtos/snapshot"}
+
+
+class _GZipMiddleware(GZipMiddleware):
+    """Não recompacta o snapshot do catálogo, já gravado em gzip e servido por intervalos."""
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] == "http" and scope["path"] in SEM_COMPRESSAO:
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
+
+
+# A carga inicial do catálogo nos terminais chega a dezenas de milhares de produtos.
+app.add_middleware(_GZipMiddleware, minimum_size=1024)
+
 app.include_router(health.router, prefix="/api")
 app.include_router(auth.router, prefix="/api")
 app.include_router(produtos.router, prefix="/api")
+app.include_router(promocoes.router, prefix="/api")
 app.include_router(vendas.router, prefix="/api")
 app.include_router(estoque.router, prefix="/api")
 app.include_router(financeiro.router, prefix="/api")
@@ -48,6 +114,7 @@ app.include_router(pagamentos.router, prefix="/api")
 app.include_router(fiscal.router, prefix="/api")
 app.include_router(relatorios.router, prefix="/api")
 app.include_router(impressoras.router, prefix="/api")
+app.include_router(tarefas.router, prefix="/api")
 
 
 @app.get("/", tags=["root"])
@@ -55,7 +122,7 @@ async def root():
     return {"message": "PDV API up"}
 
 
-async def _extract_user_id(session: AsyncSession, request: Request) -> int | None:
+def _extract_subject(request: Request) -> str | None:
     auth_header = request.headers.get("Authorization")
     if not auth_header or not auth_header.lower().startswith("bearer "):
         return None
@@ -65,33 +132,18 @@ async def _extract_user_id(session: AsyncSession, request: Request) -> int | Non
         payload = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
     except JWTError:
         return None
+    return payload.get("sub")
 
-    email = payload.get("sub")
-    if not email:
-        return None
 
-    result = await session.execute(select(User.id).where(User.email == email))
-    return result.scalar_one_or_none()
-
-
-async def _persist_error_log(
-    request: Request, status_code: int | None = None, exc: Exception | None = None
-) -> None:
-    async with AsyncSessionLocal() as session:
-        user_id = await _extract_user_id(session, request)
-        details = traceback.format_exc() if exc else None
-        message = str(exc) if exc else "Erro durante processamento da requisição"
-        log = ErrorLog(
-            level="ERROR" if (status_code or 0) >= 500 else "WARNING",
-            message=message,
-            details=details,
-            path=str(request.url.path),
-            method=request.method,
-            status_code=status_code,
-            user_id=user_id,
-        )
-        session.add(log)
-        await session.commit()
+def _record_error(request: Request, status_code: int | None = None, exc: Exception | None = None) -> None:
+    route = request.scope.get("route")
+    error_sink.record(
+        path=getattr(route, "path", None) or str(request.url.path),
+        method=request.method,
+        status_code=status_code,
+        exc=exc,
+        subject=_extract_subject(request),
+    )
 
 
 @app.middleware("http")
@@ -100,14 +152,14 @@ async def error_logging_middleware(request: Request, call_next):
         response = await call_next(request)
         if response.status_code >= 500:
             logger.error("Erro interno na requisição %s", request.url.path)
-            await _persist_error_log(request, status_code=response.status_code)
+            _record_error(request, status_code=response.status_code)
         return response
     except HTTPException as exc:
         if exc.status_code >= 500:
             logger.exception("HTTPException capturada")
-            await _persist_error_log(request, status_code=exc.status_code, exc=exc)
+            _record_error(request, status_code=exc.status_code, exc=exc)
         raise
     except Exception as exc:  # pylint: disable=broad-except
         logger.exception("Exceção não tratada")
-        await _persist_error_log(request, status_code=500, exc=exc)
+        _record_error(request, status_code=500, exc=exc)
         return JSONResponse(status_code=500, content={"detail": "Internal server error"})
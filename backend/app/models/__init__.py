@@ -1,10 +1,22 @@
 from .user import User, Role, Permission, user_roles, role_permissions
-from .product import Product, StockItem, StockLocation, StockMovement
+from .product import (
+    CatalogCounter,
+    Product,
+    ProductBarcode,
+    ProductTombstone,
+    StockItem,
+    StockLocation,
+    StockMovement,
+)
 from .audit import AuditLog
 from .cash import CashRegister
 from .error_log import ErrorLog
-from .fiscal import FiscalDocument, FiscalEvent
+from .fiscal import FiscalContingency, FiscalDocument, FiscalEvent
+from .job import Job
+from .outbox import OutboxMessage
+from .promotion import Promotion, PromotionProduct
 from .refresh_token import RefreshToken
+from .rollup import SalesDailyFact, SalesDailyTotal, StockCheckpoint, StockMovementDaily
 from .sale import Sale, SaleItem, Payment, Customer
 from .supplier import Supplier
 
@@ -16,6 +28,9 @@ __all__ = [
     "role_permissions",
     "RefreshToken",
     "Product",
+    "ProductBarcode",
+    "ProductTombstone",
+    "CatalogCounter",
     "StockItem",
     "StockLocation",
     "StockMovement",
@@ -25,8 +40,17 @@ __all__ = [
     "SaleItem",
     "Payment",
     "Customer",
+    "Promotion",
+    "PromotionProduct",
     "AuditLog",
     "ErrorLog",
+    "FiscalContingency",
     "FiscalDocument",
     "FiscalEvent",
+    "OutboxMessage",
+    "Job",
+    "SalesDailyFact",
+    "SalesDailyTotal",
+    "StockCheckpoint",
+    "StockMovementDaily",
 ]
@@ -17,6 +17,9 @@ class ErrorLog(Base):
     method = Column(String, nullable=True)
     status_code = Column(Integer, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
+    fingerprint = Column(String(40), nullable=True, index=True)
+    occurrences = Column(Integer, nullable=False, default=1)
+    last_seen_at = Column(DateTime, nullable=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
 
     user = relationship("User")
@@ -1,5 +1,5 @@
 from datetime import datetime
-from sqlalchemy import Column, DateTime, ForeignKey, Integer, String
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer, String, Text
 from sqlalchemy.orm import relationship
 
 from app.db.base import Base
@@ -31,3 +31,39 @@ class FiscalEvent(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
 
     document = relationship("FiscalDocument", back_populates="events")
+
+
+class FiscalContingency(Base):
+    """NFC-e emitida em contingência offline, guardada até ser transmitida à SEFAZ.
+
+    `deadline` é o prazo legal de transmissão e ordena a fila. Quedas da SEFAZ só adiam
+    `next_attempt_at`; o documento termina `authorized`, `rejected` ou, após erros
+    inesperados repetidos, `failed`. `claim_token` identifica a reivindicação em curso: só
+    quem a detém grava o resultado. Com venda, a resposta fica em `outcome` e a linha em
+    `linking` até a NFC-e da venda (`document_id`) receber o protocolo.
+    """
+
+    __tablename__ = "fiscal_contingency"
+
+    id = Column(Integer, primary_key=True)
+    reference = Column(String(32), unique=True, nullable=False)
+    sale_id = Column(Integer, nullable=True)
+    uf = Column(String(2), nullable=True)
+    xml = Column(Text, nullable=False)
+    reason = Column(String, nullable=True)
+    status = Column(String(16), nullable=False, default="pending")
+    attempts = Column(Integer, nullable=False, default=0)
+    deadline = Column(DateTime, nullable=False)
+    next_attempt_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    locked_until = Column(DateTime, nullable=True)
+    claim_token = Column(String(32), nullable=True)
+    outcome = Column(String(16), nullable=True)
+    document_id = Column(Integer, nullable=True)
+    code = Column(String(8), nullable=True)
+    message = Column(String, nullable=True)
+    protocol = Column(String, nullable=True)
+    access_key = Column(String, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    sent_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (Index("ix_fiscal_contingency_status_deadline", "status", "deadline"),)
@@ -0,0 +1,38 @@
+from datetime import datetime
+from sqlalchemy import Column, DateTime, Float, Index, Integer, JSON, String
+
+from app.db.base import Base
+
+
+class Job(Base):
+    """Tarefa em segundo plano: `queued` → `running` → `done`, ou `dead` ao esgotar as tentativas.
+
+    Uma tarefa `running` cujo `locked_until` venceu pertence a um worker que caiu e volta a
+    ser reivindicada. `dedupe_key` impede que a mesma execução agendada entre duas vezes.
+    """
+
+    __tablename__ = "jobs"
+
+    id = Column(Integer, primary_key=True)
+    queue = Column(String(32), nullable=False, default="default")
+    task = Column(String(64), nullable=False)
+    payload = Column(JSON, nullable=True)
+    priority = Column(Integer, nullable=False, default=0)
+    status = Column(String(16), nullable=False, default="queued")
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=5)
+    run_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    locked_until = Column(DateTime, nullable=True)
+    worker = Column(String(64), nullable=True)
+    dedupe_key = Column(String(128), unique=True, nullable=True)
+    result = Column(JSON, nullable=True)
+    last_error = Column(String, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    duration_ms = Column(Float, nullable=True)
+
+    __table_args__ = (
+        Index("ix_jobs_queue_status_priority_run_at", "queue", "status", "priority", "run_at"),
+        Index("ix_jobs_status_finished_at", "status", "finished_at"),
+    )
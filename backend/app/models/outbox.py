@@ -0,0 +1,26 @@
+from datetime import datetime
+from sqlalchemy import Column, DateTime, Index, Integer, JSON, String
+
+from app.db.base import Base
+
+
+class OutboxMessage(Base):
+    """Efeito de uma operação, gravado na mesma transação e despachado depois do commit.
+
+    `available_at` é o próximo momento em que a mensagem pode ser reivindicada: avança pelo
+    prazo de posse ao ser reivindicada e pelo intervalo de espera após uma falha. Mensagens
+    despachadas são removidas; as que esgotam as tentativas ficam com `status = "failed"`.
+    """
+
+    __tablename__ = "outbox"
+
+    id = Column(Integer, primary_key=True)
+    topic = Column(String(32), nullable=False)
+    payload = Column(JSON, nullable=False)
+    status = Column(String(16), nullable=False, default="pending")
+    attempts = Column(Integer, nullable=False, default=0)
+    available_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    last_error = Column(String, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (Index("ix_outbox_status_available_at", "status", "available_at"),)
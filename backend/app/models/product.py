@@ -1,5 +1,5 @@
 from datetime import datetime
-from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Integer, Numeric, String
+from sqlalchemy import BigInteger, Boolean, Column, DateTime, ForeignKey, Index, Integer, Numeric, String
 from sqlalchemy.orm import relationship
 
 from app.db.base import Base
@@ -15,10 +15,52 @@ class Product(Base):
     price = Column(Numeric(10, 2), nullable=False)
     cost = Column(Numeric(10, 2), nullable=False, default=0)
     is_active = Column(Boolean, default=True)
+    # Código da balança: etiquetas EAN-13 de prefixo 2 embutem o PLU com peso ou preço.
+    plu = Column(Integer, unique=True, index=True, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Atribuído a cada alteração pelo contador do catálogo (ver app.services.catalog_sync).
+    change_seq = Column(BigInteger, nullable=False, default=1)
 
     stock_items = relationship("StockItem", back_populates="product")
     sale_items = relationship("SaleItem", back_populates="product")
+    barcodes = relationship("ProductBarcode", back_populates="product", cascade="all, delete-orphan")
+
+    __table_args__ = (Index("ix_products_change_seq_id", "change_seq", "id"),)
+
+
+class ProductBarcode(Base):
+    """Código de barras (GTIN) do produto; `pack_quantity` > 1 identifica embalagens fechadas."""
+
+    __tablename__ = "barcodes"
+
+    id = Column(Integer, primary_key=True)
+    code = Column(String(64), unique=True, index=True, nullable=False)
+    product_id = Column(Integer, ForeignKey("products.id", ondelete="CASCADE"), nullable=False, index=True)
+    pack_quantity = Column(Numeric(10, 3), nullable=False, default=1)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    product = relationship("Product", back_populates="barcodes")
+
+
+class CatalogCounter(Base):
+    """Contador de alterações do catálogo; a linha fica bloqueada até o commit de quem a incrementa."""
+
+    __tablename__ = "catalog_counters"
+
+    name = Column(String(32), primary_key=True)
+    value = Column(BigInteger, nullable=False, default=0)
+
+
+class ProductTombstone(Base):
+    """Registro de produto excluído, mantido para a sincronização incremental dos terminais."""
+
+    __tablename__ = "product_tombstones"
+
+    product_id = Column(Integer, primary_key=True, autoincrement=False)
+    sku = Column(String, nullable=False)
+    change_seq = Column(BigInteger, nullable=False, index=True)
+    deleted_at = Column(DateTime, default=datetime.utcnow)
 
 
 class StockLocation(Base):
@@ -44,6 +86,9 @@ class StockItem(Base):
     location = relationship("StockLocation", back_populates="items")
     movements = relationship("StockMovement", back_populates="stock_item")
 
+    # Mesma ordem do bloqueio em apply_stock_deltas.
+    __table_args__ = (Index("ix_stock_items_product_id_id", "product_id", "id"),)
+
 
 class StockMovement(Base):
     __tablename__ = "stock_movements"
@@ -62,3 +107,13 @@ class StockMovement(Base):
     supplier = relationship("Supplier", back_populates="stock_movements")
     sale_item = relationship("SaleItem", back_populates="stock_movements")
     created_by = relationship("User")
+
+    __table_args__ = (
+        Index("ix_stock_movements_stock_item_created_at", "stock_item_id", "created_at"),
+        Index(
+            "ix_stock_movements_sale_item_id",
+            "sale_item_id",
+            postgresql_where=sale_item_id.isnot(None),
+            sqlite_where=sale_item_id.isnot(None),
+        ),
+    )
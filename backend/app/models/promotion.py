@@ -0,0 +1,48 @@
+from datetime import datetime
+from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Integer, Numeric, String, Time
+from sqlalchemy.orm import relationship
+
+from app.db.base import Base
+
+
+class Promotion(Base):
+    """Regra de preço avaliada no carrinho (ver app.services.pricing).
+
+    `kind`: `tier` (desconto percentual a partir de `min_quantity`), `buy_get` (leve
+    `min_quantity` + `get_quantity` e ganhe `percent_off` nos mais baratos), `mix_match`
+    (`min_quantity` itens do grupo por `bundle_price`) e `price_list` (preço por produto,
+    em geral restrito a um cliente).
+    """
+
+    __tablename__ = "promotions"
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String, nullable=False)
+    kind = Column(String(16), nullable=False)
+    is_active = Column(Boolean, nullable=False, default=True)
+    customer_id = Column(Integer, ForeignKey("customers.id", ondelete="CASCADE"), nullable=True, index=True)
+    starts_at = Column(DateTime, nullable=True)
+    ends_at = Column(DateTime, nullable=True)
+    # Janela diária e dias da semana (0 = segunda), no horário local do servidor.
+    daily_start = Column(Time, nullable=True)
+    daily_end = Column(Time, nullable=True)
+    weekdays = Column(String(7), nullable=True)
+    min_quantity = Column(Numeric(12, 3), nullable=False, default=1)
+    get_quantity = Column(Numeric(12, 3), nullable=False, default=0)
+    percent_off = Column(Numeric(5, 2), nullable=False, default=0)
+    bundle_price = Column(Numeric(12, 2), nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    products = relationship("PromotionProduct", back_populates="promotion", cascade="all, delete-orphan")
+
+
+class PromotionProduct(Base):
+    __tablename__ = "promotion_products"
+
+    promotion_id = Column(Integer, ForeignKey("promotions.id", ondelete="CASCADE"), primary_key=True)
+    product_id = Column(Integer, ForeignKey("products.id", ondelete="CASCADE"), primary_key=True, index=True)
+    # Preço do produto na lista (`price_list`); nulo nos demais tipos.
+    price = Column(Numeric(10, 2), nullable=True)
+
+    promotion = relationship("Promotion", back_populates="products")
@@ -0,0 +1,49 @@
+from sqlalchemy import Column, Date, ForeignKey, Integer, Numeric
+
+from app.db.base import Base
+
+
+class SalesDailyFact(Base):
+    """Vendas concluídas agregadas por dia, produto e caixa (0 = sem caixa)."""
+
+    __tablename__ = "sales_daily_facts"
+
+    day = Column(Date, primary_key=True)
+    product_id = Column(Integer, ForeignKey("products.id"), primary_key=True)
+    cash_register_id = Column(Integer, primary_key=True, default=0)
+    quantity = Column(Numeric(14, 3), nullable=False, default=0)
+    revenue = Column(Numeric(14, 2), nullable=False, default=0)
+
+
+class SalesDailyTotal(Base):
+    """Totais de cabeçalho (quantidade de vendas, descontos) por dia e caixa."""
+
+    __tablename__ = "sales_daily_totals"
+
+    day = Column(Date, primary_key=True)
+    cash_register_id = Column(Integer, primary_key=True, default=0)
+    sale_count = Column(Integer, nullable=False, default=0)
+    gross = Column(Numeric(14, 2), nullable=False, default=0)
+    discount = Column(Numeric(14, 2), nullable=False, default=0)
+    total = Column(Numeric(14, 2), nullable=False, default=0)
+
+
+class StockMovementDaily(Base):
+    """Entradas e saídas de cada item de estoque agregadas por dia."""
+
+    __tablename__ = "stock_movement_daily"
+
+    day = Column(Date, primary_key=True)
+    stock_item_id = Column(Integer, ForeignKey("stock_items.id"), primary_key=True)
+    entries = Column(Numeric(14, 3), nullable=False, default=0)
+    exits = Column(Numeric(14, 3), nullable=False, default=0)
+
+
+class StockCheckpoint(Base):
+    """Saldo de um item de estoque ao final do dia `as_of`."""
+
+    __tablename__ = "stock_checkpoints"
+
+    stock_item_id = Column(Integer, ForeignKey("stock_items.id"), primary_key=True)
+    as_of = Column(Date, primary_key=True)
+    quantity = Column(Numeric(14, 3), nullable=False)
@@ -1,5 +1,5 @@
 from datetime import datetime
-from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Integer, Numeric, String
+from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Index, Integer, Numeric, String, false
 from sqlalchemy.orm import relationship
 
 from app.db.base import Base
@@ -23,6 +23,14 @@ class Sale(Base):
     fiscal_documents = relationship("FiscalDocument", back_populates="sale")
     cash_register = relationship("CashRegister", back_populates="sales")
 
+    __table_args__ = (
+        Index("ix_sales_created_at_id", "created_at", "id"),
+        Index("ix_sales_status_created_at_id", "status", "created_at", "id"),
+        Index("ix_sales_cash_register_created_at_id", "cash_register_id", "created_at", "id"),
+        Index("ix_sales_cashier_created_at_id", "cashier_id", "created_at", "id"),
+        Index("ix_sales_customer_created_at_id", "customer_id", "created_at", "id"),
+    )
+
 
 class SaleItem(Base):
     __tablename__ = "sale_items"
@@ -32,12 +40,20 @@ class SaleItem(Base):
     product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
     quantity = Column(Numeric(12, 3), nullable=False)
     unit_price = Column(Numeric(12, 2), nullable=False)
+    # Desconto de promoção já abatido de `total_price` (ver app.services.pricing).
+    discount = Column(Numeric(12, 2), nullable=False, default=0)
+    promotion_id = Column(Integer, ForeignKey("promotions.id", ondelete="SET NULL"), nullable=True)
     total_price = Column(Numeric(12, 2), nullable=False)
 
     sale = relationship("Sale", back_populates="items")
     product = relationship("Product", back_populates="sale_items")
     stock_movements = relationship("StockMovement", back_populates="sale_item")
 
+    __table_args__ = (
+        Index("ix_sale_items_sale_id", "sale_id"),
+        Index("ix_sale_items_product_id", "product_id"),
+    )
+
 
 class Customer(Base):
     __tablename__ = "customers"
@@ -65,3 +81,19 @@ class Payment(Base):
 
     sale = relationship("Sale", back_populates="payments")
     cash_register = relationship("CashRegister", back_populates="payments")
+
+    __table_args__ = (
+        Index("ix_payments_sale_id", "sale_id"),
+        Index(
+            "ix_payments_transaction_code",
+            "transaction_code",
+            postgresql_where=transaction_code.isnot(None),
+            sqlite_where=transaction_code.isnot(None),
+        ),
+        Index(
+            "ix_payments_unpaid_sale_id",
+            "sale_id",
+            postgresql_where=paid == false(),
+            sqlite_where=paid == false(),
+        ),
+    )
@@ -41,14 +41,17 @@ class InvoiceItem(BaseModel):
     csosn: Optional[str] = None
 
 
-class InvoiceRequest(BaseModel):
-    sale_id: int
+class InvoiceOptions(BaseModel):
     items: list[InvoiceItem]
     environment: str = Field("homologacao", description="producao ou homologacao")
     use_contingency: bool = False
     contingency_reason: Optional[str] = None
 
 
+class InvoiceRequest(InvoiceOptions):
+    sale_id: int
+
+
 class InvoiceResponse(BaseModel):
     success: bool
     message: str
@@ -74,3 +77,7 @@ class ContingencyStatus(BaseModel):
     reference: str
     queued_at: datetime
     reason: Optional[str]
+    deadline: Optional[datetime] = None
+    status: str = "pending"
+    attempts: int = 0
+    message: Optional[str] = None
@@ -0,0 +1,32 @@
+from datetime import datetime
+from typing import Optional
+from pydantic import BaseModel, ConfigDict, Field
+
+
+class JobCreate(BaseModel):
+    task: str
+    payload: dict = Field(default_factory=dict)
+    queue: Optional[str] = Field(None, description="Padrão: a fila registrada para a tarefa")
+    priority: Optional[int] = Field(None, description="Maior primeiro")
+    run_at: Optional[datetime] = Field(None, description="Não executa antes deste horário (UTC)")
+
+
+class Job(BaseModel):
+    id: int
+    queue: str
+    task: str
+    payload: Optional[dict] = None
+    priority: int
+    status: str
+    attempts: int
+    max_attempts: int
+    run_at: datetime
+    worker: Optional[str] = None
+    result: Optional[dict] = None
+    last_error: Optional[str] = None
+    created_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    duration_ms: Optional[float] = None
+
+    model_config = ConfigDict(from_attributes=True)
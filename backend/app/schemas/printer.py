@@ -1,3 +1,5 @@
+from typing import Optional
+
 from pydantic import BaseModel, Field
 
 
@@ -22,3 +24,4 @@ class PrintJobResult(BaseModel):
     sale_id: int
     printer: PrinterConfig
     receipt_preview: str
+    job_id: Optional[int] = None
@@ -1,6 +1,6 @@
 from datetime import datetime
 from typing import Optional
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 
 class ProductBase(BaseModel):
@@ -10,20 +10,72 @@ class ProductBase(BaseModel):
     price: float
     cost: float
     is_active: bool = True
+    plu: Optional[int] = Field(None, ge=0, description="Código do produto na balança")
 
 
 class ProductCreate(ProductBase):
     pass
 
 
+class ProductUpdate(BaseModel):
+    sku: Optional[str] = None
+    name: Optional[str] = None
+    description: Optional[str] = None
+    price: Optional[float] = None
+    cost: Optional[float] = None
+    is_active: Optional[bool] = None
+    plu: Optional[int] = Field(None, ge=0)
+
+
 class Product(ProductBase):
     id: int
     created_at: datetime
+    updated_at: Optional[datetime] = None
+
+    class Config:
+        orm_mode = True
+
+
+class BarcodeCreate(BaseModel):
+    code: str = Field(..., min_length=1, max_length=64)
+    pack_quantity: float = Field(1, gt=0, description="Unidades vendidas a cada leitura do código")
+
+
+class Barcode(BarcodeCreate):
+    id: int
+    product_id: int
 
     class Config:
         orm_mode = True
 
 
+class ProductWithBarcodes(Product):
+    barcodes: list[Barcode] = []
+
+
+class ProductLookup(BaseModel):
+    product_id: int
+    sku: str
+    name: str
+    price: float
+    is_active: bool
+
+
+class ProductScan(ProductLookup):
+    code: str
+    quantity: float = Field(description="Unidades (ou quilos) correspondentes ao código lido")
+    unit_price: float
+    total: float
+    on_hand: float
+
+
+class ProductSyncPage(BaseModel):
+    changes: list[ProductWithBarcodes]
+    deleted: list[int]
+    cursor: int
+    has_more: bool
+
+
 class StockItem(BaseModel):
     id: int
     product_id: int
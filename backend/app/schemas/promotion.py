@@ -0,0 +1,52 @@
+from datetime import datetime, time
+from typing import List, Literal, Optional
+from pydantic import BaseModel, ConfigDict, Field, model_validator
+
+
+class PromotionProduct(BaseModel):
+    product_id: int
+    price: Optional[float] = Field(None, ge=0, description="Preço do produto na lista de preços")
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class PromotionBase(BaseModel):
+    name: str
+    kind: Literal["tier", "buy_get", "mix_match", "price_list"]
+    is_active: bool = True
+    customer_id: Optional[int] = None
+    starts_at: Optional[datetime] = None
+    ends_at: Optional[datetime] = None
+    daily_start: Optional[time] = None
+    daily_end: Optional[time] = None
+    weekdays: Optional[str] = Field(None, pattern="^[0-6]{1,7}$", description="Dias da semana, 0 = segunda")
+    min_quantity: float = Field(1, gt=0)
+    get_quantity: float = Field(0, ge=0)
+    percent_off: float = Field(0, ge=0, le=100)
+    bundle_price: Optional[float] = Field(None, ge=0)
+    products: List[PromotionProduct] = Field(..., min_length=1)
+
+    @model_validator(mode="after")
+    def _valida_tipo(self) -> "PromotionBase":
+        if (self.daily_start is None) != (self.daily_end is None):
+            raise ValueError("Informe o início e o fim da janela diária")
+        if self.kind in {"tier", "buy_get"} and self.percent_off <= 0:
+            raise ValueError("Informe percent_off")
+        if self.kind == "buy_get" and self.get_quantity < 1:
+            raise ValueError("Informe get_quantity")
+        if self.kind == "mix_match" and (self.bundle_price is None or self.min_quantity < 2):
+            raise ValueError("Informe bundle_price e min_quantity de ao menos 2 itens")
+        if self.kind == "price_list" and any(item.price is None for item in self.products):
+            raise ValueError("Informe o preço de cada produto da lista")
+        return self
+
+
+class PromotionCreate(PromotionBase):
+    pass
+
+
+class Promotion(PromotionBase):
+    id: int
+    updated_at: Optional[datetime] = None
+
+    model_config = ConfigDict(from_attributes=True)
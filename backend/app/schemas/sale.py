@@ -1,6 +1,9 @@
 from datetime import datetime
 from typing import List, Optional
-from pydantic import BaseModel, ConfigDict
+from pydantic import BaseModel, ConfigDict, Field, model_validator
+
+from app.schemas.fiscal import InvoiceOptions
+from app.schemas.printer import PrinterConfig
 
 
 class SaleItemBase(BaseModel):
@@ -11,6 +14,8 @@ class SaleItemBase(BaseModel):
 
 class SaleItem(SaleItemBase):
     id: int
+    discount: float = 0
+    promotion_id: Optional[int] = None
     total_price: float
 
     model_config = ConfigDict(from_attributes=True)
@@ -39,22 +44,79 @@ class SaleCreate(SaleBase):
     payments: List[PaymentBase]
 
 
+class SaleBatchEntry(SaleCreate):
+    code: Optional[str] = Field(
+        None, description="Código gerado pelo terminal; reenvios com o mesmo código são ignorados"
+    )
+    created_at: Optional[datetime] = None
+    cash_register_id: Optional[int] = None
+
+
+class SaleBatchCreate(BaseModel):
+    sales: List[SaleBatchEntry] = Field(..., min_length=1, max_length=1000)
+
+
+class SaleBatchItemResult(BaseModel):
+    index: int
+    code: Optional[str] = None
+    status: str
+    sale_id: Optional[int] = None
+    detail: Optional[str] = None
+
+
+class SaleBatchResult(BaseModel):
+    created: int
+    duplicates: int
+    rejected: int
+    results: List[SaleBatchItemResult]
+
+
 class SaleStart(SaleBase):
     cash_register_id: Optional[int] = None
 
 
-class SaleAddItem(BaseModel):
-    sale_id: int
-    product_id: int
-    quantity: float
+class SaleScanLine(BaseModel):
+    product_id: Optional[int] = None
+    barcode: Optional[str] = Field(None, description="Código de barras, SKU ou etiqueta de balança")
+    quantity: float = 1
     unit_price: Optional[float] = None
 
+    @model_validator(mode="after")
+    def _exige_identificador(self) -> "SaleScanLine":
+        if (self.product_id is None) == (self.barcode is None):
+            raise ValueError("Informe product_id ou barcode")
+        return self
+
+
+class SaleAddItem(SaleScanLine):
+    sale_id: int
+
+
+class SaleAddItems(BaseModel):
+    sale_id: int
+    lines: List[SaleScanLine] = Field(..., min_length=1, max_length=500)
+
+
+class SaleItemsDelta(BaseModel):
+    sale_id: int
+    items: List[SaleItem]
+    subtotal: float
+    discount: float
+    total: float
+
+
+class SaleRemoveItem(BaseModel):
+    sale_id: int
+    item_id: int
+
 
 class SaleFinalize(BaseModel):
     sale_id: int
     payments: List[PaymentBase]
     discount: float = 0
     cash_register_id: Optional[int] = None
+    invoice: Optional[InvoiceOptions] = Field(None, description="Emite a NFC-e depois do commit")
+    printer: Optional[PrinterConfig] = Field(None, description="Imprime o cupom depois do commit")
 
 
 class SaleCancel(BaseModel):
@@ -75,6 +137,23 @@ class Sale(SaleBase):
     model_config = ConfigDict(from_attributes=True)
 
 
+class SaleSummary(SaleBase):
+    id: int
+    code: str
+    status: str
+    total: float
+    created_at: datetime
+    cashier_id: Optional[int] = None
+    cash_register_id: Optional[int] = None
+    items: Optional[List[SaleItem]] = None
+    payments: Optional[List[Payment]] = None
+
+
+class SalePage(BaseModel):
+    data: List[SaleSummary]
+    next_cursor: Optional[str] = None
+
+
 class SaleWorkflowResult(BaseModel):
     sale: Sale
     receipt: Optional[str] = None
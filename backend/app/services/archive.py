@@ -0,0 +1,287 @@
+import gzip
+import json
+import os
+import re
+from datetime import date, datetime
+from decimal import Decimal
+from pathlib import Path
+from typing import Iterator
+
+from sqlalchemy import delete, func, select, text, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from app.core.config import get_settings
+from app.db.base import Base
+from app.models.fiscal import FiscalDocument, FiscalEvent
+from app.models.product import StockMovement
+from app.models.sale import Payment, Sale, SaleItem
+from app.services.partitions import (
+    PARTITIONED_TABLES,
+    add_months,
+    default_partition_start,
+    detach_partition,
+    ensure_partitions,
+    is_partitioned,
+    month_start,
+)
+
+ARCHIVED_TABLES = ("sales", "stock_movements", "audit_logs")
+LOTE = 2000
+_MES = re.compile(r"^\d{4}-\d{2}$")
+
+
+def _json_default(value):
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Tipo não serializável: {type(value).__name__}")
+
+
+def archive_dir() -> Path:
+    return Path(get_settings().archive_dir)
+
+
+def archive_path(table: str, month: date) -> Path:
+    return archive_dir() / table / f"{month:%Y-%m}.ndjson.gz"
+
+
+def list_archives() -> dict[str, list[str]]:
+    return {
+        table: sorted({path.name.split(".")[0] for path in (archive_dir() / table).glob("*.ndjson.gz")})
+        for table in ARCHIVED_TABLES
+    }
+
+
+class _ArchiveWriter:
+    """Grava o NDJSON compactado em um arquivo temporário e só o publica ao final."""
+
+    def __init__(self, table: str, month: date) -> None:
+        destino = archive_path(table, month)
+        destino.parent.mkdir(parents=True, exist_ok=True)
+        # Uma nova execução para o mesmo mês gera outro membro, lido junto com o primeiro.
+        sufixo = 0
+        while destino.exists():
+            sufixo += 1
+            destino = destino.with_name(f"{month:%Y-%m}.{sufixo}.ndjson.gz")
+        self.path = destino
+        self._tmp = destino.with_suffix(".tmp")
+        self._file = gzip.open(self._tmp, "wt", encoding="utf-8")
+        self.rows = 0
+
+    def write(self, row: dict) -> None:
+        self._file.write(json.dumps(row, default=_json_default, ensure_ascii=False))
+        self._file.write("\n")
+        self.rows += 1
+
+    def discard(self) -> None:
+        self._file.close()
+        self._tmp.unlink(missing_ok=True)
+
+    def publish(self) -> Path | None:
+        self._file.close()
+        if not self.rows:
+            self._tmp.unlink()
+            return None
+        with open(self._tmp, "rb") as handle:
+            os.fsync(handle.fileno())
+        os.replace(self._tmp, self.path)
+        return self.path
+
+
+def read_archive(
+    table: str, month: str, filters: dict[str, str] | None = None, limit: int = 500
+) -> Iterator[dict]:
+    """Lê sob demanda as linhas arquivadas de um mês, filtrando por igualdade de campos."""
+
+    if table not in ARCHIVED_TABLES or not _MES.match(month):
+        raise ValueError("Arquivo inválido")
+    filters = filters or {}
+    vistos: set = set()
+    for path in sorted((archive_dir() / table).glob(f"{month}*.ndjson.gz")):
+        with gzip.open(path, "rt", encoding="utf-8") as handle:
+            for line in handle:
+                row = json.loads(line)
+                if row.get("id") in vistos:
+                    continue
+                if all(str(row.get(campo)) == valor for campo, valor in filters.items()):
+                    vistos.add(row.get("id"))
+                    yield row
+                    if len(vistos) >= limit:
+                        return
+
+
+async def _exportar_tabela(
+    session: AsyncSession,
+    table: str,
+    source: str,
+    writer: _ArchiveWriter,
+    periodo: tuple[datetime, datetime] | None = None,
+) -> None:
+    colunas = ", ".join(column.name for column in Base.metadata.tables[table].columns)
+    filtro = "AND created_at >= :inicio AND created_at < :fim" if periodo else ""
+    inicio, fim = periodo or (None, None)
+    ultimo = 0
+    while True:
+        result = await session.execute(
+            text(f"SELECT {colunas} FROM {source} WHERE id > :ultimo {filtro} ORDER BY id LIMIT {LOTE}"),
+            {"ultimo": ultimo, "inicio": inicio, "fim": fim},
+        )
+        rows = result.mappings().all()
+        if not rows:
+            return
+        for row in rows:
+            writer.write(dict(row))
+        ultimo = rows[-1]["id"]
+
+
+def _periodo(month: date) -> tuple[datetime, datetime]:
+    return datetime.combine(month, datetime.min.time()), datetime.combine(add_months(month, 1), datetime.min.time())
+
+
+async def archive_table_month(session: AsyncSession, table: str, month: date) -> int:
+    """Arquiva um mês de audit_logs ou stock_movements: desanexa a partição ou exclui as linhas."""
+
+    writer = _ArchiveWriter(table, month)
+    try:
+        if await is_partitioned(session, table):
+            partition = await detach_partition(session, table, month)
+            if partition is not None:
+                await _exportar_tabela(session, table, partition, writer)
+                await session.execute(text(f"DROP TABLE {partition}"))
+        else:
+            await _exportar_tabela(session, table, table, writer, _periodo(month))
+    except BaseException:
+        writer.discard()
+        raise
+    writer.publish()
+    if not await is_partitioned(session, table):
+        inicio, fim = _periodo(month)
+        modelo = Base.metadata.tables[table]
+        await session.execute(delete(modelo).where(modelo.c.created_at >= inicio, modelo.c.created_at < fim))
+    await session.commit()
+    return writer.rows
+
+
+async def _exportar_vendas(
+    session: AsyncSession, writer: _ArchiveWriter, inicio: datetime, fim: datetime
+) -> list[int]:
+    sale_ids: list[int] = []
+    ultimo = 0
+    while True:
+        result = await session.execute(
+            select(Sale)
+            .options(
+                selectinload(Sale.items),
+                selectinload(Sale.payments),
+                selectinload(Sale.fiscal_documents).selectinload(FiscalDocument.events),
+            )
+            .where(
+                Sale.id > ultimo,
+                Sale.created_at >= inicio,
+                Sale.created_at < fim,
+                Sale.status.in_(["completed", "canceled"]),
+            )
+            .order_by(Sale.id)
+            .limit(LOTE)
+        )
+        sales = result.scalars().all()
+        if not sales:
+            return sale_ids
+        for sale in sales:
+            row = {column.name: getattr(sale, column.key) for column in Sale.__table__.columns}
+            row["items"] = [
+                {column.name: getattr(item, column.key) for column in SaleItem.__table__.columns}
+                for item in sale.items
+            ]
+            row["payments"] = [
+                {column.name: getattr(payment, column.key) for column in Payment.__table__.columns}
+                for payment in sale.payments
+            ]
+            row["fiscal_documents"] = [
+                {
+                    **{column.name: getattr(documento, column.key) for column in FiscalDocument.__table__.columns},
+                    "events": [
+                        {column.name: getattr(evento, column.key) for column in FiscalEvent.__table__.columns}
+                        for evento in documento.events
+                    ],
+                }
+                for documento in sale.fiscal_documents
+            ]
+            writer.write(row)
+            sale_ids.append(sale.id)
+        ultimo = sales[-1].id
+        session.expunge_all()
+
+
+async def archive_sales_month(session: AsyncSession, month: date) -> int:
+    """Arquiva vendas fechadas do mês com itens, pagamentos e documentos fiscais com seus eventos."""
+
+    inicio, fim = _periodo(month)
+    writer = _ArchiveWriter("sales", month)
+    try:
+        sale_ids = await _exportar_vendas(session, writer, inicio, fim)
+    except BaseException:
+        writer.discard()
+        raise
+    writer.publish()
+
+    for inicio_lote in range(0, len(sale_ids), LOTE):
+        lote = sale_ids[inicio_lote : inicio_lote + LOTE]
+        itens = select(SaleItem.id).where(SaleItem.sale_id.in_(lote))
+        # Os movimentos de estoque seguem o próprio calendário de arquivamento.
+        await session.execute(
+            update(StockMovement)
+            .where(StockMovement.sale_item_id.in_(itens))
+            .values(sale_item_id=None),
+            execution_options={"synchronize_session": False},
+        )
+        documentos = select(FiscalDocument.id).where(FiscalDocument.sale_id.in_(lote))
+        await session.execute(delete(FiscalEvent).where(FiscalEvent.document_id.in_(documentos)))
+        await session.execute(delete(FiscalDocument).where(FiscalDocument.sale_id.in_(lote)))
+        await session.execute(delete(Payment).where(Payment.sale_id.in_(lote)))
+        await session.execute(delete(SaleItem).where(SaleItem.sale_id.in_(lote)))
+        await session.execute(delete(Sale).where(Sale.id.in_(lote)))
+    await session.commit()
+    return len(sale_ids)
+
+
+async def _meses_a_arquivar(session: AsyncSession, table: str, limite: date) -> list[date]:
+    created_at = Base.metadata.tables[table].c.created_at
+    primeiro = (await session.execute(select(func.min(created_at)))).scalar_one_or_none()
+    meses = []
+    if primeiro is not None:
+        month = month_start(primeiro.date())
+        while month < limite:
+            meses.append(month)
+            month = add_months(month, 1)
+    return meses
+
+
+async def maintain_partitions(session: AsyncSession, months_ahead: int, retention_months: int) -> dict:
+    """Cria as partições dos próximos meses e arquiva os meses além da retenção.
+
+    Também cria as partições dos meses que caíram na DEFAULT, tirando as linhas de lá.
+    Devolve as partições criadas e as linhas arquivadas por tabela e mês.
+    """
+
+    hoje = month_start(date.today())
+    criadas: list[str] = []
+    for table in PARTITIONED_TABLES:
+        if await is_partitioned(session, table):
+            primeiro = min(hoje, await default_partition_start(session, table) or hoje)
+            criadas += await ensure_partitions(session, table, primeiro, add_months(hoje, months_ahead))
+            await session.commit()
+
+    arquivadas: dict[str, int] = {}
+    limite = add_months(hoje, -retention_months)
+    for table in ("sales",) + PARTITIONED_TABLES:
+        for month in await _meses_a_arquivar(session, table, limite):
+            if table == "sales":
+                linhas = await archive_sales_month(session, month)
+            else:
+                linhas = await archive_table_month(session, table, month)
+            if linhas:
+                arquivadas[f"{table} {month:%Y-%m}"] = linhas
+    return {"created": criadas, "archived": arquivadas}
@@ -1,9 +1,178 @@
+import asyncio
+import logging
+import time
+from datetime import datetime
 from typing import Any
 
+from sqlalchemy import insert
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
 
+from app.core.config import Settings, get_settings
 from app.models.audit import AuditLog
 from app.models.user import User
+from app.services import outbox
+
+logger = logging.getLogger("pdv")
+
+_FIM = object()
+
+
+class AuditWriter:
+    """Fila limitada de auditoria gravada em INSERTs multi-linha por tamanho ou tempo."""
+
+    def __init__(
+        self,
+        enabled: bool,
+        max_queue: int,
+        batch_size: int,
+        flush_seconds: float,
+        critical_actions: set[str],
+    ) -> None:
+        self.enabled = enabled
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.critical_actions = critical_actions
+        self._max_queue = max_queue
+        self._queue: asyncio.Queue | None = None
+        self._acordar = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self._session_factory: sessionmaker | None = None
+        self.enqueued = 0
+        self.written = 0
+        self.failed = 0
+        self.overflow = 0
+        self.batches = 0
+        self.flush_ms_total = 0.0
+        self.flush_ms_max = 0.0
+        self.last_flush_ms = 0.0
+
+    @classmethod
+    def from_settings(cls, settings: Settings) -> "AuditWriter":
+        return cls(
+            enabled=settings.audit_async_enabled,
+            max_queue=settings.audit_queue_size,
+            batch_size=settings.audit_batch_size,
+            flush_seconds=settings.audit_flush_seconds,
+            critical_actions=set(settings.audit_critical_actions),
+        )
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def is_critical(self, action: str) -> bool:
+        return action in self.critical_actions
+
+    def submit(self, row: dict, waiter: asyncio.Future | None = None) -> bool:
+        """Enfileira a linha; retorna False se a fila estiver cheia."""
+
+        try:
+            self._queue.put_nowait((row, waiter))
+        except asyncio.QueueFull:
+            self.overflow += 1
+            return False
+        self.enqueued += 1
+        if waiter is not None or self._queue.qsize() >= self.batch_size:
+            self._acordar.set()
+        return True
+
+    def metrics(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "running": self.running,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "queue_capacity": self._max_queue,
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "failed": self.failed,
+            "overflow": self.overflow,
+            "batches": self.batches,
+            "last_flush_ms": round(self.last_flush_ms, 3),
+            "avg_flush_ms": round(self.flush_ms_total / self.batches, 3) if self.batches else 0.0,
+            "max_flush_ms": round(self.flush_ms_max, 3),
+        }
+
+    async def _flush(self, batch: list[tuple[dict, asyncio.Future | None]]) -> None:
+        if not batch:
+            return
+        inicio = time.perf_counter()
+        try:
+            async with self._session_factory() as session:
+                await session.execute(insert(AuditLog), [row for row, _ in batch])
+                await session.commit()
+        except Exception as exc:  # pylint: disable=broad-except
+            self.failed += len(batch)
+            logger.exception("Falha ao gravar %s registros de auditoria", len(batch))
+            for _, waiter in batch:
+                if waiter is not None and not waiter.done():
+                    waiter.set_exception(exc)
+        else:
+            self.written += len(batch)
+            for _, waiter in batch:
+                if waiter is not None and not waiter.done():
+                    waiter.set_result(None)
+        finally:
+            duracao = (time.perf_counter() - inicio) * 1000
+            self.batches += 1
+            self.last_flush_ms = duracao
+            self.flush_ms_total += duracao
+            self.flush_ms_max = max(self.flush_ms_max, duracao)
+
+    def _drenar(self, batch: list) -> bool:
+        """Move para o lote o que já está na fila; retorna True ao encontrar o fim."""
+
+        while len(batch) < self.batch_size:
+            try:
+                item = self._queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return False
+            if item is _FIM:
+                return True
+            batch.append(item)
+        return False
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await self._queue.get()
+            if item is _FIM:
+                return
+            batch = [item]
+            prazo = loop.time() + self.flush_seconds
+            # Espera completar o lote ou vencer o prazo; ações críticas antecipam a gravação.
+            while True:
+                self._acordar.clear()
+                fim = self._drenar(batch)
+                restante = prazo - loop.time()
+                if fim or len(batch) >= self.batch_size or any(w for _, w in batch) or restante <= 0:
+                    break
+                try:
+                    await asyncio.wait_for(self._acordar.wait(), restante)
+                except asyncio.TimeoutError:
+                    pass
+            await self._flush(batch)
+            if fim:
+                # Esvazia o que ainda estiver na fila antes de encerrar.
+                while True:
+                    batch = []
+                    self._drenar(batch)
+                    if not batch:
+                        return
+                    await self._flush(batch)
+
+    def start(self, session_factory: sessionmaker) -> None:
+        if self._task is None:
+            self._session_factory = session_factory
+            self._queue = asyncio.Queue(maxsize=self._max_queue)
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            task, self._task = self._task, None
+            await self._queue.put(_FIM)
+            self._acordar.set()
+            await task
 
 
 async def log_action(
@@ -13,13 +182,58 @@ async def log_action(
     entity: str,
     entity_id: int | None = None,
     payload: Any = None,
+    critical: bool | None = None,
 ) -> None:
-    audit_entry = AuditLog(
-        action=action,
-        entity=entity,
-        entity_id=entity_id,
-        payload=payload,
-        user_id=user.id if user else None,
-    )
-    session.add(audit_entry)
+    """Registra a ação; críticas aguardam a gravação do lote antes da resposta."""
+
+    row = {
+        "action": action,
+        "entity": entity,
+        "entity_id": entity_id,
+        "payload": payload,
+        "user_id": user.id if user else None,
+        "created_at": datetime.utcnow(),
+    }
+    if audit_writer.running:
+        if critical is None:
+            critical = audit_writer.is_critical(action)
+        waiter = asyncio.get_running_loop().create_future() if critical else None
+        if audit_writer.submit(row, waiter):
+            if waiter is not None:
+                await waiter
+            return
+    # Sem o gravador em execução (comandos, testes) ou com a fila cheia, grava na sessão da rota.
+    await session.execute(insert(AuditLog), [row])
     await session.commit()
+
+
+def enqueue_action(
+    session: AsyncSession,
+    user: User | None,
+    action: str,
+    entity: str,
+    entity_id: int | None = None,
+    payload: Any = None,
+) -> None:
+    """Registra a ação pelo outbox, confirmada no mesmo commit da operação auditada."""
+
+    outbox.enqueue(
+        session,
+        "audit",
+        {
+            "action": action,
+            "entity": entity,
+            "entity_id": entity_id,
+            "payload": payload,
+            "user_id": user.id if user else None,
+            "created_at": datetime.utcnow().isoformat(),
+        },
+    )
+
+
+@outbox.handler("audit")
+async def _gravar_auditoria(session: AsyncSession, row: dict) -> None:
+    await session.execute(insert(AuditLog), [{**row, "created_at": datetime.fromisoformat(row["created_at"])}])
+
+
+audit_writer = AuditWriter.from_settings(get_settings())
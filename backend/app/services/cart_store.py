@@ -0,0 +1,544 @@
+import asyncio
+import contextlib
+import json
+import logging
+import os
+from collections import OrderedDict
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any
+
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload, sessionmaker
+
+from app.core import money
+from app.core.config import Settings, get_settings
+from app.models.audit import AuditLog
+from app.models.sale import Sale, SaleItem
+from app.services.pricing import CartPricing
+
+logger = logging.getLogger("pdv")
+
+@dataclass
+class CartLine:
+    """Linha do carrinho com quantidade em milésimos e valores em centavos (ver app.core.money)."""
+
+    line_id: int
+    product_id: int
+    quantity: int
+    unit_price: int
+    total_price: int
+    discount: int = 0
+    promotion_id: int | None = None
+
+    def as_dict(self) -> dict:
+        return {
+            "id": self.line_id,
+            "product_id": self.product_id,
+            "quantity": self.quantity / money.MILLI,
+            "unit_price": money.to_float(self.unit_price),
+            "discount": money.to_float(self.discount),
+            "promotion_id": self.promotion_id,
+            "total_price": money.to_float(self.total_price),
+        }
+
+
+@dataclass
+class Cart:
+    """Venda em andamento mantida em memória; ids negativos ainda não foram gravados."""
+
+    sale_id: int
+    code: str
+    status: str
+    discount: int
+    created_at: datetime
+    customer_id: int | None
+    payments: list[dict]
+    lines: dict[int, CartLine] = field(default_factory=dict)
+    subtotal: int = 0
+    version: int = 0
+    persisted_version: int = 0
+    removed_ids: set[int] = field(default_factory=set)
+    repriced_ids: set[int] = field(default_factory=set)
+    pricing: CartPricing = field(default_factory=CartPricing, repr=False)
+    pending_audit: list[dict] = field(default_factory=list)
+    next_temp_id: int = -1
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock, repr=False)
+
+    @classmethod
+    def from_sale(cls, sale: Sale) -> "Cart":
+        cart = cls(
+            sale_id=sale.id,
+            code=sale.code,
+            status=sale.status,
+            discount=money.cents(sale.discount),
+            created_at=sale.created_at,
+            customer_id=sale.customer_id,
+            payments=[
+                {
+                    "id": payment.id,
+                    "method": payment.method,
+                    "amount": money.to_float(money.cents(payment.amount)),
+                    "transaction_code": payment.transaction_code,
+                    "paid": bool(payment.paid),
+                }
+                for payment in sale.payments
+            ],
+        )
+        for item in sale.items:
+            line = CartLine(
+                line_id=item.id,
+                product_id=item.product_id,
+                quantity=money.milli(item.quantity),
+                unit_price=money.cents(item.unit_price),
+                total_price=money.cents(item.total_price),
+                discount=money.cents(item.discount),
+                promotion_id=item.promotion_id,
+            )
+            cart.lines[line.line_id] = line
+            cart.pricing.add(line.line_id, line.product_id, line.quantity, line.unit_price)
+            if line.promotion_id is not None:
+                cart.pricing.discounts[line.line_id] = (line.discount, line.promotion_id)
+            cart.subtotal += line.total_price
+        return cart
+
+    @property
+    def dirty(self) -> bool:
+        return self.version > self.persisted_version
+
+    @property
+    def total(self) -> int:
+        return self.subtotal - self.discount
+
+    def add_line(self, product_id: int, quantity: int, unit_price: int, line_id: int) -> CartLine:
+        line = CartLine(
+            line_id=line_id,
+            product_id=product_id,
+            quantity=quantity,
+            unit_price=unit_price,
+            total_price=money.line_total(quantity, unit_price),
+        )
+        self.lines[line_id] = line
+        self.pricing.add(line_id, product_id, quantity, unit_price)
+        self.subtotal += line.total_price
+        self.next_temp_id = min(self.next_temp_id, line_id - 1)
+        self.version += 1
+        return line
+
+    def remove_line(self, line_id: int) -> CartLine:
+        line = self.lines.pop(line_id)
+        self.pricing.remove(line_id)
+        self.subtotal -= line.total_price
+        if line_id > 0:
+            self.removed_ids.add(line_id)
+            self.repriced_ids.discard(line_id)
+        self.version += 1
+        return line
+
+    def set_discounts(self, discounts: dict[int, tuple[int, int | None]]) -> None:
+        for line_id, (discount, promotion_id) in discounts.items():
+            line = self.lines.get(line_id)
+            if line is None:
+                continue
+            self.subtotal -= line.total_price
+            line.discount = discount
+            line.promotion_id = promotion_id
+            line.total_price = money.line_total(line.quantity, line.unit_price) - discount
+            self.subtotal += line.total_price
+            if line_id > 0:
+                self.repriced_ids.add(line_id)
+        self.version += 1
+
+    def apply(self, record: dict) -> None:
+        """Reaplica uma operação lida do journal."""
+
+        if record["op"] == "add":
+            line = record["line"]
+            self.add_line(
+                line["product_id"], money.milli(line["quantity"]), money.cents(line["unit_price"]), line["id"]
+            )
+        elif record["op"] == "remove":
+            if record["line_id"] not in self.lines:
+                logger.warning("Item %s do carrinho %s não encontrado na recuperação", record["line_id"], self.sale_id)
+                return
+            self.remove_line(record["line_id"])
+        elif record["op"] == "discount":
+            self.set_discounts(
+                {
+                    int(line_id): (money.cents(valor), promotion_id)
+                    for line_id, (valor, promotion_id) in record["discounts"].items()
+                }
+            )
+        audit = record.get("audit")
+        if audit:
+            self.pending_audit.append({**audit, "created_at": datetime.fromisoformat(audit["created_at"])})
+        self.version = record["seq"]
+
+    def as_sale(self) -> dict:
+        return {
+            "id": self.sale_id,
+            "code": self.code,
+            "status": self.status,
+            "customer_id": self.customer_id,
+            "discount": money.to_float(self.discount),
+            "total": money.to_float(self.total),
+            "created_at": self.created_at,
+            "items": [line.as_dict() for line in self.lines.values()],
+            "payments": self.payments,
+        }
+
+
+class CartJournal:
+    """Journal append-only usado para reconstruir carrinhos após uma queda do processo."""
+
+    def __init__(self, path: str, fsync: bool = False) -> None:
+        self.path = path
+        self.fsync = fsync
+        self._file = None
+
+    def append(self, record: dict) -> None:
+        if self._file is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._file = open(self.path, "a", encoding="utf-8")
+        self._file.write(json.dumps(record, default=str) + "\n")
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+
+    def replay(self) -> dict[int, list[dict]]:
+        """Retorna, por venda, as operações ainda não gravadas no banco."""
+
+        pending: dict[int, list[dict]] = {}
+        if not os.path.exists(self.path):
+            return pending
+
+        with open(self.path, encoding="utf-8") as journal:
+            for raw in journal:
+                try:
+                    record = json.loads(raw)
+                except json.JSONDecodeError:
+                    # Última linha truncada pela queda do processo.
+                    break
+                sale_id = record["sale_id"]
+                if record["op"] == "closed":
+                    pending.pop(sale_id, None)
+                elif record["op"] == "persisted":
+                    ids = record.get("ids", {})
+                    remaining = [op for op in pending.get(sale_id, []) if op["seq"] > record["version"]]
+                    for op in remaining:
+                        if op["op"] == "remove":
+                            op["line_id"] = ids.get(str(op["line_id"]), op["line_id"])
+                        elif op["op"] == "discount":
+                            op["discounts"] = {str(ids.get(key, key)): valor for key, valor in op["discounts"].items()}
+                    pending[sale_id] = remaining
+                else:
+                    pending.setdefault(sale_id, []).append(record)
+        return {sale_id: ops for sale_id, ops in pending.items() if ops}
+
+    def truncate(self) -> None:
+        self.close()
+        if os.path.exists(self.path):
+            open(self.path, "w", encoding="utf-8").close()
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+async def _load_sale(session: AsyncSession, sale_id: int) -> Sale | None:
+    result = await session.execute(
+        select(Sale)
+        .options(selectinload(Sale.items), selectinload(Sale.payments))
+        .where(Sale.id == sale_id)
+    )
+    return result.scalar_one_or_none()
+
+
+class CartStore:
+    """Armazena vendas em andamento em memória e grava no banco apenas em checkpoints."""
+
+    def __init__(
+        self,
+        *,
+        enabled: bool,
+        max_carts: int,
+        journal: CartJournal,
+        checkpoint_seconds: float = 30,
+    ) -> None:
+        self.enabled = enabled
+        self.max_carts = max_carts
+        self.journal = journal
+        self.checkpoint_seconds = checkpoint_seconds
+        self._carts: OrderedDict[int, Cart] = OrderedDict()
+        self._task: asyncio.Task | None = None
+
+    @classmethod
+    def from_settings(cls, settings: Settings) -> "CartStore":
+        return cls(
+            enabled=settings.cart_store_enabled,
+            max_carts=settings.cart_store_max_carts,
+            journal=CartJournal(settings.cart_journal_path, fsync=settings.cart_journal_fsync),
+            checkpoint_seconds=settings.cart_checkpoint_seconds,
+        )
+
+    def __len__(self) -> int:
+        return len(self._carts)
+
+    def peek(self, sale_id: int) -> Cart | None:
+        cart = self._carts.get(sale_id)
+        if cart is not None:
+            self._carts.move_to_end(sale_id)
+        return cart
+
+    async def load(self, session: AsyncSession, sale: Sale) -> Cart:
+        """Coloca uma venda aberta no armazenamento, liberando espaço se necessário."""
+
+        while len(self._carts) >= self.max_carts:
+            sale_id, oldest = next(iter(self._carts.items()))
+            await self.persist(session, oldest)
+            if self._carts.get(sale_id) is oldest and not oldest.dirty:
+                del self._carts[sale_id]
+
+        cart = self._carts.get(sale.id)
+        if cart is None:
+            cart = Cart.from_sale(sale)
+            self._carts[sale.id] = cart
+        return cart
+
+    def add_item(
+        self, cart: Cart, product_id: int, quantity: int, unit_price: int, audit: dict | None = None
+    ) -> CartLine:
+        """Inclui uma linha; quantidade em milésimos e preço em centavos."""
+
+        line_id = cart.next_temp_id
+        self.journal.append(
+            {
+                "sale_id": cart.sale_id,
+                "op": "add",
+                "seq": cart.version + 1,
+                "line": {
+                    "id": line_id,
+                    "product_id": product_id,
+                    "quantity": money.format_quantity(quantity),
+                    "unit_price": money.format_cents(unit_price),
+                },
+                "audit": audit,
+            }
+        )
+        line = cart.add_line(product_id, quantity, unit_price, line_id)
+        if audit:
+            cart.pending_audit.append(audit)
+        return line
+
+    def apply_discounts(self, cart: Cart, discounts: dict[int, tuple[int, int | None]]) -> None:
+        """Registra os descontos recalculados pelo motor de promoções."""
+
+        if not discounts:
+            return
+        self.journal.append(
+            {
+                "sale_id": cart.sale_id,
+                "op": "discount",
+                "seq": cart.version + 1,
+                "discounts": {
+                    str(line_id): [money.format_cents(valor), promotion_id]
+                    for line_id, (valor, promotion_id) in discounts.items()
+                },
+            }
+        )
+        cart.set_discounts(discounts)
+
+    def remove_item(self, cart: Cart, line_id: int, audit: dict | None = None) -> CartLine:
+        if line_id not in cart.lines:
+            raise KeyError(line_id)
+        self.journal.append(
+            {"sale_id": cart.sale_id, "op": "remove", "seq": cart.version + 1, "line_id": line_id, "audit": audit}
+        )
+        line = cart.remove_line(line_id)
+        if audit:
+            cart.pending_audit.append(audit)
+        return line
+
+    async def persist(self, session: AsyncSession, cart: Cart) -> None:
+        """Grava as alterações pendentes do carrinho e confirma a transação."""
+
+        async with cart.lock:
+            confirmar = await self._gravar(session, cart)
+            if confirmar is not None:
+                await session.commit()
+                confirmar()
+
+    @contextlib.asynccontextmanager
+    async def staged(self, session: AsyncSession, cart: Cart):
+        """Grava as alterações pendentes na transação de quem chama, sem commit.
+
+        O commit é feito dentro do bloco, como último passo, e a trava do carrinho fica com
+        ele até o fim: um checkpoint concorrente não grava as mesmas linhas em outra transação.
+        O carrinho só registra o que foi gravado se o bloco terminar sem erro.
+        """
+
+        async with cart.lock:
+            confirmar = await self._gravar(session, cart)
+            yield
+            if confirmar is not None:
+                confirmar()
+
+    async def _gravar(self, session: AsyncSession, cart: Cart) -> Callable[[], None] | None:
+        """Executa as alterações pendentes na sessão e devolve o que marcar no carrinho após o commit."""
+
+        if not cart.dirty:
+            return None
+        version = cart.version
+        new_lines = [line for line in cart.lines.values() if line.line_id < 0]
+        removed = set(cart.removed_ids)
+        repriced = {
+            line_id: (line.discount, line.promotion_id, line.total_price)
+            for line_id in cart.repriced_ids
+            if (line := cart.lines.get(line_id)) is not None
+        }
+        inserted = {line.line_id: line.discount for line in new_lines}
+        audit_rows = list(cart.pending_audit)
+
+        if removed:
+            await session.execute(delete(SaleItem).where(SaleItem.id.in_(removed)))
+        if repriced:
+            await session.execute(
+                update(SaleItem),
+                [
+                    {
+                        "id": line_id,
+                        "discount": money.to_decimal(discount),
+                        "promotion_id": promotion_id,
+                        "total_price": money.to_decimal(total),
+                    }
+                    for line_id, (discount, promotion_id, total) in repriced.items()
+                ],
+            )
+        ids: dict[int, int] = {}
+        if new_lines:
+            result = await session.execute(
+                insert(SaleItem).returning(SaleItem.id, sort_by_parameter_order=True),
+                [
+                    {
+                        "sale_id": cart.sale_id,
+                        "product_id": line.product_id,
+                        "quantity": money.quantity_to_decimal(line.quantity),
+                        "unit_price": money.to_decimal(line.unit_price),
+                        "discount": money.to_decimal(line.discount),
+                        "promotion_id": line.promotion_id,
+                        "total_price": money.to_decimal(line.total_price),
+                    }
+                    for line in new_lines
+                ],
+            )
+            ids = dict(zip((line.line_id for line in new_lines), result.scalars().all()))
+        await session.execute(
+            update(Sale).where(Sale.id == cart.sale_id).values(total=money.to_decimal(cart.total)),
+            execution_options={"synchronize_session": False},
+        )
+        if audit_rows:
+            await session.execute(insert(AuditLog), audit_rows)
+
+        def confirmar() -> None:
+            cart.removed_ids -= removed
+            for line_id, (discount, _, _) in repriced.items():
+                line = cart.lines.get(line_id)
+                if line is None or line.discount == discount:
+                    cart.repriced_ids.discard(line_id)
+            del cart.pending_audit[: len(audit_rows)]
+            for temp_id, real_id in ids.items():
+                line = cart.lines.get(temp_id)
+                if line is None:
+                    cart.removed_ids.add(real_id)
+                else:
+                    line.line_id = real_id
+                    if line.discount != inserted[temp_id]:
+                        # Desconto recalculado enquanto a linha era gravada.
+                        cart.repriced_ids.add(real_id)
+            cart.lines = {line.line_id: line for line in cart.lines.values()}
+            cart.pricing.rename(ids)
+            cart.persisted_version = version
+            self.journal.append(
+                {
+                    "sale_id": cart.sale_id,
+                    "op": "persisted",
+                    "version": version,
+                    "ids": {str(temp_id): real_id for temp_id, real_id in ids.items()},
+                }
+            )
+
+        return confirmar
+
+    def discard(self, sale_id: int) -> None:
+        if self._carts.pop(sale_id, None) is not None:
+            self.journal.append({"sale_id": sale_id, "op": "closed"})
+
+    async def checkpoint(self, session_factory: sessionmaker) -> int:
+        dirty = [cart for cart in self._carts.values() if cart.dirty]
+        if dirty:
+            async with session_factory() as session:
+                for cart in dirty:
+                    await self.persist(session, cart)
+        if not any(cart.dirty for cart in self._carts.values()):
+            self.journal.truncate()
+        return len(dirty)
+
+    async def recover(self, session_factory: sessionmaker) -> int:
+        """Reconstrói os carrinhos a partir do journal e grava o que estava pendente."""
+
+        pending = self.journal.replay()
+        async with session_factory() as session:
+            for sale_id, records in pending.items():
+                sale = await _load_sale(session, sale_id)
+                if sale is None or sale.status in {"completed", "canceled"}:
+                    logger.warning("Carrinho %s descartado na recuperação: venda indisponível", sale_id)
+                    continue
+                cart = self._carts.get(sale_id) or Cart.from_sale(sale)
+                cart.persisted_version = cart.version = records[0]["seq"] - 1
+                for record in records:
+                    cart.apply(record)
+                self._carts[sale_id] = cart
+                await self.persist(session, cart)
+        if not any(cart.dirty for cart in self._carts.values()):
+            self.journal.truncate()
+        return len(pending)
+
+    async def _run(self, session_factory: sessionmaker) -> None:
+        while True:
+            await asyncio.sleep(self.checkpoint_seconds)
+            try:
+                await self.checkpoint(session_factory)
+            except Exception:  # pylint: disable=broad-except
+                logger.exception("Falha no checkpoint dos carrinhos")
+
+    def start(self, session_factory: sessionmaker) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(session_factory))
+
+    async def stop(self, session_factory: sessionmaker) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.checkpoint(session_factory)
+        self.journal.close()
+
+
+def audit_entry(user: Any, action: str, sale_id: int, payload: Any) -> dict:
+    return {
+        "action": action,
+        "entity": "Sale",
+        "entity_id": sale_id,
+        "payload": payload,
+        "user_id": user.id if user else None,
+        "created_at": datetime.utcnow(),
+    }
+
+
+cart_store = CartStore.from_settings(get_settings())
@@ -0,0 +1,114 @@
+from datetime import datetime
+
+from sqlalchemy import event, insert, select, update
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, selectinload
+
+from app.models.product import CatalogCounter, Product, ProductBarcode, ProductTombstone
+
+CONTADOR = "products"
+
+
+def _proximo_seq(connection: Connection) -> int:
+    # O UPDATE bloqueia a linha até o commit: as sequências ficam visíveis na mesma ordem
+    # em que são atribuídas e um cursor nunca pula uma alteração ainda não confirmada.
+    contador = CatalogCounter.__table__
+    valor = connection.execute(
+        update(contador)
+        .where(contador.c.name == CONTADOR)
+        .values(value=contador.c.value + 1)
+        .returning(contador.c.value)
+    ).scalar_one_or_none()
+    if valor is None:
+        connection.execute(insert(contador).values(name=CONTADOR, value=1))
+        valor = 1
+    return valor
+
+
+@event.listens_for(Session, "before_flush")
+def _registrar_alteracoes(session: Session, _flush_context, _instances) -> None:
+    alterados = [obj for obj in session.new if isinstance(obj, Product)]
+    alterados += [
+        obj
+        for obj in session.dirty
+        if isinstance(obj, Product) and session.is_modified(obj, include_collections=False)
+    ]
+    excluidos = [obj for obj in session.deleted if isinstance(obj, Product)]
+    # Códigos de barras fazem parte do produto para os terminais: alterá-los republica o produto.
+    por_codigo = {
+        obj.product_id
+        for obj in (*session.new, *session.dirty, *session.deleted)
+        if isinstance(obj, ProductBarcode) and obj.product_id is not None
+    }
+    por_codigo -= {product.id for product in (*alterados, *excluidos)}
+    if not alterados and not excluidos and not por_codigo:
+        return
+    connection = session.connection()
+    seq = _proximo_seq(connection)
+    for product in alterados:
+        product.change_seq = seq
+    for product in excluidos:
+        session.add(ProductTombstone(product_id=product.id, sku=product.sku, change_seq=seq))
+    if por_codigo:
+        produtos = Product.__table__
+        connection.execute(
+            update(produtos)
+            .where(produtos.c.id.in_(por_codigo))
+            .values(change_seq=seq, updated_at=datetime.utcnow())
+        )
+    session.info["catalog_changed"] = True
+
+
+async def current_seq(session: AsyncSession) -> int:
+    result = await session.execute(select(CatalogCounter.value).where(CatalogCounter.name == CONTADOR))
+    return result.scalar_one_or_none() or 0
+
+
+def catalog_etag(since: int, limit: int, seq: int) -> str:
+    return f'W/"catalogo-{since}-{limit}-{seq}"'
+
+
+async def _alteracoes(session: AsyncSession, since: int, limit: int | None = None, seq: int | None = None):
+    produtos = (
+        select(Product)
+        .options(selectinload(Product.barcodes))
+        .order_by(Product.change_seq, Product.id)
+    )
+    excluidos = select(ProductTombstone.change_seq, ProductTombstone.product_id).order_by(
+        ProductTombstone.change_seq, ProductTombstone.product_id
+    )
+    if seq is None:
+        produtos = produtos.where(Product.change_seq > since).limit(limit)
+        excluidos = excluidos.where(ProductTombstone.change_seq > since).limit(limit)
+    else:
+        produtos = produtos.where(Product.change_seq == seq)
+        excluidos = excluidos.where(ProductTombstone.change_seq == seq)
+    return (await session.execute(produtos)).scalars().all(), (await session.execute(excluidos)).all()
+
+
+async def catalog_changes(session: AsyncSession, since: int, limit: int, seq: int) -> dict:
+    """Produtos alterados e excluídos após `since`, sem dividir uma mesma sequência entre páginas."""
+
+    produtos, excluidos = await _alteracoes(session, since, limit=limit + 1)
+    sequencias = sorted([p.change_seq for p in produtos] + [s for s, _ in excluidos])
+    if len(sequencias) <= limit:
+        cursor = max([since, seq, *sequencias])
+        return {
+            "changes": produtos,
+            "deleted": [product_id for _, product_id in excluidos],
+            "cursor": cursor,
+            "has_more": False,
+        }
+
+    corte = sequencias[limit - 1]
+    produtos = [p for p in produtos if p.change_seq < corte]
+    excluidos = [row for row in excluidos if row[0] < corte]
+    # Uma única transação pode ter alterado mais produtos que o limite: a sequência vai inteira.
+    ultimos_produtos, ultimos_excluidos = await _alteracoes(session, since, seq=corte)
+    return {
+        "changes": [*produtos, *ultimos_produtos],
+        "deleted": [product_id for _, product_id in (*excluidos, *ultimos_excluidos)],
+        "cursor": corte,
+        "has_more": True,
+    }
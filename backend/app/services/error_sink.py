@@ -0,0 +1,213 @@
+import asyncio
+import hashlib
+import logging
+import time
+import traceback
+from dataclasses import dataclass
+from datetime import datetime
+
+from sqlalchemy import insert, select
+from sqlalchemy.orm import sessionmaker
+
+from app.core.config import Settings, get_settings
+from app.models.error_log import ErrorLog
+from app.models.user import User
+
+logger = logging.getLogger("pdv")
+
+FRAMES_NO_FINGERPRINT = 5
+
+
+@dataclass
+class _Ocorrencia:
+    level: str
+    message: str
+    details: str | None
+    path: str
+    method: str
+    status_code: int | None
+    subject: str | None
+    first_seen: datetime
+    last_seen: datetime
+    count: int = 1
+
+
+def fingerprint(path: str, method: str, exc: BaseException | None, status_code: int | None) -> str:
+    """Identifica o erro por rota, tipo da exceção e frames mais internos."""
+
+    partes = [method, path, type(exc).__qualname__ if exc else f"HTTP {status_code}"]
+    if exc is not None:
+        frames = [
+            f"{frame.f_code.co_filename}:{frame.f_code.co_name}:{lineno}"
+            for frame, lineno in traceback.walk_tb(exc.__traceback__)
+        ]
+        partes.extend(frames[-FRAMES_NO_FINGERPRINT:])
+    return hashlib.sha1("|".join(partes).encode()).hexdigest()
+
+
+class ErrorSink:
+    """Agrega erros por fingerprint em memória e grava lotes periodicamente."""
+
+    def __init__(self, flush_seconds: float, min_interval_seconds: float, max_fingerprints: int) -> None:
+        self.flush_seconds = flush_seconds
+        self.min_interval_seconds = min_interval_seconds
+        self.max_fingerprints = max_fingerprints
+        self._pendentes: dict[str, _Ocorrencia] = {}
+        self._ultima_gravacao: dict[str, float] = {}
+        self._task: asyncio.Task | None = None
+        self.recorded = 0
+        self.persisted_rows = 0
+        self.dropped = 0
+        self.failed_flushes = 0
+        self.last_flush_ms = 0.0
+
+    @classmethod
+    def from_settings(cls, settings: Settings) -> "ErrorSink":
+        return cls(
+            flush_seconds=settings.error_sink_flush_seconds,
+            min_interval_seconds=settings.error_sink_min_interval_seconds,
+            max_fingerprints=settings.error_sink_max_fingerprints,
+        )
+
+    def record(
+        self,
+        path: str,
+        method: str,
+        status_code: int | None,
+        exc: BaseException | None = None,
+        subject: str | None = None,
+    ) -> str:
+        """Conta a ocorrência; o traceback só é formatado na primeira vez da janela."""
+
+        self.recorded += 1
+        chave = fingerprint(path, method, exc, status_code)
+        agora = datetime.utcnow()
+        ocorrencia = self._pendentes.get(chave)
+        if ocorrencia is not None:
+            ocorrencia.count += 1
+            ocorrencia.last_seen = agora
+            return chave
+        if len(self._pendentes) >= self.max_fingerprints:
+            self.dropped += 1
+            return chave
+        self._pendentes[chave] = _Ocorrencia(
+            level="ERROR" if (status_code or 0) >= 500 else "WARNING",
+            message=str(exc) if exc else "Erro durante processamento da requisição",
+            details="".join(traceback.format_exception(exc)) if exc else None,
+            path=path,
+            method=method,
+            status_code=status_code,
+            subject=subject,
+            first_seen=agora,
+            last_seen=agora,
+        )
+        return chave
+
+    def _prontos(self) -> dict[str, _Ocorrencia]:
+        agora = time.monotonic()
+        prontos = {
+            chave: ocorrencia
+            for chave, ocorrencia in self._pendentes.items()
+            if agora - self._ultima_gravacao.get(chave, float("-inf")) >= self.min_interval_seconds
+        }
+        for chave in prontos:
+            del self._pendentes[chave]
+            self._ultima_gravacao[chave] = agora
+        expirados = [
+            chave
+            for chave, gravado in self._ultima_gravacao.items()
+            if agora - gravado >= self.min_interval_seconds and chave not in self._pendentes
+        ]
+        for chave in expirados:
+            del self._ultima_gravacao[chave]
+        return prontos
+
+    async def flush(self, session_factory: sessionmaker, force: bool = False) -> int:
+        """Grava uma linha por fingerprint liberado pelo limite de frequência."""
+
+        if force:
+            lote, self._pendentes = self._pendentes, {}
+        else:
+            lote = self._prontos()
+        if not lote:
+            return 0
+        inicio = time.perf_counter()
+        try:
+            async with session_factory() as session:
+                subjects = {o.subject for o in lote.values() if o.subject}
+                usuarios: dict[str, int] = {}
+                if subjects:
+                    result = await session.execute(
+                        select(User.email, User.id).where(User.email.in_(subjects))
+                    )
+                    usuarios = dict(result.all())
+                await session.execute(
+                    insert(ErrorLog),
+                    [
+                        {
+                            "level": o.level,
+                            "message": o.message,
+                            "details": o.details,
+                            "path": o.path,
+                            "method": o.method,
+                            "status_code": o.status_code,
+                            "created_at": o.first_seen,
+                            "last_seen_at": o.last_seen,
+                            "fingerprint": chave,
+                            "occurrences": o.count,
+                            "user_id": usuarios.get(o.subject),
+                        }
+                        for chave, o in lote.items()
+                    ],
+                )
+                await session.commit()
+        except Exception:  # pylint: disable=broad-except
+            self.failed_flushes += 1
+            logger.exception("Falha ao gravar %s erros agregados", len(lote))
+            # Devolve as contagens para a próxima tentativa.
+            for chave, ocorrencia in lote.items():
+                atual = self._pendentes.get(chave)
+                if atual is None:
+                    self._pendentes[chave] = ocorrencia
+                else:
+                    atual.count += ocorrencia.count
+                    atual.first_seen = ocorrencia.first_seen
+                self._ultima_gravacao.pop(chave, None)
+            return 0
+        self.last_flush_ms = (time.perf_counter() - inicio) * 1000
+        self.persisted_rows += len(lote)
+        return len(lote)
+
+    def metrics(self) -> dict:
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "pending_fingerprints": len(self._pendentes),
+            "pending_occurrences": sum(o.count for o in self._pendentes.values()),
+            "recorded": self.recorded,
+            "persisted_rows": self.persisted_rows,
+            "dropped": self.dropped,
+            "failed_flushes": self.failed_flushes,
+            "last_flush_ms": round(self.last_flush_ms, 3),
+        }
+
+    async def _run(self, session_factory: sessionmaker) -> None:
+        while True:
+            await asyncio.sleep(self.flush_seconds)
+            await self.flush(session_factory)
+
+    def start(self, session_factory: sessionmaker) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(session_factory))
+
+    async def stop(self, session_factory: sessionmaker) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush(session_factory, force=True)
+
+
+error_sink = ErrorSink.from_settings(get_settings())
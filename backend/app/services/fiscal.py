@@ -3,12 +3,15 @@ from __future__ import annotations
 from dataclasses import dataclass
 from typing import Protocol
 
+from app.core.config import get_settings
 from app.fiscal import (
     ContingencyManager,
     DigitalSigner,
     NfceProcessor,
     SefazClient,
+    SefazMockClient,
     TaxTableRepository,
+    build_sefaz_client,
 )
 from app.schemas.fiscal import CancelRequest, CancelResponse, InvoiceRequest, InvoiceResponse
 
@@ -37,11 +40,18 @@ class FiscalAdapter(Protocol):
 class NfceAdapter:
     """Adapter NFC-e que encadeia geração, assinatura e comunicação com SEFAZ."""
 
-    def __init__(self) -> None:
+    def __init__(
+        self,
+        sefaz_client: SefazClient | SefazMockClient | None = None,
+        contingency_manager: ContingencyManager | None = None,
+    ) -> None:
+        settings = get_settings()
         self.tax_tables = TaxTableRepository()
         self.signer = DigitalSigner()
-        self.sefaz_client = SefazClient()
-        self.contingency_manager = ContingencyManager()
+        self.sefaz_client = sefaz_client or build_sefaz_client(settings)
+        self.contingency_manager = contingency_manager or ContingencyManager(
+            deadline_hours=settings.fiscal_contingency_deadline_hours
+        )
         self.processor = NfceProcessor(
             tax_tables=self.tax_tables,
             signer=self.signer,
@@ -50,7 +60,7 @@ class NfceAdapter:
         )
 
     async def emit(self, payload: InvoiceRequest) -> FiscalResult:
-        emission = self.processor.emit(
+        emission = await self.processor.emit(
             sale_id=payload.sale_id,
             items=payload.items,
             offline=payload.use_contingency,
@@ -66,7 +76,7 @@ class NfceAdapter:
         )
 
     async def cancel(self, payload: CancelRequest) -> FiscalResult:
-        emission = self.processor.cancel(payload.access_key, payload.justification)
+        emission = await self.processor.cancel(payload.access_key, payload.justification)
         return FiscalResult(
             success=emission.success,
             message=emission.message,
@@ -77,7 +87,7 @@ class NfceAdapter:
         )
 
     async def status(self, access_key: str) -> FiscalResult:
-        emission = self.processor.status(access_key)
+        emission = await self.processor.status(access_key)
         return FiscalResult(
             success=emission.success,
             message=emission.message,
@@ -87,15 +97,25 @@ class NfceAdapter:
             xml_preview=emission.xml or None,
         )
 
-    def pending_contingency(self) -> list[dict]:
+    def metrics(self) -> dict:
+        return self.sefaz_client.metrics()
+
+    async def aclose(self) -> None:
+        await self.sefaz_client.aclose()
+
+    async def pending_contingency(self) -> list[dict]:
         return [
             {
                 "reference": record.reference,
                 "payload": record.payload,
                 "queued_at": record.created_at,
                 "reason": record.reason,
+                "deadline": record.deadline,
+                "status": record.status,
+                "attempts": record.attempts,
+                "message": record.message,
             }
-            for record in self.contingency_manager.pending()
+            for record in await self.contingency_manager.pending()
         ]
 
 
@@ -115,7 +135,17 @@ class FiscalService:
         result = await self.adapter.status(access_key)
         return InvoiceResponse(**result.__dict__)
 
-    def contingency_queue(self) -> list[dict]:
+    async def contingency_queue(self) -> list[dict]:
         if hasattr(self.adapter, "pending_contingency"):
-            return self.adapter.pending_contingency()  # type: ignore[no-any-return]
+            return await self.adapter.pending_contingency()  # type: ignore[no-any-return]
         return []
+
+    def metrics(self) -> dict:
+        return self.adapter.metrics() if hasattr(self.adapter, "metrics") else {}
+
+    async def aclose(self) -> None:
+        if hasattr(self.adapter, "aclose"):
+            await self.adapter.aclose()
+
+
+fiscal_service = FiscalService()
@@ -0,0 +1,288 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy.orm import sessionmaker
+
+from app.core.config import Settings, get_settings
+from app.fiscal import ContingencyManager, SefazClient, SefazMockClient, SefazUnavailable
+from app.fiscal.sefaz import SefazResponse
+from app.services.fiscal import fiscal_service
+from app.services.work_queue import LeaseHeartbeat, backoff, wake_after_commit
+
+logger = logging.getLogger("pdv")
+
+
+class ContingencyRetransmitter:
+    """Transmite as NFC-e da contingência, do prazo legal mais próximo para o mais distante.
+
+    Com a SEFAZ no ar, cada lote sai com até `concurrency` documentos simultâneos, sujeitos
+    também ao limite por UF do cliente. Na primeira indisponibilidade o lote para, o que não
+    foi enviado volta à fila e o worker passa a sondar com um documento por vez, com espera
+    dobrada a cada falha, até a SEFAZ responder; aí volta aos lotes cheios.
+
+    Reivindicação, renovação da posse e aviso de commit vêm de `work_queue`; o que é só
+    daqui é a sondagem durante a queda.
+    """
+
+    def __init__(
+        self,
+        manager: ContingencyManager,
+        sefaz_client: SefazClient | SefazMockClient,
+        enabled: bool,
+        concurrency: int,
+        batch_size: int,
+        poll_seconds: float,
+        lease_seconds: float,
+        probe_seconds: float,
+        probe_max_seconds: float,
+        max_attempts: int,
+    ) -> None:
+        self.manager = manager
+        self.sefaz_client = sefaz_client
+        self.enabled = enabled
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.poll_seconds = poll_seconds
+        self.lease_seconds = lease_seconds
+        self.probe_seconds = probe_seconds
+        self.probe_max_seconds = probe_max_seconds
+        self.max_attempts = max_attempts
+        self._acordar = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self._lote: asyncio.Task | None = None
+        self._falhas = 0
+        self.claimed = 0
+        self.authorized = 0
+        self.rejected = 0
+        self.failed = 0
+        self.linked = 0
+        self.errors = 0
+        self.outages = 0
+        self.overdue_sent = 0
+        self.last_error: str | None = None
+        self.last_batch_size = 0
+        self.last_batch_ms = 0.0
+
+    @classmethod
+    def from_settings(
+        cls, settings: Settings, manager: ContingencyManager, sefaz_client: SefazClient | SefazMockClient
+    ) -> "ContingencyRetransmitter":
+        return cls(
+            manager=manager,
+            sefaz_client=sefaz_client,
+            enabled=settings.fiscal_contingency_enabled,
+            concurrency=settings.fiscal_contingency_concurrency,
+            batch_size=settings.fiscal_contingency_batch_size,
+            poll_seconds=settings.fiscal_contingency_poll_seconds,
+            lease_seconds=settings.fiscal_contingency_lease_seconds,
+            probe_seconds=settings.fiscal_contingency_probe_seconds,
+            probe_max_seconds=settings.fiscal_contingency_probe_max_seconds,
+            max_attempts=settings.fiscal_contingency_max_attempts,
+        )
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    @property
+    def online(self) -> bool:
+        return self._falhas == 0
+
+    def wake(self) -> None:
+        self._acordar.set()
+
+    def probe_delay(self) -> float:
+        """Espera até a próxima sondagem: dobra a cada falha seguida, até `probe_max_seconds`."""
+
+        return backoff(self.probe_seconds, self._falhas, self.probe_max_seconds)
+
+    def claim_limit(self) -> int:
+        """Tamanho do lote que cabe no prazo de posse mesmo com cada envio esgotando o timeout."""
+
+        if not self.online:
+            return 1
+        timeout = getattr(self.sefaz_client, "timeout_seconds", None)
+        if not timeout:
+            return self.batch_size
+        paralelos = min(self.concurrency, getattr(self.sefaz_client, "max_concurrency", self.concurrency))
+        return min(self.batch_size, max(1, int(paralelos * self.lease_seconds / timeout)))
+
+    def _resultado(self, documento, agora: datetime, resposta: SefazResponse | None, exc: Exception | None) -> dict:
+        tentativas = documento.attempts + 1
+        if resposta is not None:
+            status = "authorized" if resposta.success else "rejected"
+            espera = 0.0
+        else:
+            status = "failed" if tentativas >= self.max_attempts else "pending"
+            espera = backoff(self.probe_seconds, tentativas, self.probe_max_seconds)
+        return {
+            "id": documento.id,
+            "reference": documento.reference,
+            "status": status,
+            "attempts": tentativas,
+            "code": resposta.code if resposta else None,
+            "message": resposta.message if resposta else f"{type(exc).__name__}: {exc}"[:1000],
+            "protocol": resposta.protocol if resposta else None,
+            "access_key": resposta.access_key if resposta else None,
+            "sent_at": agora if resposta else None,
+            "next_attempt_at": agora + timedelta(seconds=espera),
+        }
+
+    async def transmit_batch(self) -> int:
+        """Reivindica e envia um lote (um só documento enquanto a SEFAZ estiver fora); devolve quantos reivindicou."""
+
+        documentos = await self.manager.claim(self.claim_limit(), self.lease_seconds)
+        if not documentos:
+            return 0
+        token = documentos[0].claim_token
+        self.claimed += len(documentos)
+        inicio = time.perf_counter()
+        semaforo = asyncio.Semaphore(self.concurrency)
+        fora_do_ar: list[str] = []
+        resultados: list[dict] = []
+
+        async def renovar(ids: list[int]) -> None:
+            await self.manager.renew(ids, token, self.lease_seconds)
+
+        async def enviar(documento) -> None:
+            async with semaforo:
+                if fora_do_ar:
+                    return
+                resposta, erro = None, None
+                try:
+                    resposta = await self.sefaz_client.send_signed_xml(documento.xml, uf=documento.uf)
+                except SefazUnavailable as exc:
+                    fora_do_ar.append(str(exc))
+                    return
+                except Exception as exc:  # pylint: disable=broad-except
+                    erro = exc
+                agora = datetime.utcnow()
+                if documento.deadline < agora:
+                    self.overdue_sent += 1
+                resultados.append(self._resultado(documento, agora, resposta, erro))
+
+        async with LeaseHeartbeat("contingency", self.lease_seconds, renovar) as heartbeat:
+            heartbeat.held.update(documento.id for documento in documentos)
+            await asyncio.gather(*(enviar(documento) for documento in documentos))
+            gravados = await self.manager.record(resultados, token)
+            if fora_do_ar:
+                enviados = {resultado["id"] for resultado in resultados}
+                restantes = [documento.id for documento in documentos if documento.id not in enviados]
+                await self.manager.release(restantes, token, 0, fora_do_ar[0])
+        if len(gravados) < len(resultados):
+            logger.warning(
+                "%s resultados da contingência descartados: a posse foi retomada por outro worker",
+                len(resultados) - len(gravados),
+            )
+        for resultado in resultados:
+            if resultado["id"] not in gravados:
+                continue
+            if resultado["status"] == "authorized":
+                self.authorized += 1
+            elif resultado["status"] == "rejected":
+                self.rejected += 1
+            else:
+                self.errors += 1
+                self.failed += resultado["status"] == "failed"
+                logger.warning("Contingência %s não transmitida: %s", resultado["reference"], resultado["message"])
+
+        if fora_do_ar:
+            if self.online:
+                self.outages += 1
+                logger.warning("SEFAZ indisponível; retransmissão da contingência em sondagem: %s", fora_do_ar[0])
+            self._falhas += 1
+            self.last_error = fora_do_ar[0]
+        elif not self.online:
+            logger.info("SEFAZ respondeu após %s sondagens; retransmitindo a contingência", self._falhas)
+            self._falhas = 0
+        self.last_batch_size = len(resultados)
+        self.last_batch_ms = (time.perf_counter() - inicio) * 1000
+        return len(documentos)
+
+    async def link_pending(self) -> int:
+        """Vincula às NFC-e das vendas as respostas que chegaram antes do documento; devolve quantas."""
+
+        vinculados = await self.manager.link_pending()
+        self.linked += vinculados
+        return vinculados
+
+    async def retransmit_pending(self) -> int:
+        """Transmite, neste processo, o que estiver vencido enquanto a SEFAZ responder; devolve quantos enviou."""
+
+        total = 0
+        while True:
+            reivindicados = await self.transmit_batch()
+            if not reivindicados:
+                await self.link_pending()
+                return total
+            total += self.last_batch_size
+            if not self.online:
+                await self.link_pending()
+                return total
+
+    def metrics(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "running": self.running,
+            "online": self.online,
+            "failed_probes": self._falhas,
+            "next_probe_seconds": self.probe_delay() if not self.online else None,
+            "concurrency": self.concurrency,
+            "claimed": self.claimed,
+            "authorized": self.authorized,
+            "rejected": self.rejected,
+            "errors": self.errors,
+            "failed": self.failed,
+            "linked": self.linked,
+            "outages": self.outages,
+            "overdue_sent": self.overdue_sent,
+            "last_error": self.last_error,
+            "last_batch_size": self.last_batch_size,
+            "last_batch_ms": round(self.last_batch_ms, 3),
+            "last_batch_per_second": (
+                round(self.last_batch_size / (self.last_batch_ms / 1000), 1) if self.last_batch_ms else 0.0
+            ),
+        }
+
+    async def _executar(self) -> None:
+        while True:
+            self._acordar.clear()
+            try:
+                # Fora do cancelamento: `stop` espera o lote em andamento gravar os resultados.
+                self._lote = asyncio.create_task(self.transmit_batch())
+                reivindicados = await asyncio.shield(self._lote)
+                await self.link_pending()
+            except Exception:  # pylint: disable=broad-except
+                logger.exception("Falha ao retransmitir a contingência")
+                reivindicados = 0
+            if not self.online:
+                # Emissões novas também caem na contingência: não acordam a sondagem antes da hora.
+                await asyncio.sleep(self.probe_delay())
+            elif reivindicados < self.claim_limit():
+                try:
+                    await asyncio.wait_for(self._acordar.wait(), self.poll_seconds)
+                except asyncio.TimeoutError:
+                    pass
+
+    def start(self, session_factory: sessionmaker) -> None:
+        if self._task is None:
+            self.manager.session_factory = session_factory
+            self._task = asyncio.create_task(self._executar())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            task, self._task = self._task, None
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            if self._lote is not None:
+                await asyncio.gather(self._lote, return_exceptions=True)
+                self._lote = None
+
+
+contingency_retransmitter = ContingencyRetransmitter.from_settings(
+    get_settings(), fiscal_service.adapter.contingency_manager, fiscal_service.adapter.sefaz_client
+)
+
+wake_after_commit("contingency", lambda _: contingency_retransmitter.wake())
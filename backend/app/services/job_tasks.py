@@ -0,0 +1,41 @@
+"""Tarefas executadas pelo `job_runner`; importado por quem inicia os workers."""
+
+from datetime import date, timedelta
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import get_settings
+from app.services import jobs
+from app.services import sale_effects  # registra fiscal.emit_nfce e print.sale
+from app.services.archive import maintain_partitions
+from app.services.sales_rollup import rebuild_daily_facts
+from app.services.stock_rollup import create_checkpoint
+
+
+def _ontem() -> str:
+    return (date.today() - timedelta(days=1)).isoformat()
+
+
+@jobs.task("reports.rebuild_daily_facts", queue="reports")
+async def recalcular_totais_diarios(session: AsyncSession, payload: dict) -> dict:
+    inicio = date.fromisoformat(payload.get("inicio") or _ontem())
+    fim = date.fromisoformat(payload.get("fim") or inicio.isoformat())
+    await rebuild_daily_facts(session, inicio, fim)
+    return {"inicio": inicio.isoformat(), "fim": fim.isoformat()}
+
+
+@jobs.task("stock.checkpoint", queue="reports")
+async def checkpoint_estoque(session: AsyncSession, payload: dict) -> dict:
+    dia = date.fromisoformat(payload.get("data") or _ontem())
+    return {"data": dia.isoformat(), "itens": await create_checkpoint(session, dia)}
+
+
+@jobs.task("partitions.maintain", queue="reports")
+async def manter_particoes(session: AsyncSession, payload: dict) -> dict:
+    # Cada mês arquivado é confirmado à parte, como no comando partition_maintenance.
+    settings = get_settings()
+    return await maintain_partitions(
+        session,
+        payload.get("meses_adiante", settings.partition_months_ahead),
+        payload.get("retencao", settings.archive_retention_months),
+    )
@@ -0,0 +1,533 @@
+import asyncio
+import inspect
+import logging
+import os
+import socket
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from functools import partial
+from typing import Callable
+
+from sqlalchemy import and_, case, delete, func, or_, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from app.core.config import JobSchedule, Settings, get_settings
+from app.models.job import Job
+from app.services.work_queue import LeasedPool, backoff, claim_rows, wake_after_commit
+
+logger = logging.getLogger("pdv")
+
+
+@dataclass(frozen=True)
+class TaskSpec:
+    name: str
+    func: Callable
+    queue: str
+    priority: int
+    max_attempts: int | None
+
+    @property
+    def threaded(self) -> bool:
+        return not inspect.iscoroutinefunction(self.func)
+
+
+_tasks: dict[str, TaskSpec] = {}
+
+
+def task(name: str, queue: str = "default", priority: int = 0, max_attempts: int | None = None):
+    """Registra uma tarefa.
+
+    Funções `async` recebem `(session, payload)` e o que gravam é confirmado junto com a
+    conclusão da tarefa, sem commit próprio. Funções comuns recebem só `payload` e rodam em
+    uma thread, para trabalho bloqueante.
+    """
+
+    def registrar(funcao: Callable) -> Callable:
+        _tasks[name] = TaskSpec(name, funcao, queue, priority, max_attempts)
+        return funcao
+
+    return registrar
+
+
+def registered_tasks() -> dict[str, TaskSpec]:
+    return dict(_tasks)
+
+
+def enqueue_job(
+    session: AsyncSession,
+    name: str,
+    payload: dict | None = None,
+    *,
+    queue: str | None = None,
+    priority: int | None = None,
+    run_at: datetime | None = None,
+    max_attempts: int | None = None,
+) -> Job:
+    """Inclui a tarefa na transação da sessão; ela fica visível aos workers depois do commit."""
+
+    spec = _tasks.get(name)
+    if spec is None:
+        raise LookupError(f"Tarefa não registrada: {name}")
+    job = Job(
+        queue=queue or spec.queue,
+        task=name,
+        payload=payload or {},
+        priority=spec.priority if priority is None else priority,
+        status="queued",
+        attempts=0,
+        max_attempts=max_attempts or spec.max_attempts or job_runner.max_attempts,
+        run_at=run_at or datetime.utcnow(),
+    )
+    session.add(job)
+    session.info.setdefault("jobs", set()).add(job.queue)
+    return job
+
+
+def requeue_job(session: AsyncSession, job: Job) -> None:
+    """Devolve à fila uma tarefa morta, com as tentativas zeradas."""
+
+    job.status = "queued"
+    job.attempts = 0
+    job.run_at = datetime.utcnow()
+    job.finished_at = None
+    session.info.setdefault("jobs", set()).add(job.queue)
+
+
+class CronSchedule:
+    """Expressão cron de 5 campos com `*`, listas, intervalos e passos (`*/15`, `1-5`, `0,30`)."""
+
+    _LIMITES = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+
+    def __init__(self, expression: str) -> None:
+        campos = expression.split()
+        if len(campos) != 5:
+            raise ValueError(f"Expressão cron inválida: {expression}")
+        self.expression = expression
+        self.minutes, self.hours, self.days, self.months, dias_semana = (
+            self._campo(campo, minimo, maximo) for campo, (minimo, maximo) in zip(campos, self._LIMITES)
+        )
+        # 0 e 7 são domingo.
+        self.weekdays = {dia % 7 for dia in dias_semana}
+        self._qualquer_dia = campos[2] == "*"
+        self._qualquer_dia_semana = campos[4] == "*"
+
+    def _campo(self, texto: str, minimo: int, maximo: int) -> set[int]:
+        valores: set[int] = set()
+        for parte in texto.split(","):
+            base, _, passo = parte.partition("/")
+            if base == "*":
+                inicio, fim = minimo, maximo
+            elif "-" in base:
+                inicio, fim = (int(valor) for valor in base.split("-", 1))
+            else:
+                inicio = int(base)
+                fim = maximo if passo else inicio
+            incremento = int(passo) if passo else 1
+            if inicio < minimo or fim > maximo or inicio > fim or incremento < 1:
+                raise ValueError(f"Expressão cron inválida: {self.expression}")
+            valores.update(range(inicio, fim + 1, incremento))
+        return valores
+
+    def _dia(self, instante: datetime) -> bool:
+        no_mes = instante.day in self.days
+        na_semana = (instante.weekday() + 1) % 7 in self.weekdays
+        if self._qualquer_dia:
+            return na_semana
+        if self._qualquer_dia_semana:
+            return no_mes
+        # Como no cron: com dia do mês e da semana restritos, basta um dos dois.
+        return no_mes or na_semana
+
+    def next_after(self, instante: datetime) -> datetime:
+        """Primeiro horário da expressão estritamente depois de `instante`."""
+
+        atual = instante.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limite = atual + timedelta(days=5 * 366)
+        while atual < limite:
+            if atual.month not in self.months:
+                atual = (atual.replace(day=1, hour=0, minute=0) + timedelta(days=32)).replace(day=1)
+            elif not self._dia(atual):
+                atual = atual.replace(hour=0, minute=0) + timedelta(days=1)
+            elif atual.hour not in self.hours:
+                atual = atual.replace(minute=0) + timedelta(hours=1)
+            elif atual.minute not in self.minutes:
+                atual += timedelta(minutes=1)
+            else:
+                return atual
+        raise ValueError(f"Expressão cron sem horário válido: {self.expression}")
+
+
+@dataclass
+class _QueueStats:
+    claimed: int = 0
+    done: int = 0
+    retried: int = 0
+    dead: int = 0
+    running: int = 0
+
+
+class JobRunner:
+    """Executa as tarefas da tabela `jobs` em um `LeasedPool` por fila.
+
+    Qualquer número de processos atende a mesma fila sem disputar tarefas. Cada processo
+    reivindica só o que seus workers livres podem começar e renova a posse das tarefas em
+    execução: uma tarefa mais longa que `lease_seconds` não roda duas vezes.
+    """
+
+    def __init__(
+        self,
+        enabled: bool,
+        queues: dict[str, int],
+        poll_seconds: float,
+        lease_seconds: float,
+        max_attempts: int,
+        retry_base_seconds: float,
+        retention_days: int,
+        schedules: list[JobSchedule],
+    ) -> None:
+        self.enabled = enabled
+        self.queues = dict(queues)
+        self.poll_seconds = poll_seconds
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.retry_base_seconds = retry_base_seconds
+        self.retention_days = retention_days
+        self.schedules = {agenda.name: (agenda, CronSchedule(agenda.cron)) for agenda in schedules}
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"[:64]
+        self._proximas: dict[str, datetime] = {}
+        self._pools: dict[str, LeasedPool] = {}
+        self._agendador: asyncio.Task | None = None
+        self.stats: dict[str, _QueueStats] = {}
+        self.timings: dict[str, list[float]] = {}
+        self.scheduled = 0
+
+    @classmethod
+    def from_settings(cls, settings: Settings) -> "JobRunner":
+        return cls(
+            enabled=settings.jobs_enabled,
+            queues=settings.jobs_queues,
+            poll_seconds=settings.jobs_poll_seconds,
+            lease_seconds=settings.jobs_lease_seconds,
+            max_attempts=settings.jobs_max_attempts,
+            retry_base_seconds=settings.jobs_retry_base_seconds,
+            retention_days=settings.jobs_retention_days,
+            schedules=settings.jobs_schedules,
+        )
+
+    @property
+    def running(self) -> bool:
+        return any(pool.running for pool in self._pools.values())
+
+    def _stats(self, queue: str) -> _QueueStats:
+        return self.stats.setdefault(queue, _QueueStats())
+
+    def wake(self, queues: set[str]) -> None:
+        for queue in queues:
+            if queue in self._pools:
+                self._pools[queue].wake()
+
+    async def claim(self, session: AsyncSession, queue: str, limit: int) -> list:
+        """Reivindica até `limit` tarefas vencidas da fila, por prioridade e horário."""
+
+        agora = datetime.utcnow()
+        vencidas = and_(
+            Job.queue == queue,
+            or_(
+                and_(Job.status == "queued", Job.run_at <= agora),
+                # Worker que caiu com a tarefa em execução: retoma depois do prazo de posse.
+                and_(Job.status == "running", Job.locked_until <= agora),
+            ),
+        )
+        jobs = await claim_rows(
+            session,
+            Job,
+            vencidas,
+            order_by=(Job.priority.desc(), Job.run_at, Job.id),
+            limit=limit,
+            values={
+                "status": "running",
+                "attempts": Job.attempts + 1,
+                "locked_until": agora + timedelta(seconds=self.lease_seconds),
+                "worker": self.worker_id,
+                "started_at": agora,
+            },
+            returning=(Job.id, Job.queue, Job.task, Job.payload, Job.attempts, Job.max_attempts, Job.priority),
+        )
+        jobs = sorted(jobs, key=lambda job: (-job.priority, job.id))
+        await session.commit()
+        self._stats(queue).claimed += len(jobs)
+        return jobs
+
+    async def execute(self, session_factory: sessionmaker, job) -> bool:
+        """Executa a tarefa reivindicada; em caso de erro agenda nova tentativa ou a marca como morta."""
+
+        stats = self._stats(job.queue)
+        stats.running += 1
+        inicio = time.perf_counter()
+        try:
+            spec = _tasks.get(job.task)
+            if spec is None:
+                raise LookupError(f"Tarefa não registrada: {job.task}")
+            async with session_factory() as session:
+                if spec.threaded:
+                    resultado = await asyncio.to_thread(spec.func, job.payload or {})
+                else:
+                    resultado = await spec.func(session, job.payload or {})
+                duracao = (time.perf_counter() - inicio) * 1000
+                await session.execute(
+                    update(Job)
+                    .where(Job.id == job.id)
+                    .values(
+                        status="done",
+                        result=resultado,
+                        last_error=None,
+                        locked_until=None,
+                        finished_at=datetime.utcnow(),
+                        duration_ms=duracao,
+                    )
+                )
+                await session.commit()
+        except Exception as exc:  # pylint: disable=broad-except
+            await self._falhou(session_factory, job, exc, (time.perf_counter() - inicio) * 1000)
+            return False
+        finally:
+            stats.running -= 1
+        stats.done += 1
+        tempos = self.timings.setdefault(job.task, [0, 0.0, 0.0])
+        tempos[0] += 1
+        tempos[1] += duracao
+        tempos[2] = max(tempos[2], duracao)
+        return True
+
+    async def _falhou(self, session_factory: sessionmaker, job, exc: Exception, duracao: float) -> None:
+        agora = datetime.utcnow()
+        valores = {"last_error": f"{type(exc).__name__}: {exc}"[:1000], "locked_until": None, "duration_ms": duracao}
+        if job.attempts >= job.max_attempts:
+            self._stats(job.queue).dead += 1
+            valores.update(status="dead", finished_at=agora)
+            logger.error("Tarefa %s (%s) morta após %s tentativas: %s", job.id, job.task, job.attempts, exc)
+        else:
+            self._stats(job.queue).retried += 1
+            espera = backoff(self.retry_base_seconds, job.attempts)
+            valores.update(status="queued", run_at=agora + timedelta(seconds=espera))
+            logger.warning("Tarefa %s (%s) falhou na tentativa %s: %s", job.id, job.task, job.attempts, exc)
+        try:
+            async with session_factory() as session:
+                await session.execute(update(Job).where(Job.id == job.id).values(**valores))
+                await session.commit()
+        except Exception:  # pylint: disable=broad-except
+            logger.exception("Falha ao registrar o erro da tarefa %s", job.id)
+
+    async def run_pending(self, session_factory: sessionmaker, queue: str | None = None) -> int:
+        """Executa neste processo, em sequência, as tarefas vencidas (comandos e testes)."""
+
+        total = 0
+        for fila in [queue] if queue else sorted(self.queues):
+            while True:
+                async with session_factory() as session:
+                    jobs = await self.claim(session, fila, max(self.queues.get(fila, 1), 1) * 10)
+                if not jobs:
+                    break
+                for job in jobs:
+                    await self.execute(session_factory, job)
+                total += len(jobs)
+        return total
+
+    async def schedule_due(self, session_factory: sessionmaker, agora: datetime | None = None) -> int:
+        """Enfileira as execuções agendadas que venceram; cada horário entra uma vez entre todos os processos."""
+
+        agora = agora or datetime.utcnow()
+        linhas = []
+        for nome, (agenda, cron) in self.schedules.items():
+            proxima = self._proximas.get(nome)
+            if proxima is None:
+                self._proximas[nome] = cron.next_after(agora)
+                continue
+            if proxima > agora:
+                continue
+            spec = _tasks.get(agenda.task)
+            if spec is None:
+                logger.error("Agendamento %s aponta para tarefa não registrada: %s", nome, agenda.task)
+            else:
+                linhas.append(
+                    {
+                        "queue": agenda.queue or spec.queue,
+                        "task": agenda.task,
+                        "payload": agenda.payload,
+                        "priority": agenda.priority,
+                        "status": "queued",
+                        "attempts": 0,
+                        "max_attempts": spec.max_attempts or self.max_attempts,
+                        "run_at": proxima,
+                        "dedupe_key": f"{nome}:{proxima:%Y-%m-%dT%H:%M}",
+                        "created_at": agora,
+                    }
+                )
+            # Horários perdidos com o processo parado não são recuperados.
+            self._proximas[nome] = cron.next_after(agora)
+        if not linhas:
+            return 0
+        async with session_factory() as session:
+            dialect = session.get_bind().dialect.name
+            insert = pg_insert if dialect == "postgresql" else sqlite_insert
+            result = await session.execute(
+                insert(Job).on_conflict_do_nothing(index_elements=["dedupe_key"]).returning(Job.id), linhas
+            )
+            novas = len(result.all())
+            await session.commit()
+        self.scheduled += novas
+        self.wake({linha["queue"] for linha in linhas})
+        return novas
+
+    async def queue_stats(self, session: AsyncSession) -> dict:
+        """Profundidade de cada fila e tempos por tarefa nas últimas 24 horas, lidos da tabela."""
+
+        agora = datetime.utcnow()
+        result = await session.execute(
+            select(
+                Job.queue,
+                Job.status,
+                func.count(),
+                func.min(Job.run_at),
+                func.sum(case((Job.run_at <= agora, 1), else_=0)),
+            ).group_by(Job.queue, Job.status)
+        )
+        filas: dict[str, dict] = {}
+        for queue, status, quantidade, mais_antiga, vencidas in result.all():
+            fila = filas.setdefault(queue, {"workers": self.queues.get(queue, 0)})
+            fila[status] = quantidade
+            if status == "queued":
+                fila["ready"] = int(vencidas or 0)
+                fila["oldest_ready_seconds"] = (
+                    round(max((agora - mais_antiga).total_seconds(), 0.0), 3) if vencidas else 0.0
+                )
+        result = await session.execute(
+            select(
+                Job.task,
+                func.count(),
+                func.avg(Job.duration_ms),
+                func.max(Job.duration_ms),
+                func.avg(Job.attempts),
+            )
+            .where(Job.status == "done", Job.finished_at >= agora - timedelta(days=1))
+            .group_by(Job.task)
+        )
+        tarefas = {
+            nome: {
+                "done_24h": quantidade,
+                "avg_ms": round(media or 0.0, 3),
+                "max_ms": round(maximo or 0.0, 3),
+                "avg_attempts": round(float(tentativas or 0), 2),
+            }
+            for nome, quantidade, media, maximo, tentativas in result.all()
+        }
+        return {"queues": filas, "tasks": tarefas}
+
+    def metrics(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "running": self.running,
+            "worker": self.worker_id,
+            "queues": {
+                queue: {
+                    "workers": self.queues.get(queue, 0),
+                    "local_queue": self._pools[queue].local_queue if queue in self._pools else 0,
+                    **vars(stats),
+                }
+                for queue, stats in sorted(self.stats.items())
+            },
+            "tasks": {
+                nome: {"executed": total, "avg_ms": round(soma / total, 3), "max_ms": round(maximo, 3)}
+                for nome, (total, soma, maximo) in sorted(self.timings.items())
+                if total
+            },
+            "scheduled": self.scheduled,
+            "next_runs": {nome: proxima.isoformat() for nome, proxima in sorted(self._proximas.items())},
+        }
+
+    async def _reivindicar(self, session_factory: sessionmaker, queue: str, limit: int) -> list:
+        async with session_factory() as session:
+            return await self.claim(session, queue, limit)
+
+    async def _renovar(self, session_factory: sessionmaker, ids: list[int]) -> None:
+        async with session_factory() as session:
+            await session.execute(
+                update(Job)
+                .where(Job.id.in_(ids), Job.status == "running", Job.worker == self.worker_id)
+                .values(locked_until=datetime.utcnow() + timedelta(seconds=self.lease_seconds))
+            )
+            await session.commit()
+
+    async def _agendar(self, session_factory: sessionmaker) -> None:
+        while True:
+            try:
+                await self.schedule_due(session_factory)
+            except Exception:  # pylint: disable=broad-except
+                logger.exception("Falha ao enfileirar tarefas agendadas")
+            agora = datetime.utcnow()
+            espera = min(
+                [(proxima - agora).total_seconds() for proxima in self._proximas.values()] + [60.0]
+            )
+            await asyncio.sleep(max(espera, 1.0))
+
+    async def _liberar(self, session_factory: sessionmaker, jobs: list) -> None:
+        """Devolve à fila as tarefas reivindicadas que não chegaram a começar."""
+
+        async with session_factory() as session:
+            await session.execute(
+                update(Job)
+                .where(Job.id.in_([job.id for job in jobs]), Job.status == "running")
+                .values(status="queued", attempts=Job.attempts - 1, locked_until=None, run_at=datetime.utcnow())
+            )
+            await session.commit()
+
+    def start(self, session_factory: sessionmaker, queues: dict[str, int] | None = None, schedule: bool = True) -> None:
+        if self._pools or self._agendador is not None:
+            return
+        if queues is not None:
+            self.queues = dict(queues)
+        for queue, workers in self.queues.items():
+            if workers <= 0:
+                continue
+            # Reivindica só o que os workers livres podem começar: o resto fica para outros processos.
+            self._pools[queue] = LeasedPool(
+                queue,
+                workers=workers,
+                prefetch=workers,
+                poll_seconds=self.poll_seconds,
+                lease_seconds=self.lease_seconds,
+                claim=partial(self._reivindicar, session_factory, queue),
+                execute=partial(self.execute, session_factory),
+                renew=partial(self._renovar, session_factory),
+                release=partial(self._liberar, session_factory),
+            )
+            self._pools[queue].start()
+        if schedule and self.schedules:
+            self._agendador = asyncio.create_task(self._agendar(session_factory))
+
+    async def stop(self) -> None:
+        if self._agendador is not None:
+            agendador, self._agendador = self._agendador, None
+            agendador.cancel()
+            await asyncio.gather(agendador, return_exceptions=True)
+        pools, self._pools = self._pools, {}
+        await asyncio.gather(*(pool.stop() for pool in pools.values()))
+
+
+job_runner = JobRunner.from_settings(get_settings())
+
+
+@task("jobs.cleanup")
+async def _limpar_concluidas(session: AsyncSession, payload: dict) -> dict:
+    dias = payload.get("days", job_runner.retention_days)
+    result = await session.execute(
+        delete(Job).where(Job.status == "done", Job.finished_at < datetime.utcnow() - timedelta(days=dias))
+    )
+    return {"removed": result.rowcount}
+
+
+wake_after_commit("jobs", job_runner.wake)
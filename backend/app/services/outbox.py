@@ -0,0 +1,263 @@
+import logging
+import time
+from datetime import datetime, timedelta
+from functools import partial
+from typing import Awaitable, Callable
+
+from sqlalchemy import and_, delete, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from app.core.config import Settings, get_settings
+from app.models.outbox import OutboxMessage
+from app.services.work_queue import LeasedPool, backoff, claim_rows, wake_after_commit
+
+logger = logging.getLogger("pdv")
+
+Handler = Callable[[AsyncSession, dict], Awaitable[None]]
+
+_handlers: dict[str, Handler] = {}
+_PENDENTES = ("pending", "processing")
+
+
+def handler(topic: str) -> Callable[[Handler], Handler]:
+    """Registra a função que despacha as mensagens de `topic`.
+
+    O que a função grava na sessão é confirmado junto com a remoção da mensagem, então ela
+    não deve fazer commit. Efeitos externos (SEFAZ, impressora) podem se repetir se esse
+    commit falhar.
+    """
+
+    def registrar(funcao: Handler) -> Handler:
+        _handlers[topic] = funcao
+        return funcao
+
+    return registrar
+
+
+def enqueue(session: AsyncSession, topic: str, payload: dict) -> None:
+    """Inclui a mensagem na transação da sessão; o despacho começa depois do commit."""
+
+    session.add(
+        OutboxMessage(topic=topic, payload=payload, status="pending", attempts=0, available_at=datetime.utcnow())
+    )
+    session.info["outbox"] = True
+
+
+class OutboxDispatcher:
+    """Reivindica as mensagens vencidas do outbox e as despacha em um `LeasedPool`.
+
+    Vários processos despacham o mesmo outbox sem disputar mensagens; a posse de cada
+    mensagem é renovada enquanto o despacho estiver em andamento.
+    """
+
+    def __init__(
+        self,
+        enabled: bool,
+        workers: int,
+        batch_size: int,
+        poll_seconds: float,
+        lease_seconds: float,
+        max_attempts: int,
+        retry_base_seconds: float,
+    ) -> None:
+        self.enabled = enabled
+        self.workers = workers
+        self.batch_size = batch_size
+        self.poll_seconds = poll_seconds
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.retry_base_seconds = retry_base_seconds
+        self._pool: LeasedPool | None = None
+        self.claimed = 0
+        self.dispatched = 0
+        self.retried = 0
+        self.failed = 0
+        self.topics: dict[str, int] = {}
+        self.dispatch_ms_total = 0.0
+        self.dispatch_ms_max = 0.0
+        self.last_dispatch_ms = 0.0
+
+    @classmethod
+    def from_settings(cls, settings: Settings) -> "OutboxDispatcher":
+        return cls(
+            enabled=settings.outbox_enabled,
+            workers=settings.outbox_workers,
+            batch_size=settings.outbox_batch_size,
+            poll_seconds=settings.outbox_poll_seconds,
+            lease_seconds=settings.outbox_lease_seconds,
+            max_attempts=settings.outbox_max_attempts,
+            retry_base_seconds=settings.outbox_retry_base_seconds,
+        )
+
+    @property
+    def running(self) -> bool:
+        return self._pool is not None and self._pool.running
+
+    def wake(self) -> None:
+        if self._pool is not None:
+            self._pool.wake()
+
+    async def claim(self, session: AsyncSession, limit: int) -> list:
+        """Marca até `limit` mensagens vencidas como em processamento e as devolve."""
+
+        agora = datetime.utcnow()
+        mensagens = await claim_rows(
+            session,
+            OutboxMessage,
+            and_(OutboxMessage.status.in_(_PENDENTES), OutboxMessage.available_at <= agora),
+            order_by=(OutboxMessage.available_at, OutboxMessage.id),
+            limit=limit,
+            values={
+                "status": "processing",
+                "attempts": OutboxMessage.attempts + 1,
+                "available_at": agora + timedelta(seconds=self.lease_seconds),
+            },
+            returning=(OutboxMessage.id, OutboxMessage.topic, OutboxMessage.payload, OutboxMessage.attempts),
+        )
+        await session.commit()
+        self.claimed += len(mensagens)
+        return mensagens
+
+    async def dispatch(self, session_factory: sessionmaker, mensagem) -> bool:
+        """Executa a mensagem reivindicada; em caso de erro agenda nova tentativa ou a marca como falha."""
+
+        inicio = time.perf_counter()
+        try:
+            funcao = _handlers.get(mensagem.topic)
+            if funcao is None:
+                raise LookupError(f"Tópico sem despachante: {mensagem.topic}")
+            async with session_factory() as session:
+                await funcao(session, mensagem.payload)
+                await session.execute(delete(OutboxMessage).where(OutboxMessage.id == mensagem.id))
+                await session.commit()
+        except Exception as exc:  # pylint: disable=broad-except
+            await self._falhou(session_factory, mensagem, exc)
+            return False
+        duracao = (time.perf_counter() - inicio) * 1000
+        self.dispatched += 1
+        self.topics[mensagem.topic] = self.topics.get(mensagem.topic, 0) + 1
+        self.last_dispatch_ms = duracao
+        self.dispatch_ms_total += duracao
+        self.dispatch_ms_max = max(self.dispatch_ms_max, duracao)
+        return True
+
+    async def _falhou(self, session_factory: sessionmaker, mensagem, exc: Exception) -> None:
+        valores = {"last_error": f"{type(exc).__name__}: {exc}"[:1000]}
+        if mensagem.attempts >= self.max_attempts:
+            self.failed += 1
+            valores["status"] = "failed"
+            logger.error(
+                "Mensagem %s do outbox (%s) descartada após %s tentativas: %s",
+                mensagem.id,
+                mensagem.topic,
+                mensagem.attempts,
+                exc,
+            )
+        else:
+            self.retried += 1
+            valores["status"] = "pending"
+            espera = backoff(self.retry_base_seconds, mensagem.attempts)
+            valores["available_at"] = datetime.utcnow() + timedelta(seconds=espera)
+            logger.warning("Mensagem %s do outbox (%s) falhou: %s", mensagem.id, mensagem.topic, exc)
+        try:
+            async with session_factory() as session:
+                await session.execute(update(OutboxMessage).where(OutboxMessage.id == mensagem.id).values(**valores))
+                await session.commit()
+        except Exception:  # pylint: disable=broad-except
+            # A mensagem continua reivindicada e volta quando o prazo de posse vencer.
+            logger.exception("Falha ao registrar o erro da mensagem %s do outbox", mensagem.id)
+
+    async def dispatch_pending(self, session_factory: sessionmaker) -> int:
+        """Despacha, neste processo e em sequência, tudo o que estiver vencido (comandos e testes)."""
+
+        total = 0
+        while True:
+            async with session_factory() as session:
+                mensagens = await self.claim(session, self.batch_size)
+            if not mensagens:
+                return total
+            for mensagem in mensagens:
+                await self.dispatch(session_factory, mensagem)
+            total += len(mensagens)
+
+    async def backlog(self, session: AsyncSession) -> dict:
+        result = await session.execute(
+            select(OutboxMessage.status, func.count(), func.min(OutboxMessage.created_at)).group_by(
+                OutboxMessage.status
+            )
+        )
+        agora = datetime.utcnow()
+        return {
+            status: {
+                "count": quantidade,
+                "oldest_age_seconds": round((agora - mais_antiga).total_seconds(), 3) if mais_antiga else None,
+            }
+            for status, quantidade, mais_antiga in result.all()
+        }
+
+    def metrics(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "running": self.running,
+            "workers": self.workers,
+            "local_queue": self._pool.local_queue if self._pool is not None else 0,
+            "claimed": self.claimed,
+            "dispatched": self.dispatched,
+            "retried": self.retried,
+            "failed": self.failed,
+            "topics": dict(self.topics),
+            "last_dispatch_ms": round(self.last_dispatch_ms, 3),
+            "avg_dispatch_ms": round(self.dispatch_ms_total / self.dispatched, 3) if self.dispatched else 0.0,
+            "max_dispatch_ms": round(self.dispatch_ms_max, 3),
+        }
+
+    async def _reivindicar(self, session_factory: sessionmaker, limit: int) -> list:
+        async with session_factory() as session:
+            return await self.claim(session, limit)
+
+    async def _renovar(self, session_factory: sessionmaker, ids: list[int]) -> None:
+        async with session_factory() as session:
+            await session.execute(
+                update(OutboxMessage)
+                .where(OutboxMessage.id.in_(ids), OutboxMessage.status == "processing")
+                .values(available_at=datetime.utcnow() + timedelta(seconds=self.lease_seconds))
+            )
+            await session.commit()
+
+    async def _liberar(self, session_factory: sessionmaker, mensagens: list) -> None:
+        """Devolve ao outbox as mensagens reivindicadas que não chegaram a ser despachadas."""
+
+        async with session_factory() as session:
+            await session.execute(
+                update(OutboxMessage)
+                .where(OutboxMessage.id.in_([mensagem.id for mensagem in mensagens]))
+                .values(status="pending", attempts=OutboxMessage.attempts - 1, available_at=datetime.utcnow())
+            )
+            await session.commit()
+
+    def start(self, session_factory: sessionmaker) -> None:
+        if self._pool is None:
+            self._pool = LeasedPool(
+                "outbox",
+                workers=self.workers,
+                prefetch=self.batch_size,
+                poll_seconds=self.poll_seconds,
+                lease_seconds=self.lease_seconds,
+                claim=partial(self._reivindicar, session_factory),
+                execute=partial(self.dispatch, session_factory),
+                renew=partial(self._renovar, session_factory),
+                release=partial(self._liberar, session_factory),
+            )
+            self._pool.start()
+
+    async def stop(self) -> None:
+        if self._pool is not None:
+            pool, self._pool = self._pool, None
+            await pool.stop()
+
+
+outbox_dispatcher = OutboxDispatcher.from_settings(get_settings())
+
+
+wake_after_commit("outbox", lambda _: outbox_dispatcher.wake())
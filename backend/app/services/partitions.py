@@ -0,0 +1,137 @@
+from datetime import date
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.schema import AddConstraint, CreateIndex
+
+from app.db.base import Base
+
+# Tabelas só de inserção sem FKs apontando para elas: podem virar particionadas sem
+# reescrever o restante do esquema. Vendas, itens e pagamentos são arquivados por exclusão.
+PARTITIONED_TABLES = ("audit_logs", "stock_movements")
+
+
+def month_start(day: date) -> date:
+    return day.replace(day=1)
+
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(table: str, month: date) -> str:
+    return f"{table}_p{month:%Y%m}"
+
+
+def default_partition_name(table: str) -> str:
+    return f"{table}_default"
+
+
+async def is_partitioned(session: AsyncSession, table: str) -> bool:
+    if session.get_bind().dialect.name != "postgresql":
+        return False
+    result = await session.execute(
+        text("SELECT relkind FROM pg_class WHERE oid = to_regclass(:table)"), {"table": table}
+    )
+    return result.scalar_one_or_none() == "p"
+
+
+async def list_partitions(session: AsyncSession, table: str) -> list[str]:
+    result = await session.execute(
+        text(
+            "SELECT child.relname FROM pg_inherits "
+            "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "WHERE pg_inherits.inhparent = to_regclass(:table) ORDER BY child.relname"
+        ),
+        {"table": table},
+    )
+    return list(result.scalars())
+
+
+async def default_partition_start(session: AsyncSession, table: str) -> date | None:
+    """Mês da linha mais antiga na partição DEFAULT, ou None se ela estiver vazia ou não existir."""
+
+    padrao = default_partition_name(table)
+    if padrao not in await list_partitions(session, table):
+        return None
+    primeiro = (await session.execute(text(f"SELECT min(created_at)::date FROM {padrao}"))).scalar_one_or_none()
+    return month_start(primeiro) if primeiro else None
+
+
+async def ensure_partitions(session: AsyncSession, table: str, first: date, last: date) -> list[str]:
+    """Cria as partições mensais de `first` até `last` que ainda não existem.
+
+    Linhas do mês que caíram na partição DEFAULT são movidas para a partição nova: o
+    PostgreSQL recusa anexar um intervalo que a DEFAULT ainda contém.
+    """
+
+    criadas = []
+    existentes = set(await list_partitions(session, table))
+    padrao = default_partition_name(table)
+    month = month_start(first)
+    while month <= last:
+        name = partition_name(table, month)
+        if name not in existentes:
+            intervalo = f"FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')"
+            if padrao in existentes:
+                await session.execute(text(f"CREATE TABLE {name} (LIKE {table} INCLUDING DEFAULTS)"))
+                await session.execute(
+                    text(
+                        f"WITH movidas AS (DELETE FROM {padrao} WHERE created_at >= :inicio AND created_at < :fim "
+                        f"RETURNING *) INSERT INTO {name} SELECT * FROM movidas"
+                    ),
+                    {"inicio": month, "fim": add_months(month, 1)},
+                )
+                await session.execute(text(f"ALTER TABLE {table} ATTACH PARTITION {name} FOR VALUES {intervalo}"))
+            else:
+                await session.execute(text(f"CREATE TABLE {name} PARTITION OF {table} FOR VALUES {intervalo}"))
+            criadas.append(name)
+        month = add_months(month, 1)
+    return criadas
+
+
+async def convert_to_partitioned(session: AsyncSession, table: str, months_ahead: int) -> int:
+    """Recria a tabela particionada por mês de created_at e copia as linhas existentes."""
+
+    if await is_partitioned(session, table):
+        return 0
+    legado = f"{table}_legacy"
+    metadata_table = Base.metadata.tables[table]
+    dialect = session.get_bind().dialect
+
+    await session.execute(text(f"UPDATE {table} SET created_at = now() WHERE created_at IS NULL"))
+    await session.execute(text(f"ALTER TABLE {table} RENAME TO {legado}"))
+    await session.execute(text(f"ALTER TABLE {legado} RENAME CONSTRAINT {table}_pkey TO {legado}_pkey"))
+    await session.execute(
+        text(f"CREATE TABLE {table} (LIKE {legado} INCLUDING DEFAULTS) PARTITION BY RANGE (created_at)")
+    )
+    await session.execute(text(f"ALTER TABLE {table} ALTER COLUMN created_at SET NOT NULL"))
+    # A chave primária de uma tabela particionada precisa conter a coluna de partição.
+    await session.execute(text(f"ALTER TABLE {table} ADD PRIMARY KEY (id, created_at)"))
+    # A sequência pertence à coluna antiga e seria removida junto com a tabela legada.
+    await session.execute(text(f"ALTER SEQUENCE {table}_id_seq OWNED BY {table}.id"))
+    for constraint in metadata_table.foreign_key_constraints:
+        await session.execute(text(str(AddConstraint(constraint).compile(dialect=dialect))))
+
+    bounds = await session.execute(text(f"SELECT min(created_at)::date, now()::date FROM {legado}"))
+    primeiro, hoje = bounds.one()
+    await ensure_partitions(session, table, primeiro or hoje, add_months(month_start(hoje), months_ahead))
+    # Sem ela, um INSERT além das partições criadas falharia, e com ele a finalização da venda.
+    await session.execute(text(f"CREATE TABLE {default_partition_name(table)} PARTITION OF {table} DEFAULT"))
+
+    copiadas = await session.execute(text(f"INSERT INTO {table} SELECT * FROM {legado}"))
+    await session.execute(text(f"DROP TABLE {legado}"))
+    for index in metadata_table.indexes:
+        await session.execute(text(str(CreateIndex(index).compile(dialect=dialect))))
+    return copiadas.rowcount
+
+
+async def detach_partition(session: AsyncSession, table: str, month: date) -> str | None:
+    """Desanexa a partição do mês; a tabela resultante deve ser arquivada e removida."""
+
+    name = partition_name(table, month)
+    if name not in await list_partitions(session, table):
+        return None
+    await session.execute(text(f"ALTER TABLE {table} DETACH PARTITION {name}"))
+    return name
@@ -0,0 +1,404 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from functools import cached_property
+from datetime import datetime
+from datetime import time as hora
+
+from sqlalchemy import event, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, selectinload, sessionmaker
+
+from app.core import money
+from app.core.config import Settings, get_settings
+from app.models.promotion import Promotion, PromotionProduct
+
+logger = logging.getLogger("pdv")
+
+KINDS = ("tier", "buy_get", "mix_match", "price_list")
+UNIDADE = money.MILLI
+
+
+@dataclass(frozen=True)
+class PricingLine:
+    """Linha do carrinho em milésimos de quantidade e centavos."""
+
+    line_id: int
+    product_id: int
+    quantity: int
+    unit_price: int
+
+    @property
+    def gross(self) -> int:
+        return money.line_total(self.quantity, self.unit_price)
+
+
+@dataclass(frozen=True, eq=False)
+class PricingRule:
+    """Promoção compilada: filtros de vigência e cálculo do desconto por linha."""
+
+    promotion_id: int
+    kind: str
+    products: frozenset[int]
+    prices: dict[int, int] = field(default_factory=dict)
+    customer_id: int | None = None
+    starts_at: datetime | None = None
+    ends_at: datetime | None = None
+    daily_start: hora | None = None
+    daily_end: hora | None = None
+    weekdays: frozenset[int] | None = None
+    # Quantidades em milésimos, percentual em pontos-base e preços em centavos.
+    min_quantity: int = UNIDADE
+    get_quantity: int = 0
+    percent_off: int = 0
+    bundle_price: int | None = None
+
+    @cached_property
+    def restricted(self) -> bool:
+        """Se há cliente ou vigência a conferir antes de avaliar a regra."""
+
+        return self.customer_id is not None or any(
+            filtro is not None
+            for filtro in (self.starts_at, self.ends_at, self.weekdays, self.daily_start, self.daily_end)
+        )
+
+    @classmethod
+    def from_promotion(cls, promotion: Promotion) -> "PricingRule":
+        return cls(
+            promotion_id=promotion.id,
+            kind=promotion.kind,
+            products=frozenset(item.product_id for item in promotion.products),
+            prices={
+                item.product_id: money.cents(item.price) for item in promotion.products if item.price is not None
+            },
+            customer_id=promotion.customer_id,
+            starts_at=promotion.starts_at,
+            ends_at=promotion.ends_at,
+            daily_start=promotion.daily_start,
+            daily_end=promotion.daily_end,
+            weekdays=frozenset(int(dia) for dia in promotion.weekdays) if promotion.weekdays else None,
+            min_quantity=money.milli(promotion.min_quantity or 1),
+            get_quantity=money.milli(promotion.get_quantity),
+            percent_off=money.cents(promotion.percent_off),
+            bundle_price=money.cents(promotion.bundle_price) if promotion.bundle_price is not None else None,
+        )
+
+    def applies(self, now: datetime, customer_id: int | None) -> bool:
+        if self.customer_id is not None and self.customer_id != customer_id:
+            return False
+        if self.starts_at is not None and now < self.starts_at:
+            return False
+        if self.ends_at is not None and now >= self.ends_at:
+            return False
+        if self.weekdays is not None and now.weekday() not in self.weekdays:
+            return False
+        if self.daily_start is not None and self.daily_end is not None:
+            agora = now.time()
+            if self.daily_start <= self.daily_end:
+                return self.daily_start <= agora < self.daily_end
+            # Janela que passa da meia-noite (ex.: 22h às 2h).
+            return agora >= self.daily_start or agora < self.daily_end
+        return True
+
+    def allocate(self, linhas: list[PricingLine]) -> dict[int, int]:
+        """Desconto, em centavos, de cada linha do carrinho que participa da regra."""
+
+        if not linhas:
+            return {}
+        if self.kind == "price_list":
+            descontos = {}
+            for linha in linhas:
+                preco = self.prices.get(linha.product_id)
+                if preco is not None and preco < linha.unit_price:
+                    descontos[linha.line_id] = money.line_total(linha.quantity, linha.unit_price - preco)
+            return descontos
+        if self.kind == "tier":
+            if sum(linha.quantity for linha in linhas) < self.min_quantity:
+                return {}
+            return {linha.line_id: money.percent(linha.gross, self.percent_off) for linha in linhas}
+        # Os tipos por unidade consideram apenas unidades inteiras (itens pesados não entram).
+        unidades = [(linha, linha.quantity // UNIDADE) for linha in linhas if linha.quantity >= UNIDADE]
+        total_unidades = sum(quantidade for _, quantidade in unidades)
+        if self.kind == "buy_get":
+            grupo = (self.min_quantity + self.get_quantity) // UNIDADE
+            gratis = (total_unidades // grupo) * (self.get_quantity // UNIDADE) if grupo > 0 else 0
+            descontos: dict[int, int] = {}
+            # O benefício recai sobre as unidades mais baratas.
+            for linha, quantidade in sorted(unidades, key=lambda par: par[0].unit_price):
+                if gratis <= 0:
+                    break
+                usadas = min(gratis, quantidade)
+                descontos[linha.line_id] = money.percent(usadas * linha.unit_price, self.percent_off)
+                gratis -= usadas
+            return {line_id: valor for line_id, valor in descontos.items() if valor > 0}
+        if self.kind == "mix_match" and self.bundle_price is not None:
+            tamanho = self.min_quantity // UNIDADE
+            kits = total_unidades // tamanho if tamanho > 0 else 0
+            restantes = kits * tamanho
+            participantes: list[int] = []
+            pesos: list[int] = []
+            # Monta os kits com as unidades mais caras, as que mais se beneficiam do preço fechado.
+            for linha, quantidade in sorted(unidades, key=lambda par: par[0].unit_price, reverse=True):
+                if restantes <= 0:
+                    break
+                usadas = min(restantes, quantidade)
+                participantes.append(linha.line_id)
+                pesos.append(usadas * linha.unit_price)
+                restantes -= usadas
+            desconto = sum(pesos) - kits * self.bundle_price
+            if desconto <= 0:
+                return {}
+            partes = money.allocate(desconto, pesos)
+            return {line_id: parte for line_id, parte in zip(participantes, partes) if parte > 0}
+        return {}
+
+
+@dataclass
+class CartPricing:
+    """Estado de preço de um carrinho: linhas por produto e o desconto que cada regra atribuiu."""
+
+    lines: dict[int, PricingLine] = field(default_factory=dict)
+    by_product: dict[int, set[int]] = field(default_factory=dict)
+    allocations: dict[int, dict[int, int]] = field(default_factory=dict)
+    discounts: dict[int, tuple[int, int | None]] = field(default_factory=dict)
+    pending: set[int] = field(default_factory=set)
+    customer_id: int | None = None
+    version: int = -1
+
+    def add(self, line_id: int, product_id: int, quantity: int, unit_price: int) -> None:
+        """Inclui uma linha com quantidade em milésimos e preço em centavos."""
+
+        self.lines[line_id] = PricingLine(line_id, product_id, quantity, unit_price)
+        self.by_product.setdefault(product_id, set()).add(line_id)
+        self.pending.add(product_id)
+
+    def remove(self, line_id: int) -> None:
+        linha = self.lines.pop(line_id, None)
+        if linha is None:
+            return
+        ids = self.by_product.get(linha.product_id)
+        if ids is not None:
+            ids.discard(line_id)
+            if not ids:
+                del self.by_product[linha.product_id]
+        self.discounts.pop(line_id, None)
+        self.pending.add(linha.product_id)
+
+    def rename(self, ids: dict[int, int]) -> None:
+        """Troca ids provisórios pelos gravados no banco."""
+
+        if not ids:
+            return
+
+        def novo(line_id: int) -> int:
+            return ids.get(line_id, line_id)
+
+        self.lines = {
+            novo(line_id): PricingLine(novo(line_id), linha.product_id, linha.quantity, linha.unit_price)
+            for line_id, linha in self.lines.items()
+        }
+        self.by_product = {product_id: {novo(i) for i in linhas} for product_id, linhas in self.by_product.items()}
+        self.allocations = {
+            rule_id: {novo(i): valor for i, valor in alocacao.items()} for rule_id, alocacao in self.allocations.items()
+        }
+        self.discounts = {novo(i): valor for i, valor in self.discounts.items()}
+
+
+class PricingEngine:
+    """Promoções ativas compiladas em índices por produto.
+
+    A cada alteração do carrinho só as regras dos produtos alterados são recalculadas; as
+    demais mantêm o desconto já atribuído. Descontos não se acumulam: cada linha fica com
+    o maior entre as regras que a alcançam.
+    """
+
+    def __init__(self, refresh_seconds: float) -> None:
+        self.refresh_seconds = refresh_seconds
+        self.version = 0
+        self.signature: tuple | None = None
+        self.stale = True
+        self._regras: dict[int, PricingRule] = {}
+        self._por_produto: dict[int, tuple[PricingRule, ...]] = {}
+        self._lock = asyncio.Lock()
+        self._task: asyncio.Task | None = None
+        self.reprices = 0
+        self.rules_evaluated = 0
+        self.compiles = 0
+        self.last_compile_ms = 0.0
+
+    @classmethod
+    def from_settings(cls, settings: Settings) -> "PricingEngine":
+        return cls(refresh_seconds=settings.pricing_refresh_seconds)
+
+    def compile(self, regras: list[PricingRule]) -> None:
+        """Substitui as regras em uso; carrinhos abertos são recalculados por inteiro na próxima alteração."""
+
+        inicio = time.perf_counter()
+        por_produto: dict[int, list[PricingRule]] = {}
+        for regra in regras:
+            for product_id in regra.products:
+                por_produto.setdefault(product_id, []).append(regra)
+        self._regras = {regra.promotion_id: regra for regra in regras}
+        self._por_produto = {product_id: tuple(lista) for product_id, lista in por_produto.items()}
+        self.version += 1
+        self.compiles += 1
+        self.last_compile_ms = (time.perf_counter() - inicio) * 1000
+
+    def touches(self, product_ids) -> bool:
+        return any(product_id in self._por_produto for product_id in product_ids)
+
+    def reprice(
+        self, state: CartPricing, customer_id: int | None = None, now: datetime | None = None
+    ) -> dict[int, tuple[int, int | None]]:
+        """Recalcula as regras afetadas pelas linhas alteradas; devolve só os descontos que mudaram."""
+
+        now = now or datetime.now()
+        if state.version != self.version or state.customer_id != customer_id:
+            state.allocations.clear()
+            state.pending = set(state.by_product)
+            state.version = self.version
+            state.customer_id = customer_id
+        alterados, state.pending = state.pending, set()
+        self.reprices += 1
+
+        por_produto = self._por_produto
+        regras: dict[int, PricingRule] = {}
+        for product_id in alterados:
+            for regra in por_produto.get(product_id, ()):
+                regras[regra.promotion_id] = regra
+        linhas_por_produto = state.by_product
+        alocacoes = state.allocations
+        afetadas: set[int] = set()
+        for regra in regras.values():
+            anterior = alocacoes.pop(regra.promotion_id, None)
+            if anterior:
+                afetadas.update(anterior)
+            if regra.restricted and not regra.applies(now, customer_id):
+                continue
+            linhas = [
+                state.lines[line_id]
+                for product_id in regra.products
+                if product_id in linhas_por_produto
+                for line_id in linhas_por_produto[product_id]
+            ]
+            alocacao = regra.allocate(linhas)
+            self.rules_evaluated += 1
+            if alocacao:
+                alocacoes[regra.promotion_id] = alocacao
+                afetadas.update(alocacao)
+        for product_id in alterados:
+            afetadas.update(linhas_por_produto.get(product_id, ()))
+
+        sem_desconto: tuple[int, int | None] = (0, None)
+        mudancas: dict[int, tuple[int, int | None]] = {}
+        for line_id in afetadas:
+            linha = state.lines.get(line_id)
+            if linha is None:
+                continue
+            melhor = sem_desconto
+            for regra in por_produto.get(linha.product_id, ()):
+                alocacao = alocacoes.get(regra.promotion_id)
+                valor = alocacao.get(line_id) if alocacao else None
+                if valor is not None and valor > melhor[0]:
+                    melhor = (min(valor, linha.gross), regra.promotion_id)
+            if state.discounts.get(line_id, sem_desconto) != melhor:
+                mudancas[line_id] = melhor
+                if melhor[1] is None:
+                    state.discounts.pop(line_id, None)
+                else:
+                    state.discounts[line_id] = melhor
+        return mudancas
+
+    async def _assinatura(self, session: AsyncSession) -> tuple:
+        result = await session.execute(select(func.count(Promotion.id), func.max(Promotion.updated_at)))
+        return tuple(result.one())
+
+    async def refresh(self, session: AsyncSession) -> None:
+        """Recompila as regras quando o cadastro de promoções mudou."""
+
+        async with self._lock:
+            self.stale = False
+            assinatura = await self._assinatura(session)
+            if assinatura == self.signature:
+                return
+            result = await session.execute(
+                select(Promotion).options(selectinload(Promotion.products)).where(Promotion.is_active.is_(True))
+            )
+            agora = datetime.now()
+            self.compile(
+                [
+                    PricingRule.from_promotion(promotion)
+                    for promotion in result.scalars().all()
+                    if promotion.ends_at is None or promotion.ends_at > agora
+                ]
+            )
+            self.signature = assinatura
+
+    async def ensure_fresh(self, session: AsyncSession) -> None:
+        if self.stale or self.signature is None:
+            await self.refresh(session)
+
+    def mark_stale(self) -> None:
+        self.stale = True
+
+    def reset(self) -> None:
+        self.signature = None
+        self.stale = True
+        self.compile([])
+
+    def metrics(self) -> dict:
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "version": self.version,
+            "rules": len(self._regras),
+            "indexed_products": len(self._por_produto),
+            "compiles": self.compiles,
+            "last_compile_ms": round(self.last_compile_ms, 3),
+            "reprices": self.reprices,
+            "rules_evaluated": self.rules_evaluated,
+        }
+
+    async def _run(self, session_factory: sessionmaker) -> None:
+        while True:
+            try:
+                async with session_factory() as session:
+                    await self.refresh(session)
+            except Exception:  # pylint: disable=broad-except
+                logger.exception("Falha ao atualizar as promoções")
+            await asyncio.sleep(self.refresh_seconds)
+
+    def start(self, session_factory: sessionmaker) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(session_factory))
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+pricing_engine = PricingEngine.from_settings(get_settings())
+
+
+@event.listens_for(Session, "before_flush")
+def _registrar_promocoes(session: Session, _flush_context, _instances) -> None:
+    if any(
+        isinstance(obj, (Promotion, PromotionProduct)) for obj in (*session.new, *session.dirty, *session.deleted)
+    ):
+        session.info["pricing_changed"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _marcar_desatualizado(session: Session) -> None:
+    if session.info.pop("pricing_changed", False):
+        pricing_engine.mark_stale()
+
+
+@event.listens_for(Session, "after_rollback")
+def _descartar_alteracao(session: Session) -> None:
+    session.info.pop("pricing_changed", None)
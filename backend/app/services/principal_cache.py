@@ -0,0 +1,171 @@
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from app.core.config import Settings, get_settings
+from app.models.user import Permission, Role, User
+
+
+@dataclass(frozen=True)
+class PermissionSnapshot:
+    id: int
+    code: str
+    description: str | None
+
+
+@dataclass(frozen=True)
+class RoleSnapshot:
+    id: int
+    name: str
+    description: str | None
+    permissions: tuple[PermissionSnapshot, ...]
+
+
+@dataclass(frozen=True)
+class Principal:
+    """Cópia imutável do usuário autenticado, sem vínculo com a sessão."""
+
+    id: int
+    email: str
+    full_name: str
+    is_active: bool
+    is_superuser: bool
+    created_at: datetime | None
+    roles: tuple[RoleSnapshot, ...]
+    role_names: frozenset[str]
+    permission_codes: frozenset[str]
+
+    @classmethod
+    def from_user(cls, user: User) -> "Principal":
+        roles = tuple(
+            RoleSnapshot(
+                id=role.id,
+                name=role.name,
+                description=role.description,
+                permissions=tuple(
+                    PermissionSnapshot(id=p.id, code=p.code, description=p.description)
+                    for p in role.permissions
+                ),
+            )
+            for role in user.roles
+        )
+        return cls(
+            id=user.id,
+            email=user.email,
+            full_name=user.full_name,
+            is_active=bool(user.is_active),
+            is_superuser=bool(user.is_superuser),
+            created_at=user.created_at,
+            roles=roles,
+            role_names=frozenset(role.name for role in roles),
+            permission_codes=frozenset(p.code for role in roles for p in role.permissions),
+        )
+
+
+class PrincipalCache:
+    """Cache LRU com TTL dos usuários autenticados, indexado pelo subject do token."""
+
+    def __init__(self, ttl_seconds: float, max_entries: int) -> None:
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, tuple[float, Principal]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @classmethod
+    def from_settings(cls, settings: Settings) -> "PrincipalCache":
+        return cls(
+            ttl_seconds=settings.principal_cache_ttl_seconds,
+            max_entries=settings.principal_cache_max_entries,
+        )
+
+    def get(self, subject: str) -> Principal | None:
+        entry = self._entries.get(subject)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self._entries[subject]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(subject)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, principal: Principal) -> None:
+        if self.ttl_seconds <= 0:
+            return
+        self._entries[principal.email] = (time.monotonic() + self.ttl_seconds, principal)
+        self._entries.move_to_end(principal.email)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, *subjects: str) -> None:
+        for subject in subjects:
+            if self._entries.pop(subject, None) is not None:
+                self.invalidations += 1
+
+    def clear(self) -> None:
+        self.invalidations += len(self._entries)
+        self._entries.clear()
+
+    def metrics(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+            "invalidations": self.invalidations,
+            "ttl_seconds": self.ttl_seconds,
+        }
+
+
+principal_cache = PrincipalCache.from_settings(get_settings())
+
+
+_TODOS = "*"
+
+
+def _afetados(session: Session) -> set[str]:
+    afetados: set[str] = set()
+    for instance in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(instance, (Role, Permission)):
+            # Perfis e permissões afetam vários usuários: descarta tudo.
+            return {_TODOS}
+        if isinstance(instance, User):
+            afetados.update(inspect(instance).attrs.email.history.sum())
+            afetados.add(instance.email)
+    afetados.discard(None)
+    return afetados
+
+
+def _invalidar(afetados: set[str]) -> None:
+    if _TODOS in afetados:
+        principal_cache.clear()
+    else:
+        principal_cache.invalidate(*afetados)
+
+
+@event.listens_for(Session, "after_flush")
+def _invalidar_apos_flush(session: Session, _flush_context) -> None:
+    afetados = _afetados(session)
+    if afetados:
+        _invalidar(afetados)
+        session.info.setdefault("principal_cache", set()).update(afetados)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidar_apos_commit(session: Session) -> None:
+    # Repete após o commit: uma requisição concorrente pode ter lido o estado antigo.
+    afetados = session.info.pop("principal_cache", None)
+    if afetados:
+        _invalidar(afetados)
+
+
+@event.listens_for(Session, "after_rollback")
+def _descartar_pendentes(session: Session) -> None:
+    session.info.pop("principal_cache", None)
@@ -2,6 +2,7 @@ from datetime import datetime
 
 from escpos.printer import Network
 
+from app.core import money
 from app.models.sale import Sale
 
 
@@ -35,7 +36,7 @@ class ThermalPrinterService:
         clean_label = label[: width - len(value) - 1]
         return f"{clean_label}{'.' * (width - len(clean_label) - len(value))}{value}\n"
 
-    def _format_sale_receipt(self, sale: Sale) -> str:
+    def format_sale_receipt(self, sale: Sale) -> str:
         lines: list[str] = []
         lines.append("PDV - COMPROVANTE DE VENDA")
         lines.append(datetime.utcnow().strftime("%d/%m/%Y %H:%M UTC"))
@@ -46,23 +47,23 @@ class ThermalPrinterService:
             name = item.product.name if item.product else "Produto"
             lines.append(name[:32])
             lines.append(
-                f" x{float(item.quantity):.3f} @ {float(item.unit_price):.2f}"
-                f" = {float(item.total_price):.2f}"
+                f" x{money.format_quantity(money.milli(item.quantity))} @ {money.format_reais(item.unit_price)}"
+                f" = {money.format_reais(item.total_price)}"
             )
             lines.append("-" * 32)
 
-        subtotal = sum(float(item.total_price) for item in sale.items)
-        lines.append(self._format_line("Subtotal", f"{subtotal:.2f}"))
-        if float(sale.discount or 0) > 0:
-            lines.append(self._format_line("Desconto", f"-{float(sale.discount):.2f}"))
-        lines.append(self._format_line("Total", f"{float(sale.total):.2f}"))
+        subtotal = money.total(item.total_price for item in sale.items)
+        lines.append(self._format_line("Subtotal", money.format_cents(subtotal)))
+        if money.cents(sale.discount) > 0:
+            lines.append(self._format_line("Desconto", f"-{money.format_reais(sale.discount)}"))
+        lines.append(self._format_line("Total", money.format_reais(sale.total)))
 
         if sale.payments:
             lines.append("Pagamentos:")
             for payment in sale.payments:
                 status = "pago" if payment.paid else "pendente"
                 lines.append(
-                    f"- {payment.method}: {float(payment.amount):.2f} ({status})"
+                    f"- {payment.method}: {money.format_reais(payment.amount)} ({status})"
                 )
 
         lines.append("Obrigado pela preferência!")
@@ -71,7 +72,7 @@ class ThermalPrinterService:
     def print_sale(self, sale: Sale) -> str:
         """Gera e envia o comprovante de venda para a impressora."""
 
-        receipt = self._format_sale_receipt(sale)
+        receipt = self.format_sale_receipt(sale)
         printer = self._connect()
         printer.set(align="center", text_type="B", width=1, height=1)
         printer.text(f"{receipt}\n\n")
@@ -0,0 +1,340 @@
+import asyncio
+import bisect
+import logging
+import time
+import unicodedata
+from dataclasses import dataclass
+from decimal import ROUND_HALF_UP, Decimal
+
+from sqlalchemy import bindparam, event, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.core.config import Settings, get_settings
+from app.models.product import Product, ProductBarcode, ProductTombstone, StockItem
+from app.services.catalog_sync import current_seq
+from app.services.scale_labels import CENTAVOS, InvalidScaleLabel, ScaleLabel, ScaleLabelDecoder
+
+logger = logging.getLogger("pdv")
+
+LOTE = 5000
+
+
+@dataclass(frozen=True)
+class LookupEntry:
+    product_id: int
+    sku: str
+    name: str
+    price: Decimal
+    is_active: bool
+    plu: int | None = None
+
+
+@dataclass(frozen=True)
+class ScanMatch:
+    """Produto lido com a quantidade e o preço unitário a lançar no item."""
+
+    entry: LookupEntry
+    quantity: Decimal
+    unit_price: Decimal
+    from_scale: bool = False
+
+    @property
+    def total(self) -> Decimal:
+        return (self.quantity * self.unit_price).quantize(CENTAVOS, ROUND_HALF_UP)
+
+
+# Bloco de diacríticos combinantes (acentos, til, cedilha) removido após a decomposição.
+_SEM_ACENTOS = dict.fromkeys(range(0x300, 0x370))
+
+
+def normalize(texto: str) -> str:
+    """Minúsculas e sem acentos, para a busca por prefixo."""
+
+    if not texto.isascii():
+        texto = unicodedata.normalize("NFKD", texto).translate(_SEM_ACENTOS)
+    return texto.casefold().strip()
+
+
+class ProductLookupIndex:
+    """Índice em memória por código de barras, SKU e prefixo de SKU/nome.
+
+    Alterações gravadas neste processo marcam o índice para atualização imediata;
+    as de outros workers chegam pela verificação periódica do contador do catálogo.
+    """
+
+    def __init__(self, refresh_seconds: float, decoder: ScaleLabelDecoder | None = None) -> None:
+        self.refresh_seconds = refresh_seconds
+        self.decoder = decoder or ScaleLabelDecoder([])
+        self.seq: int | None = None
+        self.stale = True
+        self._produtos: dict[int, LookupEntry] = {}
+        self._barcodes: dict[str, tuple[int, Decimal]] = {}
+        self._skus: dict[str, int] = {}
+        self._plus: dict[int, int] = {}
+        self._codigos_por_produto: dict[int, list[str]] = {}
+        self._prefixos: list[tuple[str, int]] = []
+        self._lock = asyncio.Lock()
+        self._task: asyncio.Task | None = None
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.last_refresh_ms = 0.0
+
+    @classmethod
+    def from_settings(cls, settings: Settings) -> "ProductLookupIndex":
+        return cls(
+            refresh_seconds=settings.product_lookup_refresh_seconds,
+            decoder=ScaleLabelDecoder.from_settings(settings),
+        )
+
+    def _exato(self, code: str) -> tuple[LookupEntry, Decimal] | None:
+        encontrado = self._barcodes.get(code)
+        if encontrado is None:
+            product_id = self._skus.get(code)
+            encontrado = (product_id, Decimal("1")) if product_id is not None else None
+        return (self._produtos[encontrado[0]], encontrado[1]) if encontrado is not None else None
+
+    def _pesavel(self, code: str) -> ScanMatch | None:
+        etiqueta = self.decoder.decode(code)
+        product_id = self._plus.get(etiqueta.plu) if etiqueta is not None else None
+        if product_id is None:
+            return None
+        return self._pesar(etiqueta, self._produtos[product_id])
+
+    @staticmethod
+    def _pesar(etiqueta: ScaleLabel, entry: LookupEntry) -> ScanMatch:
+        quantidade, total = etiqueta.quantity_and_total(entry.price)
+        if quantidade <= 0:
+            raise InvalidScaleLabel("Etiqueta de balança sem peso ou valor")
+        unit_price = entry.price
+        if (quantidade * unit_price).quantize(CENTAVOS, ROUND_HALF_UP) != total:
+            # Preço alterado depois da pesagem: mantém o total impresso na etiqueta.
+            unit_price = (total / quantidade).quantize(CENTAVOS, ROUND_HALF_UP)
+        return ScanMatch(entry, quantidade, unit_price, from_scale=True)
+
+    def _contar(self, encontrado):
+        if encontrado is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return encontrado
+
+    def lookup(self, code: str) -> tuple[LookupEntry, Decimal] | None:
+        """Resolve um código lido: GTIN cadastrado primeiro, depois SKU. Devolve a quantidade da embalagem."""
+
+        return self._contar(self._exato(code))
+
+    def resolve(self, code: str) -> ScanMatch | None:
+        """Código cadastrado ou SKU; se não houver, etiqueta de balança resolvida pelo PLU."""
+
+        encontrado = self._exato(code)
+        if encontrado is not None:
+            entry, pack_quantity = encontrado
+            return self._contar(ScanMatch(entry, pack_quantity, entry.price))
+        return self._contar(self._pesavel(code))
+
+    async def resolve_plu(self, session: AsyncSession, code: str) -> ScanMatch | None:
+        """Etiqueta de balança cujo PLU não está no índice: consulta `products.plu` no banco.
+
+        Cobre o PLU cadastrado por outro worker depois da última atualização do índice.
+        """
+
+        etiqueta = self.decoder.decode(code)
+        if etiqueta is None:
+            return None
+        result = await session.execute(
+            select(Product.id, Product.sku, Product.name, Product.price, Product.is_active, Product.plu).where(
+                Product.plu == etiqueta.plu
+            )
+        )
+        row = result.first()
+        if row is None:
+            return None
+        entry = LookupEntry(row.id, row.sku, row.name, Decimal(str(row.price)), bool(row.is_active), row.plu)
+        return self._pesar(etiqueta, entry)
+
+    def search(self, prefix: str, limit: int = 20) -> list[LookupEntry]:
+        chave = normalize(prefix)
+        if not chave:
+            return []
+        encontrados: dict[int, LookupEntry] = {}
+        posicao = bisect.bisect_left(self._prefixos, (chave, -1))
+        while posicao < len(self._prefixos) and len(encontrados) < limit:
+            texto, product_id = self._prefixos[posicao]
+            if not texto.startswith(chave):
+                break
+            encontrados.setdefault(product_id, self._produtos[product_id])
+            posicao += 1
+        return list(encontrados.values())
+
+    def _chaves(self, entry: LookupEntry) -> set[tuple[str, int]]:
+        return {(normalize(entry.sku), entry.product_id), (normalize(entry.name), entry.product_id)}
+
+    def _remover(self, product_id: int) -> None:
+        entry = self._produtos.pop(product_id, None)
+        if entry is None:
+            return
+        if self._skus.get(entry.sku) == product_id:
+            del self._skus[entry.sku]
+        if entry.plu is not None and self._plus.get(entry.plu) == product_id:
+            del self._plus[entry.plu]
+        for code in self._codigos_por_produto.pop(product_id, []):
+            if self._barcodes.get(code, (None,))[0] == product_id:
+                del self._barcodes[code]
+        for chave in self._chaves(entry):
+            posicao = bisect.bisect_left(self._prefixos, chave)
+            if posicao < len(self._prefixos) and self._prefixos[posicao] == chave:
+                del self._prefixos[posicao]
+
+    def _inserir(self, entry: LookupEntry, codigos: list[tuple[str, Decimal]], ordenar: bool = True) -> None:
+        self._produtos[entry.product_id] = entry
+        self._skus[entry.sku] = entry.product_id
+        if entry.plu is not None:
+            self._plus[entry.plu] = entry.product_id
+        self._codigos_por_produto[entry.product_id] = [code for code, _ in codigos]
+        for code, pack_quantity in codigos:
+            self._barcodes[code] = (entry.product_id, pack_quantity)
+        for chave in self._chaves(entry):
+            if ordenar:
+                bisect.insort(self._prefixos, chave)
+            else:
+                self._prefixos.append(chave)
+
+    async def _carregar(self, session: AsyncSession, since: int) -> tuple[list[LookupEntry], dict, list[int]]:
+        entries: list[LookupEntry] = []
+        ultimo = 0
+        while True:
+            result = await session.execute(
+                select(Product.id, Product.sku, Product.name, Product.price, Product.is_active, Product.plu)
+                .where(Product.id > ultimo, Product.change_seq > since)
+                .order_by(Product.id)
+                .limit(LOTE)
+            )
+            lote = result.all()
+            if not lote:
+                break
+            entries.extend(
+                LookupEntry(row.id, row.sku, row.name, Decimal(str(row.price)), bool(row.is_active), row.plu)
+                for row in lote
+            )
+            ultimo = lote[-1].id
+
+        codigos: dict[int, list[tuple[str, Decimal]]] = {}
+        consulta = select(ProductBarcode.product_id, ProductBarcode.code, ProductBarcode.pack_quantity)
+        if since:
+            consulta = consulta.join(Product).where(Product.change_seq > since)
+        for product_id, code, pack_quantity in (await session.execute(consulta)).all():
+            codigos.setdefault(product_id, []).append((code, Decimal(str(pack_quantity))))
+
+        removidos: list[int] = []
+        if since:
+            result = await session.execute(
+                select(ProductTombstone.product_id).where(ProductTombstone.change_seq > since)
+            )
+            removidos = list(result.scalars())
+        return entries, codigos, removidos
+
+    async def refresh(self, session: AsyncSession) -> None:
+        """Carrega o catálogo na primeira chamada e depois só os produtos alterados desde `seq`."""
+
+        async with self._lock:
+            self.stale = False
+            seq = await current_seq(session)
+            if self.seq is not None and seq == self.seq:
+                return
+            inicio = time.perf_counter()
+            since = self.seq or 0
+            entries, codigos, removidos = await self._carregar(session, since)
+            if not since:
+                self._produtos, self._barcodes, self._skus, self._plus = {}, {}, {}, {}
+                self._codigos_por_produto, self._prefixos = {}, []
+                for entry in entries:
+                    self._inserir(entry, codigos.get(entry.product_id, []), ordenar=False)
+                self._prefixos.sort()
+            else:
+                for product_id in removidos:
+                    self._remover(product_id)
+                for entry in entries:
+                    self._remover(entry.product_id)
+                    self._inserir(entry, codigos.get(entry.product_id, []))
+            self.seq = seq
+            self.refreshes += 1
+            self.last_refresh_ms = (time.perf_counter() - inicio) * 1000
+
+    async def ensure_fresh(self, session: AsyncSession) -> None:
+        if self.stale or self.seq is None:
+            await self.refresh(session)
+
+    def mark_stale(self) -> None:
+        self.stale = True
+
+    def reset(self) -> None:
+        """Esquece o catálogo carregado; a próxima leitura recarrega tudo (ex.: banco restaurado)."""
+
+        self.seq = None
+        self.stale = True
+
+    def metrics(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "seq": self.seq,
+            "products": len(self._produtos),
+            "barcodes": len(self._barcodes),
+            "plus": len(self._plus),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+            "refreshes": self.refreshes,
+            "last_refresh_ms": round(self.last_refresh_ms, 3),
+        }
+
+    async def _run(self, session_factory: sessionmaker) -> None:
+        while True:
+            try:
+                async with session_factory() as session:
+                    await self.refresh(session)
+            except Exception:  # pylint: disable=broad-except
+                logger.exception("Falha ao atualizar o índice de produtos")
+            await asyncio.sleep(self.refresh_seconds)
+
+    def start(self, session_factory: sessionmaker) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(session_factory))
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+product_lookup = ProductLookupIndex.from_settings(get_settings())
+
+
+# Montada uma vez e executada direto na conexão: a leitura do caixa não paga a construção
+# da consulta nem o processamento de resultados da sessão a cada produto.
+_SALDO = select(func.coalesce(func.sum(StockItem.quantity), 0)).where(
+    StockItem.product_id == bindparam("product_id")
+)
+
+
+async def on_hand(session: AsyncSession, product_id: int) -> Decimal:
+    connection = await session.connection()
+    result = await connection.execute(_SALDO, {"product_id": product_id})
+    return Decimal(str(result.scalar_one()))
+
+
+@event.listens_for(Session, "after_commit")
+def _marcar_desatualizado(session: Session) -> None:
+    if session.info.pop("catalog_changed", False):
+        product_lookup.mark_stale()
+
+
+@event.listens_for(Session, "after_rollback")
+def _descartar_alteracao(session: Session) -> None:
+    session.info.pop("catalog_changed", None)
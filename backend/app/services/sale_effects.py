@@ -0,0 +1,97 @@
+"""Efeitos de uma venda finalizada, gravados na mesma transação e executados depois do commit.
+
+Os totais diários vão pelo outbox; a NFC-e e o cupom viram tarefas das filas `fiscal` e
+`print` do `job_runner`, com workers, prioridade e tentativas próprios.
+"""
+
+import asyncio
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from app.models.fiscal import FiscalDocument, FiscalEvent
+from app.models.sale import Sale, SaleItem
+from app.schemas.fiscal import InvoiceOptions, InvoiceRequest
+from app.schemas.printer import PrinterConfig
+from app.services import jobs, outbox
+from app.services.fiscal import fiscal_service
+from app.services.printer import ThermalPrinterService
+from app.services.sales_rollup import record_sale
+
+
+def enqueue_sale_effects(
+    session: AsyncSession,
+    sale: Sale,
+    invoice: InvoiceOptions | None = None,
+    printer: PrinterConfig | None = None,
+) -> None:
+    outbox.enqueue(session, "sales_rollup", {"sale_id": sale.id, "sign": 1})
+    if invoice is not None:
+        jobs.enqueue_job(
+            session, "fiscal.emit_nfce", {"sale_id": sale.id, "invoice": invoice.model_dump(mode="json")}
+        )
+    if printer is not None:
+        jobs.enqueue_job(session, "print.sale", {"sale_id": sale.id, "printer": printer.model_dump()})
+
+
+async def _carregar_venda(session: AsyncSession, sale_id: int) -> Sale | None:
+    result = await session.execute(
+        select(Sale)
+        .options(
+            selectinload(Sale.items).selectinload(SaleItem.product),
+            selectinload(Sale.payments),
+        )
+        .where(Sale.id == sale_id)
+    )
+    return result.scalar_one_or_none()
+
+
+@outbox.handler("sales_rollup")
+async def _atualizar_totais(session: AsyncSession, payload: dict) -> None:
+    # Sem checar o status: o estorno do cancelamento é somado à parte e os dois se compensam.
+    sale = await _carregar_venda(session, payload["sale_id"])
+    if sale is not None:
+        await record_sale(session, sale, sign=payload["sign"])
+
+
+@jobs.task("fiscal.emit_nfce", queue="fiscal", priority=10)
+async def emit_nfce(session: AsyncSession, payload: dict) -> None:
+    resultado = await fiscal_service.emit_invoice(InvoiceRequest(sale_id=payload["sale_id"], **payload["invoice"]))
+    if not resultado.success:
+        status = "rejected"
+    elif resultado.contingency:
+        status = "contingency"
+        # A resposta da SEFAZ pode ter chegado antes desta NFC-e: o retransmissor a vincula após o commit.
+        session.info["contingency"] = True
+    else:
+        status = "authorized"
+    session.add(
+        FiscalDocument(
+            sale_id=payload["sale_id"],
+            model="NFC-e",
+            status=status,
+            protocol=resultado.protocol,
+            access_key=resultado.access_key,
+            events=[FiscalEvent(type="emission", status=status, message=resultado.message)],
+        )
+    )
+
+
+@jobs.task("print.sale", queue="print", priority=10, max_attempts=3)
+async def print_receipt(session: AsyncSession, payload: dict) -> None:
+    sale = await _carregar_venda(session, payload["sale_id"])
+    if sale is not None:
+        impressora = ThermalPrinterService(**payload["printer"])
+        await asyncio.to_thread(impressora.print_sale, sale)
+
+
+@outbox.handler("nfce")
+async def _encaminhar_nfce(session: AsyncSession, payload: dict) -> None:
+    # Mensagens gravadas antes de a NFC-e virar tarefa: seguem para a fila fiscal.
+    jobs.enqueue_job(session, "fiscal.emit_nfce", payload)
+
+
+@outbox.handler("print")
+async def _encaminhar_impressao(session: AsyncSession, payload: dict) -> None:
+    jobs.enqueue_job(session, "print.sale", payload)
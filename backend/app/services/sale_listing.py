@@ -0,0 +1,97 @@
+import base64
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta
+from typing import Literal, Sequence
+
+from sqlalchemy import select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from app.models.sale import Sale
+from app.schemas import sale as sale_schema
+
+SaleExpand = Literal["items", "payments"]
+
+
+@dataclass
+class SaleFilters:
+    status: str | None = None
+    cash_register_id: int | None = None
+    cashier_id: int | None = None
+    customer_id: int | None = None
+    date_from: date | None = None
+    date_to: date | None = None
+
+
+def encode_cursor(sale: Sale) -> str:
+    raw = f"{sale.created_at.isoformat()}|{sale.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    """Converte o cursor opaco em (created_at, id); levanta ValueError se inválido."""
+
+    try:
+        created_at, sale_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), int(sale_id)
+    except (UnicodeDecodeError, ValueError) as exc:
+        raise ValueError("Cursor inválido") from exc
+
+
+def _summary(sale: Sale, expand: Sequence[SaleExpand]) -> sale_schema.SaleSummary:
+    return sale_schema.SaleSummary(
+        id=sale.id,
+        code=sale.code,
+        status=sale.status,
+        total=float(sale.total or 0),
+        discount=float(sale.discount or 0),
+        created_at=sale.created_at,
+        customer_id=sale.customer_id,
+        cashier_id=sale.cashier_id,
+        cash_register_id=sale.cash_register_id,
+        items=[sale_schema.SaleItem.model_validate(item) for item in sale.items] if "items" in expand else None,
+        payments=(
+            [sale_schema.Payment.model_validate(payment) for payment in sale.payments]
+            if "payments" in expand
+            else None
+        ),
+    )
+
+
+async def list_sales_page(
+    session: AsyncSession,
+    filters: SaleFilters,
+    *,
+    limit: int,
+    cursor: str | None = None,
+    expand: Sequence[SaleExpand] = (),
+) -> sale_schema.SalePage:
+    """Lista vendas da mais recente para a mais antiga usando paginação por chave (created_at, id)."""
+
+    stmt = select(Sale).order_by(Sale.created_at.desc(), Sale.id.desc()).limit(limit + 1)
+    if filters.status:
+        stmt = stmt.where(Sale.status == filters.status)
+    if filters.cash_register_id is not None:
+        stmt = stmt.where(Sale.cash_register_id == filters.cash_register_id)
+    if filters.cashier_id is not None:
+        stmt = stmt.where(Sale.cashier_id == filters.cashier_id)
+    if filters.customer_id is not None:
+        stmt = stmt.where(Sale.customer_id == filters.customer_id)
+    if filters.date_from:
+        stmt = stmt.where(Sale.created_at >= datetime.combine(filters.date_from, time.min))
+    if filters.date_to:
+        stmt = stmt.where(Sale.created_at < datetime.combine(filters.date_to + timedelta(days=1), time.min))
+    if cursor:
+        stmt = stmt.where(tuple_(Sale.created_at, Sale.id) < tuple_(*decode_cursor(cursor)))
+    if "items" in expand:
+        stmt = stmt.options(selectinload(Sale.items))
+    if "payments" in expand:
+        stmt = stmt.options(selectinload(Sale.payments))
+
+    result = await session.execute(stmt)
+    sales = result.scalars().all()
+    page = sales[:limit]
+    return sale_schema.SalePage(
+        data=[_summary(sale, expand) for sale in page],
+        next_cursor=encode_cursor(page[-1]) if len(sales) > limit else None,
+    )
@@ -0,0 +1,111 @@
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.upsert import upsert_increment
+from app.models.rollup import SalesDailyFact, SalesDailyTotal
+from app.models.sale import Sale, SaleItem
+
+
+async def record_sale(session: AsyncSession, sale: Sale, sign: int = 1) -> None:
+    """Soma (sign=1) ou estorna (sign=-1) uma venda concluída nas tabelas diárias."""
+
+    day = sale.created_at.date()
+    cash_register_id = sale.cash_register_id or 0
+
+    products: dict[int, list[Decimal]] = defaultdict(lambda: [Decimal("0"), Decimal("0")])
+    for item in sale.items:
+        products[item.product_id][0] += Decimal(str(item.quantity))
+        products[item.product_id][1] += Decimal(str(item.total_price))
+
+    await upsert_increment(
+        session,
+        SalesDailyFact.__table__,
+        [
+            {
+                "day": day,
+                "product_id": product_id,
+                "cash_register_id": cash_register_id,
+                "quantity": sign * quantity,
+                "revenue": sign * revenue,
+            }
+            for product_id, (quantity, revenue) in sorted(products.items())
+        ],
+        ("day", "product_id", "cash_register_id"),
+    )
+    gross = sum((revenue for _, revenue in products.values()), Decimal("0"))
+    await upsert_increment(
+        session,
+        SalesDailyTotal.__table__,
+        [
+            {
+                "day": day,
+                "cash_register_id": cash_register_id,
+                "sale_count": sign,
+                "gross": sign * gross,
+                "discount": sign * Decimal(str(sale.discount or 0)),
+                "total": sign * Decimal(str(sale.total or 0)),
+            }
+        ],
+        ("day", "cash_register_id"),
+    )
+
+
+async def rebuild_daily_facts(session: AsyncSession, start: date, end: date) -> None:
+    """Recalcula as tabelas diárias do intervalo [start, end] a partir das vendas concluídas."""
+
+    day = func.date(Sale.created_at)
+    cash_register_id = func.coalesce(Sale.cash_register_id, 0)
+    in_range = (
+        Sale.status == "completed",
+        Sale.created_at >= datetime.combine(start, time.min),
+        Sale.created_at < datetime.combine(end + timedelta(days=1), time.min),
+    )
+
+    await session.execute(delete(SalesDailyFact).where(SalesDailyFact.day.between(start, end)))
+    await session.execute(delete(SalesDailyTotal).where(SalesDailyTotal.day.between(start, end)))
+
+    facts = (
+        select(
+            day,
+            SaleItem.product_id,
+            cash_register_id,
+            func.sum(SaleItem.quantity),
+            func.sum(SaleItem.total_price),
+        )
+        .join(Sale, SaleItem.sale_id == Sale.id)
+        .where(*in_range)
+        .group_by(day, SaleItem.product_id, cash_register_id)
+    )
+    await session.execute(
+        insert(SalesDailyFact).from_select(
+            ["day", "product_id", "cash_register_id", "quantity", "revenue"], facts
+        )
+    )
+
+    gross = (
+        select(SaleItem.sale_id, func.sum(SaleItem.total_price).label("gross"))
+        .group_by(SaleItem.sale_id)
+        .subquery()
+    )
+    totals = (
+        select(
+            day,
+            cash_register_id,
+            func.count(Sale.id),
+            func.coalesce(func.sum(gross.c.gross), 0),
+            func.coalesce(func.sum(Sale.discount), 0),
+            func.coalesce(func.sum(Sale.total), 0),
+        )
+        .outerjoin(gross, gross.c.sale_id == Sale.id)
+        .where(*in_range)
+        .group_by(day, cash_register_id)
+    )
+    await session.execute(
+        insert(SalesDailyTotal).from_select(
+            ["day", "cash_register_id", "sale_count", "gross", "discount", "total"], totals
+        )
+    )
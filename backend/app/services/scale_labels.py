@@ -0,0 +1,58 @@
+from dataclasses import dataclass
+from decimal import ROUND_HALF_UP, Decimal
+
+from app.core.config import ScaleLabelFormat, Settings
+
+GRAMAS = Decimal("0.001")
+CENTAVOS = Decimal("0.01")
+
+
+class InvalidScaleLabel(ValueError):
+    pass
+
+
+@dataclass(frozen=True)
+class ScaleLabel:
+    plu: int
+    kind: str
+    value: Decimal
+
+    def quantity_and_total(self, unit_price: Decimal) -> tuple[Decimal, Decimal]:
+        """Quantidade e total do item a partir do preço por quilo/unidade do produto."""
+
+        if self.kind == "weight":
+            return self.value, (self.value * unit_price).quantize(CENTAVOS, ROUND_HALF_UP)
+        if unit_price <= 0:
+            raise InvalidScaleLabel("Produto sem preço para calcular o peso da etiqueta")
+        return (self.value / unit_price).quantize(GRAMAS, ROUND_HALF_UP), self.value
+
+
+def ean13_check_digit(digits: str) -> int:
+    soma = sum(int(d) * (3 if i % 2 else 1) for i, d in enumerate(digits[:12]))
+    return (10 - soma % 10) % 10
+
+
+class ScaleLabelDecoder:
+    """Interpreta etiquetas EAN-13 de balança (prefixo, PLU e peso ou preço embutidos)."""
+
+    def __init__(self, formats: list[ScaleLabelFormat]) -> None:
+        self.formats = formats
+
+    @classmethod
+    def from_settings(cls, settings: Settings) -> "ScaleLabelDecoder":
+        return cls(settings.scale_label_formats)
+
+    def decode(self, code: str) -> ScaleLabel | None:
+        """Devolve None quando o código não é de balança; dígito verificador errado é erro."""
+
+        if len(code) != 13 or not code.isdigit():
+            return None
+        for fmt in self.formats:
+            if not code.startswith(fmt.prefix):
+                continue
+            if ean13_check_digit(code) != int(code[12]):
+                raise InvalidScaleLabel("Dígito verificador inválido na etiqueta de balança")
+            plu = int(code[fmt.plu_start : fmt.plu_start + fmt.plu_length])
+            bruto = int(code[fmt.value_start : fmt.value_start + fmt.value_length])
+            return ScaleLabel(plu=plu, kind=fmt.kind, value=Decimal(bruto).scaleb(-fmt.decimals))
+        return None
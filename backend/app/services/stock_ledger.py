@@ -0,0 +1,124 @@
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime
+from decimal import Decimal
+from typing import Sequence
+
+from sqlalchemy import Integer, Numeric, case, column, insert, select, update, values
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.product import StockItem, StockLocation, StockMovement
+from app.services.stock_rollup import record_stock_movements
+
+
+@dataclass(frozen=True)
+class StockDelta:
+    product_id: int
+    change: float
+    movement_type: str
+    reason: str
+    sale_item_id: int | None = None
+
+
+async def _default_location_id(session: AsyncSession) -> int:
+    result = await session.execute(
+        select(StockLocation.id).where(StockLocation.is_default.is_(True)).order_by(StockLocation.id)
+    )
+    location_id = result.scalars().first()
+    if location_id is None:
+        location = StockLocation(name="Padrão", is_default=True)
+        session.add(location)
+        await session.flush()
+        location_id = location.id
+    return location_id
+
+
+async def _lock_stock_items(session: AsyncSession, product_ids: list[int]) -> dict[int, int]:
+    """Bloqueia os itens de estoque sempre na mesma ordem para evitar deadlocks."""
+
+    result = await session.execute(
+        select(StockItem.id, StockItem.product_id)
+        .where(StockItem.product_id.in_(product_ids))
+        .order_by(StockItem.product_id, StockItem.id)
+        .with_for_update()
+    )
+    stock_items: dict[int, int] = {}
+    for stock_item_id, product_id in result.all():
+        stock_items.setdefault(product_id, stock_item_id)
+    return stock_items
+
+
+async def _create_stock_items(session: AsyncSession, product_ids: list[int]) -> dict[int, int]:
+    location_id = await _default_location_id(session)
+    result = await session.execute(
+        insert(StockItem).returning(
+            StockItem.id, StockItem.product_id, sort_by_parameter_order=True
+        ),
+        [{"product_id": product_id, "location_id": location_id, "quantity": 0} for product_id in product_ids],
+    )
+    return {product_id: stock_item_id for stock_item_id, product_id in result.all()}
+
+
+async def _apply_quantities(session: AsyncSession, changes: dict[int, Decimal]) -> None:
+    ordered = sorted(changes.items())
+    if session.get_bind().dialect.name == "postgresql":
+        deltas = values(
+            column("stock_item_id", Integer), column("delta", Numeric(12, 3)), name="deltas"
+        ).data(ordered)
+        stmt = (
+            update(StockItem)
+            .where(StockItem.id == deltas.c.stock_item_id)
+            .values(quantity=StockItem.quantity + deltas.c.delta)
+        )
+    else:
+        # SQLite não aceita apelidos de colunas em VALUES; o CASE mantém um único UPDATE.
+        stmt = (
+            update(StockItem)
+            .where(StockItem.id.in_(changes))
+            .values(quantity=StockItem.quantity + case(dict(ordered), value=StockItem.id))
+        )
+    await session.execute(stmt, execution_options={"synchronize_session": False})
+
+
+async def apply_stock_deltas(
+    session: AsyncSession, deltas: Sequence[StockDelta], user_id: int | None = None
+) -> None:
+    """Aplica todos os movimentos de uma operação com um UPDATE agregado e um INSERT multi-linha."""
+
+    if not deltas:
+        return
+
+    totals: dict[int, Decimal] = defaultdict(Decimal)
+    for delta in deltas:
+        totals[delta.product_id] += Decimal(str(delta.change))
+    product_ids = sorted(totals)
+
+    stock_items = await _lock_stock_items(session, product_ids)
+    missing = [product_id for product_id in product_ids if product_id not in stock_items]
+    if missing:
+        stock_items.update(await _create_stock_items(session, missing))
+
+    await _apply_quantities(
+        session, {stock_items[product_id]: totals[product_id] for product_id in product_ids}
+    )
+    now = datetime.utcnow()
+    await session.execute(
+        insert(StockMovement),
+        [
+            {
+                "stock_item_id": stock_items[delta.product_id],
+                "change": delta.change,
+                "movement_type": delta.movement_type,
+                "reason": delta.reason,
+                "sale_item_id": delta.sale_item_id,
+                "created_by_id": user_id,
+                "created_at": now,
+            }
+            for delta in deltas
+        ],
+    )
+    await record_stock_movements(
+        session,
+        now.date(),
+        [(stock_items[delta.product_id], Decimal(str(delta.change))) for delta in deltas],
+    )
@@ -0,0 +1,133 @@
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+
+from sqlalchemy import and_, case, delete, func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.upsert import upsert_increment
+from app.models.product import StockItem, StockMovement
+from app.models.rollup import StockCheckpoint, StockMovementDaily
+
+
+async def record_stock_movements(
+    session: AsyncSession, day: date, changes: list[tuple[int, Decimal]]
+) -> None:
+    """Acumula as movimentações (stock_item_id, variação) no agregado diário."""
+
+    totals: dict[int, list[Decimal]] = defaultdict(lambda: [Decimal("0"), Decimal("0")])
+    for stock_item_id, change in changes:
+        if change >= 0:
+            totals[stock_item_id][0] += change
+        else:
+            totals[stock_item_id][1] -= change
+    await upsert_increment(
+        session,
+        StockMovementDaily.__table__,
+        [
+            {"day": day, "stock_item_id": stock_item_id, "entries": entries, "exits": exits}
+            for stock_item_id, (entries, exits) in sorted(totals.items())
+        ],
+        ("day", "stock_item_id"),
+    )
+
+
+def _only_product(stmt, stock_item_column, product_id: int | None):
+    if product_id is None:
+        return stmt
+    return stmt.where(stock_item_column.in_(select(StockItem.id).where(StockItem.product_id == product_id)))
+
+
+async def stock_as_of(
+    session: AsyncSession, day: date, product_id: int | None = None
+) -> dict[int, Decimal]:
+    """Saldo de cada item de estoque ao final de `day`.
+
+    Parte do último checkpoint até `day` e soma apenas os dias seguintes do agregado.
+    Itens sem checkpoint são calculados a partir do saldo atual, descontando os dias posteriores.
+    """
+
+    net = func.sum(StockMovementDaily.entries - StockMovementDaily.exits)
+    latest = _only_product(
+        select(StockCheckpoint.stock_item_id, func.max(StockCheckpoint.as_of).label("as_of"))
+        .where(StockCheckpoint.as_of <= day)
+        .group_by(StockCheckpoint.stock_item_id),
+        StockCheckpoint.stock_item_id,
+        product_id,
+    ).subquery()
+
+    checkpoints = await session.execute(
+        select(StockCheckpoint.stock_item_id, StockCheckpoint.quantity).join(
+            latest,
+            and_(
+                StockCheckpoint.stock_item_id == latest.c.stock_item_id,
+                StockCheckpoint.as_of == latest.c.as_of,
+            ),
+        )
+    )
+    quantities = {stock_item_id: Decimal(str(quantity)) for stock_item_id, quantity in checkpoints.all()}
+
+    tail = await session.execute(
+        select(StockMovementDaily.stock_item_id, net)
+        .join(latest, StockMovementDaily.stock_item_id == latest.c.stock_item_id)
+        .where(StockMovementDaily.day > latest.c.as_of, StockMovementDaily.day <= day)
+        .group_by(StockMovementDaily.stock_item_id)
+    )
+    for stock_item_id, change in tail.all():
+        quantities[stock_item_id] += Decimal(str(change or 0))
+
+    current = await session.execute(
+        _only_product(select(StockItem.id, StockItem.quantity), StockItem.id, product_id)
+    )
+    missing = {
+        stock_item_id: Decimal(str(quantity or 0))
+        for stock_item_id, quantity in current.all()
+        if stock_item_id not in quantities
+    }
+    if missing:
+        after = await session.execute(
+            select(StockMovementDaily.stock_item_id, net)
+            .where(StockMovementDaily.day > day, StockMovementDaily.stock_item_id.in_(list(missing)))
+            .group_by(StockMovementDaily.stock_item_id)
+        )
+        for stock_item_id, change in after.all():
+            missing[stock_item_id] -= Decimal(str(change or 0))
+        quantities.update(missing)
+    return quantities
+
+
+async def create_checkpoint(session: AsyncSession, day: date) -> int:
+    quantities = await stock_as_of(session, day)
+    await session.execute(delete(StockCheckpoint).where(StockCheckpoint.as_of == day))
+    if quantities:
+        await session.execute(
+            insert(StockCheckpoint),
+            [
+                {"stock_item_id": stock_item_id, "as_of": day, "quantity": quantity}
+                for stock_item_id, quantity in sorted(quantities.items())
+            ],
+        )
+    return len(quantities)
+
+
+async def rebuild_movement_rollup(session: AsyncSession, start: date, end: date) -> None:
+    """Recalcula o agregado diário do intervalo [start, end] a partir de stock_movements."""
+
+    day = func.date(StockMovement.created_at)
+    await session.execute(delete(StockMovementDaily).where(StockMovementDaily.day.between(start, end)))
+    await session.execute(
+        insert(StockMovementDaily).from_select(
+            ["day", "stock_item_id", "entries", "exits"],
+            select(
+                day,
+                StockMovement.stock_item_id,
+                func.sum(case((StockMovement.change > 0, StockMovement.change), else_=0)),
+                func.sum(case((StockMovement.change < 0, -StockMovement.change), else_=0)),
+            )
+            .where(
+                StockMovement.created_at >= datetime.combine(start, time.min),
+                StockMovement.created_at < datetime.combine(end + timedelta(days=1), time.min),
+            )
+            .group_by(day, StockMovement.stock_item_id),
+        )
+    )
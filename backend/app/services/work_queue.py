@@ -0,0 +1,220 @@
+"""Base comum das filas gravadas em tabela: outbox, tarefas (`jobs`) e contingência fiscal.
+
+Cada fila reivindica linhas vencidas com posse por prazo (lease), renova essa posse enquanto
+trabalha nelas e devolve à tabela o que não chegou a começar. O que muda entre as filas
+(colunas, ordem, o que fazer com o item) fica em quem usa estas peças.
+"""
+
+import asyncio
+import logging
+from collections.abc import Awaitable, Callable, Sequence
+from typing import Any
+
+from sqlalchemy import event, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger("pdv")
+
+ESPERA_MAXIMA = 3600.0
+
+
+def backoff(base_seconds: float, attempts: int, maximum: float = ESPERA_MAXIMA) -> float:
+    """Espera antes da próxima tentativa: `base_seconds` dobrado a cada falha, até `maximum`."""
+
+    return min(base_seconds * 2 ** max(attempts - 1, 0), maximum)
+
+
+async def claim_rows(
+    session: AsyncSession,
+    model,
+    due,
+    order_by: Sequence,
+    limit: int,
+    values: dict,
+    returning: Sequence,
+) -> list:
+    """Marca até `limit` linhas que satisfazem `due` com `values` e devolve as colunas de `returning`.
+
+    Um único UPDATE sobre SELECT ... FOR UPDATE SKIP LOCKED: no PostgreSQL vários processos
+    reivindicam da mesma tabela sem disputar linhas. No SQLite o FOR UPDATE é omitido e a
+    condição repetida no UPDATE impede a reivindicação dupla. O commit fica com quem chama.
+    """
+
+    candidatas = select(model.id).where(due).order_by(*order_by).limit(limit).with_for_update(skip_locked=True)
+    result = await session.execute(
+        update(model).where(model.id.in_(candidatas), due).values(**values).returning(*returning),
+        execution_options={"synchronize_session": False},
+    )
+    return result.all()
+
+
+def wake_after_commit(key: str, wake: Callable[[Any], None]) -> None:
+    """Chama `wake(session.info[key])` depois do commit da sessão que gravou o aviso; o rollback o descarta."""
+
+    @event.listens_for(Session, "after_commit")
+    def _acordar(session: Session) -> None:
+        valor = session.info.pop(key, None)
+        if valor:
+            wake(valor)
+
+    @event.listens_for(Session, "after_rollback")
+    def _descartar(session: Session) -> None:
+        session.info.pop(key, None)
+
+
+class LeaseHeartbeat:
+    """Renova, a cada terço do prazo de posse, a posse dos ids registrados em `held`.
+
+    Enquanto o processo estiver vivo, um item que demora mais que o prazo não é retomado por
+    outro worker; se o processo cair, a renovação para e a posse vence normalmente.
+    """
+
+    def __init__(self, name: str, lease_seconds: float, renew: Callable[[list[int]], Awaitable[None]]) -> None:
+        self.name = name
+        self.lease_seconds = lease_seconds
+        self.renew = renew
+        self.held: set[int] = set()
+        self.renewals = 0
+        self._task: asyncio.Task | None = None
+
+    async def _executar(self) -> None:
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            ids = sorted(self.held)
+            if not ids:
+                continue
+            try:
+                await self.renew(ids)
+                self.renewals += 1
+            except Exception:  # pylint: disable=broad-except
+                logger.exception("Falha ao renovar a posse de %s itens da fila %s", len(ids), self.name)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._executar())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            task, self._task = self._task, None
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+    async def __aenter__(self) -> "LeaseHeartbeat":
+        self.start()
+        return self
+
+    async def __aexit__(self, *_exc) -> None:
+        await self.stop()
+
+
+class LeasedPool:
+    """Pool local de workers asyncio sobre uma fila em tabela.
+
+    Um laço reivindica o que cabe em `prefetch` (fila local mais itens em execução) e
+    espera um `wake` ou `poll_seconds` quando a tabela não tem mais nada vencido. Cada item
+    roda fora do cancelamento, com a posse renovada por um `LeaseHeartbeat`. Em `stop`, os
+    itens em execução terminam e os que nem começaram voltam à tabela por `release`.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        workers: int,
+        prefetch: int,
+        poll_seconds: float,
+        lease_seconds: float,
+        claim: Callable[[int], Awaitable[list]],
+        execute: Callable[[Any], Awaitable[Any]],
+        renew: Callable[[list[int]], Awaitable[None]],
+        release: Callable[[list], Awaitable[None]],
+    ) -> None:
+        self.name = name
+        self.workers = workers
+        self.prefetch = max(prefetch, workers)
+        self.poll_seconds = poll_seconds
+        self.claim = claim
+        self.execute = execute
+        self.release = release
+        self.heartbeat = LeaseHeartbeat(name, lease_seconds, renew)
+        self._fila: asyncio.Queue = asyncio.Queue()
+        self._acordar = asyncio.Event()
+        self._tasks: list[asyncio.Task] = []
+        self._em_execucao: set[asyncio.Task] = set()
+
+    @property
+    def running(self) -> bool:
+        return any(not task.done() for task in self._tasks)
+
+    @property
+    def local_queue(self) -> int:
+        return self._fila.qsize()
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._em_execucao)
+
+    def wake(self) -> None:
+        self._acordar.set()
+
+    async def _buscar(self) -> None:
+        while True:
+            self._acordar.clear()
+            livres = self.prefetch - self._fila.qsize() - len(self._em_execucao)
+            itens = []
+            if livres > 0:
+                try:
+                    itens = await self.claim(livres)
+                except Exception:  # pylint: disable=broad-except
+                    logger.exception("Falha ao consultar a fila %s", self.name)
+            for item in itens:
+                self.heartbeat.held.add(item.id)
+                self._fila.put_nowait(item)
+            if livres <= 0 or len(itens) < livres:
+                # Tabela sem itens vencidos ou pool cheio: espera um commit com itens, uma vaga ou o intervalo.
+                try:
+                    await asyncio.wait_for(self._acordar.wait(), self.poll_seconds)
+                except asyncio.TimeoutError:
+                    pass
+
+    def _concluir(self, item, execucao: asyncio.Task) -> None:
+        self._em_execucao.discard(execucao)
+        self.heartbeat.held.discard(item.id)
+        if not execucao.cancelled() and execucao.exception() is not None:
+            logger.error("Falha não tratada na fila %s", self.name, exc_info=execucao.exception())
+        if self._fila.qsize() < self.workers:
+            self._acordar.set()
+
+    async def _trabalhar(self) -> None:
+        while True:
+            item = await self._fila.get()
+            # Fora do cancelamento: `stop` espera o item terminar em vez de deixá-lo preso até vencer a posse.
+            execucao = asyncio.create_task(self.execute(item))
+            self._em_execucao.add(execucao)
+            execucao.add_done_callback(lambda tarefa, item=item: self._concluir(item, tarefa))
+            await asyncio.wait([execucao])
+
+    def start(self) -> None:
+        if not self._tasks:
+            self.heartbeat.start()
+            self._tasks = [asyncio.create_task(self._buscar())] + [
+                asyncio.create_task(self._trabalhar()) for _ in range(self.workers)
+            ]
+
+    async def stop(self) -> None:
+        if not self._tasks:
+            return
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if self._em_execucao:
+            await asyncio.gather(*self._em_execucao, return_exceptions=True)
+        await self.heartbeat.stop()
+        restantes = [self._fila.get_nowait() for _ in range(self._fila.qsize())]
+        self.heartbeat.held.clear()
+        if restantes:
+            try:
+                await self.release(restantes)
+            except Exception:  # pylint: disable=broad-except
+                logger.exception("Falha ao devolver %s itens à fila %s", len(restantes), self.name)
@@ -0,0 +1,108 @@
+"""Mede o recálculo de promoções de um carrinho com milhares de regras ativas.
+
+Uso (a partir de backend/):
+    python -m benchmarks.pricing
+    python -m benchmarks.pricing --regras 10000 --linhas 100 --limite-ms 1
+
+As regras são compiladas direto em memória, sem banco: o que se mede é o motor usado a
+cada leitura do caixa. Termina com código 1 se o p99 do recálculo após uma leitura em um
+carrinho de --linhas linhas passar de --limite-ms.
+"""
+
+import argparse
+import random
+import statistics
+import sys
+import time
+
+from app.core import money
+from app.services.pricing import KINDS, CartPricing, PricingEngine, PricingRule
+
+
+def gerar_regras(quantidade: int, produtos: int, rng: random.Random) -> list[PricingRule]:
+    regras = []
+    for promotion_id in range(1, quantidade + 1):
+        kind = KINDS[promotion_id % len(KINDS)]
+        grupo = frozenset(rng.sample(range(1, produtos + 1), rng.randint(1, 8)))
+        regras.append(
+            PricingRule(
+                promotion_id=promotion_id,
+                kind=kind,
+                products=grupo,
+                prices={product_id: 450 for product_id in grupo} if kind == "price_list" else {},
+                min_quantity=money.milli(rng.choice([2, 3, 6])),
+                get_quantity=money.MILLI,
+                percent_off=money.cents(rng.choice([5, 10, 50, 100])),
+                bundle_price=1200,
+            )
+        )
+    return regras
+
+
+def _percentis(tempos: list[float]) -> tuple[float, float, float]:
+    ordenados = sorted(tempos)
+    p99 = ordenados[min(len(ordenados) - 1, int(len(ordenados) * 0.99))]
+    return statistics.median(ordenados), p99, ordenados[-1]
+
+
+def _linha(nome: str, tempos: list[float]) -> None:
+    p50, p99, maximo = _percentis(tempos)
+    print(f"{nome:<34}{p50:>10.4f}{p99:>10.4f}{maximo:>10.4f}")
+
+
+def executar(regras: int, produtos: int, linhas: int, carrinhos: int, limite_ms: float) -> bool:
+    rng = random.Random(42)
+    engine = PricingEngine(refresh_seconds=5)
+    engine.compile(gerar_regras(regras, produtos, rng))
+    indexados = engine.metrics()["indexed_products"]
+    print(f"{regras} regras compiladas em {engine.last_compile_ms:.1f} ms ({indexados} produtos)")
+
+    # Carrinhos concentrados em poucos produtos, como as compras de um mercado.
+    populares = rng.sample(range(1, produtos + 1), max(linhas * 2, 200))
+    tempos_completo: list[float] = []
+    tempos_leitura: list[float] = []
+    tempos_remocao: list[float] = []
+    for _ in range(carrinhos):
+        estado = CartPricing()
+        for line_id in range(1, linhas):
+            estado.add(line_id, rng.choice(populares), money.milli(rng.randint(1, 4)), 590)
+        inicio = time.perf_counter()
+        engine.reprice(estado)
+        tempos_completo.append((time.perf_counter() - inicio) * 1000)
+
+        estado.add(linhas, rng.choice(populares), money.milli(rng.randint(1, 4)), 590)
+        inicio = time.perf_counter()
+        engine.reprice(estado)
+        tempos_leitura.append((time.perf_counter() - inicio) * 1000)
+
+        estado.remove(rng.randint(1, linhas))
+        inicio = time.perf_counter()
+        engine.reprice(estado)
+        tempos_remocao.append((time.perf_counter() - inicio) * 1000)
+
+    print(f"\n{'recálculo (ms)':<34}{'p50':>10}{'p99':>10}{'máx':>10}")
+    _linha(f"carrinho completo ({linhas - 1} linhas)", tempos_completo)
+    _linha(f"após uma leitura ({linhas} linhas)", tempos_leitura)
+    _linha("após uma remoção", tempos_remocao)
+    metricas = engine.metrics()
+    print(f"\nRegras avaliadas por recálculo: {metricas['rules_evaluated'] / metricas['reprices']:.1f}")
+    p99 = _percentis(tempos_leitura)[1]
+    aprovado = p99 <= limite_ms
+    print(f"p99 após uma leitura {p99:.3f} ms {'<=' if aprovado else '>'} limite de {limite_ms} ms")
+    return aprovado
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--regras", type=int, default=10000)
+    parser.add_argument("--produtos", type=int, default=20000)
+    parser.add_argument("--linhas", type=int, default=100)
+    parser.add_argument("--carrinhos", type=int, default=2000)
+    parser.add_argument("--limite-ms", type=float, default=1.0)
+    args = parser.parse_args()
+    if not executar(args.regras, args.produtos, args.linhas, args.carrinhos, args.limite_ms):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""Mede vazão e latência da emissão de NFC-e contra a SEFAZ local.
+
+Uso (a partir de backend/):
+    python -m benchmarks.sefaz
+    python -m benchmarks.sefaz --documentos 2000 --emissoes 64 --limite-sefaz 8 --latencia-ms 80
+
+Sobe a SEFAZ local (app.fiscal.standin) em uma porta da máquina e emite --documentos
+notas com --emissoes vendas simultâneas, primeiro com o pool de conexões e keep-alive,
+depois abrindo uma conexão por requisição. Termina com código 1 se o p99 com o pool
+passar de --limite-ms.
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from decimal import Decimal
+
+import uvicorn
+
+from app.core.config import SefazEndpoint
+from app.fiscal import DigitalSigner, NfceXmlBuilder, SefazClient, TaxTableRepository
+from app.fiscal.standin import StandinConfig, create_standin_app
+from app.schemas.fiscal import InvoiceItem
+
+
+def _documento(itens: int) -> str:
+    linhas = [
+        InvoiceItem(
+            product_code=f"789{indice:010d}",
+            description=f"Produto {indice}",
+            quantity=Decimal("1"),
+            unit_price=Decimal("9.90"),
+            ncm="2203",
+            cfop="5102",
+            cst="00",
+        )
+        for indice in range(itens)
+    ]
+    return DigitalSigner().sign(NfceXmlBuilder(TaxTableRepository()).build(1, linhas)).xml
+
+
+def _percentis(tempos: list[float]) -> tuple[float, float, float]:
+    ordenados = sorted(tempos)
+    p99 = ordenados[min(len(ordenados) - 1, int(len(ordenados) * 0.99))]
+    return statistics.median(ordenados), p99, ordenados[-1]
+
+
+async def _cenario(cliente: SefazClient, xml: str, documentos: int, emissoes: int) -> tuple[list[float], float, int]:
+    tempos: list[float] = []
+    rejeitados = 0
+    proximos = iter(range(documentos))
+
+    async def caixa() -> None:
+        nonlocal rejeitados
+        for _ in proximos:
+            inicio = time.perf_counter()
+            resposta = await cliente.send_signed_xml(xml)
+            tempos.append((time.perf_counter() - inicio) * 1000)
+            rejeitados += not resposta.success
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(caixa() for _ in range(emissoes)))
+    duracao = time.perf_counter() - inicio
+    await cliente.aclose()
+    return tempos, duracao, rejeitados
+
+
+async def executar(
+    documentos: int, emissoes: int, limite_sefaz: int, itens: int, config: StandinConfig, porta: int, limite_ms: float
+) -> bool:
+    servidor = uvicorn.Server(
+        uvicorn.Config(create_standin_app(config), host="127.0.0.1", port=porta, log_level="warning")
+    )
+    tarefa = asyncio.create_task(servidor.serve())
+    while not servidor.started:
+        await asyncio.sleep(0.01)
+    endpoints = {"SP": SefazEndpoint(url=f"http://127.0.0.1:{porta}/ws/")}
+    xml = _documento(itens)
+    print(f"{documentos} NFC-e de {itens} itens ({len(xml)} bytes), {emissoes} vendas simultâneas")
+    print(f"SEFAZ local: {config.latency_ms} ms ± {config.jitter_ms} ms, rejeição {config.reject_rate:.0%}")
+    print(f"\n{'cenário':<28}{'notas/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'máx ms':>10}{'rejeitadas':>12}")
+    p99_pool = 0.0
+    try:
+        for nome, keepalive in (("pool com keep-alive", 60.0), ("conexão por requisição", 0.0)):
+            cliente = SefazClient(endpoints, "SP", max_concurrency=limite_sefaz, keepalive_seconds=keepalive)
+            tempos, duracao, rejeitados = await _cenario(cliente, xml, documentos, emissoes)
+            p50, p99, maximo = _percentis(tempos)
+            print(f"{nome:<28}{documentos / duracao:>10.1f}{p50:>10.2f}{p99:>10.2f}{maximo:>10.2f}{rejeitados:>12}")
+            p99_pool = p99_pool or p99
+    finally:
+        servidor.should_exit = True
+        await tarefa
+    aprovado = p99_pool <= limite_ms
+    print(f"\np99 com o pool {p99_pool:.2f} ms {'<=' if aprovado else '>'} limite de {limite_ms} ms")
+    return aprovado
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--documentos", type=int, default=1000)
+    parser.add_argument("--emissoes", type=int, default=32, help="vendas emitindo ao mesmo tempo")
+    parser.add_argument("--limite-sefaz", type=int, default=8, help="requisições simultâneas à SEFAZ")
+    parser.add_argument("--itens", type=int, default=20)
+    parser.add_argument("--latencia-ms", type=float, default=30)
+    parser.add_argument("--variacao-ms", type=float, default=10)
+    parser.add_argument("--rejeicao", type=float, default=0.0)
+    parser.add_argument("--porta", type=int, default=8791)
+    parser.add_argument("--limite-ms", type=float, default=1000)
+    args = parser.parse_args()
+    config = StandinConfig(
+        latency_ms=args.latencia_ms, jitter_ms=args.variacao_ms, reject_rate=args.rejeicao, seed=42
+    )
+    aprovado = asyncio.run(
+        executar(
+            args.documentos, args.emissoes, args.limite_sefaz, args.itens, config, args.porta, args.limite_ms
+        )
+    )
+    if not aprovado:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
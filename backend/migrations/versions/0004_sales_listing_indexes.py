@@ -0,0 +1,31 @@
+"""Add keyset pagination indexes for sales listing
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18
+"""
+from alembic import op
+
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index("ix_sales_created_at_id", "sales", ["created_at", "id"])
+    op.create_index("ix_sales_status_created_at_id", "sales", ["status", "created_at", "id"])
+    op.create_index(
+        "ix_sales_cash_register_created_at_id", "sales", ["cash_register_id", "created_at", "id"]
+    )
+    op.create_index("ix_sales_cashier_created_at_id", "sales", ["cashier_id", "created_at", "id"])
+    op.create_index("ix_sales_customer_created_at_id", "sales", ["customer_id", "created_at", "id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_sales_customer_created_at_id", table_name="sales")
+    op.drop_index("ix_sales_cashier_created_at_id", table_name="sales")
+    op.drop_index("ix_sales_cash_register_created_at_id", table_name="sales")
+    op.drop_index("ix_sales_status_created_at_id", table_name="sales")
+    op.drop_index("ix_sales_created_at_id", table_name="sales")
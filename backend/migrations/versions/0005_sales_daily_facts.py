@@ -0,0 +1,42 @@
+"""Add daily sales rollup tables
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "sales_daily_facts",
+        sa.Column("day", sa.Date(), nullable=False),
+        sa.Column("product_id", sa.Integer(), nullable=False),
+        sa.Column("cash_register_id", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("quantity", sa.Numeric(precision=14, scale=3), nullable=False, server_default="0"),
+        sa.Column("revenue", sa.Numeric(precision=14, scale=2), nullable=False, server_default="0"),
+        sa.ForeignKeyConstraint(["product_id"], ["products.id"]),
+        sa.PrimaryKeyConstraint("day", "product_id", "cash_register_id"),
+    )
+    op.create_table(
+        "sales_daily_totals",
+        sa.Column("day", sa.Date(), nullable=False),
+        sa.Column("cash_register_id", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("sale_count", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("gross", sa.Numeric(precision=14, scale=2), nullable=False, server_default="0"),
+        sa.Column("discount", sa.Numeric(precision=14, scale=2), nullable=False, server_default="0"),
+        sa.Column("total", sa.Numeric(precision=14, scale=2), nullable=False, server_default="0"),
+        sa.PrimaryKeyConstraint("day", "cash_register_id"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("sales_daily_totals")
+    op.drop_table("sales_daily_facts")
@@ -0,0 +1,39 @@
+"""Add daily stock movement rollup and stock checkpoints
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "stock_movement_daily",
+        sa.Column("day", sa.Date(), nullable=False),
+        sa.Column("stock_item_id", sa.Integer(), nullable=False),
+        sa.Column("entries", sa.Numeric(precision=14, scale=3), nullable=False, server_default="0"),
+        sa.Column("exits", sa.Numeric(precision=14, scale=3), nullable=False, server_default="0"),
+        sa.ForeignKeyConstraint(["stock_item_id"], ["stock_items.id"]),
+        sa.PrimaryKeyConstraint("day", "stock_item_id"),
+    )
+    op.create_table(
+        "stock_checkpoints",
+        sa.Column("stock_item_id", sa.Integer(), nullable=False),
+        sa.Column("as_of", sa.Date(), nullable=False),
+        sa.Column("quantity", sa.Numeric(precision=14, scale=3), nullable=False),
+        sa.ForeignKeyConstraint(["stock_item_id"], ["stock_items.id"]),
+        sa.PrimaryKeyConstraint("stock_item_id", "as_of"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("stock_checkpoints")
+    op.drop_table("stock_movement_daily")
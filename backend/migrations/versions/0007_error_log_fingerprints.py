@@ -0,0 +1,30 @@
+"""Add fingerprint and occurrence counters to error logs
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("error_logs", sa.Column("fingerprint", sa.String(length=40), nullable=True))
+    op.add_column(
+        "error_logs", sa.Column("occurrences", sa.Integer(), nullable=False, server_default="1")
+    )
+    op.add_column("error_logs", sa.Column("last_seen_at", sa.DateTime(), nullable=True))
+    op.create_index("ix_error_logs_fingerprint", "error_logs", ["fingerprint"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_error_logs_fingerprint", table_name="error_logs")
+    op.drop_column("error_logs", "last_seen_at")
+    op.drop_column("error_logs", "occurrences")
+    op.drop_column("error_logs", "fingerprint")
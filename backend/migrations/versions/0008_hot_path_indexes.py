@@ -0,0 +1,60 @@
+"""Add indexes for hot lookups on payments, sale items, stock and audit logs
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0008"
+down_revision = "0007"
+branch_labels = None
+depends_on = None
+
+
+# (nome, tabela, colunas, condição do índice parcial)
+INDICES = [
+    ("ix_payments_transaction_code", "payments", ["transaction_code"], "transaction_code IS NOT NULL"),
+    ("ix_payments_sale_id", "payments", ["sale_id"], None),
+    ("ix_payments_unpaid_sale_id", "payments", ["sale_id"], "paid = false"),
+    ("ix_sale_items_sale_id", "sale_items", ["sale_id"], None),
+    ("ix_sale_items_product_id", "sale_items", ["product_id"], None),
+    ("ix_stock_items_product_id_id", "stock_items", ["product_id", "id"], None),
+    ("ix_stock_movements_stock_item_created_at", "stock_movements", ["stock_item_id", "created_at"], None),
+    ("ix_stock_movements_sale_item_id", "stock_movements", ["sale_item_id"], "sale_item_id IS NOT NULL"),
+    ("ix_audit_logs_created_at", "audit_logs", ["created_at"], None),
+]
+
+
+def _postgres() -> bool:
+    return op.get_bind().dialect.name == "postgresql"
+
+
+def upgrade() -> None:
+    if _postgres():
+        # CONCURRENTLY não roda em transação e não bloqueia escritas durante a criação.
+        with op.get_context().autocommit_block():
+            for name, table, columns, where in INDICES:
+                op.create_index(
+                    name,
+                    table,
+                    columns,
+                    postgresql_concurrently=True,
+                    postgresql_where=sa.text(where) if where else None,
+                    if_not_exists=True,
+                )
+    else:
+        for name, table, columns, where in INDICES:
+            op.create_index(name, table, columns, sqlite_where=sa.text(where) if where else None)
+
+
+def downgrade() -> None:
+    if _postgres():
+        with op.get_context().autocommit_block():
+            for name, table, _, _ in reversed(INDICES):
+                op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
+    else:
+        for name, table, _, _ in reversed(INDICES):
+            op.drop_index(name, table_name=table)
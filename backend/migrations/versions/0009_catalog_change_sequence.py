@@ -0,0 +1,49 @@
+"""Add change sequence, tombstones and counter for catalog delta sync
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0009"
+down_revision = "0008"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("products", sa.Column("updated_at", sa.DateTime(), nullable=True))
+    # Produtos existentes entram na sequência 1, entregue a quem sincroniza com since=0.
+    op.add_column(
+        "products", sa.Column("change_seq", sa.BigInteger(), nullable=False, server_default="1")
+    )
+    op.execute("UPDATE products SET updated_at = created_at")
+    op.create_index("ix_products_change_seq_id", "products", ["change_seq", "id"])
+
+    op.create_table(
+        "catalog_counters",
+        sa.Column("name", sa.String(length=32), primary_key=True),
+        sa.Column("value", sa.BigInteger(), nullable=False, server_default="0"),
+    )
+    op.execute("INSERT INTO catalog_counters (name, value) VALUES ('products', 1)")
+
+    op.create_table(
+        "product_tombstones",
+        sa.Column("product_id", sa.Integer(), primary_key=True, autoincrement=False),
+        sa.Column("sku", sa.String(), nullable=False),
+        sa.Column("change_seq", sa.BigInteger(), nullable=False),
+        sa.Column("deleted_at", sa.DateTime(), nullable=True),
+    )
+    op.create_index("ix_product_tombstones_change_seq", "product_tombstones", ["change_seq"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_product_tombstones_change_seq", table_name="product_tombstones")
+    op.drop_table("product_tombstones")
+    op.drop_table("catalog_counters")
+    op.drop_index("ix_products_change_seq_id", table_name="products")
+    op.drop_column("products", "change_seq")
+    op.drop_column("products", "updated_at")
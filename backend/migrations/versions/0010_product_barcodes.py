@@ -0,0 +1,35 @@
+"""Add barcodes table with pack quantities
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0010"
+down_revision = "0009"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "barcodes",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("code", sa.String(length=64), nullable=False),
+        sa.Column(
+            "product_id", sa.Integer(), sa.ForeignKey("products.id", ondelete="CASCADE"), nullable=False
+        ),
+        sa.Column("pack_quantity", sa.Numeric(10, 3), nullable=False, server_default="1"),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+    )
+    op.create_index("ix_barcodes_code", "barcodes", ["code"], unique=True)
+    op.create_index("ix_barcodes_product_id", "barcodes", ["product_id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_barcodes_product_id", table_name="barcodes")
+    op.drop_index("ix_barcodes_code", table_name="barcodes")
+    op.drop_table("barcodes")
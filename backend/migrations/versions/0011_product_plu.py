@@ -0,0 +1,24 @@
+"""Add scale PLU to products
+
+Revision ID: 0011
+Revises: 0010
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0011"
+down_revision = "0010"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("products", sa.Column("plu", sa.Integer(), nullable=True))
+    op.create_index("ix_products_plu", "products", ["plu"], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_products_plu", table_name="products")
+    op.drop_column("products", "plu")
@@ -0,0 +1,69 @@
+"""Add promotions and per-line sale discounts
+
+Revision ID: 0012
+Revises: 0011
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0012"
+down_revision = "0011"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "promotions",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("kind", sa.String(length=16), nullable=False),
+        sa.Column("is_active", sa.Boolean(), nullable=False, server_default=sa.true()),
+        sa.Column(
+            "customer_id", sa.Integer(), sa.ForeignKey("customers.id", ondelete="CASCADE"), nullable=True
+        ),
+        sa.Column("starts_at", sa.DateTime(), nullable=True),
+        sa.Column("ends_at", sa.DateTime(), nullable=True),
+        sa.Column("daily_start", sa.Time(), nullable=True),
+        sa.Column("daily_end", sa.Time(), nullable=True),
+        sa.Column("weekdays", sa.String(length=7), nullable=True),
+        sa.Column("min_quantity", sa.Numeric(12, 3), nullable=False, server_default="1"),
+        sa.Column("get_quantity", sa.Numeric(12, 3), nullable=False, server_default="0"),
+        sa.Column("percent_off", sa.Numeric(5, 2), nullable=False, server_default="0"),
+        sa.Column("bundle_price", sa.Numeric(12, 2), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+    )
+    op.create_index("ix_promotions_customer_id", "promotions", ["customer_id"])
+    op.create_table(
+        "promotion_products",
+        sa.Column(
+            "promotion_id",
+            sa.Integer(),
+            sa.ForeignKey("promotions.id", ondelete="CASCADE"),
+            primary_key=True,
+        ),
+        sa.Column(
+            "product_id", sa.Integer(), sa.ForeignKey("products.id", ondelete="CASCADE"), primary_key=True
+        ),
+        sa.Column("price", sa.Numeric(10, 2), nullable=True),
+    )
+    op.create_index("ix_promotion_products_product_id", "promotion_products", ["product_id"])
+    op.add_column("sale_items", sa.Column("discount", sa.Numeric(12, 2), nullable=False, server_default="0"))
+    op.add_column(
+        "sale_items",
+        sa.Column(
+            "promotion_id", sa.Integer(), sa.ForeignKey("promotions.id", ondelete="SET NULL"), nullable=True
+        ),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("sale_items", "promotion_id")
+    op.drop_column("sale_items", "discount")
+    op.drop_index("ix_promotion_products_product_id", table_name="promotion_products")
+    op.drop_table("promotion_products")
+    op.drop_index("ix_promotions_customer_id", table_name="promotions")
+    op.drop_table("promotions")
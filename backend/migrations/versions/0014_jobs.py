@@ -0,0 +1,46 @@
+"""Add jobs table for the background job runner
+
+Revision ID: 0014
+Revises: 0013
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0014"
+down_revision = "0013"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "jobs",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("queue", sa.String(length=32), nullable=False, server_default="default"),
+        sa.Column("task", sa.String(length=64), nullable=False),
+        sa.Column("payload", sa.JSON(), nullable=True),
+        sa.Column("priority", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("status", sa.String(length=16), nullable=False, server_default="queued"),
+        sa.Column("attempts", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("max_attempts", sa.Integer(), nullable=False, server_default="5"),
+        sa.Column("run_at", sa.DateTime(), nullable=False, server_default=sa.func.now()),
+        sa.Column("locked_until", sa.DateTime(), nullable=True),
+        sa.Column("worker", sa.String(length=64), nullable=True),
+        sa.Column("dedupe_key", sa.String(length=128), nullable=True, unique=True),
+        sa.Column("result", sa.JSON(), nullable=True),
+        sa.Column("last_error", sa.String(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.Column("started_at", sa.DateTime(), nullable=True),
+        sa.Column("finished_at", sa.DateTime(), nullable=True),
+        sa.Column("duration_ms", sa.Float(), nullable=True),
+    )
+    op.create_index("ix_jobs_queue_status_priority_run_at", "jobs", ["queue", "status", "priority", "run_at"])
+    op.create_index("ix_jobs_status_finished_at", "jobs", ["status", "finished_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_jobs_status_finished_at", table_name="jobs")
+    op.drop_index("ix_jobs_queue_status_priority_run_at", table_name="jobs")
+    op.drop_table("jobs")
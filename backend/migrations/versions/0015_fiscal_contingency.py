@@ -0,0 +1,43 @@
+"""Add fiscal_contingency table for offline NFC-e retransmission
+
+Revision ID: 0015
+Revises: 0014
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0015"
+down_revision = "0014"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "fiscal_contingency",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("reference", sa.String(length=32), nullable=False, unique=True),
+        sa.Column("sale_id", sa.Integer(), nullable=True),
+        sa.Column("uf", sa.String(length=2), nullable=True),
+        sa.Column("xml", sa.Text(), nullable=False),
+        sa.Column("reason", sa.String(), nullable=True),
+        sa.Column("status", sa.String(length=16), nullable=False, server_default="pending"),
+        sa.Column("attempts", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("deadline", sa.DateTime(), nullable=False),
+        sa.Column("next_attempt_at", sa.DateTime(), nullable=False, server_default=sa.func.now()),
+        sa.Column("locked_until", sa.DateTime(), nullable=True),
+        sa.Column("code", sa.String(length=8), nullable=True),
+        sa.Column("message", sa.String(), nullable=True),
+        sa.Column("protocol", sa.String(), nullable=True),
+        sa.Column("access_key", sa.String(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.Column("sent_at", sa.DateTime(), nullable=True),
+    )
+    op.create_index("ix_fiscal_contingency_status_deadline", "fiscal_contingency", ["status", "deadline"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_fiscal_contingency_status_deadline", table_name="fiscal_contingency")
+    op.drop_table("fiscal_contingency")
@@ -0,0 +1,26 @@
+"""Add claim token and sale document link to fiscal_contingency
+
+Revision ID: 0016
+Revises: 0015
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0016"
+down_revision = "0015"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("fiscal_contingency", sa.Column("claim_token", sa.String(32), nullable=True))
+    op.add_column("fiscal_contingency", sa.Column("outcome", sa.String(16), nullable=True))
+    op.add_column("fiscal_contingency", sa.Column("document_id", sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("fiscal_contingency", "document_id")
+    op.drop_column("fiscal_contingency", "outcome")
+    op.drop_column("fiscal_contingency", "claim_token")
@@ -16,9 +16,11 @@ if str(ROOT_DIR) not in sys.path:
 from app.core import security
 from app import main as main_module
 from app import models  # noqa: F401
-from app.api.deps import get_db
+from app.api.deps import get_db, get_read_db
 from app.db.base import Base
 from app.main import app
+from app.services.pricing import pricing_engine
+from app.services.product_lookup import product_lookup
 
 security.pwd_context = CryptContext(schemes=["plaintext"], deprecated="auto")
 
@@ -31,6 +33,9 @@ async def _create_engine() -> AsyncEngine:
         await conn.run_sync(Base.metadata.drop_all)
         await conn.run_sync(Base.metadata.create_all)
     main_module.AsyncSessionLocal = sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+    # Cada teste usa um banco novo: o índice de leitura e as promoções não podem reaproveitar o anterior.
+    product_lookup.reset()
+    pricing_engine.reset()
     return engine
 
 
@@ -55,6 +60,7 @@ def client(session_factory: sessionmaker) -> Generator[AsyncClient, None, None]:
             yield session
 
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_read_db] = override_get_db
     transport = ASGITransport(app=app)
     async_client = AsyncClient(transport=transport, base_url="http://test")
     try:
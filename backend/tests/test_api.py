@@ -1,15 +1,50 @@
 import asyncio
+import gzip
+import hashlib
+import sqlite3
+from datetime import date, datetime, timedelta
+from types import SimpleNamespace
 
+import httpx
 import pytest
 
 from httpx import AsyncClient
-from sqlalchemy import select
-from sqlalchemy.orm import sessionmaker
+from passlib.context import CryptContext
+from sqlalchemy import event, insert, select, text, update
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.orm import Session, sessionmaker
 
+from app.api.routes import produtos, vendas
+from app.core import money, security
+from app.core.config import JobSchedule, SefazEndpoint, get_settings
 from app.core.security import get_password_hash
-from app.models.product import StockItem, StockMovement
-from app.models.sale import Sale
+from app.db.base import Base
+from app.db.replica import ReadRouter
+from app.db.session import InstrumentedPool, pool_stats
+from app.fiscal import ContingencyManager, SefazClient, SefazRequestError
+from app.fiscal.standin import StandinConfig, create_standin_app
+from app.models.audit import AuditLog
+from app.models.error_log import ErrorLog
+from app.models.fiscal import FiscalContingency, FiscalDocument, FiscalEvent
+from app.models.job import Job
+from app.models.outbox import OutboxMessage
+from app.models.product import Product, StockItem, StockLocation, StockMovement
+from app.models.sale import Sale, SaleItem
 from app.models.user import Role, User
+from app.schemas.fiscal import CancelRequest, InvoiceRequest
+from app.services import audit, jobs, outbox, sale_effects
+from app.services.archive import archive_sales_month, archive_table_month
+from app.services.audit import AuditWriter
+from app.services.cart_store import CartJournal, CartStore
+from app.services.catalog_snapshot import CatalogSnapshot
+from app.services.error_sink import ErrorSink
+from app.services.fiscal import FiscalService, NfceAdapter, fiscal_service
+from app.services.fiscal_contingency import ContingencyRetransmitter
+from app.services.outbox import OutboxDispatcher, outbox_dispatcher
+from app.services.principal_cache import principal_cache
+from app.services.sales_rollup import rebuild_daily_facts
+from app.services.scale_labels import ean13_check_digit
+from app.services.stock_rollup import create_checkpoint, stock_as_of
 
 
 def run(coro):
@@ -192,3 +227,1497 @@ def test_permissions_block_unauthorized_actions(client: AsyncClient, session_fac
     response = run(client.post("/api/produtos/", json=product_payload, headers=headers))
     assert response.status_code == 403
     assert response.json()["detail"] == "Perfil insuficiente"
+
+
+def test_sale_batch_ingestion(client: AsyncClient, session_factory: sessionmaker, monkeypatch):
+    email = "batch@example.com"
+    run(_create_user(session_factory, email=email, role_name="GERENTE"))
+    headers, _ = run(_authenticate(client, email, "secret"))
+
+    product_payload = {
+        "sku": "SKU-LOTE",
+        "name": "Produto Lote",
+        "description": None,
+        "price": 5.0,
+        "cost": 2.0,
+        "is_active": True,
+    }
+    product_id = run(client.post("/api/produtos/", json=product_payload, headers=headers)).json()["id"]
+
+    def _venda(code: str, product: int) -> dict:
+        return {
+            "code": code,
+            "discount": 1,
+            "items": [{"product_id": product, "quantity": 3, "unit_price": 5.0}],
+            "payments": [{"method": "cash", "amount": 14.0}],
+        }
+
+    batch = {"sales": [_venda("OFF-1", product_id), _venda("OFF-2", 9999), _venda("OFF-1", product_id)]}
+    response = run(client.post("/api/vendas/lote", json=batch, headers=headers))
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["created"], body["rejected"], body["duplicates"]) == (1, 1, 1)
+    assert [r["status"] for r in body["results"]] == ["created", "rejected", "duplicate"]
+
+    replay = run(client.post("/api/vendas/lote", json={"sales": [_venda("OFF-1", product_id)]}, headers=headers))
+    assert replay.json()["results"][0]["status"] == "duplicate"
+
+    async def _auditorias() -> int:
+        async with session_factory() as session:
+            result = await session.execute(select(AuditLog.id).where(AuditLog.action == "create_sale_batch"))
+            return len(result.all())
+
+    # Nada criado, nada auditado; código gerado que colide com uma venda gravada vira 409, não 500.
+    assert run(_auditorias()) == 1
+    monkeypatch.setattr(vendas.uuid, "uuid4", lambda: SimpleNamespace(hex="OFF-1"))
+    colisao = run(client.post("/api/vendas/lote", json={"sales": [_venda(None, product_id)]}, headers=headers))
+    assert colisao.status_code == 409
+    assert run(_auditorias()) == 1
+    monkeypatch.undo()
+
+    sale_resp = run(client.get(f"/api/vendas/{body['results'][0]['sale_id']}", headers=headers))
+    sale = sale_resp.json()
+    assert sale["code"] == "OFF-1"
+    assert float(sale["total"]) == 14.0
+    assert len(sale["items"]) == 1 and len(sale["payments"]) == 1
+
+
+def test_cancel_restocks_aggregated_lines(client: AsyncClient, session_factory: sessionmaker):
+    email = "estoque@example.com"
+    run(_create_user(session_factory, email=email, role_name="GERENTE"))
+    headers, _ = run(_authenticate(client, email, "secret"))
+
+    product_payload = {
+        "sku": "SKU-ESTOQUE",
+        "name": "Produto Estoque",
+        "description": None,
+        "price": 3.0,
+        "cost": 1.0,
+        "is_active": True,
+    }
+    product_id = run(client.post("/api/produtos/", json=product_payload, headers=headers)).json()["id"]
+
+    sale_payload = {
+        "customer_id": None,
+        "discount": 0,
+        "items": [
+            {"product_id": product_id, "quantity": 2, "unit_price": 3.0},
+            {"product_id": product_id, "quantity": 1.5, "unit_price": 3.0},
+        ],
+        "payments": [{"method": "cash", "amount": 10.5}],
+    }
+    sale = run(client.post("/api/vendas/", json=sale_payload, headers=headers)).json()
+    finalize_payload = {"sale_id": sale["id"], "payments": [{"method": "cash", "amount": 10.5}]}
+    assert run(client.post("/api/vendas/finalizar", json=finalize_payload, headers=headers)).status_code == 200
+
+    async def _stock() -> tuple[float, list[str]]:
+        async with session_factory() as session:
+            stock_item = (
+                await session.execute(select(StockItem).where(StockItem.product_id == product_id))
+            ).scalar_one()
+            movements = (
+                await session.execute(
+                    select(StockMovement.movement_type).where(StockMovement.stock_item_id == stock_item.id)
+                )
+            ).scalars().all()
+            return float(stock_item.quantity), sorted(movements)
+
+    assert run(_stock()) == (-3.5, ["sale", "sale"])
+
+    cancel_resp = run(client.post("/api/vendas/cancelar", json={"sale_id": sale["id"]}, headers=headers))
+    assert cancel_resp.status_code == 200
+    assert run(_stock()) == (0.0, ["sale", "sale", "sale_cancel", "sale_cancel"])
+
+
+def test_in_memory_cart_checkpoint_and_recovery(client: AsyncClient, session_factory: sessionmaker, tmp_path, monkeypatch):
+    journal_path = str(tmp_path / "carts.journal")
+    monkeypatch.setattr(
+        vendas, "cart_store", CartStore(enabled=True, max_carts=10, journal=CartJournal(journal_path))
+    )
+    email = "carrinho@example.com"
+    run(_create_user(session_factory, email=email, role_name="GERENTE"))
+    headers, _ = run(_authenticate(client, email, "secret"))
+
+    product_payload = {
+        "sku": "SKU-CART",
+        "name": "Produto Carrinho",
+        "description": None,
+        "price": 4.5,
+        "cost": 1.0,
+        "is_active": True,
+    }
+    product_id = run(client.post("/api/produtos/", json=product_payload, headers=headers)).json()["id"]
+    sale_id = run(client.post("/api/vendas/iniciar", json={}, headers=headers)).json()["id"]
+
+    for quantity in (1, 2, 3):
+        resp = run(
+            client.post(
+                "/api/vendas/adicionar-item",
+                json={"sale_id": sale_id, "product_id": product_id, "quantity": quantity},
+                headers=headers,
+            )
+        )
+        assert resp.status_code == 200
+    removed_id = resp.json()["items"][1]["id"]
+    resp = run(
+        client.post("/api/vendas/remover-item", json={"sale_id": sale_id, "item_id": removed_id}, headers=headers)
+    )
+    assert float(resp.json()["total"]) == 18.0
+    assert all(item["id"] < 0 for item in resp.json()["items"])
+
+    async def _db_items() -> list[float]:
+        async with session_factory() as session:
+            result = await session.execute(select(SaleItem.quantity).where(SaleItem.sale_id == sale_id))
+            return sorted(float(q) for q in result.scalars().all())
+
+    assert run(_db_items()) == []
+
+    # Simula a queda do processo: um novo armazenamento reconstrói o carrinho pelo journal.
+    recovered = CartStore(enabled=True, max_carts=10, journal=CartJournal(journal_path))
+    assert run(recovered.recover(session_factory)) == 1
+    assert run(_db_items()) == [1.0, 3.0]
+    monkeypatch.setattr(vendas, "cart_store", recovered)
+
+    finalize_payload = {"sale_id": sale_id, "payments": [{"method": "cash", "amount": 18.0}]}
+    finalize_resp = run(client.post("/api/vendas/finalizar", json=finalize_payload, headers=headers))
+    assert finalize_resp.status_code == 200
+    assert float(finalize_resp.json()["sale"]["total"]) == 18.0
+    assert len(recovered) == 0
+
+
+
+def test_finalize_with_cart_store_commits_once(
+    client: AsyncClient, session_factory: sessionmaker, tmp_path, monkeypatch
+):
+    store = CartStore(enabled=True, max_carts=10, journal=CartJournal(str(tmp_path / "carts.journal")))
+    monkeypatch.setattr(vendas, "cart_store", store)
+    email = "carrinho-commit@example.com"
+    run(_create_user(session_factory, email=email, role_name="GERENTE"))
+    headers, _ = run(_authenticate(client, email, "secret"))
+    payload = {"sku": "SKU-UM-COMMIT", "name": "Produto Commit", "price": 5.0, "cost": 2.0}
+    product_id = run(client.post("/api/produtos/", json=payload, headers=headers)).json()["id"]
+    sale_id = run(client.post("/api/vendas/iniciar", json={}, headers=headers)).json()["id"]
+    linhas = [{"product_id": product_id, "quantity": 2}]
+    run(client.post("/api/vendas/adicionar-itens", json={"sale_id": sale_id, "lines": linhas}, headers=headers))
+
+    async def _itens() -> list[float]:
+        async with session_factory() as session:
+            result = await session.execute(select(SaleItem.quantity).where(SaleItem.sale_id == sale_id))
+            return [float(quantidade) for quantidade in result.scalars()]
+
+    commits = []
+
+    def _contar(session) -> None:
+        commits.append(session)
+
+    event.listen(Session, "after_commit", _contar)
+    try:
+        # Pagamento insuficiente: nada é gravado e o carrinho continua com as linhas pendentes.
+        finalize = {"sale_id": sale_id, "payments": [{"method": "cash", "amount": 5.0}]}
+        assert run(client.post("/api/vendas/finalizar", json=finalize, headers=headers)).status_code == 400
+        assert commits == [] and run(_itens()) == [] and store.peek(sale_id).dirty
+
+        finalize["payments"][0]["amount"] = 10.0
+        assert run(client.post("/api/vendas/finalizar", json=finalize, headers=headers)).status_code == 200
+        # Linhas do carrinho, venda, estoque, outbox e auditoria no mesmo commit.
+        assert len(commits) == 1
+    finally:
+        event.remove(Session, "after_commit", _contar)
+    assert run(_itens()) == [2.0] and len(store) == 0
+
+
+def test_multi_item_scan_returns_only_changed_lines(client: AsyncClient, session_factory: sessionmaker):
+    email = "scan@example.com"
+    run(_create_user(session_factory, email=email, role_name="GERENTE"))
+    headers, _ = run(_authenticate(client, email, "secret"))
+
+    product_payload = {
+        "sku": "7891000100103",
+        "name": "Produto Scan",
+        "description": None,
+        "price": 2.5,
+        "cost": 1.0,
+        "is_active": True,
+    }
+    product_id = run(client.post("/api/produtos/", json=product_payload, headers=headers)).json()["id"]
+    sale_id = run(client.post("/api/vendas/iniciar", json={"discount": 1}, headers=headers)).json()["id"]
+
+    first = run(
+        client.post(
+            "/api/vendas/adicionar-itens",
+            json={
+                "sale_id": sale_id,
+                "lines": [{"product_id": product_id, "quantity": 2}, {"barcode": "7891000100103"}],
+            },
+            headers=headers,
+        )
+    )
+    assert first.status_code == 200
+    body = first.json()
+    assert len(body["items"]) == 2
+    assert (body["subtotal"], body["total"]) == (7.5, 6.5)
+
+    second = run(
+        client.post(
+            "/api/vendas/adicionar-itens",
+            json={"sale_id": sale_id, "lines": [{"barcode": "7891000100103", "quantity": 4}]},
+            headers=headers,
+        )
+    ).json()
+    assert len(second["items"]) == 1
+    assert second["total"] == 16.5
+
+    missing = run(
+        client.post(
+            "/api/vendas/adicionar-itens",
+            json={"sale_id": sale_id, "lines": [{"barcode": "000"}]},
+            headers=headers,
+        )
+    )
+    assert missing.status_code == 404
+
+
+def test_sale_listing_keyset_pagination(client: AsyncClient, session_factory: sessionmaker):
+    email = "listagem@example.com"
+    run(_create_user(session_factory, email=email, role_name="GERENTE"))
+    headers, _ = run(_authenticate(client, email, "secret"))
+
+    product_payload = {
+        "sku": "SKU-LISTA",
+        "name": "Produto Lista",
+        "description": None,
+        "price": 1.0,
+        "cost": 0.5,
+        "is_active": True,
+    }
+    product_id = run(client.post("/api/produtos/", json=product_payload, headers=headers)).json()["id"]
+    batch = {
+        "sales": [
+            {
+                "code": f"LISTA-{index}",
+                "created_at": f"2026-01-0{index}T10:00:00",
+                "items": [{"product_id": product_id, "quantity": 1, "unit_price": 1.0}],
+                "payments": [],
+            }
+            for index in range(1, 4)
+        ]
+    }
+    assert run(client.post("/api/vendas/lote", json=batch, headers=headers)).json()["created"] == 3
+
+    first = run(client.get("/api/vendas/", params={"limit": 2}, headers=headers)).json()
+    assert [sale["code"] for sale in first["data"]] == ["LISTA-3", "LISTA-2"]
+    assert first["data"][0]["items"] is None
+    assert first["next_cursor"]
+
+    second = run(
+        client.get(
+            "/api/vendas/",
+            params={"limit": 2, "cursor": first["next_cursor"], "expand": "items"},
+            headers=headers,
+        )
+    ).json()
+    assert [sale["code"] for sale in second["data"]] == ["LISTA-1"]
+    assert len(second["data"][0]["items"]) == 1
+    assert second["next_cursor"] is None
+
+    filtered = run(
+        client.get("/api/vendas/", params={"date_from": "2026-01-02", "date_to": "2026-01-02"}, headers=headers)
+    ).json()
+    assert [sale["code"] for sale in filtered["data"]] == ["LISTA-2"]
+
+    invalid = run(client.get("/api/vendas/", params={"cursor": "???"}, headers=headers))
+    assert invalid.status_code == 400
+
+
+def test_daily_sales_reports_read_rollups(client: AsyncClient, session_factory: sessionmaker):
+    email = "relatorio@example.com"
+    run(_create_user(session_factory, email=email, role_name="GERENTE"))
+    headers, _ = run(_authenticate(client, email, "secret"))
+
+    product_payload = {
+        "sku": "SKU-REL",
+        "name": "Produto Relatório",
+        "description": None,
+        "price": 10.0,
+        "cost": 5.0,
+        "is_active": True,
+    }
+    product_id = run(client.post("/api/produtos/", json=product_payload, headers=headers)).json()["id"]
+
+    sale_ids = []
+    for quantity in (1, 2):
+        sale = run(
+            client.post(
+                "/api/vendas/",
+                json={
+                    "discount": 1,
+                    "items": [{"product_id": product_id, "quantity": quantity, "unit_price": 10.0}],
+                    "payments": [],
+                },
+                headers=headers,
+            )
+        ).json()
+        finalize = {"sale_id": sale["id"], "payments": [{"method": "cash", "amount": 100}], "discount": 1}
+        assert run(client.post("/api/vendas/finalizar", json=finalize, headers=headers)).status_code == 200
+        sale_ids.append(sale["id"])
+
+    run(client.post("/api/vendas/cancelar", json={"sale_id": sale_ids[0]}, headers=headers))
+    # Os totais das vendas finalizadas chegam pelo outbox, mesmo depois do estorno do cancelamento.
+    assert run(outbox_dispatcher.dispatch_pending(session_factory)) == 4
+
+    today = date.today().isoformat()
+    daily = run(client.get("/api/relatorios/vendas/diario", headers=headers)).json()
+    assert daily == [{"data": today, "total": 19.0, "quantidade": 1}]
+
+    top = run(client.get("/api/relatorios/produtos-mais-vendidos", params={"limite": 5}, headers=headers)).json()
+    assert top == [{"product_id": product_id, "produto": "Produto Relatório", "quantidade": 2.0, "faturamento": 20.0}]
+
+    async def _rebuild():
+        async with session_factory() as session:
+            await rebuild_daily_facts(session, date.today(), date.today())
+            await session.commit()
+
+    run(_rebuild())
+    assert run(client.get("/api/relatorios/vendas/diario", headers=headers)).json() == daily
+    assert run(client.get("/api/relatorios/produtos-mais-vendidos", headers=headers)).json() == top
+
+    empty = run(
+        client.get("/api/relatorios/vendas/diario", params={"data_fim": "2000-01-01"}, headers=headers)
+    ).json()
+    assert empty == []
+
+
+def test_stock_turnover_and_as_of_queries(client: AsyncClient, session_factory: sessionmaker):
+    email = "giro@example.com"
+    run(_create_user(session_factory, email=email, role_name="GERENTE"))
+    headers, _ = run(_authenticate(client, email, "secret"))
+
+    product_payload = {
+        "sku": "SKU-GIRO",
+        "name": "Produto Giro",
+        "description": None,
+        "price": 1.0,
+        "cost": 0.5,
+        "is_active": True,
+    }
+    product_id = run(client.post("/api/produtos/", json=product_payload, headers=headers)).json()["id"]
+    sale = run(
+        client.post(
+            "/api/vendas/",
+            json={"items": [{"product_id": product_id, "quantity": 4, "unit_price": 1.0}], "payments": []},
+            headers=headers,
+        )
+    ).json()
+    finalize = {"sale_id": sale["id"], "payments": [{"method": "cash", "amount": 4}]}
+    assert run(client.post("/api/vendas/finalizar", json=finalize, headers=headers)).status_code == 200
+
+    today = date.today()
+    yesterday = today - timedelta(days=1)
+
+    async def _checkpoint_and_query() -> tuple[list, list]:
+        async with session_factory() as session:
+            assert await create_checkpoint(session, yesterday) == 1
+            await session.commit()
+            return list((await stock_as_of(session, yesterday)).values()), list(
+                (await stock_as_of(session, today, product_id)).values()
+            )
+
+    before, after = run(_checkpoint_and_query())
+    assert [float(q) for q in before] == [0.0]
+    assert [float(q) for q in after] == [-4.0]
+
+    giro = run(client.get("/api/relatorios/giro-estoque", headers=headers)).json()
+    assert giro[0]["saidas"] == 4.0 and giro[0]["estoque_inicial"] == 0.0 and giro[0]["estoque_final"] == -4.0
+
+    as_of = run(
+        client.get("/api/relatorios/estoque-em", params={"data": yesterday.isoformat()}, headers=headers)
+    ).json()
+    assert as_of == [{"product_id": product_id, "produto": "Produto Giro", "location_id": as_of[0]["location_id"], "quantidade": 0.0}]
+
+
+def test_batched_audit_writer(client: AsyncClient, session_factory: sessionmaker, monkeypatch):
+    writer = AuditWriter(
+        enabled=True, max_queue=100, batch_size=50, flush_seconds=60, critical_actions={"finalize_sale"}
+    )
+    monkeypatch.setattr(audit, "audit_writer", writer)
+
+    async def _count() -> int:
+        async with session_factory() as session:
+            return len((await session.execute(select(AuditLog.id))).all())
+
+    async def _scenario() -> tuple[int, int, int]:
+        writer.start(session_factory)
+        async with session_factory() as session:
+            for index in range(3):
+                await audit.log_action(session, None, "add_sale_item", "Sale", index)
+            pending = await _count()
+            await audit.log_action(session, None, "finalize_sale", "Sale", 1)
+            after_critical = await _count()
+            await audit.log_action(session, None, "cancel_sale", "Sale", 1)
+        await writer.stop()
+        return pending, after_critical, await _count()
+
+    pending, after_critical, drained = run(_scenario())
+    assert pending == 0
+    assert after_critical == 4
+    assert drained == 5
+
+    metrics = run(client.get("/api/health/audit")).json()
+    assert metrics["queue_depth"] == 0 and metrics["written"] == 5 and metrics["batches"] == 2
+
+
+def test_principal_cache_hits_and_invalidation(client: AsyncClient, session_factory: sessionmaker):
+    email = "cache@example.com"
+    run(_create_user(session_factory, email=email, role_name="GERENTE"))
+    headers, _ = run(_authenticate(client, email, "secret"))
+
+    hits = principal_cache.hits
+    for _ in range(3):
+        response = run(client.get("/api/auth/me", headers=headers))
+        assert response.status_code == 200
+        assert [role["name"] for role in response.json()["roles"]] == ["GERENTE"]
+    assert principal_cache.hits - hits == 2
+
+    async def _deactivate() -> None:
+        async with session_factory() as session:
+            user = (await session.execute(select(User).where(User.email == email))).scalar_one()
+            user.is_active = False
+            await session.commit()
+
+    run(_deactivate())
+    assert run(client.get("/api/auth/me", headers=headers)).status_code == 400
+    assert run(client.get("/api/health/auth-cache")).json()["invalidations"] >= 1
+
+
+def test_login_rehashes_deprecated_password_off_loop(
+    client: AsyncClient, session_factory: sessionmaker, monkeypatch
+):
+    email = "rehash@example.com"
+    run(_create_user(session_factory, email=email, role_name="CAIXA"))
+    monkeypatch.setattr(
+        security, "pwd_context", CryptContext(schemes=["hex_sha256", "plaintext"], deprecated=["plaintext"])
+    )
+
+    calls = security.password_hasher.calls
+    run(_authenticate(client, email, "secret"))
+
+    async def _stored_hash() -> str:
+        async with session_factory() as session:
+            return (await session.execute(select(User.hashed_password).where(User.email == email))).scalar_one()
+
+    assert run(_stored_hash()) == hashlib.sha256(b"secret").hexdigest()
+    run(_authenticate(client, email, "secret"))
+
+    metrics = run(client.get("/api/health/password-hashing")).json()
+    assert security.password_hasher.calls - calls == 2
+    assert metrics["rehashed"] >= 1 and metrics["waiting"] == 0
+
+
+def test_error_sink_aggregates_by_fingerprint(session_factory: sessionmaker):
+    user = run(_create_user(session_factory, email="erros@example.com", role_name="CAIXA"))
+    sink = ErrorSink(flush_seconds=60, min_interval_seconds=3600, max_fingerprints=10)
+
+    def _falhar(valor: int) -> None:
+        raise ValueError(f"falha {valor}")
+
+    def _registrar(valor: int, path: str = "/api/vendas/{sale_id}") -> str:
+        try:
+            _falhar(valor)
+        except ValueError as exc:
+            return sink.record(path, "GET", 500, exc, subject="erros@example.com")
+
+    fingerprints = {_registrar(valor) for valor in range(3)}
+    other = _registrar(0, path="/api/produtos/")
+    assert len(fingerprints) == 1 and other not in fingerprints
+    assert run(sink.flush(session_factory)) == 2
+
+    _registrar(5)
+    _registrar(6)
+    assert run(sink.flush(session_factory)) == 0
+    assert sink.metrics()["pending_occurrences"] == 2
+    assert run(sink.flush(session_factory, force=True)) == 1
+
+    async def _rows() -> list[tuple]:
+        async with session_factory() as session:
+            result = await session.execute(
+                select(ErrorLog.path, ErrorLog.occurrences, ErrorLog.user_id, ErrorLog.message).order_by(ErrorLog.id)
+            )
+            return result.all()
+
+    assert run(_rows()) == [
+        ("/api/vendas/{sale_id}", 3, user.id, "falha 0"),
+        ("/api/produtos/", 1, user.id, "falha 0"),
+        ("/api/vendas/{sale_id}", 2, user.id, "falha 5"),
+    ]
+
+
+def test_instrumented_pool_reports_checkouts(client: AsyncClient, tmp_path):
+    engine = create_async_engine(
+        f"sqlite+aiosqlite:///{tmp_path / 'pool.db'}", poolclass=InstrumentedPool, pool_size=2, max_overflow=0
+    )
+    checkouts = pool_stats.checkouts
+
+    async def _query() -> None:
+        for _ in range(3):
+            async with engine.connect() as connection:
+                await connection.execute(text("SELECT 1"))
+        assert engine.pool.checkedout() == 0
+        await engine.dispose()
+
+    run(_query())
+    assert pool_stats.checkouts - checkouts == 3
+
+    status = run(client.get("/api/health/db")).json()
+    assert {"size", "checked_out", "idle", "overflow", "avg_wait_ms", "max_wait_ms", "timeouts"} <= set(status)
+
+
+def test_read_router_uses_replica_and_falls_back(session_factory: sessionmaker, tmp_path):
+    replica_engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'replica.db'}")
+    broken_engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'ausente' / 'replica.db'}")
+
+    async def _scenario() -> tuple[list[str], list[str], list[str], dict]:
+        async with replica_engine.begin() as connection:
+            await connection.run_sync(Base.metadata.create_all)
+            await connection.execute(Role.__table__.insert().values(name="REPLICA"))
+
+        async def _roles(router: ReadRouter) -> list[str]:
+            factory = await router.session_factory()
+            async with factory() as session:
+                return list((await session.execute(select(Role.name))).scalars())
+
+        router = ReadRouter(
+            session_factory, [broken_engine, replica_engine], max_lag_seconds=5, check_seconds=60, check_timeout_seconds=2
+        )
+        from_replica = [await _roles(router) for _ in range(2)]
+        status = router.status()
+
+        lagging = ReadRouter(
+            session_factory, [replica_engine], max_lag_seconds=-1, check_seconds=60, check_timeout_seconds=2
+        )
+        from_primary = await _roles(lagging)
+        await replica_engine.dispose()
+        await broken_engine.dispose()
+        return from_replica[0], from_replica[1], from_primary, status
+
+    first, second, primary, status = run(_scenario())
+    assert first == second == ["REPLICA"]
+    assert primary == []
+    broken, healthy = status["replicas"]
+    assert not broken["healthy"] and broken["last_error"]
+    assert healthy["healthy"] and healthy["lag_seconds"] == 0.0 and healthy["reads"] == 2
+
+
+def test_monthly_archive_and_on_demand_query(
+    client: AsyncClient, session_factory: sessionmaker, tmp_path, monkeypatch
+):
+    monkeypatch.setattr(get_settings(), "archive_dir", str(tmp_path))
+    email = "arquivo@example.com"
+    run(_create_user(session_factory, email=email, role_name="GERENTE"))
+    headers, _ = run(_authenticate(client, email, "secret"))
+    product_payload = {
+        "sku": "SKU-ARQ",
+        "name": "Produto Arquivo",
+        "description": None,
+        "price": 3.0,
+        "cost": 1.0,
+        "is_active": True,
+    }
+    product_id = run(client.post("/api/produtos/", json=product_payload, headers=headers)).json()["id"]
+    sale = run(
+        client.post(
+            "/api/vendas/",
+            json={"items": [{"product_id": product_id, "quantity": 2, "unit_price": 3.0}], "payments": []},
+            headers=headers,
+        )
+    ).json()
+    finalize = {"sale_id": sale["id"], "payments": [{"method": "cash", "amount": 6}]}
+    assert run(client.post("/api/vendas/finalizar", json=finalize, headers=headers)).status_code == 200
+
+    month = date(2023, 3, 1)
+
+    async def _archive() -> tuple[int, int, list]:
+        async with session_factory() as session:
+            backdated = datetime(2023, 3, 15, 10, 0)
+            await session.execute(update(Sale).where(Sale.id == sale["id"]).values(created_at=backdated))
+            await session.execute(update(AuditLog).values(created_at=backdated))
+            # Em loja com NFC-e praticamente toda venda tem documento fiscal: ele sai junto com a venda.
+            session.add(
+                FiscalDocument(
+                    sale_id=sale["id"],
+                    model="NFC-e",
+                    status="authorized",
+                    protocol="135230000000001",
+                    events=[FiscalEvent(type="emission", status="authorized", created_at=backdated)],
+                )
+            )
+            await session.commit()
+            sales = await archive_sales_month(session, month)
+            audits = await archive_table_month(session, "audit_logs", month)
+            remaining = (await session.execute(select(Sale.id))).all() + (
+                await session.execute(select(AuditLog.id))
+            ).all()
+            remaining += (await session.execute(select(FiscalDocument.id))).all() + (
+                await session.execute(select(FiscalEvent.id))
+            ).all()
+            movements = (await session.execute(select(StockMovement.sale_item_id))).scalars().all()
+            return sales, audits, remaining + [tuple(movements)]
+
+    sales, audits, remaining = run(_archive())
+    assert sales == 1 and audits >= 2
+    assert remaining == [(None,)]
+
+    listing = run(client.get("/api/relatorios/arquivo", headers=headers)).json()
+    assert listing["sales"] == ["2023-03"] and listing["audit_logs"] == ["2023-03"]
+
+    archived = run(
+        client.get(
+            "/api/relatorios/arquivo/sales/2023-03", params={"filtro": f"id={sale['id']}"}, headers=headers
+        )
+    ).json()
+    assert archived[0]["status"] == "completed" and archived[0]["total"] == "6.00"
+    assert archived[0]["items"][0]["product_id"] == product_id
+    (documento,) = archived[0]["fiscal_documents"]
+    assert (documento["model"], documento["protocol"]) == ("NFC-e", "135230000000001")
+    assert [(evento["type"], evento["status"]) for evento in documento["events"]] == [("emission", "authorized")]
+    bad = run(client.get("/api/relatorios/arquivo/users/2023-03", headers=headers))
+    assert bad.status_code == 400
+
+
+
+def test_partition_maintenance_runs_as_monthly_job(session_factory: sessionmaker, tmp_path, monkeypatch):
+    monkeypatch.setattr(get_settings(), "archive_dir", str(tmp_path))
+    agenda = {agenda.task: agenda.cron for agenda in get_settings().jobs_schedules}
+    assert agenda["partitions.maintain"] == "0 5 1 * *"
+
+    async def _enfileirar():
+        async with session_factory() as session:
+            session.add(AuditLog(action="login", entity="user", created_at=datetime(2020, 1, 10)))
+            session.add(AuditLog(action="login", entity="user", created_at=datetime.utcnow()))
+            jobs.enqueue_job(session, "partitions.maintain", {"retencao": 12})
+            await session.commit()
+
+    async def _estado():
+        async with session_factory() as session:
+            job = (await session.execute(select(Job).where(Job.task == "partitions.maintain"))).scalar_one()
+            restantes = (await session.execute(select(AuditLog.action))).scalars().all()
+            return job, restantes
+
+    run(_enfileirar())
+    runner = jobs.JobRunner(
+        enabled=True,
+        queues={"reports": 1},
+        poll_seconds=0.1,
+        lease_seconds=60,
+        max_attempts=1,
+        retry_base_seconds=0,
+        retention_days=7,
+        schedules=[],
+    )
+    assert run(runner.run_pending(session_factory, "reports")) == 1
+    job, restantes = run(_estado())
+    assert job.status == "done"
+    assert job.result == {"created": [], "archived": {"audit_logs 2020-01": 1}}
+    assert restantes == ["login"]
+
+
+def test_catalog_delta_sync_with_etag(client: AsyncClient, session_factory: sessionmaker):
+    email = "catalogo@example.com"
+    run(_create_user(session_factory, email=email, role_name="GERENTE"))
+    headers, _ = run(_authenticate(client, email, "secret"))
+    ids = []
+    for index in range(3):
+        payload = {"sku": f"SKU-SYNC-{index}", "name": f"Item {index}", "price": 2.0, "cost": 1.0}
+        ids.append(run(client.post("/api/produtos/", json=payload, headers=headers)).json()["id"])
+
+    full = run(client.get("/api/produtos/sync", params={"since": 0}, headers=headers))
+    assert full.status_code == 200
+    page = full.json()
+    assert [p["id"] for p in page["changes"]] == ids and page["deleted"] == []
+    assert not page["has_more"]
+
+    cached = run(
+        client.get(
+            "/api/produtos/sync",
+            params={"since": 0},
+            headers={**headers, "If-None-Match": full.headers["etag"]},
+        )
+    )
+    assert cached.status_code == 304
+
+    first = run(client.get("/api/produtos/sync", params={"since": 0, "limit": 2}, headers=headers)).json()
+    assert first["has_more"] and [p["id"] for p in first["changes"]] == ids[:2]
+
+    assert run(client.put(f"/api/produtos/{ids[0]}", json={"price": 2.5}, headers=headers)).status_code == 200
+    assert run(client.delete(f"/api/produtos/{ids[1]}", headers=headers)).status_code == 204
+
+    delta = run(client.get("/api/produtos/sync", params={"since": page["cursor"]}, headers=headers))
+    body = delta.json()
+    assert [p["id"] for p in body["changes"]] == [ids[0]] and body["changes"][0]["price"] == 2.5
+    assert body["deleted"] == [ids[1]] and body["cursor"] > page["cursor"]
+    assert delta.headers["etag"] != full.headers["etag"]
+
+    empty = run(client.get("/api/produtos/sync", params={"since": body["cursor"]}, headers=headers)).json()
+    assert empty["changes"] == [] and empty["deleted"] == [] and empty["cursor"] == body["cursor"]
+
+
+def test_catalog_snapshot_incremental_and_ranges(
+    client: AsyncClient, session_factory: sessionmaker, tmp_path, monkeypatch
+):
+    snapshot = CatalogSnapshot(str(tmp_path), check_seconds=30)
+    monkeypatch.setattr(produtos, "catalog_snapshot", snapshot)
+    email = "snapshot@example.com"
+    run(_create_user(session_factory, email=email, role_name="GERENTE"))
+    headers, _ = run(_authenticate(client, email, "secret"))
+    ids = []
+    for index in range(2):
+        payload = {"sku": f"789000{index}", "name": f"Item {index}", "price": 4.99, "cost": 2.0}
+        ids.append(run(client.post("/api/produtos/", json=payload, headers=headers)).json()["id"])
+
+    def _catalogo(conteudo: bytes) -> dict:
+        path = tmp_path / "terminal.sqlite"
+        path.write_bytes(gzip.decompress(conteudo))
+        conn = sqlite3.connect(path)
+        try:
+            return {
+                "products": conn.execute("SELECT id, price_cents FROM products ORDER BY id").fetchall(),
+                "barcodes": dict(conn.execute("SELECT code, product_id FROM barcodes")),
+                "seq": int(conn.execute("SELECT value FROM meta WHERE key = 'seq'").fetchone()[0]),
+            }
+        finally:
+            conn.close()
+
+    manifest = run(client.get("/api/produtos/snapshot/manifest", headers=headers)).json()
+    full = run(client.get("/api/produtos/snapshot", headers=headers))
+    assert full.status_code == 200 and full.headers["x-catalog-seq"] == str(manifest["seq"])
+    assert hashlib.sha256(full.content).hexdigest() == manifest["sha256"] == full.headers["x-content-sha256"]
+    assert len(full.content) == manifest["size"]
+    catalogo = _catalogo(full.content)
+    assert catalogo["products"] == [(ids[0], 499), (ids[1], 499)]
+    assert catalogo["barcodes"] == {"7890000": ids[0], "7890001": ids[1]}
+
+    parte = run(client.get("/api/produtos/snapshot", headers={**headers, "Range": "bytes=10-"}))
+    assert parte.status_code == 206 and parte.content == full.content[10:]
+    assert parte.headers["content-range"] == f"bytes 10-{manifest['size'] - 1}/{manifest['size']}"
+    fim = run(client.get("/api/produtos/snapshot", headers={**headers, "Range": "bytes=-5"}))
+    assert fim.content == full.content[-5:]
+    fora = run(client.get("/api/produtos/snapshot", headers={**headers, "Range": f"bytes={manifest['size']}-"}))
+    assert fora.status_code == 416
+    cached = run(client.get("/api/produtos/snapshot", headers={**headers, "If-None-Match": full.headers["etag"]}))
+    assert cached.status_code == 304
+
+    run(client.put(f"/api/produtos/{ids[0]}", json={"price": 5.25}, headers=headers))
+    run(client.delete(f"/api/produtos/{ids[1]}", headers=headers))
+
+    async def _refresh():
+        async with session_factory() as session:
+            return await snapshot.refresh(session)
+
+    novo = run(_refresh())
+    assert novo.seq > manifest["seq"] and snapshot.incremental_builds == 1 and snapshot.full_builds == 1
+    atualizado = run(client.get("/api/produtos/snapshot", headers=headers))
+    assert atualizado.headers["etag"] != full.headers["etag"]
+    catalogo = _catalogo(atualizado.content)
+    assert catalogo["products"] == [(ids[0], 525)] and catalogo["barcodes"] == {"7890000": ids[0]}
+    assert catalogo["seq"] == novo.seq
+
+    # Outro worker no mesmo diretório adota o arquivo já gerado em vez de gerar de novo.
+    outro = CatalogSnapshot(str(tmp_path), check_seconds=30)
+
+    async def _refresh_outro():
+        async with session_factory() as session:
+            return await outro.refresh(session)
+
+    adotado = run(_refresh_outro())
+    assert (adotado.seq, adotado.sha256) == (novo.seq, novo.sha256)
+    assert outro.full_builds == outro.incremental_builds == 0
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+def test_barcode_scan_and_prefix_search(client: AsyncClient, session_factory: sessionmaker):
+    email = "leitura@example.com"
+    run(_create_user(session_factory, email=email, role_name="GERENTE"))
+    headers, _ = run(_authenticate(client, email, "secret"))
+    payload = {"sku": "CAF-500", "name": "Café Torrado 500g", "price": 18.0, "cost": 9.0}
+    product_id = run(client.post("/api/produtos/", json=payload, headers=headers)).json()["id"]
+    for code, pack in (("7891234567895", 1), ("17891234567892", 12)):
+        created = run(
+            client.post(
+                f"/api/produtos/{product_id}/codigos",
+                json={"code": code, "pack_quantity": pack},
+                headers=headers,
+            )
+        )
+        assert created.status_code == 201
+    duplicate = run(
+        client.post(f"/api/produtos/{product_id}/codigos", json={"code": "7891234567895"}, headers=headers)
+    )
+    assert duplicate.status_code == 409
+
+    async def _stock():
+        async with session_factory() as session:
+            session.add(StockLocation(id=1, name="Loja", is_default=True))
+            session.add(StockItem(product_id=product_id, location_id=1, quantity=40))
+            await session.commit()
+
+    run(_stock())
+
+    caixa = run(client.get("/api/produtos/scan/17891234567892", headers=headers)).json()
+    assert (caixa["product_id"], caixa["quantity"], caixa["price"], caixa["on_hand"]) == (product_id, 12, 18.0, 40)
+    assert run(client.get("/api/produtos/scan/CAF-500", headers=headers)).json()["quantity"] == 1
+    assert run(client.get("/api/produtos/scan/000", headers=headers)).status_code == 404
+
+    found = run(client.get("/api/produtos/busca", params={"q": "cafe tor"}, headers=headers)).json()
+    assert [item["product_id"] for item in found] == [product_id]
+
+    sale_id = run(client.post("/api/vendas/iniciar", json={}, headers=headers)).json()["id"]
+    added = run(
+        client.post(
+            "/api/vendas/adicionar-itens",
+            json={"sale_id": sale_id, "lines": [{"barcode": "17891234567892"}]},
+            headers=headers,
+        )
+    ).json()
+    assert added["items"][0]["quantity"] == 12 and added["total"] == 216.0
+
+    run(client.put(f"/api/produtos/{product_id}", json={"name": "Cafe Especial"}, headers=headers))
+    run(client.delete(f"/api/produtos/{product_id}/codigos/17891234567892", headers=headers))
+    assert run(client.get("/api/produtos/scan/17891234567892", headers=headers)).status_code == 404
+    assert run(client.get("/api/produtos/busca", params={"q": "café t"}, headers=headers)).json() == []
+    assert len(run(client.get("/api/produtos/busca", params={"q": "CAFE ESP"}, headers=headers)).json()) == 1
+
+    sync = run(client.get("/api/produtos/sync", params={"since": 0}, headers=headers)).json()
+    assert [b["code"] for b in sync["changes"][0]["barcodes"]] == ["7891234567895"]
+
+
+def test_scale_label_scan_resolves_plu(client: AsyncClient, session_factory: sessionmaker):
+    email = "balanca@example.com"
+    run(_create_user(session_factory, email=email, role_name="GERENTE"))
+    headers, _ = run(_authenticate(client, email, "secret"))
+    payload = {"sku": "QJO-MUS", "name": "Queijo Muçarela kg", "price": 45.9, "cost": 30.0, "plu": 123}
+    product_id = run(client.post("/api/produtos/", json=payload, headers=headers)).json()["id"]
+
+    def _etiqueta(corpo: str) -> str:
+        return corpo + str(ean13_check_digit(corpo))
+
+    # Formato padrão: prefixo 2, PLU de 5 dígitos e preço em centavos (R$ 22,95 = 0,500 kg).
+    preco = _etiqueta("200123002295")
+    lido = run(client.get(f"/api/produtos/scan/{preco}", headers=headers)).json()
+    assert (lido["product_id"], lido["quantity"], lido["total"]) == (product_id, 0.5, 22.95)
+
+    errado = preco[:-1] + str((int(preco[-1]) + 1) % 10)
+    assert run(client.get(f"/api/produtos/scan/{errado}", headers=headers)).status_code == 400
+    assert run(client.get(f"/api/produtos/scan/{_etiqueta('200999001000')}", headers=headers)).status_code == 404
+
+    # Preço alterado depois da pesagem: o total impresso é mantido.
+    run(client.put(f"/api/produtos/{product_id}", json={"price": 49.9}, headers=headers))
+    sale_id = run(client.post("/api/vendas/iniciar", json={}, headers=headers)).json()["id"]
+    sale = run(
+        client.post("/api/vendas/adicionar-item", json={"sale_id": sale_id, "barcode": preco}, headers=headers)
+    ).json()
+    assert sale["items"][0]["product_id"] == product_id
+    assert sale["total"] == 22.95
+
+    # PLU gravado por outro worker, fora deste índice: a leitura cai na consulta ao banco.
+    async def _cadastrar_em_outro_worker() -> int:
+        async with session_factory() as session:
+            result = await session.execute(
+                insert(Product)
+                .values(sku="PRE-KG", name="Presunto kg", price=30.0, cost=20.0, is_active=True, plu=124)
+                .returning(Product.id)
+            )
+            await session.commit()
+            return result.scalar_one()
+
+    presunto_id = run(_cadastrar_em_outro_worker())
+    presunto = _etiqueta("200124001500")
+    lido = run(client.get(f"/api/produtos/scan/{presunto}", headers=headers)).json()
+    assert (lido["product_id"], lido["quantity"], lido["total"]) == (presunto_id, 0.5, 15.0)
+    linhas = [{"barcode": presunto}]
+    delta = run(
+        client.post("/api/vendas/adicionar-itens", json={"sale_id": sale_id, "lines": linhas}, headers=headers)
+    ).json()
+    assert (delta["items"][0]["product_id"], delta["total"]) == (presunto_id, 37.95)
+
+
+def test_promotions_reprice_cart_lines(client: AsyncClient, session_factory: sessionmaker, tmp_path, monkeypatch):
+    email = "promocao@example.com"
+    run(_create_user(session_factory, email=email, role_name="GERENTE"))
+    headers, _ = run(_authenticate(client, email, "secret"))
+    ids = {}
+    for sku, price in (("SUCO-UVA", 5.0), ("SUCO-LIM", 3.0), ("AGUA-500", 2.0)):
+        payload = {"sku": sku, "name": sku, "price": price, "cost": 1.0}
+        ids[sku] = run(client.post("/api/produtos/", json=payload, headers=headers)).json()["id"]
+    kit = {
+        "name": "3 sucos por R$ 10",
+        "kind": "mix_match",
+        "min_quantity": 3,
+        "bundle_price": 10,
+        "products": [{"product_id": ids["SUCO-UVA"]}, {"product_id": ids["SUCO-LIM"]}],
+    }
+    assert run(client.post("/api/promocoes/", json=kit, headers=headers)).status_code == 201
+    faixa = {
+        "name": "Água: 10% a partir de 6",
+        "kind": "tier",
+        "min_quantity": 6,
+        "percent_off": 10,
+        "products": [{"product_id": ids["AGUA-500"]}],
+    }
+    assert run(client.post("/api/promocoes/", json=faixa, headers=headers)).status_code == 201
+    invalida = {**faixa, "kind": "buy_get"}
+    assert run(client.post("/api/promocoes/", json=invalida, headers=headers)).status_code == 422
+
+    # Carrinho em memória: a leitura que fecha o kit devolve também a linha que mudou de desconto.
+    monkeypatch.setattr(
+        vendas, "cart_store", CartStore(enabled=True, max_carts=10, journal=CartJournal(str(tmp_path / "j")))
+    )
+    sale_id = run(client.post("/api/vendas/iniciar", json={}, headers=headers)).json()["id"]
+    linhas = [{"product_id": ids["SUCO-UVA"], "quantity": 2}]
+    run(client.post("/api/vendas/adicionar-itens", json={"sale_id": sale_id, "lines": linhas}, headers=headers))
+    linhas = [{"product_id": ids["SUCO-LIM"]}]
+    delta = run(
+        client.post("/api/vendas/adicionar-itens", json={"sale_id": sale_id, "lines": linhas}, headers=headers)
+    ).json()
+    assert [(item["product_id"], item["discount"]) for item in delta["items"]] == [
+        (ids["SUCO-LIM"], 0.69),
+        (ids["SUCO-UVA"], 2.31),
+    ]
+    assert delta["total"] == 10.0
+    finalize_payload = {"sale_id": sale_id, "payments": [{"method": "cash", "amount": 10.0}]}
+    final = run(client.post("/api/vendas/finalizar", json=finalize_payload, headers=headers)).json()
+    assert final["sale"]["total"] == 10.0
+    assert "Promoção: -2.31" in final["receipt"]
+
+    # Venda gravada direto no banco: a faixa alcança a linha já lida e sai quando a quantidade cai.
+    monkeypatch.setattr(vendas, "cart_store", CartStore(enabled=False, max_carts=10, journal=CartJournal("")))
+    sale_id = run(client.post("/api/vendas/iniciar", json={}, headers=headers)).json()["id"]
+    for quantidade in (4, 2):
+        linhas = [{"product_id": ids["AGUA-500"], "quantity": quantidade}]
+        delta = run(
+            client.post("/api/vendas/adicionar-itens", json={"sale_id": sale_id, "lines": linhas}, headers=headers)
+        ).json()
+    assert sorted(item["discount"] for item in delta["items"]) == [0.4, 0.8]
+    assert delta["total"] == 10.8
+    removido = next(item["id"] for item in delta["items"] if item["quantity"] == 2)
+    sale = run(
+        client.post("/api/vendas/remover-item", json={"sale_id": sale_id, "item_id": removido}, headers=headers)
+    ).json()
+    assert [item["discount"] for item in sale["items"]] == [0.0] and sale["total"] == 8.0
+
+
+def test_promotions_apply_on_every_sale_entry_point(
+    client: AsyncClient, session_factory: sessionmaker, monkeypatch
+):
+    email = "promocao-rotas@example.com"
+    run(_create_user(session_factory, email=email, role_name="GERENTE"))
+    headers, _ = run(_authenticate(client, email, "secret"))
+    payload = {"sku": "REFRI-2L", "name": "Refrigerante 2L", "price": 2.0, "cost": 1.0}
+    product_id = run(client.post("/api/produtos/", json=payload, headers=headers)).json()["id"]
+    monkeypatch.setattr(vendas, "cart_store", CartStore(enabled=False, max_carts=10, journal=CartJournal("")))
+
+    # Motor já compilado sem promoções; a faixa gravada em seguida só o marca como desatualizado.
+    sale_id = run(client.post("/api/vendas/iniciar", json={}, headers=headers)).json()["id"]
+    linhas = [{"product_id": product_id}]
+    run(client.post("/api/vendas/adicionar-itens", json={"sale_id": sale_id, "lines": linhas}, headers=headers))
+    faixa = {
+        "name": "10% a partir de 5",
+        "kind": "tier",
+        "min_quantity": 5,
+        "percent_off": 10,
+        "products": [{"product_id": product_id}],
+    }
+    assert run(client.post("/api/promocoes/", json=faixa, headers=headers)).status_code == 201
+
+    sale_id = run(client.post("/api/vendas/iniciar", json={}, headers=headers)).json()["id"]
+    linhas = [{"product_id": product_id, "quantity": 5}]
+    delta = run(
+        client.post("/api/vendas/adicionar-itens", json={"sale_id": sale_id, "lines": linhas}, headers=headers)
+    ).json()
+    assert (delta["items"][0]["discount"], delta["total"]) == (1.0, 9.0)
+
+    itens = [{"product_id": product_id, "quantity": 5, "unit_price": 2.0}]
+    criada = run(client.post("/api/vendas/", json={"items": itens, "payments": []}, headers=headers)).json()
+    assert (criada["items"][0]["discount"], float(criada["total"])) == (1.0, 9.0)
+
+    lote = {"sales": [{"code": "PROMO-1", "items": itens, "payments": []}]}
+    resultado = run(client.post("/api/vendas/lote", json=lote, headers=headers)).json()["results"][0]
+    venda = run(client.get(f"/api/vendas/{resultado['sale_id']}", headers=headers)).json()
+    assert (venda["items"][0]["discount"], float(venda["total"])) == (1.0, 9.0)
+
+
+def test_sale_totals_use_exact_cents(client: AsyncClient, session_factory: sessionmaker):
+    assert money.allocate(1000, [3, 3, 3]) == [334, 333, 333]
+    assert money.line_total(money.milli("0.333"), money.cents("1.99")) == 66
+    assert money.format_cents(money.cents(0.1) + money.cents(0.2)) == "0.30"
+
+    email = "centavos@example.com"
+    run(_create_user(session_factory, email=email, role_name="GERENTE"))
+    headers, _ = run(_authenticate(client, email, "secret"))
+    ids = []
+    for sku, price in (("BALA-10", 0.1), ("BALA-20", 0.2)):
+        payload = {"sku": sku, "name": sku, "price": price, "cost": 0.05}
+        ids.append(run(client.post("/api/produtos/", json=payload, headers=headers)).json()["id"])
+
+    # Em float, 0,10 + 0,20 passa de 0,30 e o pagamento exato era recusado.
+    sale_id = run(client.post("/api/vendas/iniciar", json={}, headers=headers)).json()["id"]
+    linhas = [{"product_id": product_id} for product_id in ids]
+    delta = run(
+        client.post("/api/vendas/adicionar-itens", json={"sale_id": sale_id, "lines": linhas}, headers=headers)
+    ).json()
+    assert delta["total"] == 0.3
+    finalize_payload = {"sale_id": sale_id, "payments": [{"method": "cash", "amount": 0.3}]}
+    final = run(client.post("/api/vendas/finalizar", json=finalize_payload, headers=headers))
+    assert final.status_code == 200
+    assert "Total: 0.30" in final.json()["receipt"]
+
+
+def test_finalize_writes_outbox_and_dispatches_effects(
+    client: AsyncClient, session_factory: sessionmaker, monkeypatch
+):
+    email = "outbox@example.com"
+    run(_create_user(session_factory, email=email, role_name="GERENTE"))
+    headers, _ = run(_authenticate(client, email, "secret"))
+    payload = {"sku": "CAFE-500", "name": "Café 500g", "price": 18.9, "cost": 12.0}
+    product_id = run(client.post("/api/produtos/", json=payload, headers=headers)).json()["id"]
+    sale_id = run(client.post("/api/vendas/iniciar", json={}, headers=headers)).json()["id"]
+    linhas = [{"product_id": product_id}]
+    run(client.post("/api/vendas/adicionar-itens", json={"sale_id": sale_id, "lines": linhas}, headers=headers))
+
+    item = {"product_code": "CAFE-500", "description": "Café 500g", "quantity": 1, "unit_price": 18.9}
+    finalize = {
+        "sale_id": sale_id,
+        "payments": [{"method": "cash", "amount": 20}],
+        "invoice": {"items": [{**item, "ncm": "09012100", "cfop": "5102", "cst": "00"}]},
+        "printer": {"host": "impressora.local"},
+    }
+    assert run(client.post("/api/vendas/finalizar", json=finalize, headers=headers)).status_code == 200
+
+    async def _estado():
+        async with session_factory() as session:
+            mensagens = (await session.execute(select(OutboxMessage).order_by(OutboxMessage.id))).scalars().all()
+            tarefas = (await session.execute(select(Job).order_by(Job.id))).scalars().all()
+            documentos = (await session.execute(select(FiscalDocument))).scalars().all()
+            auditoria = (
+                await session.execute(select(AuditLog.action).where(AuditLog.action == "finalize_sale"))
+            ).scalars().all()
+            return (
+                [(m.topic, m.status, m.attempts) for m in mensagens],
+                [(t.queue, t.task, t.status, t.attempts) for t in tarefas],
+                documentos,
+                auditoria,
+            )
+
+    # NFC-e e cupom entram como tarefas das filas fiscal e print, na mesma transação da venda.
+    mensagens, tarefas, documentos, auditoria = run(_estado())
+    assert [topic for topic, _, _ in mensagens] == ["sales_rollup", "audit"]
+    assert {(status, attempts) for _, status, attempts in mensagens} == {("pending", 0)}
+    assert tarefas == [("fiscal", "fiscal.emit_nfce", "queued", 0), ("print", "print.sale", "queued", 0)]
+    assert documentos == [] and auditoria == []
+
+    def _sem_impressora(self, sale):
+        raise OSError("impressora desligada")
+
+    monkeypatch.setattr(sale_effects.ThermalPrinterService, "print_sale", _sem_impressora)
+    despachante = OutboxDispatcher(
+        enabled=True,
+        workers=1,
+        batch_size=10,
+        poll_seconds=0.1,
+        lease_seconds=60,
+        max_attempts=2,
+        retry_base_seconds=0,
+    )
+    assert run(despachante.dispatch_pending(session_factory)) == 2
+    assert (despachante.dispatched, despachante.retried, despachante.failed) == (2, 0, 0)
+    runner = jobs.JobRunner(
+        enabled=True,
+        queues={"fiscal": 1, "print": 1},
+        poll_seconds=0.1,
+        lease_seconds=60,
+        max_attempts=5,
+        retry_base_seconds=0,
+        retention_days=7,
+        schedules=[],
+    )
+    assert run(runner.run_pending(session_factory)) == 4
+    assert (runner.stats["fiscal"].done, runner.stats["print"].retried, runner.stats["print"].dead) == (1, 2, 1)
+
+    mensagens, tarefas, documentos, auditoria = run(_estado())
+    assert mensagens == []
+    assert tarefas == [("fiscal", "fiscal.emit_nfce", "done", 1), ("print", "print.sale", "dead", 3)]
+    assert [(d.sale_id, d.model, d.status) for d in documentos] == [(sale_id, "NFC-e", "authorized")]
+    assert auditoria == ["finalize_sale"]
+    daily = run(client.get("/api/relatorios/vendas/diario", headers=headers)).json()
+    assert daily == [{"data": date.today().isoformat(), "total": 18.9, "quantidade": 1}]
+    assert run(client.get("/api/tarefas/", headers=headers)).json()["queues"]["print"]["dead"] == 1
+
+    # Mensagem "nfce" gravada antes da mudança é encaminhada para a fila fiscal.
+    async def _mensagem_antiga():
+        async with session_factory() as session:
+            outbox.enqueue(session, "nfce", {"sale_id": sale_id, "invoice": finalize["invoice"]})
+            await session.commit()
+
+    run(_mensagem_antiga())
+    assert run(despachante.dispatch_pending(session_factory)) == 1
+    assert run(runner.run_pending(session_factory, "fiscal")) == 1
+    assert len(run(_estado())[2]) == 2
+
+
+def test_job_runner_priorities_retries_and_cron(client: AsyncClient, session_factory: sessionmaker):
+    email = "tarefas@example.com"
+    run(_create_user(session_factory, email=email, role_name="GERENTE"))
+    headers, _ = run(_authenticate(client, email, "secret"))
+    executadas = []
+
+    @jobs.task("teste.registrar", queue="teste")
+    async def _registrar(session, payload):
+        executadas.append(payload["n"])
+        return {"n": payload["n"]}
+
+    @jobs.task("teste.falhar", queue="teste", max_attempts=2)
+    def _falhar(payload):
+        raise RuntimeError("sem conexão")
+
+    async def _enfileirar():
+        async with session_factory() as session:
+            jobs.enqueue_job(session, "teste.registrar", {"n": 1})
+            jobs.enqueue_job(session, "teste.registrar", {"n": 2}, priority=5)
+            jobs.enqueue_job(session, "teste.falhar")
+            jobs.enqueue_job(session, "teste.registrar", {"n": 3}, run_at=datetime.utcnow() + timedelta(hours=1))
+            await session.commit()
+
+    run(_enfileirar())
+    runner = jobs.JobRunner(
+        enabled=True,
+        queues={"teste": 2},
+        poll_seconds=0.1,
+        lease_seconds=60,
+        max_attempts=5,
+        retry_base_seconds=0,
+        retention_days=7,
+        schedules=[JobSchedule(name="teste-horaria", task="teste.registrar", cron="0 * * * *", payload={"n": 9})],
+    )
+    # A tarefa que falha roda na thread, volta à fila e morre na segunda tentativa.
+    assert run(runner.run_pending(session_factory)) == 4
+    assert executadas == [2, 1]
+    assert (runner.stats["teste"].done, runner.stats["teste"].retried, runner.stats["teste"].dead) == (2, 1, 1)
+
+    async def _estado():
+        async with session_factory() as session:
+            result = await session.execute(select(Job).order_by(Job.id))
+            return [(job.task, job.status, job.attempts) for job in result.scalars()]
+
+    assert run(_estado()) == [
+        ("teste.registrar", "done", 1),
+        ("teste.registrar", "done", 1),
+        ("teste.falhar", "dead", 2),
+        ("teste.registrar", "queued", 0),
+    ]
+
+    cron = jobs.CronSchedule("*/15 9-17 * * 1-5")
+    assert cron.next_after(datetime(2025, 1, 3, 17, 50)) == datetime(2025, 1, 6, 9, 0)
+    assert cron.next_after(datetime(2025, 1, 6, 9, 0)) == datetime(2025, 1, 6, 9, 15)
+    assert jobs.CronSchedule("0 0 29 2 *").next_after(datetime(2025, 3, 1)) == datetime(2028, 2, 29)
+    with pytest.raises(ValueError):
+        jobs.CronSchedule("61 * * * *")
+
+    # O primeiro passo só calcula o horário; dois processos no mesmo horário geram uma única tarefa.
+    assert run(runner.schedule_due(session_factory, datetime(2025, 1, 6, 9, 30))) == 0
+    outro = jobs.JobRunner.from_settings(get_settings())
+    outro.schedules = runner.schedules
+    run(outro.schedule_due(session_factory, datetime(2025, 1, 6, 9, 30)))
+    assert run(runner.schedule_due(session_factory, datetime(2025, 1, 6, 10, 0, 5))) == 1
+    assert run(outro.schedule_due(session_factory, datetime(2025, 1, 6, 10, 0, 9))) == 0
+    assert run(runner.run_pending(session_factory, "teste")) == 1
+    assert executadas == [2, 1, 9]
+
+    resumo = run(client.get("/api/tarefas/", headers=headers)).json()
+    assert resumo["queues"]["teste"]["dead"] == 1
+    assert resumo["queues"]["teste"]["ready"] == 0
+    assert resumo["tasks"]["teste.registrar"]["done_24h"] == 3
+    assert "fiscal.emit_nfce" in resumo["registered"]
+    mortas = run(client.get("/api/tarefas/lista", params={"status": "dead"}, headers=headers)).json()
+    assert [job["task"] for job in mortas] == ["teste.falhar"]
+    requeued = run(client.post(f"/api/tarefas/{mortas[0]['id']}/reenfileirar", headers=headers))
+    assert requeued.status_code == 200
+    assert (requeued.json()["status"], requeued.json()["attempts"]) == ("queued", 0)
+    done_id = run(client.get("/api/tarefas/lista", params={"status": "done"}, headers=headers)).json()[0]["id"]
+    assert run(client.post(f"/api/tarefas/{done_id}/reenfileirar", headers=headers)).status_code == 400
+    criada = run(client.post("/api/tarefas/", json={"task": "teste.inexistente"}, headers=headers))
+    assert criada.status_code == 400
+
+    # Tarefa mais longa que o prazo de posse: a renovação impede que outro worker a retome.
+    lentas = []
+
+    @jobs.task("teste.lenta", queue="lenta")
+    async def _lenta(session, payload):
+        lentas.append(payload["n"])
+        await asyncio.sleep(0.6)
+
+    def _worker(nome: str) -> jobs.JobRunner:
+        worker = jobs.JobRunner(
+            enabled=True,
+            queues={"lenta": 1},
+            poll_seconds=0.05,
+            lease_seconds=0.2,
+            max_attempts=5,
+            retry_base_seconds=0,
+            retention_days=7,
+            schedules=[],
+        )
+        worker.worker_id = nome
+        return worker
+
+    async def _disputa():
+        async with session_factory() as session:
+            jobs.enqueue_job(session, "teste.lenta", {"n": 1})
+            await session.commit()
+        primeiro, segundo = _worker("a"), _worker("b")
+        primeiro.start(session_factory, schedule=False)
+        await asyncio.sleep(0.1)
+        segundo.start(session_factory, schedule=False)
+        await asyncio.sleep(0.8)
+        renovacoes = primeiro._pools["lenta"].heartbeat.renewals
+        await asyncio.gather(primeiro.stop(), segundo.stop())
+        async with session_factory() as session:
+            job = (await session.execute(select(Job).where(Job.task == "teste.lenta"))).scalar_one()
+        return renovacoes, (job.status, job.attempts, job.worker)
+
+    renovacoes, lenta = run(_disputa())
+    assert lentas == [1] and lenta == ("done", 1, "a") and renovacoes >= 2
+
+
+def test_sefaz_client_pools_caps_and_falls_back_to_contingency(client: AsyncClient, session_factory: sessionmaker):
+    config = StandinConfig(latency_ms=20, seed=1)
+    sefaz = create_standin_app(config)
+    cliente = SefazClient(
+        {"SP": SefazEndpoint(url="http://sefaz.test/ws/")},
+        "SP",
+        max_concurrency=2,
+        transport=httpx.ASGITransport(app=sefaz),
+    )
+    servico = FiscalService(NfceAdapter(sefaz_client=cliente, contingency_manager=ContingencyManager(session_factory)))
+    item = {"product_code": "CAFE-500", "description": "Café", "quantity": 1, "unit_price": 18.9}
+    nota = {"items": [{**item, "ncm": "09012100", "cfop": "5102", "cst": "00"}]}
+
+    async def _emitir(quantidade: int):
+        pedidos = [servico.emit_invoice(InvoiceRequest(sale_id=venda, **nota)) for venda in range(quantidade)]
+        return await asyncio.gather(*pedidos)
+
+    autorizadas = run(_emitir(6))
+    assert all(nota.success and not nota.contingency for nota in autorizadas)
+    assert {len(nota.access_key) for nota in autorizadas} == {44}
+    # O semáforo da UF segura as emissões: a SEFAZ nunca recebe mais de duas ao mesmo tempo.
+    assert (sefaz.state.stats.requests, sefaz.state.stats.max_in_flight) == (6, 2)
+
+    chave = autorizadas[0].access_key
+    assert run(servico.status(chave)).message.startswith("100")
+    cancelamento = run(servico.cancel_invoice(CancelRequest(access_key=chave, justification="Erro de digitação")))
+    assert cancelamento.success and cancelamento.message.startswith("135")
+    assert run(servico.status(chave)).message.startswith("101")
+
+    config.reject_rate, config.reject_codes = 1.0, ["778"]
+    rejeitada = run(servico.emit_invoice(InvoiceRequest(sale_id=10, **nota)))
+    assert not rejeitada.success and rejeitada.message.startswith("778")
+
+    config.outage = True
+    fora_do_ar = run(servico.emit_invoice(InvoiceRequest(sale_id=11, **nota)))
+    config.outage, config.suspended = False, True
+    paralisada = run(servico.emit_invoice(InvoiceRequest(sale_id=12, **nota)))
+    assert fora_do_ar.contingency and paralisada.contingency and fora_do_ar.success
+    motivos = [registro["reason"] for registro in run(servico.contingency_queue())]
+    assert "503" in motivos[0] and motivos[1].startswith("108")
+
+    # 403 é configuração errada, não queda: a emissão falha em vez de ir para a contingência.
+    config.suspended, config.http_status = False, 403
+    with pytest.raises(SefazRequestError, match="HTTP 403"):
+        run(servico.emit_invoice(InvoiceRequest(sale_id=13, **nota)))
+    config.http_status = 429
+    assert run(servico.emit_invoice(InvoiceRequest(sale_id=14, **nota))).contingency
+    config.http_status = None
+    assert len(run(servico.contingency_queue())) == 3
+
+    metricas = servico.metrics()["ufs"]["SP"]
+    assert (metricas["requests"], metricas["rejected"], metricas["unavailable"], metricas["in_flight"]) == (14, 1, 3, 0)
+    assert metricas["errors"] == 1
+    run(servico.aclose())
+    assert run(client.get("/api/health/sefaz")).json() == {"mode": "mock"}
+
+
+def test_contingency_is_durable_and_retransmitted_by_deadline(
+    client: AsyncClient, session_factory: sessionmaker, monkeypatch
+):
+    email = "contingencia@example.com"
+    run(_create_user(session_factory, email=email, role_name="GERENTE"))
+    headers, _ = run(_authenticate(client, email, "secret"))
+    manager = fiscal_service.adapter.contingency_manager
+    monkeypatch.setattr(manager, "session_factory", session_factory)
+
+    # Venda com a NFC-e em contingência: o documento fica gravado, não em uma lista do processo.
+    payload = {"sku": "CAFE-500", "name": "Café 500g", "price": 18.9, "cost": 12.0}
+    product_id = run(client.post("/api/produtos/", json=payload, headers=headers)).json()["id"]
+    sale_id = run(client.post("/api/vendas/iniciar", json={}, headers=headers)).json()["id"]
+    linhas = [{"product_id": product_id}]
+    run(client.post("/api/vendas/adicionar-itens", json={"sale_id": sale_id, "lines": linhas}, headers=headers))
+    item = {"product_code": "CAFE-500", "description": "Café 500g", "quantity": 1, "unit_price": 18.9}
+    finalize = {
+        "sale_id": sale_id,
+        "payments": [{"method": "cash", "amount": 20}],
+        "invoice": {
+            "items": [{**item, "ncm": "09012100", "cfop": "5102", "cst": "00"}],
+            "use_contingency": True,
+            "contingency_reason": "Sem internet",
+        },
+    }
+    assert run(client.post("/api/vendas/finalizar", json=finalize, headers=headers)).status_code == 200
+    run(jobs.job_runner.run_pending(session_factory, "fiscal"))
+    for numero in range(24):
+        run(manager.enqueue(f"CONT-{numero:04d}", f"<NFe>{numero}</NFe>", "SEFAZ fora"))
+    monkeypatch.setattr(manager, "deadline_hours", 1)
+    run(manager.enqueue("CONT-URGENTE", "<NFe>urgente</NFe>", "SEFAZ fora"))
+
+    pendentes = run(client.get("/api/fiscal/contingencia", headers=headers)).json()
+    assert len(pendentes) == 26 and pendentes[0]["reference"] == "CONT-URGENTE"
+    assert pendentes[1]["reason"] == "Sem internet" and pendentes[1]["status"] == "pending"
+
+    config = StandinConfig(latency_ms=5, outage=True, seed=3)
+    sefaz = create_standin_app(config)
+    cliente = SefazClient(
+        {"SP": SefazEndpoint(url="http://sefaz.test/ws/")},
+        "SP",
+        max_concurrency=4,
+        transport=httpx.ASGITransport(app=sefaz),
+    )
+    retransmissor = ContingencyRetransmitter(
+        manager,
+        cliente,
+        enabled=True,
+        concurrency=8,
+        batch_size=10,
+        poll_seconds=0.1,
+        lease_seconds=60,
+        probe_seconds=0.01,
+        probe_max_seconds=0.05,
+        max_attempts=2,
+    )
+    # Fora do ar: o lote para no primeiro erro, nada é marcado e o worker passa a sondar.
+    assert run(retransmissor.retransmit_pending()) == 0
+    assert not retransmissor.online and retransmissor.outages == 1
+    assert run(retransmissor.transmit_batch()) == 1
+    assert retransmissor.metrics()["failed_probes"] == 2
+
+    config.outage = False
+    assert run(retransmissor.retransmit_pending()) == 26
+    assert retransmissor.online and retransmissor.authorized == 26
+    assert sefaz.state.stats.max_in_flight <= 4
+
+    async def _estado():
+        async with session_factory() as session:
+            ordem = (FiscalContingency.sent_at, FiscalContingency.id)
+            linhas = (await session.execute(select(FiscalContingency).order_by(*ordem))).scalars().all()
+            documento = (await session.execute(select(FiscalDocument))).scalar_one()
+            eventos = (await session.execute(select(FiscalEvent.type, FiscalEvent.status))).all()
+            return linhas, documento, eventos
+
+    linhas, documento, eventos = run(_estado())
+    assert linhas[0].reference == "CONT-URGENTE"
+    assert {(linha.status, linha.code, linha.attempts) for linha in linhas} == {("authorized", "100", 1)}
+    assert all(len(linha.access_key) == 44 and linha.protocol for linha in linhas)
+    assert (documento.sale_id, documento.status, len(documento.access_key)) == (sale_id, "authorized", 44)
+    assert sorted(eventos) == [("emission", "contingency"), ("transmission", "authorized")]
+
+    config.reject_rate, config.reject_codes = 1.0, ["778"]
+    run(manager.enqueue("CONT-NCM", "<NFe>ncm</NFe>"))
+    assert run(retransmissor.retransmit_pending()) == 1
+    assert run(client.get("/api/fiscal/contingencia", headers=headers)).json() == []
+    backlog = run(client.get("/api/health/fiscal-contingency")).json()["backlog"]
+    assert backlog["authorized"]["count"] == 26 and backlog["rejected"]["count"] == 1
+    run(cliente.aclose())
+
+
+def test_contingency_result_needs_claim_and_waits_for_sale_document(session_factory: sessionmaker):
+    manager = ContingencyManager(session_factory)
+
+    async def _preparar() -> int:
+        async with session_factory() as session:
+            venda = Sale(code="V-CONT-LINK", status="completed")
+            session.add(venda)
+            await session.commit()
+            return venda.id
+
+    sale_id = run(_preparar())
+    run(manager.enqueue("CONT-LINK", "<NFe>link</NFe>", "SEFAZ fora", sale_id=sale_id))
+
+    # A posse venceu e outro worker retomou o documento: o resultado do primeiro não vale mais.
+    (primeiro,) = run(manager.claim(10, lease_seconds=0))
+    (segundo,) = run(manager.claim(10, lease_seconds=60))
+    assert primeiro.claim_token != segundo.claim_token
+    resultado = {
+        "id": segundo.id,
+        "reference": "CONT-LINK",
+        "status": "authorized",
+        "attempts": 1,
+        "code": "100",
+        "protocol": "135260000000001",
+        "access_key": "3" * 44,
+        "sent_at": datetime.utcnow(),
+    }
+    assert run(manager.record([resultado], primeiro.claim_token)) == set()
+    run(manager.release([primeiro.id], primeiro.claim_token, 0))
+
+    async def _linha() -> FiscalContingency:
+        async with session_factory() as session:
+            return (await session.execute(select(FiscalContingency))).scalar_one()
+
+    linha = run(_linha())
+    assert (linha.status, linha.claim_token, linha.protocol) == ("sending", segundo.claim_token, None)
+
+    # A resposta chegou antes de a tarefa gravar a NFC-e da venda: a linha espera em `linking`.
+    assert run(manager.record([resultado], segundo.claim_token)) == {segundo.id}
+    assert run(manager.link_pending()) == 0
+    linha = run(_linha())
+    assert (linha.status, linha.outcome, linha.document_id) == ("linking", "authorized", None)
+    assert run(manager.pending()) == []
+
+    async def _emitir() -> int:
+        async with session_factory() as session:
+            documento = FiscalDocument(
+                sale_id=sale_id,
+                model="NFC-e",
+                status="contingency",
+                protocol="CONT-LINK",
+                events=[FiscalEvent(type="emission", status="contingency")],
+            )
+            session.add(documento)
+            await session.commit()
+            return documento.id
+
+    document_id = run(_emitir())
+    assert run(manager.link_pending()) == 1
+    assert run(manager.link_pending()) == 0
+
+    async def _documento():
+        async with session_factory() as session:
+            documento = await session.get(FiscalDocument, document_id)
+            eventos = (await session.execute(select(FiscalEvent.type, FiscalEvent.status))).all()
+            return documento, eventos
+
+    documento, eventos = run(_documento())
+    linha = run(_linha())
+    assert (linha.status, linha.document_id) == ("authorized", document_id)
+    assert (documento.status, documento.protocol) == ("authorized", "135260000000001")
+    assert sorted(eventos) == [("emission", "contingency"), ("transmission", "authorized")]
+
+    # O lote reivindicado cabe no prazo de posse mesmo que cada envio esgote o timeout.
+    retransmissor = ContingencyRetransmitter(
+        manager,
+        SimpleNamespace(timeout_seconds=10, max_concurrency=8),
+        enabled=True,
+        concurrency=8,
+        batch_size=200,
+        poll_seconds=1,
+        lease_seconds=120,
+        probe_seconds=1,
+        probe_max_seconds=60,
+        max_attempts=5,
+    )
+    assert retransmissor.claim_limit() == 96